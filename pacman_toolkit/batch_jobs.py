@@ -0,0 +1,304 @@
+#!/usr/bin/env python3
+"""
+Unattended pacman_manager operations on several devices at once.
+
+Each job names a device by its USB serial number and an operation:
+
+    unlock   fastboot flashing unlock (wipes the device, so it needs confirm_wipe)
+    root     flash a patched boot image to boot_a and boot_b, then reboot
+    rescue   freeze the bootloader and run flash_rescue.sh in fastboot mode
+
+Jobs wait for their device through the interceptor's detection code
+(target_devices) instead of "Press Enter", and run concurrently. One
+DeviceWatcher thread polls the bus for all of them, and every fastboot call
+is pinned to the job's device (`fastboot -s SERIAL`, ANDROID_SERIAL).
+
+Job file (JSON; image paths are relative to the job file):
+
+    {"jobs": [
+        {"serial": "3a1b2c3d", "op": "root", "image": "magisk_patched.img"},
+        {"serial": "4d5e6f70", "op": "rescue", "timeout": 600},
+        {"serial": "7a8b9c0d", "op": "unlock", "confirm_wipe": true}
+    ]}
+
+Usage: python3 pacman_manager.py batch jobs.json (see pacman_manager.py --help)
+"""
+import os
+import json
+import time
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    from . import process_watchdog
+    from . import retry_policy
+except ImportError:
+    import process_watchdog
+    import retry_policy
+
+logger = logging.getLogger(__name__)
+
+OPERATIONS = ("unlock", "root", "rescue")
+DEFAULT_TIMEOUT = 300.0  # seconds to wait for a device to show up
+DEFAULT_WORKERS = 4
+# "fastboot flashing unlock" waits silently for the user to confirm on the device
+UNLOCK_CONFIRM_TIMEOUT = 300.0
+
+class JobError(Exception):
+    pass
+
+def _interceptor():
+    # Imported on first use: it needs pyusb, the interactive menu does not
+    try:
+        from . import pacman_interceptor
+    except ImportError:
+        import pacman_interceptor
+    return pacman_interceptor
+
+class Job:
+    def __init__(self, serial, op, image=None, timeout=DEFAULT_TIMEOUT, confirm_wipe=False):
+        self.serial = serial
+        self.op = op
+        self.image = image
+        self.timeout = timeout
+        self.confirm_wipe = confirm_wipe
+
+    def validate(self):
+        if not self.serial:
+            raise JobError("Job without a serial number")
+        if self.op not in OPERATIONS:
+            raise JobError(f"{self.serial}: unknown operation {self.op!r} (expected {', '.join(OPERATIONS)})")
+        if self.op == "unlock" and not self.confirm_wipe:
+            raise JobError(f"{self.serial}: unlock wipes all data; set confirm_wipe to run it unattended")
+        if self.op == "root":
+            if not self.image:
+                raise JobError(f"{self.serial}: root needs an image")
+            if not os.path.isfile(self.image):
+                raise JobError(f"{self.serial}: image not found: {self.image}")
+
+    @classmethod
+    def from_dict(cls, data, base_dir=".", timeout=DEFAULT_TIMEOUT):
+        unknown = set(data) - {"serial", "op", "image", "timeout", "confirm_wipe"}
+        if unknown:
+            raise JobError(f"Unknown job field(s): {', '.join(sorted(unknown))}")
+        image = data.get("image")
+        if image:
+            image = os.path.join(base_dir, os.path.expanduser(image))
+        return cls(str(data.get("serial") or ""), data.get("op"), image,
+                   float(data.get("timeout", timeout)), bool(data.get("confirm_wipe")))
+
+    def __repr__(self):
+        return f"Job({self.serial!r}, {self.op!r})"
+
+class JobResult:
+    def __init__(self, job, ok, message, seconds):
+        self.job = job
+        self.ok = ok
+        self.message = message
+        self.seconds = seconds
+
+def load_jobs(path, timeout=DEFAULT_TIMEOUT):
+    """Reads and validates a job file; `timeout` applies to jobs without their own. Raises JobError."""
+    try:
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+    except (OSError, ValueError) as e:
+        raise JobError(f"Cannot read job file {path}: {e}")
+    entries = data.get("jobs") if isinstance(data, dict) else data
+    if not isinstance(entries, list):
+        raise JobError(f"{path}: expected a list of jobs or {{\"jobs\": [...]}}")
+    base_dir = os.path.dirname(os.path.abspath(path))
+    jobs = [Job.from_dict(entry, base_dir, timeout) for entry in entries]
+    check_jobs(jobs)
+    return jobs
+
+def check_jobs(jobs):
+    seen = set()
+    for job in jobs:
+        job.validate()
+        if job.serial in seen:
+            raise JobError(f"{job.serial}: more than one job for the same device")
+        seen.add(job.serial)
+
+class DeviceWatcher:
+    """
+    Polls the bus on one thread and keeps {serial: (dev, mode)} for every
+    device the interceptor recognizes. Serial numbers are read once per
+    enumeration.
+    """
+
+    def __init__(self, interval=None, find=None):
+        interceptor = _interceptor()
+        self.target_devices = interceptor.target_devices
+        self.usb_error = interceptor.load_usb().core.USBError
+        self.interval = interval or interceptor.POLLING_INTERVAL
+        self.find = find or (lambda: interceptor.load_usb().core.find(find_all=True))
+        self.devices = {}
+        self._serials = {}
+        self._cond = threading.Condition()
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._run, name="batch-device-watcher", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stopped.set()
+        with self._cond:
+            self._cond.notify_all()
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _serial(self, dev, key):
+        serial = self._serials.get(key)
+        if serial is None:
+            try:
+                serial = dev.serial_number
+            except (self.usb_error, ValueError, NotImplementedError) as e:
+                # No permission to read string descriptors, or the device just left
+                logger.debug(f"Cannot read serial of {dev.idVendor:04x}:{dev.idProduct:04x}: {e}")
+                return None
+            self._serials[key] = serial
+        return serial
+
+    def poll(self):
+        """One scan of the bus. Returns {serial: (dev, mode)}."""
+        try:
+            devs = self.find()
+        except self.usb_error as e:
+            logger.debug(f"USB enumeration error (transient): {e}")
+            return self.devices
+        current, seen = {}, set()
+        for dev, mode in self.target_devices(devs):
+            # The address changes whenever the device re-enumerates
+            key = retry_policy.slot_key(dev) + (dev.address,)
+            seen.add(key)
+            serial = self._serial(dev, key)
+            if serial:
+                current[serial] = (dev, mode)
+        self._serials = {key: serial for key, serial in self._serials.items() if key in seen}
+        return current
+
+    def _run(self):
+        while not self._stopped.is_set():
+            devices = self.poll()
+            with self._cond:
+                self.devices = devices
+                self._cond.notify_all()
+            self._stopped.wait(self.interval)
+
+    def wait(self, serial, modes, timeout):
+        """(dev, mode) once `serial` is seen in one of `modes`; None on timeout or stop."""
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while not self._stopped.is_set():
+                hit = self.devices.get(serial)
+                if hit and hit[1] in modes:
+                    return hit
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return None
+                self._cond.wait(remaining)
+        return None
+
+def _fastboot(serial, *args):
+    """
+    Runs fastboot against one device under the watchdog (see
+    process_watchdog.py), so a stalled transfer fails its job and frees the
+    worker. Returns the StepResult; raises JobError if it fails.
+    """
+    deadline, stall_timeout = None, process_watchdog.STALL_TIMEOUT
+    if args[0] == "flash":
+        deadline = process_watchdog.step_deadline(os.path.getsize(args[-1]))
+    elif args[:2] == ("flashing", "unlock"):
+        stall_timeout = UNLOCK_CONFIRM_TIMEOUT
+    try:
+        result = process_watchdog.run(["fastboot", "-s", serial, *args], f"fastboot {' '.join(args)}",
+                                      deadline=deadline, stall_timeout=stall_timeout,
+                                      allowance=process_watchdog.FastbootSteps(), echo=False)
+    except FileNotFoundError:
+        raise JobError("'fastboot' command not found. Please install android-tools.")
+    if result.status == "failed":
+        raise JobError(f"fastboot {' '.join(args)} failed: {result.step or result.returncode}")
+    if not result.ok:
+        raise JobError(result.describe())
+    return result
+
+def _unlock(job, dev):
+    _fastboot(job.serial, "flashing", "unlock")
+    return "Unlock command sent; confirm on the device screen"
+
+def _root(job, dev):
+    # Imported here: only root jobs read images (and it pulls in zipfile)
+    try:
+        from . import image_source
+    except ImportError:
+        import image_source
+    # Archive members are streamed into memory instead of being extracted
+    staged, image_path = image_source.stage_ref(job.image)
+    try:
+        for slot in ("boot_a", "boot_b"):
+            log(job, f"Flashing {os.path.basename(image_path)} to {slot}...")
+            _fastboot(job.serial, "flash", slot, image_path)
+    finally:
+        staged.close()
+    _fastboot(job.serial, "reboot")
+    return "Flashed boot_a and boot_b, rebooting"
+
+def _rescue(job, dev):
+    interceptor = _interceptor()
+    interceptor.freeze_fastboot(dev)
+    ret = interceptor.run_rescue("fastboot", serial=job.serial)
+    if ret < 0:
+        raise JobError(f"flash_rescue.sh killed by the watchdog (signal {-ret})")
+    if ret != 0:
+        raise JobError(f"flash_rescue.sh exited with {ret}")
+    return "Rescue flash complete"
+
+_OPERATIONS = {"unlock": _unlock, "root": _root, "rescue": _rescue}
+
+def log(job, message, level=logging.INFO):
+    logger.log(level, f"[{job.serial}] {message}")
+
+def run_job(job, watcher):
+    start = time.monotonic()
+    log(job, f"{job.op}: waiting up to {job.timeout:.0f}s for the device in fastboot mode")
+    hit = watcher.wait(job.serial, ("fastboot",), job.timeout)
+    if hit is None:
+        message = f"Device not seen in fastboot mode within {job.timeout:.0f}s"
+        log(job, message, logging.ERROR)
+        return JobResult(job, False, message, time.monotonic() - start)
+
+    dev, _ = hit
+    log(job, "Device connected")
+    try:
+        message = _OPERATIONS[job.op](job, dev)
+        ok = True
+    except Exception as e:
+        message, ok = str(e), False
+    log(job, message, logging.INFO if ok else logging.ERROR)
+    return JobResult(job, ok, message, time.monotonic() - start)
+
+def run_jobs(jobs, workers=DEFAULT_WORKERS, watcher=None):
+    """Runs `jobs` concurrently, each as soon as its device shows up. Returns JobResults in job order."""
+    check_jobs(jobs)
+    watcher = watcher or DeviceWatcher()
+    pool = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="batch-job")
+    watcher.start()
+    try:
+        return list(pool.map(lambda job: run_job(job, watcher), jobs))
+    finally:
+        # Also wakes jobs still waiting for a device (Ctrl+C)
+        watcher.stop()
+        pool.shutdown(wait=True, cancel_futures=True)
@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+"""
+Bootloop window profiler.
+
+Samples the USB bus at high frequency with the interceptor's detection
+code, without trying to catch anything, and reports how long the phone
+stays enumerated in each mode (BROM, preloader, fastboot) and how long
+the gaps between appearances are. From those it suggests POLLING_INTERVAL
+and backoff values for pacman_interceptor.py.
+
+    sudo python3 bootloop_profiler.py --duration 60
+    python3 bootloop_profiler.py --from session.tl
+"""
+import sys
+import time
+import argparse
+import tempfile
+
+try:
+    from . import pacman_interceptor
+    from . import usb_timeline
+except ImportError:
+    import pacman_interceptor
+    import usb_timeline
+
+Colors = pacman_interceptor.Colors
+
+DEFAULT_INTERVAL_MS = 1.0
+# Histogram bucket upper edges in ms
+BUCKETS_MS = [5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000]
+MIN_POLLING_INTERVAL = 0.005
+MODE_ORDER = ["brom", "preloader", "mtk", "fastboot"]
+
+class SampleStats:
+    def __init__(self):
+        self.samples = 0
+        self.elapsed = 0.0
+        self.max_gap = 0.0
+
+    @property
+    def mean_interval(self):
+        return self.elapsed / self.samples if self.samples else 0.0
+
+def sample(duration, interval, record_path, find=None, clock=time.perf_counter):
+    """
+    Polls the bus every `interval` seconds for `duration` seconds (None = until
+    Ctrl+C) and records every transition of a target device to record_path.
+    """
+    if find is None:
+        find = lambda: pacman_interceptor.load_usb().core.find(find_all=True)
+    stats = SampleStats()
+    with usb_timeline.TimelineRecorder(record_path, vids=pacman_interceptor.TARGET_VIDS) as recorder:
+        start = last = clock()
+        next_tick = start
+        try:
+            while duration is None or last - start < duration:
+                try:
+                    recorder.observe(find())
+                except pacman_interceptor.load_usb().core.USBError:
+                    pass
+                now = clock()
+                stats.samples += 1
+                stats.max_gap = max(stats.max_gap, now - last)
+                last = now
+                next_tick += interval
+                if next_tick > now:
+                    time.sleep(next_tick - now)
+                else:
+                    # Fell behind (slow enumeration); don't try to catch up
+                    next_tick = now
+        except KeyboardInterrupt:
+            pass
+        stats.elapsed = last - start
+    return stats
+
+def profile(timeline):
+    """Returns {mode: {"present": [seconds], "gaps": [seconds]}} for a recording."""
+    result = {}
+    last_end = {}
+    for a in timeline.appearances(pacman_interceptor.TARGET_VIDS):
+        mode = pacman_interceptor.device_mode(a.vid, a.pid)
+        if mode is None:
+            continue
+        entry = result.setdefault(mode, {"present": [], "gaps": []})
+        entry["present"].append(a.duration)
+        if mode in last_end:
+            entry["gaps"].append(a.start - last_end[mode])
+        last_end[mode] = a.end
+    return result
+
+def percentile(values, p):
+    if not values:
+        return None
+    values = sorted(values)
+    k = (len(values) - 1) * p / 100.0
+    lo = int(k)
+    hi = min(lo + 1, len(values) - 1)
+    return values[lo] + (values[hi] - values[lo]) * (k - lo)
+
+def histogram(values, width=40):
+    """Text histogram of durations (seconds) over BUCKETS_MS."""
+    counts = [0] * (len(BUCKETS_MS) + 1)
+    for v in values:
+        ms = v * 1000
+        for i, edge in enumerate(BUCKETS_MS):
+            if ms < edge:
+                counts[i] += 1
+                break
+        else:
+            counts[-1] += 1
+    peak = max(counts) or 1
+    lines = []
+    lower = 0
+    for i, count in enumerate(counts):
+        if i < len(BUCKETS_MS):
+            label = f"{lower:>5}-{BUCKETS_MS[i]:<5} ms"
+            lower = BUCKETS_MS[i]
+        else:
+            label = f"{'>=' + str(lower):>11} ms"
+        if count:
+            lines.append(f"  {label} {'#' * max(1, count * width // peak)} {count}")
+    return lines
+
+def suggest(present, gaps):
+    """
+    Suggested interceptor settings for one mode. A window of length w is
+    caught with probability min(1, w / interval), so the interval is half
+    the 5th-percentile window to leave room for sleep overshoot. The first
+    retry waits 2 * INITIAL_BACKOFF, which should fit inside the shortest
+    gaps so the next appearance is not skipped.
+    """
+    suggestion = {}
+    shortest = percentile(present, 5)
+    if shortest is not None:
+        suggestion["POLLING_INTERVAL"] = round(max(MIN_POLLING_INTERVAL, shortest / 2), 3)
+    short_gap = percentile(gaps, 10)
+    if short_gap is not None:
+        suggestion["INITIAL_BACKOFF"] = round(max(0.0, short_gap / 4), 2)
+        suggestion["MAX_BACKOFF"] = round(max(suggestion["INITIAL_BACKOFF"], percentile(gaps, 50)), 1)
+    return suggestion
+
+def format_ms(seconds):
+    return "-" if seconds is None else f"{seconds * 1000:.1f}"
+
+def report(modes):
+    if not modes:
+        print(f"{Colors.WARNING}[PROFILE] No BROM, preloader or fastboot appearances recorded.{Colors.ENDC}")
+        return
+    for mode in sorted(modes, key=lambda m: MODE_ORDER.index(m) if m in MODE_ORDER else len(MODE_ORDER)):
+        present, gaps = modes[mode]["present"], modes[mode]["gaps"]
+        print(f"\n{Colors.BOLD}{mode.upper()}{Colors.ENDC}: {len(present)} appearances")
+        print(f"  present ms: min {format_ms(min(present))}  p50 {format_ms(percentile(present, 50))}"
+              f"  max {format_ms(max(present))}")
+        for line in histogram(present):
+            print(line)
+        if gaps:
+            print(f"  gap ms:     min {format_ms(min(gaps))}  p50 {format_ms(percentile(gaps, 50))}"
+                  f"  max {format_ms(max(gaps))}")
+            for line in histogram(gaps):
+                print(line)
+        settings = suggest(present, gaps)
+        if settings:
+            values = ", ".join(f"{k} = {v}" for k, v in settings.items())
+            print(f"  {Colors.GREEN}Suggested: {values}{Colors.ENDC}")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure bootloop enumeration windows per mode")
+    parser.add_argument("--duration", type=float, default=60.0, help="Seconds to sample (0 = until Ctrl+C)")
+    parser.add_argument("--interval", type=float, default=DEFAULT_INTERVAL_MS, help="Sampling interval in ms")
+    parser.add_argument("--record", metavar="FILE", help="Keep the sampled timeline in FILE")
+    parser.add_argument("--from", dest="source", metavar="FILE", help="Profile an existing recording instead of sampling")
+    args = parser.parse_args(argv)
+
+    if args.source:
+        path = args.source
+    else:
+        path = args.record or tempfile.mkstemp(prefix="pacman-profile-", suffix=".tl")[1]
+        print(f"[PROFILE] Sampling every {args.interval:g} ms"
+              + (f" for {args.duration:g}s" if args.duration else " until Ctrl+C") + ". Start the bootloop now.")
+        stats = sample(args.duration or None, args.interval / 1000.0, path)
+        print(f"[PROFILE] {stats.samples} samples, mean interval {format_ms(stats.mean_interval)} ms, "
+              f"worst {format_ms(stats.max_gap)} ms")
+        if stats.max_gap > 0.005:
+            print(f"{Colors.WARNING}[PROFILE] Windows shorter than {format_ms(stats.max_gap)} ms may be missed or truncated.{Colors.ENDC}")
+
+    try:
+        timeline = usb_timeline.read_timeline(path)
+    except (OSError, usb_timeline.TimelineError) as e:
+        print(f"{Colors.FAIL}[PROFILE] {e}{Colors.ENDC}")
+        return 1
+    report(profile(timeline))
+    if not args.source:
+        print(f"\n[PROFILE] Timeline saved to {path}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,216 @@
+#!/usr/bin/env python3
+"""
+Installed-package probe for setup_and_verify.
+
+Reads pacman's local database directly instead of running `pacman -Qi` once
+per package. Every installed package is a directory
+/var/lib/pacman/local/<name>-<pkgver>-<pkgrel>/ holding a `desc` file, so
+package names come from one directory listing; the desc files are only read
+when a wanted name is not a package name (something another package
+provides, or a group). The resolved database is cached keyed by the
+directory's mtime, which changes whenever a package is installed or removed.
+
+Python modules are checked with importlib.util.find_spec, which locates a
+module without importing it.
+
+    result = probe(["git", "python-pyusb"], modules={"python-pyusb": "usb"})
+    result.missing
+
+Usage: python3 dependency_probe.py [--root DIR] [--no-cache] PACKAGE...
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import importlib.util
+
+DB_SUBDIR = os.path.join("var", "lib", "pacman", "local")
+CACHE_VERSION = 1
+# A directory modified this recently may change again within the same mtime tick
+RACY_SECONDS = 2
+
+class ProbeError(Exception):
+    pass
+
+def default_cache_path():
+    cache = os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache")
+    return os.path.join(cache, "pacman_toolkit", "dependency_probe.json")
+
+def _parse_desc(path):
+    """Returns {section: [values]} for a pacman desc file."""
+    sections = {}
+    current = None
+    with open(path, encoding="utf-8", errors="replace") as f:
+        for line in f:
+            line = line.rstrip("\n")
+            if line.startswith("%") and line.endswith("%"):
+                current = sections.setdefault(line.strip("%"), [])
+            elif line and current is not None:
+                current.append(line)
+    return sections
+
+class PackageDB:
+    """The local package database under `root`, read once."""
+
+    def __init__(self, root="/"):
+        self.path = os.path.join(root, DB_SUBDIR)
+        self.mtime_ns = None
+        # name -> version
+        self.packages = {}
+        # provided name -> package, group -> [packages]; None until the desc files are read
+        self.provides = None
+        self.groups = None
+
+    def load(self):
+        try:
+            self.mtime_ns = os.stat(self.path).st_mtime_ns
+            entries = os.listdir(self.path)
+        except OSError as e:
+            raise ProbeError(f"No pacman database at {self.path}: {e.strerror}")
+        self.packages = {}
+        for entry in entries:
+            parts = entry.rsplit("-", 2)
+            if len(parts) == 3:
+                self.packages[parts[0]] = f"{parts[1]}-{parts[2]}"
+        return self
+
+    def load_desc(self):
+        self.provides, self.groups = {}, {}
+        for entry in os.listdir(self.path):
+            try:
+                desc = _parse_desc(os.path.join(self.path, entry, "desc"))
+            except OSError:
+                continue
+            name = (desc.get("NAME") or [entry.rsplit("-", 2)[0]])[0]
+            for provided in desc.get("PROVIDES", []):
+                self.provides.setdefault(provided.split("=", 1)[0], name)
+            for group in desc.get("GROUPS", []):
+                self.groups.setdefault(group, []).append(name)
+
+    def resolve(self, name):
+        """
+        Installed package satisfying `name`, or None. A group counts as
+        installed when any of its members is (like `pacman -Qg`): the local
+        database only records installed members, so a partly installed
+        group cannot be told apart from a complete one.
+        """
+        if name in self.packages:
+            return name
+        if self.provides is None:
+            self.load_desc()
+        if name in self.provides:
+            return self.provides[name]
+        if name in self.groups:
+            return " ".join(sorted(self.groups[name]))
+        return None
+
+    def to_dict(self):
+        return {"version": CACHE_VERSION, "db": self.path, "mtime_ns": self.mtime_ns,
+                "packages": self.packages, "provides": self.provides, "groups": self.groups}
+
+    @classmethod
+    def from_cache(cls, path, root="/"):
+        """The cached database if it is still current, else None."""
+        db = cls(root)
+        try:
+            with open(path, encoding="utf-8") as f:
+                data = json.load(f)
+            mtime_ns = os.stat(db.path).st_mtime_ns
+        except (OSError, ValueError):
+            return None
+        if data.get("version") != CACHE_VERSION or data.get("db") != db.path or data.get("mtime_ns") != mtime_ns:
+            return None
+        db.mtime_ns = mtime_ns
+        db.packages = data["packages"]
+        db.provides = data["provides"]
+        db.groups = data["groups"]
+        return db
+
+    def save(self, path):
+        """Writes the cache atomically. Skipped while the mtime is too fresh to trust."""
+        if self.mtime_ns is None or self.mtime_ns > time.time_ns() - RACY_SECONDS * 1_000_000_000:
+            return False
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp = f"{path}.{os.getpid()}.tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(self.to_dict(), f, separators=(",", ":"))
+            os.replace(tmp, path)
+            return True
+        except OSError:
+            return False
+
+def module_available(name):
+    try:
+        return importlib.util.find_spec(name) is not None
+    except (ImportError, ValueError):
+        return False
+
+class ProbeResult:
+    def __init__(self, installed, missing, modules, source):
+        # wanted name -> package providing it
+        self.installed = installed
+        self.missing = missing
+        # module name -> found by this interpreter
+        self.modules = modules
+        # 'cache' or 'database'
+        self.source = source
+
+def probe(packages, modules=None, root="/", cache_path=None):
+    """
+    Resolves `packages` against the local pacman database under `root`.
+    `modules` maps a package to the Python module it ships; a package whose
+    module this interpreter already finds (e.g. pip-installed) is not
+    missing. cache_path=False disables the cache. Raises ProbeError if there
+    is no pacman database.
+    """
+    if cache_path is None:
+        cache_path = default_cache_path()
+    db = PackageDB.from_cache(cache_path, root) if cache_path else None
+    source = "cache"
+    if db is None:
+        db = PackageDB(root).load()
+        source = "database"
+    had_desc = db.provides is not None
+
+    modules = modules or {}
+    found_modules = {module: module_available(module) for module in modules.values()}
+    installed, missing = {}, []
+    for name in packages:
+        provider = db.resolve(name)
+        if provider:
+            installed[name] = provider
+        elif name in modules and found_modules[modules[name]]:
+            installed[name] = f"python module {modules[name]}"
+        else:
+            missing.append(name)
+
+    if cache_path and (source == "database" or db.provides is not None and not had_desc):
+        db.save(cache_path)
+    return ProbeResult(installed, missing, found_modules, source)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Check installed pacman packages without running pacman")
+    parser.add_argument("packages", nargs="+")
+    parser.add_argument("--root", default="/", help="Filesystem root holding var/lib/pacman (default: /)")
+    parser.add_argument("--no-cache", action="store_true")
+    args = parser.parse_args(argv)
+
+    try:
+        result = probe(args.packages, root=args.root, cache_path=False if args.no_cache else None)
+    except ProbeError as e:
+        print(e, file=sys.stderr)
+        return 2
+    for name in args.packages:
+        provider = result.installed.get(name)
+        if provider is None:
+            print(f"{name}: missing")
+        elif provider == name:
+            print(f"{name}: installed")
+        else:
+            print(f"{name}: provided by {provider}")
+    return 1 if result.missing else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
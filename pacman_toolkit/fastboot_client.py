@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+"""
+Minimal native fastboot client over pyusb endpoints.
+
+Implements the subset of the fastboot protocol flash_rescue.sh relies on
+(getvar, download, flash, reboot) so images can be sent straight from the
+read-ahead pipeline or a shared image cache view instead of going through
+the `fastboot` binary. Works with real pyusb devices and with the
+fastboot_emulator backend.
+"""
+import os
+import time
+
+try:
+    from . import transfer_pipeline
+except ImportError:
+    import transfer_pipeline
+
+RESPONSE_SIZE = 64
+DEFAULT_TIMEOUT_MS = 5000
+
+class FastbootError(Exception):
+    """The device answered FAIL or broke the protocol."""
+
+class FastbootClient:
+    def __init__(self, dev, usb_util, timeout_ms=DEFAULT_TIMEOUT_MS, chunk_size=transfer_pipeline.DEFAULT_CHUNK_SIZE):
+        self.dev = dev
+        self.usb_util = usb_util
+        self.timeout_ms = timeout_ms
+        self.chunk_size = chunk_size
+        self.info = []
+        self.last_transfer = None
+
+        if dev.is_kernel_driver_active(0):
+            dev.detach_kernel_driver(0)
+        usb_util.claim_interface(dev, 0)
+        intf = dev.get_active_configuration()[(0, 0)]
+        self.ep_out = usb_util.find_descriptor(
+            intf, custom_match=lambda e: usb_util.endpoint_direction(e.bEndpointAddress) == usb_util.ENDPOINT_OUT)
+        self.ep_in = usb_util.find_descriptor(
+            intf, custom_match=lambda e: usb_util.endpoint_direction(e.bEndpointAddress) == usb_util.ENDPOINT_IN)
+        if not self.ep_out or not self.ep_in:
+            raise FastbootError("Required endpoints (IN/OUT) not found")
+
+    def _read_response(self):
+        """Reads until OKAY/FAIL/DATA, collecting INFO lines."""
+        while True:
+            raw = bytes(self.ep_in.read(RESPONSE_SIZE, timeout=self.timeout_ms))
+            status, payload = raw[:4], raw[4:].decode('ascii', 'replace')
+            if status == b"INFO":
+                self.info.append(payload)
+            elif status in (b"OKAY", b"DATA"):
+                return status, payload
+            elif status == b"FAIL":
+                raise FastbootError(payload)
+            else:
+                raise FastbootError(f"Unexpected response: {raw!r}")
+
+    def command(self, cmd):
+        self.ep_out.write(cmd.encode('ascii'))
+        status, payload = self._read_response()
+        if status != b"OKAY":
+            raise FastbootError(f"Unexpected {status.decode()} for {cmd}")
+        return payload
+
+    def getvar(self, name):
+        return self.command(f"getvar:{name}")
+
+    def max_download_size(self):
+        try:
+            return int(self.getvar("max-download-size"), 0)
+        except (FastbootError, ValueError):
+            return None
+
+    def download(self, image, size=None, buffers=transfer_pipeline.DEFAULT_BUFFERS):
+        """
+        Sends an image. `image` is a path, a binary file object or an
+        in-memory buffer (bytes, memoryview, e.g. an image_cache lease view).
+        Returns the PipelineStats of the data phase.
+        """
+        if isinstance(image, (bytes, bytearray, memoryview)):
+            view = memoryview(image)
+            size = len(view)
+        elif isinstance(image, str):
+            with open(image, 'rb', buffering=0) as f:
+                return self.download(f, os.fstat(f.fileno()).st_size, buffers)
+        elif size is None:
+            size = os.fstat(image.fileno()).st_size
+
+        self.ep_out.write(f"download:{size:08x}".encode('ascii'))
+        status, payload = self._read_response()
+        if status != b"DATA" or int(payload, 16) != size:
+            raise FastbootError(f"Device refused download of {size} bytes")
+
+        if isinstance(image, (bytes, bytearray, memoryview)):
+            stats = transfer_pipeline.PipelineStats()
+            start = time.perf_counter()
+            for chunk in transfer_pipeline.iter_view(view, self.chunk_size):
+                self.ep_out.write(chunk, timeout=self.timeout_ms)
+                stats.bytes += len(chunk)
+                stats.chunks += 1
+            stats.elapsed = time.perf_counter() - start
+        else:
+            stats = transfer_pipeline.transfer(
+                image, lambda chunk: self.ep_out.write(chunk, timeout=self.timeout_ms),
+                size=size, chunk_size=self.chunk_size, buffers=buffers)
+
+        status, _ = self._read_response()
+        if status != b"OKAY":
+            raise FastbootError("Download not acknowledged")
+        self.last_transfer = stats
+        return stats
+
+    def flash(self, partition, image):
+        self.download(image)
+        return self.command(f"flash:{partition}")
+
+    def reboot(self):
+        return self.command("reboot")
+
+    def close(self):
+        self.usb_util.dispose_resources(self.dev)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+# The fastboot half of flash_rescue.sh as (partition, image name) steps
+RESCUE_STEPS = [
+    ("boot_a", "boot.img"),
+    ("boot_b", "boot.img"),
+    ("vbmeta_a", "vbmeta.img"),
+    ("vbmeta_b", "vbmeta.img"),
+]
+
+def flash_rescue(client, images, reboot=True):
+    """
+    Runs the fastboot rescue sequence. `images` maps image names to
+    anything download() accepts. Returns a list of (partition, seconds).
+    """
+    timings = []
+    for partition, name in RESCUE_STEPS:
+        start = time.perf_counter()
+        client.flash(partition, images[name])
+        timings.append((partition, time.perf_counter() - start))
+    if reboot:
+        client.reboot()
+    return timings
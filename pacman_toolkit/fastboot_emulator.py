@@ -0,0 +1,398 @@
+#!/usr/bin/env python3
+"""
+Emulated fastboot bootloader behind a pyusb-compatible API.
+
+`EmulatedBus` holds one or more `FastbootDevice`s and exposes fake `usb`,
+`usb.core` and `usb.util` modules that behave like pyusb for the calls the
+toolkit makes (find, claim_interface, find_descriptor, endpoint read/write).
+Unlike a MagicMock, transfers take real time: writes are paced by the
+configured bandwidth and per-transfer latency, so catch and flash timings
+can be measured without hardware.
+
+    bus = EmulatedBus([FastbootDevice(bandwidth=40e6)])
+    with bus.installed():
+        import pacman_interceptor
+        pacman_interceptor.load_usb()   # binds the emulated device
+
+Devices can appear and disappear on a schedule (bootloop windows), freeze
+when they receive a command inside their window, answer FAIL for chosen
+commands, and drop off the bus after a number of bytes or commands.
+"""
+import sys
+import time
+import types
+import errno
+import array
+import hashlib
+import threading
+import contextlib
+
+ENDPOINT_OUT = 0x00
+ENDPOINT_IN = 0x80
+DEFAULT_MAX_DOWNLOAD = 256 * 1024 * 1024
+
+class USBError(IOError):
+    def __init__(self, strerror, error_code=None, errno=None):
+        IOError.__init__(self, errno, strerror)
+        self.backend_error_code = error_code
+
+class USBTimeoutError(USBError):
+    pass
+
+def _disconnected():
+    return USBError("No such device (it may have been disconnected)", -4, errno.ENODEV)
+
+class FastbootDevice:
+    """
+    State machine for one emulated bootloader.
+
+    appear_at / window: the device is enumerated from appear_at for `window`
+    seconds (None = forever), relative to the bus start time. A device that
+    receives any command inside its window stays enumerated (frozen).
+    """
+
+    def __init__(self, idVendor=0x18d1, idProduct=0x4ee0, bus=1, address=5,
+                 port_numbers=(1,), serial="EMU00001", bandwidth=40e6, latency=0.0005,
+                 flash_bandwidth=None, max_download_size=DEFAULT_MAX_DOWNLOAD,
+                 variables=None, appear_at=0.0, window=None, fail=None,
+                 disconnect_after_bytes=None, disconnect_after_commands=None):
+        self.idVendor = idVendor
+        self.idProduct = idProduct
+        self.bus = bus
+        self.address = address
+        self.port_numbers = tuple(port_numbers)
+        self.serial = serial
+        self.bandwidth = bandwidth
+        self.latency = latency
+        self.flash_bandwidth = flash_bandwidth
+        self.max_download_size = max_download_size
+        self.appear_at = appear_at
+        self.window = window
+        # Command prefix -> FAIL message, e.g. {"flash:boot_b": "write error"}
+        self.fail = dict(fail or {})
+        self.disconnect_after_bytes = disconnect_after_bytes
+        self.disconnect_after_commands = disconnect_after_commands
+
+        self.variables = {
+            "product": "Pacman",
+            "serialno": serial,
+            "secure": "yes",
+            "unlocked": "no",
+            "current-slot": "a",
+            "max-download-size": f"0x{max_download_size:x}",
+        }
+        self.variables.update(variables or {})
+
+        self.frozen = False
+        self.rebooted = False
+        self.commands = []
+        self.flashed = {}
+        self.bytes_received = 0
+        self.first_command_at = None
+
+        self._lock = threading.Lock()
+        self._responses = []
+        self._download_remaining = 0
+        self._download_hash = None
+        self._download_size = 0
+        self._staged = None
+        self._gone = False
+        self._reboot_pending = False
+
+    # --- Presence ---
+
+    def present(self, elapsed):
+        if self._gone or self.rebooted:
+            return False
+        if elapsed < self.appear_at:
+            return False
+        if self.frozen or self.window is None:
+            return True
+        return elapsed < self.appear_at + self.window
+
+    def _check_link(self):
+        if self._gone or self.rebooted:
+            raise _disconnected()
+
+    def _maybe_disconnect(self):
+        if (self.disconnect_after_bytes is not None
+                and self.bytes_received >= self.disconnect_after_bytes):
+            self._gone = True
+        if (self.disconnect_after_commands is not None
+                and len(self.commands) >= self.disconnect_after_commands):
+            self._gone = True
+
+    # --- Protocol ---
+
+    def reset_pipes(self):
+        with self._lock:
+            self._responses = []
+            self._download_remaining = 0
+
+    def write(self, data):
+        self._check_link()
+        if self._download_remaining:
+            return self._receive_data(data)
+        return self._receive_command(bytes(data))
+
+    def _receive_data(self, data):
+        n = len(data)
+        time.sleep(self.latency + n / self.bandwidth)
+        if n > self._download_remaining:
+            raise USBError("Overflow", -8, errno.EOVERFLOW)
+        self._download_hash.update(data)
+        self._download_remaining -= n
+        self.bytes_received += n
+        self._maybe_disconnect()
+        if self._gone:
+            raise _disconnected()
+        if not self._download_remaining:
+            self._staged = (self._download_size, self._download_hash.hexdigest())
+            self._respond(b"OKAY")
+        return n
+
+    def _respond(self, *messages):
+        with self._lock:
+            self._responses.extend(messages)
+
+    def _receive_command(self, data):
+        time.sleep(self.latency)
+        cmd = data.decode('ascii', 'replace')
+        self.commands.append(cmd)
+        if self.first_command_at is None:
+            self.first_command_at = time.monotonic()
+        self.frozen = True
+        self._maybe_disconnect()
+        if self._gone:
+            raise _disconnected()
+
+        for prefix, message in self.fail.items():
+            if cmd.startswith(prefix):
+                self._respond(b"FAIL" + message.encode()[:60])
+                return len(data)
+
+        if cmd.startswith("getvar:"):
+            self._getvar(cmd[len("getvar:"):])
+        elif cmd.startswith("download:"):
+            self._download(cmd[len("download:"):])
+        elif cmd.startswith("flash:"):
+            self._flash(cmd[len("flash:"):])
+        elif cmd in ("reboot", "reboot-bootloader", "continue"):
+            self._respond(b"OKAY")
+            # Drops off the bus once the host has read the OKAY
+            self._reboot_pending = True
+        elif cmd == "flashing unlock":
+            self.variables["unlocked"] = "yes"
+            self._respond(b"OKAY")
+        else:
+            self._respond(b"FAILunknown command")
+        return len(data)
+
+    def _getvar(self, name):
+        if name == "all":
+            self._respond(*[f"INFO{k}: {v}".encode()[:64] for k, v in self.variables.items()])
+            self._respond(b"OKAY")
+        elif name in self.variables:
+            self._respond(b"OKAY" + self.variables[name].encode()[:60])
+        else:
+            self._respond(b"FAILGetVar Variable Not found")
+
+    def _download(self, size_hex):
+        try:
+            size = int(size_hex, 16)
+        except ValueError:
+            self._respond(b"FAILinvalid size")
+            return
+        if size == 0 or size > self.max_download_size:
+            self._respond(b"FAILdata too large")
+            return
+        self._download_size = size
+        self._download_remaining = size
+        self._download_hash = hashlib.sha256()
+        self._respond(b"DATA%08x" % size)
+
+    def _flash(self, partition):
+        if self._staged is None:
+            self._respond(b"FAILno image downloaded")
+            return
+        size, digest = self._staged
+        if self.flash_bandwidth:
+            time.sleep(size / self.flash_bandwidth)
+        self.flashed[partition] = (size, digest)
+        self._staged = None
+        self._respond(b"OKAY")
+
+    def read(self, size, timeout=None):
+        self._check_link()
+        deadline = time.monotonic() + (timeout or 1000) / 1000.0
+        while True:
+            with self._lock:
+                if self._responses:
+                    response = self._responses.pop(0)
+                    if self._reboot_pending and not self._responses:
+                        self.rebooted = True
+                    return response[:size]
+            if time.monotonic() >= deadline:
+                raise USBTimeoutError("Operation timed out", -7, errno.ETIMEDOUT)
+            time.sleep(0.0005)
+
+class _Endpoint:
+    def __init__(self, device, address):
+        self._device = device
+        self.bEndpointAddress = address
+        self.bmAttributes = 0x02
+        self.wMaxPacketSize = 512
+
+    def write(self, data, timeout=None):
+        return self._device.write(data)
+
+    def read(self, size_or_buffer, timeout=None):
+        size = size_or_buffer if isinstance(size_or_buffer, int) else len(size_or_buffer)
+        return array.array('B', self._device.read(size, timeout))
+
+class _Interface:
+    def __init__(self, device):
+        self.bInterfaceNumber = 0
+        self.bAlternateSetting = 0
+        self.bInterfaceClass = 0xff
+        self.bInterfaceSubClass = 0x42
+        self.bInterfaceProtocol = 0x03
+        self._endpoints = [_Endpoint(device, 0x01 | ENDPOINT_OUT), _Endpoint(device, 0x81)]
+
+    def __iter__(self):
+        return iter(self._endpoints)
+
+    def endpoints(self):
+        return tuple(self._endpoints)
+
+class _Configuration:
+    def __init__(self, device):
+        self.bConfigurationValue = 1
+        self._interface = _Interface(device)
+
+    def __getitem__(self, key):
+        if key != (0, 0):
+            raise IndexError(key)
+        return self._interface
+
+    def __iter__(self):
+        return iter([self._interface])
+
+class EmulatedUsbDevice:
+    """The pyusb `usb.core.Device` face of a FastbootDevice."""
+
+    def __init__(self, state):
+        self._state = state
+        self.idVendor = state.idVendor
+        self.idProduct = state.idProduct
+        self.bus = state.bus
+        self.address = state.address
+        self.port_numbers = state.port_numbers
+        self.serial_number = state.serial
+        self._config = _Configuration(state)
+
+    def is_kernel_driver_active(self, interface):
+        return False
+
+    def detach_kernel_driver(self, interface):
+        pass
+
+    def set_configuration(self, configuration=None):
+        self._state._check_link()
+
+    def get_active_configuration(self):
+        self._state._check_link()
+        return self._config
+
+    def __iter__(self):
+        return iter([self._config])
+
+class EmulatedBus:
+    def __init__(self, devices=None, clock=time.monotonic):
+        self.devices = list(devices or [])
+        self.clock = clock
+        self.start_time = clock()
+        self.find_calls = 0
+        self.usb, self.core, self.util = self._build_modules()
+
+    def elapsed(self):
+        return self.clock() - self.start_time
+
+    def restart_clock(self):
+        self.start_time = self.clock()
+
+    def add(self, device):
+        self.devices.append(device)
+
+    def find(self, find_all=False, idVendor=None, idProduct=None, custom_match=None, **kwargs):
+        self.find_calls += 1
+        now = self.elapsed()
+        found = []
+        for state in self.devices:
+            if not state.present(now):
+                continue
+            dev = EmulatedUsbDevice(state)
+            if idVendor is not None and dev.idVendor != idVendor:
+                continue
+            if idProduct is not None and dev.idProduct != idProduct:
+                continue
+            if custom_match is not None and not custom_match(dev):
+                continue
+            found.append(dev)
+        if find_all:
+            return iter(found)
+        return found[0] if found else None
+
+    def _build_modules(self):
+        usb = types.ModuleType("usb")
+        core = types.ModuleType("usb.core")
+        util = types.ModuleType("usb.util")
+
+        core.USBError = USBError
+        core.USBTimeoutError = USBTimeoutError
+        core.Device = EmulatedUsbDevice
+        core.find = self.find
+
+        util.ENDPOINT_OUT = ENDPOINT_OUT
+        util.ENDPOINT_IN = ENDPOINT_IN
+        util.endpoint_direction = lambda address: address & 0x80
+        util.claim_interface = _claim_interface
+        util.release_interface = lambda dev, interface: None
+        util.dispose_resources = lambda dev: None
+        util.find_descriptor = _find_descriptor
+
+        usb.core = core
+        usb.util = util
+        return usb, core, util
+
+    @contextlib.contextmanager
+    def installed(self):
+        """Makes `import usb.core` / `usb.util` resolve to this bus."""
+        saved = {name: sys.modules.get(name) for name in ("usb", "usb.core", "usb.util")}
+        sys.modules["usb"] = self.usb
+        sys.modules["usb.core"] = self.core
+        sys.modules["usb.util"] = self.util
+        try:
+            yield self
+        finally:
+            for name, module in saved.items():
+                if module is None:
+                    sys.modules.pop(name, None)
+                else:
+                    sys.modules[name] = module
+
+def _claim_interface(dev, interface):
+    dev._state._check_link()
+    # A fresh claim starts with empty pipes, like after a USB reset
+    dev._state.reset_pipes()
+
+def _find_descriptor(desc, find_all=False, custom_match=None, **args):
+    def matches(d):
+        if custom_match is not None and not custom_match(d):
+            return False
+        return all(getattr(d, k) == v for k, v in args.items())
+
+    found = (d for d in desc if matches(d))
+    if find_all:
+        return found
+    return next(found, None)
@@ -0,0 +1,193 @@
+#!/usr/bin/env python3
+"""
+Persistent index of firmware image candidates under a directory tree.
+
+Walking a whole home directory for every file the manager looks for takes
+minutes on machines with large download and backup trees. FileIndex keeps
+name, size, mtime and path of every candidate image (see is_candidate()) in
+a JSON file and refreshes it incrementally: a directory whose mtime is
+unchanged cannot have gained, lost or renamed entries, so only changed
+directories are listed again and the rest cost one stat(). Lookups go
+through a name -> paths map and resolve any number of filenames at once.
+
+    index = FileIndex()
+    index.refresh(os.path.expanduser("~"))
+    index.save()
+    index.lookup_all(["boot.img", "vbmeta.img"])
+
+Usage: python3 file_index.py [--root DIR] [--index FILE] NAME...
+"""
+import os
+import sys
+import json
+import time
+import argparse
+
+INDEX_VERSION = 1
+# Directories never worth descending into
+PRUNE = frozenset({'.git', 'node_modules', '.cache'})
+# What counts as a firmware candidate: images, raw dumps and factory zips
+CANDIDATE_SUFFIXES = ('.img', '.bin', '.zip')
+CANDIDATE_NAMES = frozenset({'lk'})
+# Directories modified this recently may change again within the same
+# mtime tick; they are rescanned next time instead of trusted
+RACY_SECONDS = 2
+
+def default_path():
+    cache = os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache")
+    return os.path.join(cache, "pacman_toolkit", "file_index.json")
+
+def is_candidate(name):
+    return name.endswith(CANDIDATE_SUFFIXES) or name in CANDIDATE_NAMES
+
+class FileIndex:
+    def __init__(self, path=None):
+        self.path = path or default_path()
+        # dirpath -> [mtime_ns or None, {name: [size, mtime]}, [subdir names]]
+        self.dirs = {}
+        # name -> set of dirpaths holding a file of that name
+        self.by_name = {}
+        self.stats = {}
+        self.load()
+
+    def load(self):
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        if not isinstance(data, dict) or data.get("version") != INDEX_VERSION:
+            return
+        self.dirs = data.get("dirs", {})
+        for dirpath, (_, files, _) in self.dirs.items():
+            for name in files:
+                self.by_name.setdefault(name, set()).add(dirpath)
+
+    def save(self):
+        """Writes the index atomically; a failed save only costs a full scan later."""
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            tmp = f"{self.path}.{os.getpid()}.tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump({"version": INDEX_VERSION, "dirs": self.dirs}, f, separators=(",", ":"))
+            os.replace(tmp, self.path)
+            return True
+        except OSError:
+            return False
+
+    def _set_dir(self, dirpath, mtime, files, subdirs):
+        old = self.dirs.get(dirpath)
+        if old:
+            for name in old[1]:
+                if name not in files:
+                    self._unlink(name, dirpath)
+        for name in files:
+            self.by_name.setdefault(name, set()).add(dirpath)
+        self.dirs[dirpath] = [mtime, files, subdirs]
+
+    def _unlink(self, name, dirpath):
+        holders = self.by_name.get(name)
+        if holders:
+            holders.discard(dirpath)
+            if not holders:
+                del self.by_name[name]
+
+    def _drop(self, dirpath):
+        entry = self.dirs.pop(dirpath, None)
+        if entry:
+            for name in entry[1]:
+                self._unlink(name, dirpath)
+            self.stats["dropped"] += 1
+
+    def _scan(self, dirpath, prune):
+        files, subdirs = {}, []
+        with os.scandir(dirpath) as it:
+            for entry in it:
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        if entry.name not in prune:
+                            subdirs.append(entry.name)
+                    elif is_candidate(entry.name) and entry.is_file():
+                        st = entry.stat()
+                        files[entry.name] = [st.st_size, int(st.st_mtime)]
+                except OSError:
+                    continue
+        return files, subdirs
+
+    def refresh(self, root, prune=PRUNE):
+        """Brings the index for `root` up to date; returns the stats dict."""
+        root = os.path.abspath(root)
+        self.stats = {"scanned": 0, "reused": 0, "dropped": 0}
+        racy_after = time.time_ns() - RACY_SECONDS * 1_000_000_000
+        seen = set()
+        stack = [root]
+        while stack:
+            dirpath = stack.pop()
+            try:
+                mtime = os.stat(dirpath).st_mtime_ns
+            except OSError:
+                continue
+            seen.add(dirpath)
+            entry = self.dirs.get(dirpath)
+            if entry and entry[0] is not None and entry[0] == mtime:
+                subdirs = entry[2]
+                self.stats["reused"] += 1
+            else:
+                try:
+                    files, subdirs = self._scan(dirpath, prune)
+                except OSError:
+                    self._drop(dirpath)
+                    continue
+                self._set_dir(dirpath, mtime if mtime < racy_after else None, files, subdirs)
+                self.stats["scanned"] += 1
+            stack.extend(os.path.join(dirpath, name) for name in subdirs if name not in prune)
+
+        # Whatever is under root but was not reached has been removed or pruned
+        prefix = root.rstrip(os.sep) + os.sep
+        for dirpath in [d for d in self.dirs if (d == root or d.startswith(prefix)) and d not in seen]:
+            self._drop(dirpath)
+        return self.stats
+
+    def lookup(self, name):
+        """Paths of files called `name` that still exist, newest first."""
+        found = []
+        for dirpath in self.by_name.get(name, ()):
+            path = os.path.join(dirpath, name)
+            try:
+                found.append((os.stat(path).st_mtime, path))
+            except OSError:
+                continue
+        return [path for _, path in sorted(found, reverse=True)]
+
+    def lookup_all(self, names):
+        """{name: [paths]} for every name, in one pass over the map."""
+        return {name: self.lookup(name) for name in names}
+
+    def entries(self):
+        return sum(len(files) for _, files, _ in self.dirs.values())
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Find firmware images through the persistent file index")
+    parser.add_argument("names", nargs="+", help="File names to look up")
+    parser.add_argument("--root", default=os.path.expanduser("~"), help="Directory tree to index (default: home)")
+    parser.add_argument("--index", help=f"Index file (default: {default_path()})")
+    args = parser.parse_args(argv)
+
+    index = FileIndex(args.index)
+    start = time.monotonic()
+    stats = index.refresh(args.root)
+    index.save()
+    print(f"Indexed {index.entries()} candidates in {len(index.dirs)} directories in "
+          f"{time.monotonic() - start:.2f}s ({stats['scanned']} scanned, {stats['reused']} unchanged)")
+    missing = 0
+    for name, paths in index.lookup_all(args.names).items():
+        if paths:
+            for path in paths:
+                print(f"{name}: {path}")
+        else:
+            print(f"{name}: not found")
+            missing += 1
+    return 1 if missing else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
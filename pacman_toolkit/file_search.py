@@ -0,0 +1,262 @@
+#!/usr/bin/env python3
+"""
+Parallel filesystem search for firmware files.
+
+One pass looks for every wanted name at once: a Matcher maps file names,
+including aliases such as setup_and_verify's RAW_NAMES, to the target they
+provide. Directories are listed with os.scandir by a pool of worker threads
+sharing one queue of subtrees. The listing syscalls release the GIL, so
+cold caches and network mounts are read in parallel. SearchRules decide
+what is pruned and how deep and how large to go.
+
+Roots keep their priority: a hit in a later root only settles a target once
+every earlier root has been searched completely, so the result matches a
+serial search in root order. The search is cancelled as soon as every
+target is settled; among the hits collected by then the target's own name
+is preferred over an alias.
+
+    matcher = Matcher(["boot.img", "lk.img"], aliases={"lk.bin": "lk.img"})
+    result = search([os.getcwd(), os.path.expanduser("~")], matcher)
+    result.path("lk.img")
+
+Usage: python3 file_search.py --name boot.img [--name ...] [--max-depth N] ROOT...
+"""
+import os
+import sys
+import time
+import queue
+import fnmatch
+import argparse
+import threading
+
+try:
+    from . import file_index
+except ImportError:
+    import file_index
+
+# Never worth descending into: VCS data, dependency trees, caches, trash
+DEFAULT_PRUNE = file_index.PRUNE | frozenset({'__pycache__', '.venv', '.tox', '.Trash'})
+DEFAULT_PRUNE_GLOBS = ('.Trash-*',)
+DEFAULT_WORKERS = min(8, (os.cpu_count() or 1) * 2)
+
+_STOP = (float("inf"), 0, 0, None)
+
+class SearchRules:
+    """Pruning and limits. max_depth=0 only looks at the files directly in each root."""
+
+    def __init__(self, prune=DEFAULT_PRUNE, prune_globs=DEFAULT_PRUNE_GLOBS, skip_hidden=False,
+                 max_depth=None, min_size=0, max_size=None):
+        self.prune = frozenset(prune)
+        self.prune_globs = tuple(prune_globs)
+        self.skip_hidden = skip_hidden
+        self.max_depth = max_depth
+        self.min_size = min_size
+        self.max_size = max_size
+
+    def descend(self, name, depth):
+        """Whether to list subdirectory `name` found at `depth`."""
+        if self.max_depth is not None and depth >= self.max_depth:
+            return False
+        if name in self.prune or (self.skip_hidden and name.startswith(".")):
+            return False
+        return not any(fnmatch.fnmatch(name, pattern) for pattern in self.prune_globs)
+
+    def accept(self, size):
+        return size >= self.min_size and (self.max_size is None or size <= self.max_size)
+
+class Match:
+    def __init__(self, target, name, path, rank, depth):
+        self.target = target
+        self.name = name
+        self.path = path
+        self.rank = rank
+        self.depth = depth
+
+    @property
+    def key(self):
+        # Earlier root first, then the target's own name over an alias, then shallower
+        return (self.rank, self.name != self.target, self.depth)
+
+    def __repr__(self):
+        return f"Match({self.target!r}, {self.path!r})"
+
+class Matcher:
+    """Maps every wanted file name to the target it provides."""
+
+    def __init__(self, targets, aliases=None):
+        self.targets = list(dict.fromkeys(targets))
+        self.names = {name: name for name in self.targets}
+        for alias, target in (aliases or {}).items():
+            if target in self.names:
+                self.names[alias] = target
+
+    def get(self, name):
+        return self.names.get(name)
+
+class SearchResult:
+    def __init__(self, matcher):
+        self.matcher = matcher
+        # Best hit per target and per file name
+        self.best = {}
+        self.by_name = {}
+        self.stats = {"dirs": 0, "files": 0, "errors": 0, "elapsed": 0.0, "cancelled": False}
+
+    def _add(self, match):
+        current = self.by_name.get(match.name)
+        if current is None or match.key < current.key:
+            self.by_name[match.name] = match
+        current = self.best.get(match.target)
+        if current is None or match.key < current.key:
+            self.best[match.target] = match
+
+    def path(self, target):
+        """Best path providing `target` (its own name or an alias), or None."""
+        match = self.best.get(target)
+        return match.path if match else None
+
+    def path_of(self, name):
+        """Best path of a file called exactly `name`, or None."""
+        match = self.by_name.get(name)
+        return match.path if match else None
+
+    @property
+    def missing(self):
+        return [target for target in self.matcher.targets if target not in self.best]
+
+class _Search:
+    def __init__(self, roots, matcher, rules, workers, stop_when_found):
+        self.roots = [os.path.abspath(root) for root in roots]
+        self.matcher = matcher
+        self.rules = rules
+        self.workers = max(1, workers)
+        self.stop_when_found = stop_when_found
+        self.result = SearchResult(matcher)
+        self.queue = queue.PriorityQueue()
+        self.lock = threading.Lock()
+        self.cancel = threading.Event()
+        # Directories queued but not yet listed, per root and in total
+        self.pending = [0] * len(self.roots)
+        self.total = 0
+        self.seq = 0
+        self.stopping = False
+
+    def _enqueue(self, rank, depth, paths):
+        # Called with the lock held
+        for path in paths:
+            self.seq += 1
+            self.queue.put((rank, depth, self.seq, path))
+        self.pending[rank] += len(paths)
+        self.total += len(paths)
+
+    def _settled(self):
+        # Called with the lock held
+        for target in self.matcher.targets:
+            match = self.result.best.get(target)
+            if match is None:
+                return False
+            # Any hit settles its target once every earlier root is done
+            if any(self.pending[:match.rank]):
+                return False
+        return True
+
+    def _finish(self, rank, depth, subdirs, hits, files):
+        with self.lock:
+            self._enqueue(rank, depth + 1, subdirs)
+            for match in hits:
+                self.result._add(match)
+            if files is not None:
+                self.result.stats["dirs"] += 1
+                self.result.stats["files"] += files
+            self.pending[rank] -= 1
+            self.total -= 1
+            if self.stop_when_found and not self.cancel.is_set() and self._settled():
+                self.result.stats["cancelled"] = self.total > 0
+                self.cancel.set()
+            if (self.total == 0 or self.cancel.is_set()) and not self.stopping:
+                # Sorts after any queued directory, which are drained unlisted
+                self.stopping = True
+                for _ in range(self.workers):
+                    self.queue.put(_STOP)
+
+    def _scan(self, rank, depth, path):
+        subdirs, hits, dirs = [], [], 0
+        try:
+            with os.scandir(path) as it:
+                entries = list(it)
+        except OSError:
+            with self.lock:
+                self.result.stats["errors"] += 1
+            return subdirs, hits, 0
+        # Runs once per file in the tree: keep the common case to a type check and a dict probe
+        names = self.matcher.names
+        for entry in entries:
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    dirs += 1
+                    if self.rules.descend(entry.name, depth):
+                        subdirs.append(entry.path)
+                elif entry.name in names and entry.is_file() and self.rules.accept(entry.stat().st_size):
+                    hits.append(Match(names[entry.name], entry.name, entry.path, rank, depth))
+            except OSError:
+                continue
+        return subdirs, hits, len(entries) - dirs
+
+    def _worker(self):
+        while True:
+            rank, depth, _, path = self.queue.get()
+            if path is None:
+                return
+            if self.cancel.is_set():
+                subdirs, hits, files = [], [], None
+            else:
+                subdirs, hits, files = self._scan(rank, depth, path)
+            self._finish(rank, depth, subdirs, hits, files)
+
+    def run(self):
+        start = time.monotonic()
+        with self.lock:
+            for rank, root in enumerate(self.roots):
+                if os.path.isdir(root):
+                    self._enqueue(rank, 0, [root])
+            if not self.total or not self.matcher.targets:
+                return self.result
+        threads = [threading.Thread(target=self._worker, name=f"file-search-{i}", daemon=True)
+                   for i in range(self.workers)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.result.stats["elapsed"] = time.monotonic() - start
+        return self.result
+
+def search(roots, matcher, rules=None, workers=DEFAULT_WORKERS, stop_when_found=True):
+    """
+    Searches `roots` (in priority order) for everything `matcher` wants and
+    returns a SearchResult. With stop_when_found=False every root is
+    searched to the end, so every alias is reported too.
+    """
+    return _Search(roots, matcher, rules or SearchRules(), workers, stop_when_found).run()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Search directory trees for firmware files in one parallel pass")
+    parser.add_argument("roots", nargs="+", help="Directories to search, in priority order")
+    parser.add_argument("--name", action="append", required=True, help="File name to find; repeatable")
+    parser.add_argument("--alias", action="append", default=[], metavar="ALIAS=NAME", help="Accept ALIAS for NAME")
+    parser.add_argument("--max-depth", type=int)
+    parser.add_argument("--prune", action="append", default=[], metavar="GLOB", help="Also skip directories matching GLOB")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS)
+    parser.add_argument("--all", action="store_true", help="Search everything instead of stopping once all names are found")
+    args = parser.parse_args(argv)
+
+    aliases = dict(spec.split("=", 1) for spec in args.alias)
+    rules = SearchRules(prune_globs=DEFAULT_PRUNE_GLOBS + tuple(args.prune), max_depth=args.max_depth)
+    result = search(args.roots, Matcher(args.name, aliases), rules, args.workers, stop_when_found=not args.all)
+    for target in result.matcher.targets:
+        print(f"{target}: {result.path(target) or 'not found'}")
+    s = result.stats
+    print(f"{s['dirs']} directories, {s['files']} files in {s['elapsed']:.2f}s"
+          f"{' (stopped early)' if s['cancelled'] else ''}")
+    return 1 if result.missing else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
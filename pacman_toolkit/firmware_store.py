@@ -0,0 +1,451 @@
+#!/usr/bin/env python3
+"""
+Content-addressed firmware store.
+
+Images are stored once as blobs named by their SHA-256, and each firmware
+version is a small JSON manifest mapping image names to blob digests:
+
+    store/
+        blobs/ab/ab12...ef     (read-only)
+        versions/<version>.json
+
+Activating a version links its blobs into the working firmware directory
+(hardlink, then reflink, then copy as a last resort), so switching versions
+costs one link per image instead of copying hundreds of megabytes, and disk
+use grows with unique images rather than with the number of versions.
+
+Files are placed by stage_file, which tries the cheapest strategy first and
+falls back: hardlink, reflink (FICLONE), os.copy_file_range (in-kernel copy)
+and finally a buffered copy. Copies are checked against the SHA-256 of the
+source, and the result reports the strategy and throughput:
+
+    result = stage_file("boot.img", "firmware/boot.img", digest)
+    print(result.describe())    # "reflink, 96.0 MB at 31.2 GB/s"
+"""
+import os
+import re
+import sys
+import errno
+import json
+import time
+import hashlib
+import tempfile
+
+try:
+    from . import image_source
+except ImportError:
+    import image_source
+
+TOOLKIT_DIR = os.path.dirname(os.path.realpath(__file__))
+FIRMWARE_DIR = os.path.join(TOOLKIT_DIR, "firmware")
+STORE_DIR = os.environ.get("PACMAN_STORE_DIR", os.path.join(TOOLKIT_DIR, "store"))
+
+# Written into the firmware directory to remember which version is linked
+ACTIVE_FILE = ".store_version"
+
+CHUNK_SIZE = 1024 * 1024
+COPY_RANGE_CHUNK = 1 << 30
+FICLONE = 0x40049409
+STAGE_STRATEGIES = ('hardlink', 'reflink', 'copy_file_range', 'copy')
+# A hardlink would make the blob the caller's own file: the read-only chmod
+# would change it, and editing it in place would corrupt the store
+INGEST_STRATEGIES = ('reflink', 'copy_file_range', 'copy')
+_VERSION_RE = re.compile(r'^[A-Za-z0-9._-]+$')
+
+class StoreError(Exception):
+    """Raised for invalid versions or a corrupted store."""
+
+def _hash_stream(f):
+    h = hashlib.sha256()
+    size = 0
+    while True:
+        chunk = f.read(CHUNK_SIZE)
+        if not chunk:
+            break
+        h.update(chunk)
+        size += len(chunk)
+    return h.hexdigest(), size
+
+def _reflink(src, dst):
+    import fcntl
+    with open(src, 'rb') as s, open(dst, 'wb') as d:
+        fcntl.ioctl(d.fileno(), FICLONE, s.fileno())
+
+def _stage_hardlink(src, dst):
+    os.link(src, dst)
+
+def _stage_reflink(src, dst):
+    _reflink(src, dst)
+
+def _stage_copy_file_range(src, dst):
+    if not hasattr(os, 'copy_file_range'):
+        raise OSError(errno.ENOSYS, "copy_file_range is not available")
+    with open(src, 'rb') as s, open(dst, 'wb') as d:
+        size = os.fstat(s.fileno()).st_size
+        copied = 0
+        while True:
+            n = os.copy_file_range(s.fileno(), d.fileno(), COPY_RANGE_CHUNK)
+            if not n:
+                break
+            copied += n
+    # Some filesystems report success without copying anything
+    if copied != size:
+        raise OSError(errno.EIO, f"copy_file_range copied {copied} of {size} bytes")
+
+def _stage_copy(src, dst):
+    # The only strategy that sees the data, so it hashes in the same pass
+    h = hashlib.sha256()
+    with open(src, 'rb') as s, open(dst, 'wb') as d:
+        while True:
+            chunk = s.read(CHUNK_SIZE)
+            if not chunk:
+                break
+            h.update(chunk)
+            d.write(chunk)
+    return h.hexdigest()
+
+_STAGERS = {
+    'hardlink': _stage_hardlink,
+    'reflink': _stage_reflink,
+    'copy_file_range': _stage_copy_file_range,
+    'copy': _stage_copy,
+}
+
+class StageResult:
+    """How a file was staged: strategy, bytes placed, seconds taken."""
+
+    def __init__(self, strategy, size, seconds):
+        self.strategy = strategy
+        self.size = size
+        self.seconds = seconds
+
+    @property
+    def rate(self):
+        """Bytes per second, verification included."""
+        return self.size / self.seconds if self.seconds > 0 else float('inf')
+
+    def describe(self):
+        rate = self.rate
+        for unit in ('B/s', 'KB/s', 'MB/s', 'GB/s', 'TB/s'):
+            if rate < 1000 or unit == 'TB/s':
+                break
+            rate /= 1000
+        return f"{self.strategy}, {self.size / 1e6:.1f} MB at {rate:.1f} {unit}"
+
+    def __repr__(self):
+        return f"StageResult({self.strategy!r}, {self.size}, {self.seconds:.6f})"
+
+def stage_file(src, dst, digest=None, strategies=STAGE_STRATEGIES):
+    """
+    Places a copy of `src` at `dst` with the first strategy that works.
+    `dst` must not exist (FileExistsError): the copy is staged under a
+    temporary name next to it and only renamed into place once complete,
+    so a failed strategy never removes anything the caller had.
+
+    If `digest`, the SHA-256 of `src`, is given, copies are checked against
+    it; a hardlink is the source itself and needs no check. The buffered
+    copy hashes in the same pass. Reflink and copy_file_range never move the
+    data through userspace, so their result is read back and hashed
+    afterwards instead. Raises StoreError on a mismatch. Returns a
+    StageResult.
+    """
+    if os.path.lexists(dst):
+        raise FileExistsError(errno.EEXIST, "Staging target already exists", dst)
+    start = time.monotonic()
+    size = os.path.getsize(src)
+    tmp = os.path.join(os.path.dirname(dst), f".{os.path.basename(dst)}.stage-{os.urandom(8).hex()}")
+    try:
+        for i, strategy in enumerate(strategies):
+            try:
+                computed = _STAGERS[strategy](src, tmp)
+                break
+            except OSError:
+                if os.path.lexists(tmp):
+                    os.remove(tmp)
+                if i == len(strategies) - 1:
+                    raise
+        if digest is not None and strategy != 'hardlink':
+            if computed is None:
+                with open(tmp, 'rb') as f:
+                    computed, _ = _hash_stream(f)
+            if computed != digest:
+                raise StoreError(f"Staged copy of {src} does not match its sha256 ({computed} != {digest})")
+        os.replace(tmp, dst)
+    finally:
+        if os.path.lexists(tmp):
+            os.remove(tmp)
+    return StageResult(strategy, size, time.monotonic() - start)
+
+def link_file(src, dst):
+    """
+    Places `src` at `dst` without copying data where possible.
+    Returns the strategy used: 'hardlink', 'reflink', 'copy_file_range' or 'copy'.
+    """
+    return stage_file(src, dst).strategy
+
+class FirmwareStore:
+    def __init__(self, root=STORE_DIR):
+        self.root = root
+        self.blob_dir = os.path.join(root, "blobs")
+        self.version_dir = os.path.join(root, "versions")
+
+    def _ensure_dirs(self):
+        os.makedirs(self.blob_dir, exist_ok=True)
+        os.makedirs(self.version_dir, exist_ok=True)
+
+    def blob_path(self, digest):
+        return os.path.join(self.blob_dir, digest[:2], digest)
+
+    def has_blob(self, digest):
+        return os.path.exists(self.blob_path(digest))
+
+    def _commit_blob(self, tmp_path, digest):
+        path = self.blob_path(digest)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        os.chmod(tmp_path, 0o444)
+        if os.path.exists(path):
+            os.remove(tmp_path)
+        else:
+            os.replace(tmp_path, path)
+        return path
+
+    def add_stream(self, f):
+        """Stores the contents of a binary stream. Returns its digest."""
+        self._ensure_dirs()
+        fd, tmp_path = tempfile.mkstemp(dir=self.blob_dir, prefix=".incoming-")
+        h = hashlib.sha256()
+        try:
+            with os.fdopen(fd, 'wb') as out:
+                while True:
+                    chunk = f.read(CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    h.update(chunk)
+                    out.write(chunk)
+        except Exception:
+            os.remove(tmp_path)
+            raise
+        digest = h.hexdigest()
+        self._commit_blob(tmp_path, digest)
+        return digest
+
+    def add_file(self, path):
+        """
+        Stores a loose file. The file is hashed first so images that are
+        already in the store are never copied again.
+        """
+        return self.ingest(path)[0]
+
+    def ingest(self, path):
+        """
+        Like add_file, but returns (digest, StageResult). The result is None
+        if the image was already stored. New images are staged without
+        passing through userspace where the filesystem allows it, and checked
+        against the hash taken for deduplication.
+        """
+        with open(path, 'rb') as f:
+            digest, _ = _hash_stream(f)
+        if self.has_blob(digest):
+            return digest, None
+        self._ensure_dirs()
+        tmp_path = os.path.join(self.blob_dir, f".incoming-{os.urandom(8).hex()}")
+        result = stage_file(path, tmp_path, digest, INGEST_STRATEGIES)
+        self._commit_blob(tmp_path, digest)
+        return digest, result
+
+    def _manifest_path(self, version):
+        if not _VERSION_RE.match(version or ''):
+            raise StoreError(f"Invalid version name: {version!r}")
+        return os.path.join(self.version_dir, f"{version}.json")
+
+    def import_version(self, version, source, names=None):
+        """
+        Records a firmware version from an image source (directory or zip).
+        Only images not already in the store are written.
+        Returns the manifest dict.
+        """
+        manifest_path = self._manifest_path(version)
+        if names is None:
+            names = [n for n in source.names() if n.endswith('.img')]
+
+        images = {}
+        for name in names:
+            local = source.local_path(name)
+            if local:
+                images[name] = self.add_file(local)
+            else:
+                with source.open(name) as f:
+                    images[name] = self.add_stream(f)
+
+        manifest = {"version": version, "created": int(time.time()), "images": images}
+        self._ensure_dirs()
+        tmp_path = manifest_path + ".tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(manifest, f, indent=2, sort_keys=True)
+        os.replace(tmp_path, manifest_path)
+        return manifest
+
+    def versions(self):
+        try:
+            return sorted(n[:-5] for n in os.listdir(self.version_dir) if n.endswith('.json'))
+        except OSError:
+            return []
+
+    def manifest(self, version):
+        try:
+            with open(self._manifest_path(version)) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            raise StoreError(f"Unknown firmware version: {version}")
+
+    def activate(self, version, firmware_dir=FIRMWARE_DIR):
+        """
+        Links every image of `version` into `firmware_dir`, replacing the
+        images of the previously active version. Each image is swapped in
+        atomically. Returns a dict of image name -> link strategy.
+        """
+        manifest = self.manifest(version)
+        for digest in manifest["images"].values():
+            if not self.has_blob(digest):
+                raise StoreError(f"Blob {digest} of version {version} is missing")
+
+        os.makedirs(firmware_dir, exist_ok=True)
+        previous = active_version(firmware_dir)
+
+        strategies = {}
+        for name, digest in manifest["images"].items():
+            dest = os.path.join(firmware_dir, name)
+            tmp_dest = os.path.join(firmware_dir, f".{name}.link")
+            if os.path.lexists(tmp_dest):
+                os.remove(tmp_dest)
+            strategies[name] = link_file(self.blob_path(digest), tmp_dest)
+            os.replace(tmp_dest, dest)
+
+        # Drop images that only belonged to the previous version
+        if previous:
+            for name in previous.get("images", {}):
+                if name not in manifest["images"]:
+                    stale = os.path.join(firmware_dir, name)
+                    if os.path.lexists(stale):
+                        os.remove(stale)
+
+        with open(os.path.join(firmware_dir, ACTIVE_FILE), 'w') as f:
+            json.dump({"version": version, "images": manifest["images"]}, f, indent=2, sort_keys=True)
+        return strategies
+
+    def remove_version(self, version):
+        os.remove(self._manifest_path(version))
+
+    def referenced_blobs(self):
+        referenced = set()
+        for version in self.versions():
+            referenced.update(self.manifest(version)["images"].values())
+        return referenced
+
+    def gc(self):
+        """Deletes blobs no manifest refers to. Returns bytes freed."""
+        referenced = self.referenced_blobs()
+        freed = 0
+        for digest, path in self._iter_blobs():
+            if digest not in referenced:
+                freed += os.path.getsize(path)
+                os.chmod(path, 0o644)
+                os.remove(path)
+        return freed
+
+    def verify(self):
+        """Re-hashes every blob. Returns the digests that no longer match."""
+        corrupt = []
+        for digest, path in self._iter_blobs():
+            with open(path, 'rb') as f:
+                actual, _ = _hash_stream(f)
+            if actual != digest:
+                corrupt.append(digest)
+        return corrupt
+
+    def usage(self):
+        """Returns (unique bytes stored, logical bytes across all versions)."""
+        sizes = {digest: os.path.getsize(path) for digest, path in self._iter_blobs()}
+        logical = 0
+        for version in self.versions():
+            logical += sum(sizes.get(d, 0) for d in self.manifest(version)["images"].values())
+        return sum(sizes.values()), logical
+
+    def _iter_blobs(self):
+        try:
+            prefixes = os.listdir(self.blob_dir)
+        except OSError:
+            return
+        for prefix in prefixes:
+            prefix_dir = os.path.join(self.blob_dir, prefix)
+            if not os.path.isdir(prefix_dir):
+                continue
+            for digest in os.listdir(prefix_dir):
+                yield digest, os.path.join(prefix_dir, digest)
+
+def active_version(firmware_dir=FIRMWARE_DIR):
+    """Returns the active-version record of a firmware directory, or None."""
+    try:
+        with open(os.path.join(firmware_dir, ACTIVE_FILE)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Manage stored firmware versions")
+    parser.add_argument("--store", default=STORE_DIR, help="Store directory")
+    parser.add_argument("--firmware-dir", default=FIRMWARE_DIR, help="Working firmware directory")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p_import = sub.add_parser("import", help="Import a firmware directory or zip as a version")
+    p_import.add_argument("version")
+    p_import.add_argument("source", help="Directory or zip archive")
+    p_import.add_argument("images", nargs="*", help="Image names (default: all *.img)")
+
+    p_use = sub.add_parser("use", help="Link a version into the firmware directory")
+    p_use.add_argument("version")
+
+    sub.add_parser("list", help="List stored versions")
+    sub.add_parser("gc", help="Delete unreferenced blobs")
+    sub.add_parser("verify", help="Re-hash all blobs")
+
+    args = parser.parse_args(argv)
+    store = FirmwareStore(args.store)
+
+    try:
+        if args.command == "import":
+            with image_source.open_source(args.source) as source:
+                manifest = store.import_version(args.version, source, args.images or None)
+            for name, digest in sorted(manifest["images"].items()):
+                print(f"[STORE] {name:<16} {digest}")
+            print(f"[STORE] Imported {args.version} ({len(manifest['images'])} images)")
+        elif args.command == "use":
+            strategies = store.activate(args.version, args.firmware_dir)
+            for name, strategy in sorted(strategies.items()):
+                print(f"[STORE] {name:<16} {strategy}")
+            print(f"[STORE] {args.version} is now active in {args.firmware_dir}")
+        elif args.command == "list":
+            current = active_version(args.firmware_dir) or {}
+            for version in store.versions():
+                marker = "*" if version == current.get("version") else " "
+                print(f"{marker} {version} ({len(store.manifest(version)['images'])} images)")
+            unique, logical = store.usage()
+            print(f"[STORE] {unique / 1e6:.1f} MB stored for {logical / 1e6:.1f} MB of images")
+        elif args.command == "gc":
+            print(f"[STORE] Freed {store.gc() / 1e6:.1f} MB")
+        elif args.command == "verify":
+            corrupt = store.verify()
+            for digest in corrupt:
+                print(f"[STORE] Corrupt blob: {digest}")
+            if corrupt:
+                return 1
+            print("[STORE] All blobs verified.")
+    except (StoreError, ValueError, OSError) as e:
+        print(f"[STORE] Error: {e}")
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -10,6 +10,13 @@ FIRMWARE_DIR="${SCRIPT_DIR}/firmware"
 # We expect mtkclient to be a folder in toolkit
 MTK_CLIENT="${SCRIPT_DIR}/mtkclient/mtk"
 
+# Image paths. The interceptor overrides these when images are streamed
+# from a firmware archive instead of living in FIRMWARE_DIR.
+BOOT_IMG="${PACMAN_BOOT_IMG:-$FIRMWARE_DIR/boot.img}"
+VBMETA_IMG="${PACMAN_VBMETA_IMG:-$FIRMWARE_DIR/vbmeta.img}"
+PRELOADER_IMG="${PACMAN_PRELOADER_IMG:-$FIRMWARE_DIR/preloader.img}"
+LK_IMG="${PACMAN_LK_IMG:-$FIRMWARE_DIR/lk.img}"
+
 MODE=$1
 
 # Track operations for summary report
@@ -26,12 +33,12 @@ validate_firmware_files() {
     if [ "$mode" == "fastboot" ]; then
         # Files needed for fastboot mode
         local required_files=(
-            "boot.img"
-            "vbmeta.img"
+            "$BOOT_IMG"
+            "$VBMETA_IMG"
         )
         
         for file in "${required_files[@]}"; do
-            if [ -f "$FIRMWARE_DIR/$file" ]; then
+            if [ -f "$file" ]; then
                 echo "  ✅ $file"
             else
                 echo "  ❌ $file - MISSING"
@@ -42,14 +49,14 @@ validate_firmware_files() {
     elif [ "$mode" == "mtk" ]; then
         # Files needed for MTK mode
         local required_files=(
-            "preloader.img"
-            "lk.img"
-            "boot.img"
-            "vbmeta.img"
+            "$PRELOADER_IMG"
+            "$LK_IMG"
+            "$BOOT_IMG"
+            "$VBMETA_IMG"
         )
         
         for file in "${required_files[@]}"; do
-            if [ -f "$FIRMWARE_DIR/$file" ]; then
+            if [ -f "$file" ]; then
                 echo "  ✅ $file"
             else
                 echo "  ❌ $file - MISSING"
@@ -137,10 +144,10 @@ if [ "$MODE" == "fastboot" ]; then
         exit 1
     fi
 
-    exec_with_check "Flash boot_a partition" fastboot flash boot_a "$FIRMWARE_DIR/boot.img"
-    exec_with_check "Flash boot_b partition" fastboot flash boot_b "$FIRMWARE_DIR/boot.img"
-    exec_with_check "Flash vbmeta_a partition (disable verity)" fastboot flash --disable-verity --disable-verification vbmeta_a "$FIRMWARE_DIR/vbmeta.img"
-    exec_with_check "Flash vbmeta_b partition (disable verity)" fastboot flash --disable-verity --disable-verification vbmeta_b "$FIRMWARE_DIR/vbmeta.img"
+    exec_with_check "Flash boot_a partition" fastboot flash boot_a "$BOOT_IMG"
+    exec_with_check "Flash boot_b partition" fastboot flash boot_b "$BOOT_IMG"
+    exec_with_check "Flash vbmeta_a partition (disable verity)" fastboot flash --disable-verity --disable-verification vbmeta_a "$VBMETA_IMG"
+    exec_with_check "Flash vbmeta_b partition (disable verity)" fastboot flash --disable-verity --disable-verification vbmeta_b "$VBMETA_IMG"
 
     print_summary
     
@@ -164,21 +171,24 @@ elif [ "$MODE" == "mtk" ]; then
 
     echo "[PACMAN-RESCUE] Flashing via mtkclient..."
 
+    # Refuse to write anything if lk.img is not a valid header chain
+    exec_with_check "Validate lk.img partition headers" python3 "${SCRIPT_DIR}/lk_image.py" "$LK_IMG"
+
     # Preloader (Critical)
-    exec_with_check "Flash preloader partition" "${MTK_CMD[@]}" w preloader "$FIRMWARE_DIR/preloader.img"
-    exec_with_check "Flash preloader_b partition" "${MTK_CMD[@]}" w preloader_b "$FIRMWARE_DIR/preloader.img"
+    exec_with_check "Flash preloader partition" "${MTK_CMD[@]}" w preloader "$PRELOADER_IMG"
+    exec_with_check "Flash preloader_b partition" "${MTK_CMD[@]}" w preloader_b "$PRELOADER_IMG"
 
     # LK / Bootloader
-    exec_with_check "Flash lk partition" "${MTK_CMD[@]}" w lk "$FIRMWARE_DIR/lk.img"
-    exec_with_check "Flash lk2 partition" "${MTK_CMD[@]}" w lk2 "$FIRMWARE_DIR/lk.img"
+    exec_with_check "Flash lk partition" "${MTK_CMD[@]}" w lk "$LK_IMG"
+    exec_with_check "Flash lk2 partition" "${MTK_CMD[@]}" w lk2 "$LK_IMG"
 
     # Boot
-    exec_with_check "Flash boot_a partition" "${MTK_CMD[@]}" w boot_a "$FIRMWARE_DIR/boot.img"
-    exec_with_check "Flash boot_b partition" "${MTK_CMD[@]}" w boot_b "$FIRMWARE_DIR/boot.img"
+    exec_with_check "Flash boot_a partition" "${MTK_CMD[@]}" w boot_a "$BOOT_IMG"
+    exec_with_check "Flash boot_b partition" "${MTK_CMD[@]}" w boot_b "$BOOT_IMG"
 
     # VBMeta
-    exec_with_check "Flash vbmeta_a partition (disable verified boot)" "${MTK_CMD[@]}" w vbmeta_a "$FIRMWARE_DIR/vbmeta.img" --verified-boot-disable
-    exec_with_check "Flash vbmeta_b partition (disable verified boot)" "${MTK_CMD[@]}" w vbmeta_b "$FIRMWARE_DIR/vbmeta.img" --verified-boot-disable
+    exec_with_check "Flash vbmeta_a partition (disable verified boot)" "${MTK_CMD[@]}" w vbmeta_a "$VBMETA_IMG" --verified-boot-disable
+    exec_with_check "Flash vbmeta_b partition (disable verified boot)" "${MTK_CMD[@]}" w vbmeta_b "$VBMETA_IMG" --verified-boot-disable
 
     print_summary
     
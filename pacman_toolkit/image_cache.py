@@ -0,0 +1,279 @@
+#!/usr/bin/env python3
+"""
+Shared in-memory image cache for flashing several devices from one process.
+
+Each image is loaded once into an anonymous shared memory file (memfd) and
+mapped read-only. Flashing workers take a lease on an image and get:
+
+    lease.view  - a read-only memoryview over the shared mapping
+    lease.path  - a /proc path external tools (fastboot, mtkclient) can open
+
+so no matter how many devices are flashed at once, each image is held in
+memory exactly once. Leases are reference counted. Changing the firmware set
+evicts cached images as soon as the last worker releases them.
+"""
+import io
+import os
+import mmap
+import hashlib
+import threading
+
+try:
+    from . import image_source
+except ImportError:
+    import image_source
+
+CHUNK_SIZE = 1024 * 1024
+
+class CachedImage:
+    def __init__(self, name, fd, size, sha256):
+        self.name = name
+        self.fd = fd
+        self.size = size
+        self.sha256 = sha256
+        self.refcount = 0
+        self.stale = False
+        # mmap cannot map an empty file
+        self._map = mmap.mmap(fd, size, access=mmap.ACCESS_READ) if size else None
+
+    @property
+    def path(self):
+        return f"/proc/{os.getpid()}/fd/{self.fd}"
+
+    def new_view(self):
+        return memoryview(self._map) if self._map else memoryview(b'')
+
+    def close(self):
+        if self._map:
+            self._map.close()
+        os.close(self.fd)
+
+class ImageLease:
+    """A worker's handle on a cached image. Release it when flashing is done."""
+
+    def __init__(self, cache, entry):
+        self._cache = cache
+        self._entry = entry
+        self.name = entry.name
+        self.size = entry.size
+        self.sha256 = entry.sha256
+        self.path = entry.path
+        self.view = entry.new_view()
+        self.released = False
+
+    def release(self):
+        if not self.released:
+            self.released = True
+            # Slices taken from the view must be released by the worker first
+            self.view.release()
+            self.view = None
+            self._cache._release(self._entry)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+
+class ImageCache:
+    def __init__(self, source=None):
+        self._lock = threading.Lock()
+        self._entries = {}
+        self._loading = {}
+        self._source = source
+        # {source: loads in flight}; a replaced source is closed after its last one
+        self._reading = {}
+        self.loads = 0
+
+    def set_source(self, source):
+        """
+        Switches to a new firmware set and closes the previous source. Images
+        nobody is using are evicted now; images still leased are evicted
+        when their last lease ends.
+        """
+        with self._lock:
+            old, self._source = self._source, source
+            for key in list(self._entries):
+                self._evict_locked(key)
+            if old is source or self._reading.get(old):
+                old = None
+        if old is not None:
+            old.close()
+
+    def _done_reading_locked(self, source):
+        """Returns `source` if it was replaced and this was its last load (close it outside the lock)."""
+        if source is None:
+            return None
+        self._reading[source] -= 1
+        if self._reading[source]:
+            return None
+        del self._reading[source]
+        return source if source is not self._source else None
+
+    def _evict_locked(self, key):
+        entry = self._entries.pop(key)
+        entry.stale = True
+        if entry.refcount == 0:
+            entry.close()
+
+    def _load(self, name, stream):
+        fd = os.memfd_create(name) if hasattr(os, 'memfd_create') else _unlinked_tempfile(name)
+        h = hashlib.sha256()
+        size = 0
+        try:
+            with os.fdopen(os.dup(fd), 'wb') as out:
+                while True:
+                    chunk = stream.read(CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    h.update(chunk)
+                    out.write(chunk)
+                    size += len(chunk)
+            return CachedImage(name, fd, size, h.hexdigest())
+        except Exception:
+            os.close(fd)
+            raise
+
+    def acquire(self, name, data=None):
+        """
+        Returns a lease on `name`, loading it from the current source (or
+        from `data`, e.g. a patched image) on first use. Concurrent callers
+        asking for the same image wait for a single load.
+        """
+        key = name
+        while True:
+            with self._lock:
+                entry = self._entries.get(key)
+                if entry is not None:
+                    entry.refcount += 1
+                    return ImageLease(self, entry)
+                event = self._loading.get(key)
+                if event is None:
+                    event = threading.Event()
+                    self._loading[key] = event
+                    source = None if data is not None else self._source
+                    if source is not None:
+                        self._reading[source] = self._reading.get(source, 0) + 1
+                    break
+            event.wait()
+
+        try:
+            if data is not None:
+                entry = self._load(name, io.BytesIO(data))
+            else:
+                if source is None:
+                    raise KeyError(name)
+                with source.open(name) as stream:
+                    entry = self._load(name, stream)
+        except BaseException:
+            with self._lock:
+                del self._loading[key]
+                retired = self._done_reading_locked(source)
+            event.set()
+            if retired:
+                retired.close()
+            raise
+
+        with self._lock:
+            self.loads += 1
+            del self._loading[key]
+            retired = self._done_reading_locked(source)
+            if source is not self._source and data is None:
+                # Firmware set changed while loading, do not cache it
+                entry.stale = True
+            else:
+                self._entries[key] = entry
+            entry.refcount += 1
+            lease = ImageLease(self, entry)
+        event.set()
+        if retired:
+            retired.close()
+        return lease
+
+    def put(self, name, data):
+        """
+        Caches already-built image bytes (e.g. a patched boot.img), replacing
+        any previous image of that name once its leases end.
+        """
+        with self._lock:
+            if name in self._entries:
+                self._evict_locked(name)
+        self.acquire(name, data=data).release()
+
+    def _release(self, entry):
+        with self._lock:
+            entry.refcount -= 1
+            if entry.refcount == 0 and entry.stale:
+                entry.close()
+
+    def evict_unused(self):
+        """Drops every image no worker currently holds. Returns bytes freed."""
+        freed = 0
+        with self._lock:
+            for key, entry in list(self._entries.items()):
+                if entry.refcount == 0:
+                    freed += entry.size
+                    self._evict_locked(key)
+        return freed
+
+    def stats(self):
+        with self._lock:
+            return {
+                "images": len(self._entries),
+                "bytes": sum(e.size for e in self._entries.values()),
+                "leases": sum(e.refcount for e in self._entries.values()),
+                "loads": self.loads,
+            }
+
+    def close(self):
+        with self._lock:
+            for key in list(self._entries):
+                self._evict_locked(key)
+            source = self._source
+        if source is not None:
+            source.close()
+
+def _unlinked_tempfile(name):
+    import tempfile
+    fd, tmp_path = tempfile.mkstemp(prefix=f"pacman-{name}-")
+    os.unlink(tmp_path)
+    return fd
+
+def firmware_signature(firmware_dir):
+    """Identity of the files in a firmware directory (name, inode, mtime, size)."""
+    signature = []
+    try:
+        for entry in os.scandir(firmware_dir):
+            try:
+                st = entry.stat()
+            except OSError:
+                continue
+            signature.append((entry.name, st.st_ino, st.st_mtime_ns, st.st_size))
+    except OSError:
+        pass
+    return tuple(sorted(signature))
+
+class FirmwareImageCache(ImageCache):
+    """
+    A cache over the toolkit's firmware directory (loose images and archives).
+    refresh() evicts everything when the directory's contents change, e.g.
+    after `firmware_store.py use` switched versions.
+    """
+
+    def __init__(self, firmware_dir):
+        self.firmware_dir = firmware_dir
+        self._signature = firmware_signature(firmware_dir)
+        super().__init__(image_source.FirmwareSource(firmware_dir))
+
+    def refresh(self):
+        signature = firmware_signature(self.firmware_dir)
+        if signature == self._signature:
+            return False
+        self._signature = signature
+        self.set_source(image_source.FirmwareSource(self.firmware_dir))
+        return True
+
+    def archive_only(self, names):
+        """Names that are only available from an archive (no loose file)."""
+        source = self._source
+        return [n for n in names if source.has(n) and source.local_path(n) is None]
@@ -0,0 +1,372 @@
+#!/usr/bin/env python3
+"""
+Firmware image sources.
+
+An image source is a set of named images (boot.img, vbmeta.img, ...) that can
+be opened as streams. Loose files in a directory and members of factory zip
+archives are both exposed through the same interface, so the flashing pipeline
+and hash verification never need an archive to be unpacked first.
+
+External tools (fastboot, mtkclient, flash_rescue.sh) need a path. For
+archive members, `stage()` streams the member into an anonymous in-memory file
+(memfd) and hands out its /proc path instead of writing it to disk.
+"""
+import os
+import abc
+import hashlib
+import zipfile
+
+CHUNK_SIZE = 1024 * 1024
+ARCHIVE_EXTENSIONS = ('.zip',)
+
+class ImageSource(abc.ABC):
+    """Base interface for a collection of firmware images."""
+
+    def __init__(self):
+        self._hashes = {}
+
+    @abc.abstractmethod
+    def names(self):
+        """Image names available from this source."""
+
+    def has(self, name):
+        return name in self.names()
+
+    @abc.abstractmethod
+    def size(self, name):
+        """Uncompressed size of the image in bytes."""
+
+    @abc.abstractmethod
+    def open(self, name):
+        """Returns a binary, readable stream for the image."""
+
+    def local_path(self, name):
+        """Path of the image on disk if it is a loose file, otherwise None."""
+        return None
+
+    @abc.abstractmethod
+    def describe(self, name):
+        """Where the image comes from, for messages."""
+
+    def sha256(self, name):
+        """Streams the image once and caches its SHA-256 hex digest."""
+        if name not in self._hashes:
+            h = hashlib.sha256()
+            with self.open(name) as f:
+                while True:
+                    chunk = f.read(CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    h.update(chunk)
+            self._hashes[name] = h.hexdigest()
+        return self._hashes[name]
+
+    def verify(self, name, expected_sha256):
+        return self.sha256(name) == expected_sha256.lower()
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+class DirectorySource(ImageSource):
+    """Loose image files in a directory."""
+
+    def __init__(self, path):
+        super().__init__()
+        self.path = path
+
+    def names(self):
+        try:
+            return [e.name for e in os.scandir(self.path)
+                    if e.is_file() and not e.name.lower().endswith(ARCHIVE_EXTENSIONS)]
+        except OSError:
+            return []
+
+    def has(self, name):
+        return os.path.isfile(os.path.join(self.path, name))
+
+    def size(self, name):
+        return os.path.getsize(os.path.join(self.path, name))
+
+    def open(self, name):
+        return open(os.path.join(self.path, name), 'rb')
+
+    def local_path(self, name):
+        return os.path.join(self.path, name)
+
+    def describe(self, name):
+        return os.path.join(self.path, name)
+
+class ZipSource(ImageSource):
+    """
+    Images inside a zip archive, looked up by basename via the central
+    directory. Members may live in subfolders (e.g. images/boot.img).
+    """
+
+    def __init__(self, path):
+        super().__init__()
+        self.path = path
+        self._zip = zipfile.ZipFile(path)
+        self._members = {}
+        for info in self._zip.infolist():
+            if info.is_dir():
+                continue
+            base = os.path.basename(info.filename)
+            current = self._members.get(base)
+            # Prefer the shallowest member if a name appears more than once
+            if current is None or info.filename.count('/') < current.filename.count('/'):
+                self._members[base] = info
+
+    def names(self):
+        return list(self._members)
+
+    def has(self, name):
+        return name in self._members
+
+    def size(self, name):
+        return self._members[name].file_size
+
+    def open(self, name):
+        # zipfile checks the CRC32 of the member as it is read
+        return self._zip.open(self._members[name])
+
+    def stored_offset(self, name):
+        """
+        Absolute offset of an uncompressed (STORED) member's data inside the
+        archive, or None if the member is compressed.
+        """
+        info = self._members[name]
+        if info.compress_type != zipfile.ZIP_STORED:
+            return None
+        with open(self.path, 'rb') as f:
+            f.seek(info.header_offset)
+            local = f.read(30)
+        if local[:4] != b'PK\x03\x04':
+            return None
+        name_len = int.from_bytes(local[26:28], 'little')
+        extra_len = int.from_bytes(local[28:30], 'little')
+        return info.header_offset + 30 + name_len + extra_len
+
+    def describe(self, name):
+        return f"{self.path}!{self._members[name].filename}"
+
+    def close(self):
+        self._zip.close()
+
+class FirmwareSource(ImageSource):
+    """
+    The toolkit's firmware directory: loose images first, then any zip
+    archives (or symlinks to archives) placed in the same directory.
+    """
+
+    def __init__(self, path):
+        super().__init__()
+        self.path = path
+        self.sources = [DirectorySource(path)]
+        try:
+            archives = sorted(e.path for e in os.scandir(path)
+                              if e.name.lower().endswith(ARCHIVE_EXTENSIONS))
+        except OSError:
+            archives = []
+        for archive in archives:
+            try:
+                self.sources.append(ZipSource(archive))
+            except (zipfile.BadZipFile, OSError):
+                continue
+
+    def _source_for(self, name):
+        for source in self.sources:
+            if source.has(name):
+                return source
+        raise KeyError(name)
+
+    def names(self):
+        seen = []
+        for source in self.sources:
+            seen.extend(n for n in source.names() if n not in seen)
+        return seen
+
+    def has(self, name):
+        return any(source.has(name) for source in self.sources)
+
+    def size(self, name):
+        return self._source_for(name).size(name)
+
+    def open(self, name):
+        return self._source_for(name).open(name)
+
+    def local_path(self, name):
+        return self._source_for(name).local_path(name)
+
+    def describe(self, name):
+        return self._source_for(name).describe(name)
+
+    def sha256(self, name):
+        return self._source_for(name).sha256(name)
+
+    def close(self):
+        for source in self.sources:
+            source.close()
+
+class ImageRef:
+    """A single image inside a source."""
+
+    def __init__(self, source, name):
+        self.source = source
+        self.name = name
+
+    def __str__(self):
+        return self.source.describe(self.name)
+
+    def __repr__(self):
+        return f"ImageRef({str(self)!r})"
+
+    def close(self):
+        """Closes the source (e.g. the archive find_in_archives() opened)."""
+        self.source.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def as_ref(path_or_ref):
+    """Wraps a loose file path as an ImageRef; ImageRefs pass through."""
+    if isinstance(path_or_ref, ImageRef):
+        return path_or_ref
+    path = os.path.abspath(path_or_ref)
+    return ImageRef(DirectorySource(os.path.dirname(path)), os.path.basename(path))
+
+def open_source(path):
+    """Opens a directory or a zip archive as an image source."""
+    if os.path.isdir(path):
+        return FirmwareSource(path)
+    if zipfile.is_zipfile(path):
+        return ZipSource(path)
+    raise ValueError(f"Not a firmware directory or zip archive: {path}")
+
+def find_in_archives(filename, search_paths):
+    """
+    Looks for `filename` inside zip archives directly in each search path.
+    Returns an ImageRef or None; the caller closes the ref.
+    """
+    for path in search_paths:
+        try:
+            entries = sorted(e.path for e in os.scandir(path)
+                             if e.is_file() and e.name.lower().endswith(ARCHIVE_EXTENSIONS))
+        except OSError:
+            continue
+        for archive in entries:
+            try:
+                source = ZipSource(archive)
+            except (zipfile.BadZipFile, OSError):
+                continue
+            if source.has(filename):
+                return ImageRef(source, filename)
+            source.close()
+    return None
+
+class StagedImages:
+    """
+    Paths for images that external tools can open. Loose files map to their
+    real path; everything else is streamed into a memfd that lives until
+    close() is called.
+    """
+
+    def __init__(self):
+        self.paths = {}
+        self.sha256 = {}
+        self._fds = []
+
+    def add(self, source, name):
+        local = source.local_path(name)
+        if local:
+            self.paths[name] = local
+            return local
+
+        fd = _memfd(name)
+        h = hashlib.sha256()
+        try:
+            with source.open(name) as src, os.fdopen(os.dup(fd), 'wb') as dst:
+                while True:
+                    chunk = src.read(CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    h.update(chunk)
+                    dst.write(chunk)
+        except Exception:
+            os.close(fd)
+            raise
+
+        self._fds.append(fd)
+        self.sha256[name] = h.hexdigest()
+        # Readable by child processes without fd inheritance
+        self.paths[name] = f"/proc/{os.getpid()}/fd/{fd}"
+        return self.paths[name]
+
+    def in_memory(self):
+        return [name for name, path in self.paths.items() if path.startswith("/proc/")]
+
+    def close(self):
+        for fd in self._fds:
+            os.close(fd)
+        self._fds = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def _memfd(name):
+    if hasattr(os, 'memfd_create'):
+        return os.memfd_create(name)
+    # Fall back to an unlinked temporary file on systems without memfd
+    import tempfile
+    fd, tmp_path = tempfile.mkstemp(prefix=f"pacman-{name}-")
+    os.unlink(tmp_path)
+    return fd
+
+def stage(source, names):
+    """Stages the given images from a source. Missing names raise KeyError."""
+    staged = StagedImages()
+    try:
+        for name in names:
+            if not source.has(name):
+                raise KeyError(name)
+            staged.add(source, name)
+    except Exception:
+        staged.close()
+        raise
+    return staged
+
+def stage_ref(path_or_ref):
+    """Stages a single loose path or ImageRef. Returns (StagedImages, path)."""
+    ref = as_ref(path_or_ref)
+    staged = stage(ref.source, [ref.name])
+    return staged, staged.paths[ref.name]
+
+def stage_from_archives(firmware_dir, names):
+    """
+    Stages images that are missing as loose files in `firmware_dir` but
+    present in an archive placed there. Returns None if any name is
+    unavailable or nothing needs staging from an archive.
+    """
+    source = FirmwareSource(firmware_dir)
+    if len(source.sources) == 1 or not all(source.has(n) for n in names):
+        source.close()
+        return None
+    try:
+        staged = stage(source, names)
+    finally:
+        source.close()
+    if not staged.in_memory():
+        staged.close()
+        return None
+    return staged
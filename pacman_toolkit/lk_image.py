@@ -0,0 +1,231 @@
+#!/usr/bin/env python3
+"""
+Parser and validator for the MediaTek partition header chain inside lk.img.
+
+An lk.img is a sequence of sub-images (lk, cert1, cert2, bl2_ext, aee, ...),
+each prefixed with a 512 byte header:
+
+    0x00  magic        0x58881688
+    0x04  data size
+    0x08  name         32 bytes, NUL padded
+    0x28  load address
+    0x2c  mode
+    0x30  ext magic    0x58891689 (absent on legacy headers)
+    0x34  header size
+    0x38  header version
+    0x3c  image type
+    0x40  image list end (1 on the last header of the chain)
+    0x44  alignment
+
+Only the headers are read while walking the chain, so parsing is a handful of
+small seeks regardless of image size. Results are cached by SHA-256 so the
+same image is only parsed once per process.
+"""
+import os
+import sys
+import struct
+import hashlib
+
+LK_MAGIC = 0x58881688
+LK_EXT_MAGIC = 0x58891689
+HEADER_SIZE = 512
+DEFAULT_ALIGN = 16
+MAX_PARTITIONS = 64
+CHUNK_SIZE = 1024 * 1024
+
+# magic, dsize, name, maddr, mode, ext_magic, hdr_size, hdr_version,
+# img_type, img_list_end, align_size
+_HEADER = struct.Struct('<II32sIIIIIIII')
+
+# Maps sha256 hex digest to a parsed LkImage
+_parse_cache = {}
+
+class LkImageError(Exception):
+    """Raised when a file is not a well-formed MTK partition image."""
+
+class LkPartition:
+    __slots__ = ('name', 'header_offset', 'data_offset', 'size', 'load_addr', 'img_type')
+
+    def __init__(self, name, header_offset, data_offset, size, load_addr, img_type):
+        self.name = name
+        self.header_offset = header_offset
+        self.data_offset = data_offset
+        self.size = size
+        self.load_addr = load_addr
+        self.img_type = img_type
+
+    @property
+    def data_end(self):
+        return self.data_offset + self.size
+
+    def __repr__(self):
+        return (f"LkPartition({self.name!r}, header=0x{self.header_offset:x}, "
+                f"data=0x{self.data_offset:x}, size={self.size})")
+
+class LkImage:
+    def __init__(self, sha256, file_size, used_length, partitions):
+        self.sha256 = sha256
+        self.file_size = file_size
+        self.used_length = used_length
+        self.partitions = partitions
+
+    def names(self):
+        return [p.name for p in self.partitions]
+
+    def find(self, name):
+        """Returns the first sub-image with the given name, or None."""
+        for part in self.partitions:
+            if part.name == name:
+                return part
+        return None
+
+def file_sha256(path):
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        while True:
+            chunk = f.read(CHUNK_SIZE)
+            if not chunk:
+                break
+            h.update(chunk)
+    return h.hexdigest()
+
+def has_lk_magic(path):
+    """Cheap check that a file starts with an MTK partition header."""
+    try:
+        with open(path, 'rb') as f:
+            head = f.read(4)
+    except OSError:
+        return False
+    return len(head) == 4 and struct.unpack('<I', head)[0] == LK_MAGIC
+
+def _decode_name(raw, offset):
+    name = raw.split(b'\0', 1)[0]
+    try:
+        name = name.decode('ascii')
+    except UnicodeDecodeError:
+        raise LkImageError(f"Header at 0x{offset:x} has a non-ASCII name")
+    if not name or not name.isprintable():
+        raise LkImageError(f"Header at 0x{offset:x} has an invalid name")
+    return name
+
+def parse_headers(f, file_size):
+    """
+    Walks the header chain of an open file.
+    Returns (partitions, used_length).
+    """
+    partitions = []
+    offset = 0
+
+    while True:
+        if len(partitions) >= MAX_PARTITIONS:
+            raise LkImageError(f"More than {MAX_PARTITIONS} headers in chain")
+        if offset + HEADER_SIZE > file_size:
+            raise LkImageError(f"Truncated header at 0x{offset:x}")
+
+        f.seek(offset)
+        raw = f.read(_HEADER.size)
+        if len(raw) < _HEADER.size:
+            raise LkImageError(f"Truncated header at 0x{offset:x}")
+
+        (magic, dsize, name, maddr, _mode, ext_magic, hdr_size, _hdr_version,
+         img_type, list_end, align) = _HEADER.unpack(raw)
+
+        if magic != LK_MAGIC:
+            if not partitions:
+                raise LkImageError("Missing MTK partition header magic")
+            # Legacy chains have no list-end flag, they just stop
+            return partitions, offset
+
+        if ext_magic == LK_EXT_MAGIC:
+            if hdr_size < _HEADER.size or hdr_size % 16 or hdr_size > 4096:
+                raise LkImageError(f"Invalid header size {hdr_size} at 0x{offset:x}")
+            if align == 0 or align & (align - 1):
+                raise LkImageError(f"Invalid alignment {align} at 0x{offset:x}")
+            last = list_end == 1
+        else:
+            # Legacy header without the extension block
+            hdr_size = HEADER_SIZE
+            align = DEFAULT_ALIGN
+            img_type = 0
+            last = False
+
+        data_offset = offset + hdr_size
+        if data_offset + dsize > file_size:
+            raise LkImageError(
+                f"Sub-image at 0x{offset:x} claims {dsize} bytes, past end of file ({file_size})")
+
+        partitions.append(LkPartition(
+            _decode_name(name, offset), offset, data_offset, dsize, maddr, img_type))
+
+        offset = data_offset + ((dsize + align - 1) // align) * align
+        if last:
+            return partitions, min(offset, file_size)
+        if offset >= file_size:
+            return partitions, file_size
+
+def _check_padding(f, start, file_size):
+    """Everything after the last sub-image must be 0x00 or 0xff fill."""
+    f.seek(start)
+    fill = None
+    remaining = file_size - start
+    while remaining > 0:
+        chunk = f.read(min(CHUNK_SIZE, remaining))
+        if not chunk:
+            break
+        if fill is None:
+            fill = chunk[0]
+            if fill not in (0x00, 0xff):
+                raise LkImageError(f"Unexpected data after header chain at 0x{start:x}")
+        if chunk.count(fill) != len(chunk):
+            raise LkImageError(f"Unexpected data after header chain at 0x{start:x}")
+        remaining -= len(chunk)
+
+def parse_lk_image(path, use_cache=True):
+    """
+    Parses and validates an lk.img.
+    Raises LkImageError if the structure or total length is invalid.
+    """
+    digest = file_sha256(path)
+    if use_cache and digest in _parse_cache:
+        return _parse_cache[digest]
+
+    file_size = os.path.getsize(path)
+    with open(path, 'rb') as f:
+        partitions, used_length = parse_headers(f, file_size)
+        _check_padding(f, used_length, file_size)
+
+    image = LkImage(digest, file_size, used_length, partitions)
+    if use_cache:
+        _parse_cache[digest] = image
+    return image
+
+def validate_lk_image(path):
+    """Returns (True, LkImage) or (False, error message)."""
+    try:
+        return True, parse_lk_image(path)
+    except (LkImageError, OSError) as e:
+        return False, str(e)
+
+def clear_cache():
+    _parse_cache.clear()
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if len(argv) != 1:
+        print(f"Usage: {os.path.basename(sys.argv[0])} <lk.img>")
+        return 2
+
+    ok, result = validate_lk_image(argv[0])
+    if not ok:
+        print(f"[LK-IMAGE] Invalid: {result}")
+        return 1
+
+    print(f"[LK-IMAGE] {argv[0]} ({result.file_size} bytes, sha256 {result.sha256[:16]}...)")
+    for part in result.partitions:
+        print(f"  {part.name:<16} header 0x{part.header_offset:08x}  "
+              f"data 0x{part.data_offset:08x}  size {part.size}")
+    print(f"  Header chain ends at 0x{result.used_length:x}, remainder is padding")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
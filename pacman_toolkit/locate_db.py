@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""
+Reader for the mlocate database, as a fast search backend.
+
+Most workstations already keep a locate database that `updatedb` refreshes
+nightly. Scanning it for a few file names is much cheaper than walking the
+disk. The file is read in chunks and parsed directory by directory, so it is
+never loaded whole. Hits are only returned if they still exist.
+
+mlocate format (all integers big-endian):
+    header     "\\0mlocate", u32 config size, u8 version (0), u8 visibility,
+               2 pad, root path NUL, config block
+    directory  u64 seconds, u32 nanoseconds, 4 pad, path NUL, entries
+    entry      u8 type (0 file, 1 directory) + name NUL, or u8 2 (end)
+
+plocate databases (zstd-compressed posting lists) are recognized but cannot
+be read without zstd, so they are skipped like a missing database.
+
+Usage: python3 locate_db.py [--db FILE] NAME...
+"""
+import os
+import sys
+import struct
+import argparse
+
+MAGIC = b"\0mlocate"
+PLOCATE_MAGIC = b"\0plocate"
+HEADER = struct.Struct(">8sIBB2x")
+DIRECTORY = struct.Struct(">QI4x")
+ENTRY_FILE, ENTRY_DIR, ENTRY_END = 0, 1, 2
+
+# Searched in order, after the paths in $LOCATE_PATH
+DEFAULT_DATABASES = [
+    "/var/lib/mlocate/mlocate.db",
+    "/var/lib/plocate/plocate.db",
+]
+CHUNK_SIZE = 1 << 20
+
+class LocateDBError(Exception):
+    pass
+
+class LocateDB:
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as f:
+            head = f.read(HEADER.size)
+            if head.startswith(PLOCATE_MAGIC):
+                raise LocateDBError(f"{path}: plocate database (zstd-compressed), not supported")
+            if len(head) < HEADER.size or not head.startswith(MAGIC):
+                raise LocateDBError(f"{path}: not an mlocate database")
+            _, self.config_size, version, self.visibility = HEADER.unpack(head)
+            if version != 0:
+                raise LocateDBError(f"{path}: unsupported mlocate version {version}")
+            root = b""
+            while not root.endswith(b"\0"):
+                byte = f.read(1)
+                if not byte:
+                    raise LocateDBError(f"{path}: truncated header")
+                root += byte
+            self.root = os.fsdecode(root[:-1])
+            self._data_offset = f.tell() + self.config_size
+        self.mtime = os.stat(path).st_mtime
+
+    def find(self, names):
+        """Streams (name, path) for every file entry called one of `names`."""
+        wanted = {os.fsencode(name): name for name in names}
+        with open(self.path, "rb") as f:
+            f.seek(self._data_offset)
+            buf = b""
+            pos = 0
+            eof = False
+            while True:
+                parsed = self._scan_directory(buf, pos, wanted)
+                if parsed is None:
+                    if eof:
+                        if pos < len(buf):
+                            raise LocateDBError(f"{self.path}: truncated at directory record")
+                        return
+                    # The rest of this directory is in the next chunk
+                    chunk = f.read(CHUNK_SIZE)
+                    eof = not chunk
+                    buf = buf[pos:] + chunk
+                    pos = 0
+                    continue
+                pos, hits = parsed
+                yield from hits
+
+    @staticmethod
+    def _scan_directory(buf, pos, wanted):
+        """(next position, [(name, path)]) if the whole directory is in buf, else None."""
+        hits = []
+        try:
+            path_end = buf.index(b"\0", pos + DIRECTORY.size)
+            p = path_end + 1
+            while True:
+                kind = buf[p]
+                if kind == ENTRY_END:
+                    return p + 1, hits
+                name_end = buf.index(b"\0", p + 1)
+                if kind == ENTRY_FILE:
+                    name = buf[p + 1:name_end]
+                    if name in wanted:
+                        dirpath = buf[pos + DIRECTORY.size:path_end]
+                        hits.append((wanted[name], os.fsdecode(os.path.join(dirpath, name))))
+                p = name_end + 1
+        except (ValueError, IndexError):
+            return None
+
+def databases():
+    """Readable database paths: $LOCATE_PATH entries first, then the defaults."""
+    paths = [p for p in os.environ.get("LOCATE_PATH", "").split(":") if p] + DEFAULT_DATABASES
+    return [p for p in dict.fromkeys(paths) if os.access(p, os.R_OK)]
+
+def locate(names, dbs=None):
+    """
+    Looks `names` up in every usable database. Returns ({name: [paths that
+    still exist]}, [messages about databases that were skipped]).
+    """
+    found = {name: [] for name in names}
+    messages = []
+    for path in databases() if dbs is None else dbs:
+        try:
+            db = LocateDB(path)
+            for name, hit in db.find(names):
+                if hit not in found[name] and os.path.isfile(hit):
+                    found[name].append(hit)
+        except (OSError, LocateDBError) as e:
+            messages.append(str(e))
+    return found, messages
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Find files through the mlocate database")
+    parser.add_argument("names", nargs="+")
+    parser.add_argument("--db", action="append", help="Database to read (default: $LOCATE_PATH and system databases)")
+    args = parser.parse_args(argv)
+
+    found, messages = locate(args.names, args.db)
+    for message in messages:
+        print(f"skipped: {message}", file=sys.stderr)
+    for name, paths in found.items():
+        print(f"{name}: {', '.join(paths) if paths else 'not found'}")
+    return 0 if all(found.values()) else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,14 +1,29 @@
 #!/usr/bin/env python3
-import usb.core
-import usb.util
-import subprocess
 import time
 import sys
 import os
 import logging
-
-# Configure logging
-logging.basicConfig(level=logging.INFO, format='[%(levelname)s] %(message)s')
+import argparse
+import queue
+import threading
+
+try:
+    from . import usb_timeline
+    from . import process_watchdog
+    from . import retry_policy
+    from . import tick_scheduler
+    from . import realtime
+    from . import toolkit_logging
+except ImportError:
+    import usb_timeline
+    import process_watchdog
+    import retry_policy
+    import tick_scheduler
+    import realtime
+    import toolkit_logging
+
+# Configure logging (written by a background thread, see toolkit_logging.py)
+toolkit_logging.configure(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 # Configuration
@@ -16,6 +31,14 @@ TOOLKIT_DIR = os.path.dirname(os.path.realpath(__file__))
 # Check for mtkclient in toolkit dir, otherwise assume system path or relative
 MTK_PATH = os.path.join(TOOLKIT_DIR, "mtkclient")
 RESCUE_SCRIPT = os.path.join(TOOLKIT_DIR, "flash_rescue.sh")
+FIRMWARE_DIR = os.path.join(TOOLKIT_DIR, "firmware")
+
+# Images flash_rescue.sh needs per mode, and the variables that override their paths
+RESCUE_IMAGES = {
+    "fastboot": {"boot.img": "PACMAN_BOOT_IMG", "vbmeta.img": "PACMAN_VBMETA_IMG"},
+    "mtk": {"boot.img": "PACMAN_BOOT_IMG", "vbmeta.img": "PACMAN_VBMETA_IMG",
+            "preloader.img": "PACMAN_PRELOADER_IMG", "lk.img": "PACMAN_LK_IMG"},
+}
 
 # Identifiers
 VID_GOOGLE = 0x18d1
@@ -28,13 +51,20 @@ FASTBOOT_PIDS = {0x4ee0, 0xd001}  # Common Fastboot PIDs
 
 # Known MediaTek Product IDs (BROM, Preloader)
 MTK_PIDS = {0x0003, 0x2000}
+MTK_MODES = {0x0003: "brom", 0x2000: "preloader"}
 
 # Retry configuration
-MAX_RETRIES = 10
-INITIAL_BACKOFF = 2.0  # seconds
-MAX_BACKOFF = 30.0  # seconds
+MAX_RETRIES = 10  # windows with failed catch attempts before giving up
+INITIAL_BACKOFF = 2.0  # seconds, "exponential" policy
+MAX_BACKOFF = 30.0  # seconds, "exponential" policy
+# Retry policy per device profile (see retry_policy.py)
+RETRY_POLICIES = {"fastboot": "window", "brom": "window", "preloader": "window", "mtk": "exponential"}
 POLLING_INTERVAL = 0.05  # seconds (20Hz) - balanced for responsiveness and CPU
 
+# Watchdog for mtkclient and flash_rescue.sh (see process_watchdog.py)
+MTK_PAYLOAD_DEADLINE = 120.0  # seconds for the payload handshake
+STALL_TIMEOUT = 60.0  # seconds without output before a step is killed
+
 class Colors:
     _is_tty = sys.stdout.isatty()
     HEADER = '\033[95m' if _is_tty else ''
@@ -79,78 +109,238 @@ class Spinner:
             sys.stdout.flush()
             self.running = False
 
-# Global spinner instance
-spinner = None
+class Renderer:
+    """
+    Owns the terminal while the poll loop runs. A background thread animates
+    a Spinner at up to `fps` frames per second, appends the per-device status
+    and writes queued log lines, so the poll loop never blocks on a slow
+    terminal: it only swaps in a status snapshot and enqueues messages.
+    """
 
-def log(msg, color=None):
-    global spinner
-    was_running = False
-    if spinner and spinner.running:
-        spinner.stop()
-        was_running = True
+    def __init__(self, message="Waiting", fps=10):
+        self.spinner = Spinner(message)
+        # Frames are paced by the renderer thread, not by Spinner itself
+        self.spinner.update_interval = 0
+        self.message = message
+        self.frame_interval = 1.0 / fps
+        # Replaced wholesale by the poll loop, read by the renderer thread
+        self.status = ()
+        self.running = False
+        # log() queues lines for a renderer that is about to start
+        self.held = False
+        self._queue = queue.SimpleQueue()
+        self._thread = None
 
-    if color:
-        logger.info(f"{color}[PACMAN-INTERCEPTOR] {msg}{Colors.ENDC}")
-    else:
-        logger.info(f"[PACMAN-INTERCEPTOR] {msg}")
+    def start(self):
+        self.held = False
+        if not self.running:
+            self.running = True
+            self._thread = threading.Thread(target=self._run, name="interceptor-renderer", daemon=True)
+            self._thread.start()
 
-    if was_running:
-        spinner.start()
+    def hold(self):
+        """Queues log() lines until start(), for a renderer started later (see StartupChecks)."""
+        self.held = True
 
-def catch_fastboot(dev):
-    log(f"Fastboot Device Detected: {hex(dev.idVendor)}:{hex(dev.idProduct)}", Colors.GREEN)
-    try:
-        # Detach kernel driver to ensure we can claim it
-        if dev.is_kernel_driver_active(0):
+    def update(self, status=()):
+        """Publishes the current candidates as (mode, retries) tuples."""
+        self.status = status
+
+    def log(self, level, text):
+        self._queue.put((level, text))
+
+    def stop(self):
+        """Writes pending log lines, clears the spinner and waits for the thread."""
+        if self.running:
+            self.running = False
+            self._queue.put(None)
+            self._thread.join()
+
+    def _format(self, status):
+        if not status:
+            return self.message
+        devices = ", ".join(mode if not retries else f"{mode} (retry {retries})"
+                            for mode, retries in status)
+        return f"{self.message} {Colors.GREEN}[{devices}]{Colors.ENDC}"
+
+    def _run(self):
+        shown = ()
+        while True:
+            items = []
             try:
-                dev.detach_kernel_driver(0)
-            except usb.core.USBError:
+                items.append(self._queue.get(timeout=self.frame_interval))
+                while True:
+                    items.append(self._queue.get_nowait())
+            except queue.Empty:
                 pass
+            done = None in items
+            lines = [item for item in items if item is not None]
+            status = self.status
+            if lines or done or status != shown:
+                self.spinner.stop()
+            for level, text in lines:
+                logger.log(level, text)
+            if lines:
+                # Keep the next frame from landing before the lines are out
+                toolkit_logging.flush()
+            if done:
+                return
+            if status != shown:
+                self.spinner.message = self._format(status)
+                shown = status
+            if self.spinner.running:
+                self.spinner.update()
+            else:
+                self.spinner.start()
+
+# pyusb, imported by load_usb() on first use: modules that import this one
+# (pacman_manager, batch_jobs) don't load libusb until they poll the bus
+usb = None
+
+def load_usb():
+    """Imports usb.core and usb.util on first use and returns the usb package."""
+    global usb
+    if usb is None:
+        import usb.core
+        import usb.util
+    return usb
+
+# Global spinner instance (main()'s Renderer, which log() writes through)
+spinner = None
 
-        # Claim interface
-        usb.util.claim_interface(dev, 0)
-
-        # Find endpoints
-        cfg = dev.get_active_configuration()
-        intf = cfg[(0,0)]
+def log(msg, color=None):
+    if color:
+        text = f"{color}[PACMAN-INTERCEPTOR] {msg}{Colors.ENDC}"
+    else:
+        text = f"[PACMAN-INTERCEPTOR] {msg}"
 
-        ep_out = usb.util.find_descriptor(intf, custom_match=lambda e: usb.util.endpoint_direction(e.bEndpointAddress) == usb.util.ENDPOINT_OUT)
-        ep_in = usb.util.find_descriptor(intf, custom_match=lambda e: usb.util.endpoint_direction(e.bEndpointAddress) == usb.util.ENDPOINT_IN)
+    if spinner and (spinner.running or spinner.held):
+        # The renderer thread writes it between spinner frames (or after the banner)
+        spinner.log(logging.INFO, text)
+    else:
+        logger.info(text)
 
-        if ep_out and ep_in:
-            # Send 'getvar:all' to freeze bootloader
-            log("Sending 'getvar:all' to freeze bootloader...")
-            ep_out.write(b'getvar:all')
+# Shared across every rescue run by this process, see get_image_cache()
+_image_cache = None
+# Batch jobs run rescues concurrently
+_image_cache_lock = threading.Lock()
 
-            # Attempt to read response to confirm command receipt
+def get_image_cache():
+    """
+    Returns the process-wide image cache, so archive images are loaded into
+    shared memory once no matter how many devices are rescued.
+    """
+    global _image_cache
+    with _image_cache_lock:
+        if _image_cache is None:
+            # Imported here: it pulls in zipfile, which polling never needs
             try:
-                ep_in.read(64, timeout=100)
-            except usb.core.USBError as e:
-                logger.debug(f"USB read timeout or error (expected): {e}")
-                pass
+                from . import image_cache
+            except ImportError:
+                import image_cache
+            _image_cache = image_cache.FirmwareImageCache(FIRMWARE_DIR)
+        else:
+            _image_cache.refresh()
+        return _image_cache
 
-            # Release resources so flash_rescue.sh (fastboot tool) can take over
-            usb.util.dispose_resources(dev)
+def lease_archive_images(names):
+    """Leases the images in `names` that only exist inside a firmware archive."""
+    cache = get_image_cache()
+    leases = []
+    try:
+        for name in cache.archive_only(names):
+            leases.append(cache.acquire(name))
+    except Exception:
+        for lease in leases:
+            lease.release()
+        raise
+    return leases
+
+def rescue_deadline(mode, paths):
+    """Overall limit for flash_rescue.sh: each image in `paths` is written to both slots."""
+    throughput = process_watchdog.FASTBOOT_THROUGHPUT if mode == "fastboot" else process_watchdog.MTK_THROUGHPUT
+    total = 0.0
+    for path in paths:
+        size = os.path.getsize(path) if os.path.exists(path) else 0
+        total += 2 * process_watchdog.step_deadline(size, throughput)
+    return total
+
+def run_rescue(mode, serial=None):
+    """
+    Hands off to flash_rescue.sh and returns its exit code. Images that
+    only exist inside a firmware archive are served from the shared image
+    cache and passed by path, never extracted. With `serial`, the script's
+    fastboot calls only talk to that device (ANDROID_SERIAL). The script is
+    killed if it stalls or overruns rescue_deadline(); the exit code is then
+    negative (the signal).
+    """
+    os.chmod(RESCUE_SCRIPT, 0o755)
+    images = RESCUE_IMAGES[mode]
+    leases = lease_archive_images(list(images))
+    try:
+        env = None
+        paths = {name: os.path.join(FIRMWARE_DIR, name) for name in images}
+        if leases or serial:
+            env = dict(os.environ)
+            if serial:
+                env["ANDROID_SERIAL"] = serial
+            for lease in leases:
+                env[images[lease.name]] = lease.path
+                paths[lease.name] = lease.path
+                log(f"Streaming {lease.name} from archive (sha256 {lease.sha256[:16]}...)")
+        allowance = process_watchdog.FastbootSteps() if mode == "fastboot" else None
+        result = process_watchdog.run([RESCUE_SCRIPT, mode], "flash_rescue.sh", env=env,
+                                      deadline=rescue_deadline(mode, paths.values()),
+                                      stall_timeout=STALL_TIMEOUT, allowance=allowance)
+    finally:
+        for lease in leases:
+            lease.release()
+    if result.status in ("stalled", "timeout"):
+        log(result.describe(), Colors.FAIL)
+    return result.returncode
+
+def freeze_fastboot(dev):
+    """
+    Sends 'getvar:all' so the bootloader stays in fastboot instead of
+    rebooting, then releases the device for the fastboot tool.
+    """
+    load_usb()
+    # Detach kernel driver to ensure we can claim it
+    if dev.is_kernel_driver_active(0):
+        try:
+            dev.detach_kernel_driver(0)
+        except usb.core.USBError:
+            pass
 
-            log("Device frozen. Invoking Flash Rescue (Fastboot Mode)...", Colors.GREEN)
-            if spinner:
-                spinner.stop()
+    # Claim interface
+    usb.util.claim_interface(dev, 0)
 
-            # Ensure executable
-            os.chmod(RESCUE_SCRIPT, 0o755)
-            subprocess.call([RESCUE_SCRIPT, "fastboot"])
-            sys.exit(0)
-        else:
-            raise Exception("Required endpoints (IN/OUT) not found")
+    # Find endpoints
+    cfg = dev.get_active_configuration()
+    intf = cfg[(0,0)]
+
+    ep_out = usb.util.find_descriptor(intf, custom_match=lambda e: usb.util.endpoint_direction(e.bEndpointAddress) == usb.util.ENDPOINT_OUT)
+    ep_in = usb.util.find_descriptor(intf, custom_match=lambda e: usb.util.endpoint_direction(e.bEndpointAddress) == usb.util.ENDPOINT_IN)
+
+    if not (ep_out and ep_in):
+        raise Exception("Required endpoints (IN/OUT) not found")
 
-    except Exception as e:
-        log(f"Fastboot Catch Error: {e}", Colors.FAIL)
+    # Send 'getvar:all' to freeze bootloader
+    log("Sending 'getvar:all' to freeze bootloader...")
+    ep_out.write(b'getvar:all')
 
-def catch_mtk(dev):
-    log(f"MediaTek Device Detected: {hex(dev.idVendor)}:{hex(dev.idProduct)}", Colors.GREEN)
-    log("Attempting to trigger mtkclient payload...", Colors.CYAN)
+    # Attempt to read response to confirm command receipt
+    try:
+        ep_in.read(64, timeout=100)
+    except usb.core.USBError as e:
+        logger.debug(f"USB read timeout or error (expected): {e}")
+        pass
+
+    # Release resources so flash_rescue.sh (fastboot tool) can take over
+    usb.util.dispose_resources(dev)
 
-    # We construct the command to run mtkclient
+def mtk_payload_command(preloader_path):
+    """The mtkclient command line that sends the payload with `preloader_path`."""
     # Prefer local mtkclient if present
     # Check for mtk.py (source) or mtk (executable/link)
     python_cmd = "python3"
@@ -158,50 +348,81 @@ def catch_mtk(dev):
     if os.path.exists(venv_python):
         python_cmd = venv_python
 
-    preloader_path = os.path.join(TOOLKIT_DIR, "firmware", "preloader.img")
-    if not os.path.exists(preloader_path):
-        log(f"Preloader image not found at {preloader_path}", Colors.FAIL)
-        # We can't proceed without a preloader for the exploit
-        return
-
     if os.path.exists(os.path.join(MTK_PATH, "mtk.py")):
-        cmd = [python_cmd, os.path.join(MTK_PATH, "mtk.py"), "payload", "--preloader", preloader_path]
-    elif os.path.exists(os.path.join(MTK_PATH, "mtk")):
-        cmd = [python_cmd, os.path.join(MTK_PATH, "mtk"), "payload", "--preloader", preloader_path]
-    else:
-        # Fallback to assuming it's in PATH or installed as module
-        cmd = ["mtk", "payload", "--preloader", preloader_path]
-
-    try:
-        # We use call to wait for it. mtk payload should handle the handshake.
-        ret = subprocess.call(cmd)
-        if ret == 0:
-            log("Payload successful. Invoking Flash Rescue (MTK Mode)...", Colors.GREEN)
-            if spinner:
-                spinner.stop()
-            os.chmod(RESCUE_SCRIPT, 0o755)
-            subprocess.call([RESCUE_SCRIPT, "mtk"])
-            sys.exit(0)
-        else:
-            log("mtkclient payload failed.", Colors.FAIL)
-    except Exception as e:
-        log(f"MTK Launch Error: {e}", Colors.FAIL)
-
-def handle_catch_error(e, dev_addr, failed_devices, retry_counts, device_type="device"):
+        return [python_cmd, os.path.join(MTK_PATH, "mtk.py"), "payload", "--preloader", preloader_path]
+    if os.path.exists(os.path.join(MTK_PATH, "mtk")):
+        return [python_cmd, os.path.join(MTK_PATH, "mtk"), "payload", "--preloader", preloader_path]
+    # Fallback to assuming it's in PATH or installed as module
+    return ["mtk", "payload", "--preloader", preloader_path]
+
+def send_mtk_payload(preloader_path):
+    """Runs the mtkclient payload under the watchdog. Returns a process_watchdog.StepResult."""
+    result = process_watchdog.run(mtk_payload_command(preloader_path), "mtkclient payload",
+                                  deadline=MTK_PAYLOAD_DEADLINE, stall_timeout=STALL_TIMEOUT)
+    if result.status in ("stalled", "timeout"):
+        log(result.describe(), Colors.FAIL)
+    return result
+
+def catch_device(dev, mode, before_payload=None):
     """
-    Centralized error handling for catch attempts.
-    Updates failure tracking and logs the error.
+    Freezes a fastboot device or sends the mtkclient payload to a MediaTek
+    one (`mode` as returned by device_mode()); raises if that fails.
+    `before_payload` is called right before mtkclient starts.
     """
-    # Track failure
-    current_count = failed_devices.get(dev_addr, (0, 0))[1]
-    new_count = current_count + 1
-    backoff = min(INITIAL_BACKOFF * (2 ** new_count), MAX_BACKOFF)
-    failed_devices[dev_addr] = (
-        time.time() + backoff,
-        new_count
-    )
-    retry_counts[dev_addr] = retry_counts.get(dev_addr, 0) + 1
-    log(f"Failed to catch {device_type} (attempt {retry_counts[dev_addr]}): {e}", Colors.WARNING)
+    if mode == "fastboot":
+        freeze_fastboot(dev)
+        return
+    preloader_path = os.path.join(FIRMWARE_DIR, "preloader.img")
+    leases = []
+    if not os.path.exists(preloader_path):
+        leases = lease_archive_images(["preloader.img"])
+        if not leases:
+            # We can't proceed without a preloader for the exploit
+            raise CatchError(f"Preloader image not found at {preloader_path}")
+        preloader_path = leases[0].path
+    if before_payload:
+        before_payload()
+    try:
+        # mtk payload should handle the handshake; the watchdog ends it if it hangs
+        result = send_mtk_payload(preloader_path)
+    finally:
+        for lease in leases:
+            lease.release()
+    if not result.ok:
+        raise CatchError(result.describe())
+
+def device_mode(vid, pid):
+    """Classifies a USB ID as "fastboot", "brom", "preloader" (or "mtk"), or None."""
+    if vid in {VID_GOOGLE, VID_NOTHING} and pid in FASTBOOT_PIDS:
+        return "fastboot"
+    if vid == VID_MEDIATEK and pid in MTK_PIDS:
+        return MTK_MODES.get(pid, "mtk")
+    return None
+
+def target_devices(devs):
+    """(dev, mode) for every device in `devs` the interceptor would catch."""
+    found = []
+    for dev in devs:
+        # Optimization: Skip irrelevant devices early to save CPU
+        if dev.idVendor not in TARGET_VIDS:
+            continue
+        # Filter by VID and PID
+        mode = device_mode(dev.idVendor, dev.idProduct)
+        if mode is not None:
+            found.append((dev, mode))
+    return found
+
+def build_retry_tracker(overrides=None):
+    """RetryTracker with RETRY_POLICIES, optionally overridden per profile."""
+    names = dict(RETRY_POLICIES)
+    names.update(overrides or {})
+    policies = {}
+    for profile, name in names.items():
+        if name == "exponential":
+            policies[profile] = retry_policy.make_policy(name, initial=INITIAL_BACKOFF, maximum=MAX_BACKOFF)
+        else:
+            policies[profile] = retry_policy.make_policy(name)
+    return retry_policy.RetryTracker(policies)
 
 def print_instructions():
     print("\n" + Colors.HEADER + "="*60 + Colors.ENDC)
@@ -213,12 +434,16 @@ def print_instructions():
     print(f"3. {Colors.BOLD}Connect:{Colors.ENDC}        Plug in USB cable while holding all three buttons")
     print("\n" + Colors.HEADER + "="*60 + Colors.ENDC + "\n")
 
+def firmware_archive_has(name):
+    """True if an archive placed in the firmware directory contains the image."""
+    return bool(get_image_cache().archive_only([name]))
+
 def check_prerequisites():
     if not os.path.exists(RESCUE_SCRIPT):
         logger.error(f"Rescue script not found: {RESCUE_SCRIPT}")
         sys.exit(1)
 
-    firmware_dir = os.path.join(TOOLKIT_DIR, "firmware")
+    firmware_dir = FIRMWARE_DIR
     if not os.path.isdir(firmware_dir):
         logger.error(f"{Colors.FAIL}Firmware directory not found: {firmware_dir}{Colors.ENDC}")
         print(f"\n{Colors.WARNING}Please create the firmware directory and place your images there:{Colors.ENDC}")
@@ -226,101 +451,470 @@ def check_prerequisites():
         sys.exit(1)
 
     # Check for minimal files (boot.img is critical for both modes)
-    if not os.path.exists(os.path.join(firmware_dir, "boot.img")):
+    if not os.path.exists(os.path.join(firmware_dir, "boot.img")) and not firmware_archive_has("boot.img"):
         logger.error(f"{Colors.FAIL}boot.img not found in firmware directory!{Colors.ENDC}")
         print(f"{Colors.WARNING}Please place official firmware images in pacman_toolkit/firmware/{Colors.ENDC}")
         sys.exit(1)
 
-def main():
-    global spinner
+def prerequisite_problems():
+    """What check_prerequisites() would exit on, as messages instead of an exit."""
+    if not os.path.exists(RESCUE_SCRIPT):
+        return [f"Rescue script not found: {RESCUE_SCRIPT}"]
+    if not os.path.isdir(FIRMWARE_DIR):
+        return [f"Firmware directory not found: {FIRMWARE_DIR}"]
+    if not os.path.exists(os.path.join(FIRMWARE_DIR, "boot.img")) and not firmware_archive_has("boot.img"):
+        return ["boot.img not found in firmware directory"]
+    return []
 
-    check_prerequisites()
-    print_instructions()
+class CatchError(Exception):
+    pass
 
-    log("Starting Pacman Interceptor...", Colors.BOLD)
-    log("  Target VIDs: 0x18d1 (Google), 0x2b4c (Nothing), 0x0e8d (MediaTek)")
-    
-    spinner = Spinner(f"{Colors.CYAN}🔎 Waiting for device connection... (Press Ctrl+C to stop){Colors.ENDC}")
-    spinner.start()
+class InterceptorEvent:
+    """
+    Something an Interceptor saw or did. `kind` is one of:
+
+        started    run() starts polling (detail: the real-time mode, if any)
+        appeared   a target device showed up on the bus
+        left       it disappeared again
+        attempt    a catch attempt starts (detail: attempt number)
+        failed     the attempt failed (detail: the error; retry_in: seconds)
+        caught     the bootloader is frozen / the MTK payload ran
+        rescued    flash_rescue.sh finished (detail: its exit code)
+        gave_up    MAX_RETRIES windows failed for the device
+    """
+
+    def __init__(self, kind, mode=None, key=None, detail=None, retry_in=None):
+        self.kind = kind
+        self.mode = mode
+        self.key = key
+        self.detail = detail
+        self.retry_in = retry_in
+        self.time = time.monotonic()
+
+    def describe(self):
+        text = f"{self.kind}: {self.mode}" if self.mode else self.kind
+        if self.detail is not None:
+            text += f" ({self.detail})"
+        if self.retry_in is not None:
+            text += f", retry in {self.retry_in:.2f}s"
+        return text
+
+    def __repr__(self):
+        return f"InterceptorEvent({self.kind!r}, {self.mode!r})"
+
+class InterceptorResult:
+    def __init__(self, status, mode=None, key=None, returncode=None, attempts=0):
+        # 'rescued', 'rescue_failed', 'caught' (rescue=False), 'gave_up', 'stopped' or 'timeout'
+        self.status = status
+        self.mode = mode
+        self.key = key
+        self.returncode = returncode
+        self.attempts = attempts
+
+    @property
+    def ok(self):
+        return self.status in ("rescued", "caught")
+
+    def __repr__(self):
+        return f"InterceptorResult({self.status!r}, {self.mode!r})"
+
+class Interceptor:
+    """
+    The detection and catch loop as an object, for callers that drive it
+    in-process (pacman_manager, batch orchestration) instead of starting
+    this script. All state lives on the instance, progress is reported as
+    InterceptorEvents to `on_event` or through events(), and run() returns
+    an InterceptorResult instead of exiting. Nothing is printed or logged
+    above debug level; the events carry everything worth showing.
+
+        interceptor = Interceptor(on_event=lambda e: print(e.describe()))
+        result = interceptor.run(timeout=600)
+        if not result.ok:
+            ...
+
+    `find` replaces usb.core.find(find_all=True), e.g. to enumerate through
+    an already initialized backend. With rescue=False the run ends as soon
+    as the device is caught, leaving flash_rescue.sh to the caller.
+    """
 
-    # Track failed catch attempts to implement cooldown
-    failed_devices = {}  # Maps device address to (failure_count, last_attempt_time)
-    retry_counts = {}  # Maps device address to retry count
+    def __init__(self, catch=True, rescue=True, record_path=None, retry_policies=None, rt=None,
+                 polling_interval=None, max_retries=None, on_event=None, find=None):
+        self.catch = catch
+        self.rescue = rescue
+        self.record_path = record_path
+        self.rt = rt
+        self.polling_interval = POLLING_INTERVAL if polling_interval is None else polling_interval
+        self.max_retries = MAX_RETRIES if max_retries is None else max_retries
+        self.on_event = on_event
+        self.find = find or (lambda: load_usb().core.find(find_all=True))
+        self.retry_policies = retry_policies
+        # Rebuilt by every run(), so retries don't carry over
+        self.tracker = build_retry_tracker(retry_policies)
+        self.scheduler = None
+        self.recorder = None
+        self.rt_mode = None
+        self.result = None
+        self._present = {}
+        self._stop = threading.Event()
+        self._error = None
 
-    while True:
+    def stop(self):
+        """Ends run() after the current poll; safe to call from any thread."""
+        self._stop.set()
+
+    def _emit(self, kind, mode=None, key=None, detail=None, retry_in=None):
+        if self.on_event:
+            self.on_event(InterceptorEvent(kind, mode, key, detail, retry_in))
+
+    def run(self, timeout=None):
+        """Polls until a device is caught, run() gives up, stop() is called or `timeout` seconds pass."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        self._stop.clear()
+        self._present = {}
+        self.tracker = build_retry_tracker(self.retry_policies)
+        self.scheduler = tick_scheduler.TickScheduler(self.polling_interval, clock=time.monotonic_ns,
+                                                      sleep=self._sleep)
+        self.recorder = None
+        if self.record_path:
+            self.recorder = usb_timeline.TimelineRecorder(self.record_path, vids=TARGET_VIDS)
+        self._apply_rt()
+        try:
+            self._emit("started", detail=self.rt_mode.describe() if self.rt_mode else None)
+            result = None
+            while result is None:
+                if self._stop.is_set():
+                    result = InterceptorResult("stopped")
+                elif deadline is not None and time.monotonic() >= deadline:
+                    result = InterceptorResult("timeout")
+                else:
+                    result = self.poll()
+                    if result is None:
+                        self.scheduler.wait()
+        finally:
+            self._restore_rt()
+            # Kept for its transition count
+            if self.recorder:
+                self.recorder.close()
+        self.result = result
+        return result
+
+    def _sleep(self, seconds):
+        # stop() ends the wait early
+        self._stop.wait(seconds)
+
+    def _restore_rt(self):
+        if self.rt_mode:
+            self.rt_mode.restore()
+            self.rt_mode = None
+
+    def _apply_rt(self):
+        if self.rt and not self.rt_mode:
+            self.rt_mode = self.rt.apply()
+
+    def poll(self):
+        """One scan of the bus and its catch attempts. Returns an InterceptorResult once the run is over."""
         try:
-            if spinner:
-                spinner.update()
-
-            # find_all=True is faster than creating new context repeatedly?
-            # Actually usb.core.find returns an iterator.
-            devs = usb.core.find(find_all=True)
-
-            for dev in devs:
-                # Optimization: Skip irrelevant devices early to save CPU
-                if dev.idVendor not in TARGET_VIDS:
-                    continue
-
-                # Create unique device identifier
-                dev_addr = (dev.idVendor, dev.idProduct, dev.bus, dev.address)
-                
-                # Check if we should apply cooldown for this device
-                if dev_addr in failed_devices:
-                    next_retry_time, failure_count = failed_devices[dev_addr]
-                    
-                    if time.time() < next_retry_time:
-                        # Still in cooldown period, skip this device
-                        continue
-                    
-                    # Check if we've exceeded max retries
-                    if dev_addr in retry_counts and retry_counts[dev_addr] >= MAX_RETRIES:
-                        log(f"Max retries ({MAX_RETRIES}) exceeded for device {dev_addr}", Colors.FAIL)
-                        log("Unable to catch device. Possible causes:", Colors.FAIL)
-                        log("  - Device bootloop window too short", Colors.FAIL)
-                        log("  - USB connection unstable", Colors.FAIL)
-                        log("  - Incorrect device permissions", Colors.FAIL)
-                        log("Please reconnect the device and try again.", Colors.FAIL)
-                        logger.error(f"Max retries ({MAX_RETRIES}) exceeded for device {dev_addr[0]:04x}:{dev_addr[1]:04x}:{dev_addr[2]}:{dev_addr[3]}")
-                        logger.error("Unable to catch device. Possible causes:")
-                        logger.error("  - Device bootloop window too short")
-                        logger.error("  - USB connection unstable")
-                        logger.error("  - Incorrect device permissions")
-                        logger.error("Please reconnect the device and try again.")
-                        sys.exit(1)
-                
-                # Filter by VID and PID
-                is_fastboot = (dev.idVendor in {VID_GOOGLE, VID_NOTHING} and dev.idProduct in FASTBOOT_PIDS)
-
-                if is_fastboot:
-                    try:
-                        catch_fastboot(dev)
-                    except Exception as e:
-                        handle_catch_error(e, dev_addr, failed_devices, retry_counts, "fastboot device")
-                elif dev.idVendor == VID_MEDIATEK and dev.idProduct in MTK_PIDS:
-                    try:
-                        catch_mtk(dev)
-                    except Exception as e:
-                        handle_catch_error(e, dev_addr, failed_devices, retry_counts, "MTK device")
-
-            # Minimal sleep to prevent CPU hogging, but keep it tight
-            time.sleep(POLLING_INTERVAL)
-
-        except usb.core.USBError as e:
+            devs = self.find()
+            if self.recorder:
+                devs = list(devs)
+                self.recorder.observe(devs)
+            candidates = [(dev, mode, retry_policy.slot_key(dev)) for dev, mode in target_devices(devs)]
+        except load_usb().core.USBError as e:
             logger.debug(f"USB enumeration error (transient): {e}")
-            continue
-        except KeyboardInterrupt:
-            if spinner:
-                spinner.stop()
-            log("Aborted.")
-            break
-        except Exception:
-            if spinner:
-                spinner.stop()
-            raise
+            return None
+
+        present = {key: mode for _, mode, key in candidates}
+        for key, mode in present.items():
+            if key not in self._present:
+                self._emit("appeared", mode, key)
+        for key, mode in self._present.items():
+            if key not in present:
+                self._emit("left", mode, key)
+        self._present = present
+        if not self.catch:
+            return None
+
+        now = time.monotonic()
+        self.tracker.observe([(key, mode) for _, mode, key in candidates], now)
+        for dev, mode, key in candidates:
+            if not self.tracker.ready(key, now):
+                continue
+            attempts = self.tracker.states[key].failures
+            if self.tracker.retries(key) >= self.max_retries:
+                logger.debug(f"Max retries ({self.max_retries}) exceeded for {mode} device {key}")
+                self._emit("gave_up", mode, key, attempts)
+                return InterceptorResult("gave_up", mode, key, attempts=attempts)
+
+            self.tracker.attempt(key)
+            self._emit("attempt", mode, key, attempts + 1)
+            try:
+                self._catch(dev, mode)
+            except Exception as e:
+                # A failed MTK attempt restored normal scheduling for mtkclient
+                self._apply_rt()
+                delay = self.tracker.failed(key, time.monotonic())
+                logger.debug(f"Failed to catch {mode} device (attempt {attempts + 1}, retry in {delay:.2f}s): {e}")
+                self._emit("failed", mode, key, str(e), delay)
+                continue
+            self._emit("caught", mode, key)
+            if not self.rescue:
+                return InterceptorResult("caught", mode, key, attempts=attempts + 1)
+
+            self._restore_rt()
+            returncode = run_rescue("fastboot" if mode == "fastboot" else "mtk")
+            self._emit("rescued", mode, key, returncode)
+            status = "rescued" if returncode == 0 else "rescue_failed"
+            return InterceptorResult(status, mode, key, returncode, attempts + 1)
+        return None
+
+    def _catch(self, dev, mode):
+        # mtkclient must not inherit real-time priority or the pinned CPU
+        catch_device(dev, mode, before_payload=self._restore_rt)
+
+    def events(self, timeout=None):
+        """
+        Runs the loop on a background thread and yields its InterceptorEvents.
+        The InterceptorResult is in `result` once the iterator is exhausted;
+        leaving the loop early stops the run.
+        """
+        events = queue.SimpleQueue()
+        previous = self.on_event
+
+        def forward(event):
+            if previous:
+                previous(event)
+            events.put(event)
+
+        def target():
+            try:
+                self.run(timeout)
+            except BaseException as e:
+                self._error = e
+            finally:
+                events.put(None)
+
+        self.on_event = forward
+        self.result = self._error = None
+        thread = threading.Thread(target=target, name="interceptor", daemon=True)
+        thread.start()
+        try:
+            while True:
+                event = events.get()
+                if event is None:
+                    break
+                yield event
+        finally:
+            self.stop()
+            thread.join()
+            self.on_event = previous
+        if self._error:
+            raise self._error
+
+class StartupChecks:
+    """
+    Runs check_prerequisites() and print_instructions() on a thread so the
+    poll loop can enumerate the bus from the moment main() starts: a phone
+    that is already bootlooping when the tool is launched is not missed
+    while the firmware directory is inspected and the banner is printed.
+    The renderer is started once the banner is out, so the two never mix;
+    log() lines from before then are queued for it. `on_failed` is called
+    if the checks fail.
+    """
+
+    def __init__(self, renderer=None, on_failed=None):
+        self.renderer = renderer
+        self.on_failed = on_failed
+        self.exit_code = None
+        self.started = False
+        self.done = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="interceptor-startup", daemon=True)
+        if renderer:
+            renderer.hold()
+
+    def start(self):
+        self.started = True
+        self._thread.start()
+        return self
+
+    def _run(self):
+        try:
+            check_prerequisites()
+            print_instructions()
+        except SystemExit as e:
+            self.exit_code = e.code
+        finally:
+            # Even after a failure, to write out what log() queued meanwhile
+            if self.renderer:
+                self.renderer.start()
+            self.done.set()
+        if self.exit_code is not None and self.on_failed:
+            self.on_failed()
+
+    def failed(self):
+        return self.done.is_set() and self.exit_code is not None
+
+    def wait(self):
+        """Waits for the checks; exits the way check_prerequisites() would if they failed."""
+        self.done.wait()
+        if self.exit_code is not None:
+            sys.exit(self.exit_code)
+
+class ConsoleView:
+    """
+    Shows an Interceptor's events on the terminal for main(): the devices on
+    the bus go to the renderer's status line, everything else through log().
+    A device is only handed to the rescue flow (or to mtkclient, which takes
+    over the terminal) once `startup` has passed.
+    """
+
+    def __init__(self, interceptor, renderer, startup=None):
+        self.interceptor = interceptor
+        self.renderer = renderer
+        self.startup = startup
+        self._present = {}
+
+    def show(self, event):
+        kind, mode = event.kind, event.mode
+        if kind == "started":
+            self._started(event)
+        elif kind in ("appeared", "left"):
+            if kind == "appeared":
+                self._present[event.key] = mode
+            else:
+                self._present.pop(event.key, None)
+            self._update()
+        elif kind == "attempt":
+            vid, pid = event.key[:2]
+            if mode == "fastboot":
+                log(f"Fastboot Device Detected: {hex(vid)}:{hex(pid)}", Colors.GREEN)
+            else:
+                log(f"MediaTek Device Detected: {hex(vid)}:{hex(pid)}", Colors.GREEN)
+                log("Attempting to trigger mtkclient payload...", Colors.CYAN)
+                self._finish_startup()
+                # mtkclient writes to the terminal from here on
+                self.renderer.stop()
+        elif kind == "failed":
+            device_type = "fastboot device" if mode == "fastboot" else "MTK device"
+            attempts = self.interceptor.tracker.states[event.key].failures
+            log(f"Failed to catch {device_type} (attempt {attempts}, retry in {event.retry_in:.2f}s): {event.detail}",
+                Colors.WARNING)
+            self._update()
+            if not self.startup or self.startup.done.is_set():
+                self.renderer.start()
+        elif kind == "caught":
+            if mode == "fastboot":
+                # The device is frozen now, so there is time to finish the checks
+                self._finish_startup()
+                log("Device frozen. Invoking Flash Rescue (Fastboot Mode)...", Colors.GREEN)
+                self.renderer.stop()
+            else:
+                log("Payload successful. Invoking Flash Rescue (MTK Mode)...", Colors.GREEN)
+        elif kind == "gave_up":
+            vid, pid, bus = event.key[:3]
+            log(f"Max retries ({self.interceptor.max_retries}) exceeded for device {vid:04x}:{pid:04x} on bus {bus}",
+                Colors.FAIL)
+            log("Unable to catch device. Possible causes:", Colors.FAIL)
+            log("  - Device bootloop window too short", Colors.FAIL)
+            log("  - USB connection unstable", Colors.FAIL)
+            log("  - Incorrect device permissions", Colors.FAIL)
+            log("Please reconnect the device and try again.", Colors.FAIL)
+
+    def _started(self, event):
+        rt_mode = self.interceptor.rt_mode
+        if rt_mode:
+            log(f"Real-time mode: {event.detail}", Colors.CYAN if rt_mode.active else Colors.WARNING)
+            for message in rt_mode.messages:
+                log(f"  {message}", Colors.WARNING)
+            if rt_mode.scheduler and self.interceptor.polling_interval <= 0:
+                log("  POLLING_INTERVAL is 0: a real-time busy loop will monopolize its CPU", Colors.WARNING)
+        # Polling starts right away; the checks and the banner run beside it
+        if self.startup:
+            self.startup.start()
+        else:
+            self.renderer.start()
+
+    def _update(self):
+        tracker = self.interceptor.tracker
+        self.renderer.update(tuple((mode, tracker.retries(key)) for key, mode in self._present.items()))
+
+    def _finish_startup(self):
+        # Before handing the terminal or the device to the rescue flow
+        if self.startup:
+            self.startup.wait()
+
+def main(record_path=None, catch=True, retry_policies=None, rt=None):
+    """
+    Polls for the device with an Interceptor and hands it to the rescue flow,
+    exiting with 0 once the rescue flash succeeded. With `record_path` every
+    enumeration change of a target device is written to a USB timeline
+    recording; with catch=False the bus is only observed. `retry_policies`
+    overrides RETRY_POLICIES per device profile. `rt` is an unapplied
+    realtime.RealtimeMode for the detection thread.
+    """
+    global spinner
+
+    load_usb()
+    spinner = Renderer(f"{Colors.CYAN}🔎 Waiting for device connection... (Press Ctrl+C to stop){Colors.ENDC}")
+    session = Interceptor(catch=catch, record_path=record_path, retry_policies=retry_policies, rt=rt)
+    startup = StartupChecks(spinner, on_failed=session.stop) if catch else None
+    session.on_event = ConsoleView(session, spinner, startup).show
+
+    log("Starting Pacman Interceptor...", Colors.BOLD)
+    log("  Target VIDs: 0x18d1 (Google), 0x2b4c (Nothing), 0x0e8d (MediaTek)")
+    if record_path:
+        log(f"Recording USB timeline to {record_path}" + ("" if catch else " (observe only)"), Colors.CYAN)
+
+    result = None
+    try:
+        result = session.run()
+    except KeyboardInterrupt:
+        spinner.stop()
+        log("Aborted.")
+    finally:
+        # The startup thread may still be about to start the renderer
+        if startup and startup.started:
+            startup.done.wait()
+        # Also covers sys.exit(): flush queued log lines before the summary
+        spinner.stop()
+        if session.scheduler:
+            log(f"Polling: {session.scheduler.summary()}")
+        for line in session.tracker.summary():
+            log(f"Retry policy {line}")
+        if session.recorder:
+            log(f"Recorded {session.recorder.transitions} USB transitions to {record_path}")
+
+    if startup and startup.failed():
+        sys.exit(startup.exit_code)
+    if result is not None and result.status != "stopped":
+        sys.exit(0 if result.ok else 1)
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Catch a bootlooping Nothing Phone 2(a) and run the rescue flash")
+    parser.add_argument("--record", metavar="FILE", help="Record USB enumeration transitions to FILE")
+    parser.add_argument("--no-catch", action="store_true", help="Only observe the bus (use with --record)")
+    parser.add_argument("--retry-policy", action="append", default=[], metavar="[PROFILE=]POLICY",
+                        help=f"Retry policy ({', '.join(retry_policy.POLICIES)}) for all or one of "
+                             f"{', '.join(RETRY_POLICIES)}; repeatable")
+    parser.add_argument("--realtime", nargs="?", const="fifo", choices=list(realtime.POLICIES),
+                        help="Run the detection loop at real-time priority (fifo or rr; needs root for priority)")
+    parser.add_argument("--cpu", type=int, help="Pin the detection loop to this CPU (with --realtime, defaults to the highest allowed CPU)")
+    parser.add_argument("--log-json", metavar="FILE",
+                        help=f"Also write the log as JSON lines to FILE (rotated; or set {toolkit_logging.JSONL_ENV})")
+    args = parser.parse_args()
+    if args.log_json:
+        toolkit_logging.configure(jsonl_path=args.log_json)
+    rt = None
+    if args.realtime or args.cpu is not None:
+        rt = realtime.RealtimeMode(cpu=args.cpu, policy=args.realtime)
+    overrides = {}
+    for spec in args.retry_policy:
+        profile, _, name = spec.rpartition("=")
+        if name not in retry_policy.POLICIES or (profile and profile not in RETRY_POLICIES):
+            parser.error(f"invalid --retry-policy {spec!r}")
+        for p in ([profile] if profile else RETRY_POLICIES):
+            overrides[p] = name
     try:
-        main()
+        main(record_path=args.record, catch=not args.no_catch, retry_policies=overrides, rt=rt)
     except Exception:
         # Ensure cursor is cleared on crash
         if spinner:
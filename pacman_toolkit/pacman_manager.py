@@ -2,17 +2,29 @@
 import os
 import sys
 import time
+import argparse
 import subprocess
 import logging
 
-# Configure logging
-logging.basicConfig(level=logging.INFO, format='[%(levelname)s] %(message)s')
+# The search, watchdog and batch modules are imported where they are used,
+# so opening the menu doesn't load them
+try:
+    from . import image_source
+    from . import toolkit_logging
+except ImportError:
+    import image_source
+    import toolkit_logging
+
+# Configure logging (written by a background thread, see toolkit_logging.py)
+toolkit_logging.configure(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 # Constants
 TOOLKIT_DIR = os.path.dirname(os.path.realpath(__file__))
 FIRMWARE_DIR = os.path.join(TOOLKIT_DIR, "firmware")
-PACMAN_INTERCEPTOR = os.path.join(TOOLKIT_DIR, "pacman_interceptor.py")
+# Persistent index for the home directory search, see file_index.py
+# (None: file_index.default_path())
+FILE_INDEX_PATH = None
 
 class Colors:
     _is_tty = sys.stdout.isatty()
@@ -33,12 +45,60 @@ def print_header():
     print(Colors.HEADER + "="*60 + Colors.ENDC)
     print("")
 
+def search_home(filenames):
+    """
+    Resolves all `filenames` in one query. The system locate database is
+    asked first (no disk walk at all); names it has no live hit for go to
+    the persistent file index for the home directory, which is brought up to
+    date first (only directories changed since the last search are listed
+    again). Names the index does not track are looked for in one parallel
+    pass that stops once each is found. Returns {name: path} for the names
+    found.
+    """
+    try:
+        from . import file_index
+        from . import file_search
+        from . import locate_db
+    except ImportError:
+        import file_index
+        import file_search
+        import locate_db
+
+    home = os.path.expanduser("~")
+    found = {}
+    hits, skipped = locate_db.locate(filenames)
+    for message in skipped:
+        logger.debug(f"Locate database skipped: {message}")
+    for name, paths in hits.items():
+        if paths:
+            # Prefer copies in the user's own tree
+            found[name] = min(paths, key=lambda p: not p.startswith(home + os.sep))
+
+    remaining = [name for name in filenames if name not in found]
+    indexed = [name for name in remaining if file_index.is_candidate(name)]
+    if indexed:
+        index = file_index.FileIndex(FILE_INDEX_PATH)
+        stats = index.refresh(home)
+        index.save()
+        logger.debug(f"File index: {stats['scanned']} directories scanned, {stats['reused']} unchanged")
+        for name, paths in index.lookup_all(indexed).items():
+            if paths:
+                found[name] = paths[0]
+    unindexed = [name for name in remaining if name not in indexed]
+    if unindexed:
+        result = file_search.search([home], file_search.Matcher(unindexed))
+        for name in unindexed:
+            if result.path(name):
+                found[name] = result.path(name)
+    return found
+
 def find_file_interactive(filename, description="firmware file"):
     """
     Finds a file interactively.
-    1. Checks common paths.
+    1. Checks common paths (loose files, then inside zip archives).
     2. Asks user to search hidden paths.
     3. Asks user for manual path.
+    Returns a path, an image_source.ImageRef for archive members, or None.
     """
     print(f"{Colors.CYAN}Searching for {description} ('{filename}')...{Colors.ENDC}")
 
@@ -57,24 +117,22 @@ def find_file_interactive(filename, description="firmware file"):
             print(f"{Colors.GREEN}Found at: {candidate}{Colors.ENDC}")
             return candidate
 
+    # Factory zips can be used as-is, without unpacking them first
+    ref = image_source.find_in_archives(filename, common_paths)
+    if ref:
+        print(f"{Colors.GREEN}Found in archive: {ref}{Colors.ENDC}")
+        return ref
+
     print(f"{Colors.WARNING}File '{filename}' not found in common locations.{Colors.ENDC}")
 
     # 2. Hidden / Uncommon Paths
     choice = input(f"Do you want to search in hidden/uncommon folders (this might take a while)? (y/n): ").strip().lower()
     if choice == 'y':
         print(f"{Colors.CYAN}Searching user home directory...{Colors.ENDC}")
-        home = os.path.expanduser("~")
-        # Walk through home directory
-        for root, dirs, files in os.walk(home):
-            # Optimizations: Skip heavy directories
-            if '.git' in dirs: dirs.remove('.git')
-            if 'node_modules' in dirs: dirs.remove('node_modules')
-            if '.cache' in dirs: dirs.remove('.cache') # Optional, but often huge
-
-            if filename in files:
-                candidate = os.path.join(root, filename)
-                print(f"{Colors.GREEN}Found at: {candidate}{Colors.ENDC}")
-                return candidate
+        candidate = search_home([filename]).get(filename)
+        if candidate:
+            print(f"{Colors.GREEN}Found at: {candidate}{Colors.ENDC}")
+            return candidate
         print(f"{Colors.WARNING}File not found in hidden search.{Colors.ENDC}")
 
     # 3. Manual Input
@@ -136,6 +194,20 @@ def unlock_bootloader():
 
     input("\nPress Enter to return to menu...")
 
+def flash_partition(partition, image_path):
+    """
+    fastboot flash under the watchdog (see process_watchdog.py): killed if
+    the transfer stalls or takes far longer than the image size allows.
+    Raises process_watchdog.StepFailed, a CalledProcessError.
+    """
+    try:
+        from . import process_watchdog
+    except ImportError:
+        import process_watchdog
+    process_watchdog.check(["fastboot", "flash", partition, image_path], f"fastboot flash {partition}",
+                           deadline=process_watchdog.step_deadline(os.path.getsize(image_path)),
+                           allowance=process_watchdog.FastbootSteps())
+
 def flash_root():
     print_header()
     print(f"{Colors.BOLD}=== Root Device (Flash Patched Boot) ==={Colors.ENDC}")
@@ -151,18 +223,24 @@ def flash_root():
         input("\nPress Enter to return to menu...")
         return
 
-    print(f"\n{Colors.CYAN}Please put your device in Fastboot Mode (Vol- + Power).{Colors.ENDC}")
-    input("Press Enter when device is connected in Fastboot mode...")
-
+    # Closes the archive find_file_interactive() may have opened
+    ref = image_source.as_ref(image_path)
+    staged = None
     try:
+        print(f"\n{Colors.CYAN}Please put your device in Fastboot Mode (Vol- + Power).{Colors.ENDC}")
+        input("Press Enter when device is connected in Fastboot mode...")
+
+        # Archive members are streamed into memory instead of being extracted
+        staged, image_path = image_source.stage_ref(ref)
+        for name in staged.in_memory():
+            print(f"Streaming {name} from archive (sha256 {staged.sha256[name][:16]}...)")
+
         # Check connection
         subprocess.check_call(["fastboot", "devices"])
 
-        print(f"Flashing {filename} to boot_a...")
-        subprocess.check_call(["fastboot", "flash", "boot_a", image_path])
-
-        print(f"Flashing {filename} to boot_b...")
-        subprocess.check_call(["fastboot", "flash", "boot_b", image_path])
+        for slot in ("boot_a", "boot_b"):
+            print(f"Flashing {filename} to {slot}...")
+            flash_partition(slot, image_path)
 
         print(f"{Colors.GREEN}Flashing complete! Rebooting...{Colors.ENDC}")
         subprocess.call(["fastboot", "reboot"])
@@ -171,16 +249,53 @@ def flash_root():
         print(f"{Colors.FAIL}Error flashing root image: {e}{Colors.ENDC}")
     except FileNotFoundError:
          print(f"{Colors.FAIL}Error: 'fastboot' command not found. Please install android-tools.{Colors.ENDC}")
+    finally:
+        if staged:
+            staged.close()
+        ref.close()
 
     input("\nPress Enter to return to menu...")
 
-def run_interceptor():
-    # We call the interceptor script using the same python interpreter
+def _interceptor():
+    # Imported on first use: it needs pyusb, the rest of the menu does not.
+    # Later runs reuse the module and its initialized libusb backend.
+    try:
+        from . import pacman_interceptor
+    except ImportError:
+        import pacman_interceptor
+    return pacman_interceptor
+
+def run_interceptor(timeout=None):
+    """
+    Runs the interceptor in this process and returns its InterceptorResult
+    (None if it could not start).
+    """
     print(f"{Colors.CYAN}Starting Pacman Interceptor...{Colors.ENDC}")
     try:
-        subprocess.call([sys.executable, PACMAN_INTERCEPTOR])
+        interceptor = _interceptor()
+    except ImportError as e:
+        print(f"{Colors.FAIL}Cannot load the interceptor ({e}). Run setup_and_verify.py first.{Colors.ENDC}")
+        return None
+
+    problems = interceptor.prerequisite_problems()
+    if problems:
+        for problem in problems:
+            print(f"{Colors.FAIL}{problem}{Colors.ENDC}")
+        print(f"{Colors.WARNING}Please place official firmware images in {FIRMWARE_DIR}/{Colors.ENDC}")
+        return None
+
+    interceptor.print_instructions()
+    print(f"{Colors.CYAN}Waiting for device connection... (Press Ctrl+C to stop){Colors.ENDC}")
+    session = interceptor.Interceptor(on_event=lambda event: print(f"  {event.describe()}"))
+    try:
+        result = session.run(timeout)
     except KeyboardInterrupt:
-        pass
+        print("Aborted.")
+        return None
+
+    color = Colors.GREEN if result.ok else Colors.FAIL
+    print(f"{color}Interceptor finished: {result.status}{Colors.ENDC}")
+    return result
 
 def main_menu():
     while True:
@@ -194,6 +309,7 @@ def main_menu():
 
         if choice == '1':
             run_interceptor()
+            input("\nPress Enter to return to menu...")
         elif choice == '2':
             unlock_bootloader()
         elif choice == '3':
@@ -205,9 +321,70 @@ def main_menu():
             print(f"{Colors.FAIL}Invalid option.{Colors.ENDC}")
             time.sleep(1)
 
-if __name__ == "__main__":
+def run_batch(jobs, workers):
+    """Runs batch jobs without prompts and prints a summary. Returns the exit code."""
+    try:
+        from . import batch_jobs
+    except ImportError:
+        import batch_jobs
+    print(f"{Colors.BOLD}Running {len(jobs)} job(s), up to {workers} at a time. "
+          f"Put each device in Fastboot Mode (Vol- + Power).{Colors.ENDC}")
+    results = batch_jobs.run_jobs(jobs, workers)
+    print(f"\n{'serial':<20}{'op':<8}{'result':<8}{'time':>8}  message")
+    for r in results:
+        color = Colors.GREEN if r.ok else Colors.FAIL
+        print(f"{r.job.serial:<20}{r.job.op:<8}{color}{'ok' if r.ok else 'FAILED':<8}{Colors.ENDC}"
+              f"{r.seconds:>7.0f}s  {r.message}")
+    return 0 if all(r.ok for r in results) else 1
+
+def main(argv=None):
     try:
+        from . import batch_jobs
+    except ImportError:
+        import batch_jobs
+    parser = argparse.ArgumentParser(
+        description="Nothing Phone 2(a) manager. Without a command, opens the interactive menu; "
+                    "the commands run unattended on devices identified by serial number.")
+    sub = parser.add_subparsers(dest="command")
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument("--timeout", type=float, default=batch_jobs.DEFAULT_TIMEOUT,
+                        help="Seconds to wait for each device (default: %(default)s)")
+    common.add_argument("--jobs", type=int, default=batch_jobs.DEFAULT_WORKERS,
+                        help="Devices handled at the same time (default: %(default)s)")
+
+    p_unlock = sub.add_parser("unlock", parents=[common], help="Unlock the bootloader (WIPES ALL DATA)")
+    p_unlock.add_argument("serials", nargs="+")
+    p_unlock.add_argument("--confirm-wipe", action="store_true", required=True,
+                          help="Required: acknowledges that unlocking wipes the devices")
+    p_root = sub.add_parser("root", parents=[common], help="Flash a rooted boot image to boot_a and boot_b")
+    p_root.add_argument("serials", nargs="+")
+    p_root.add_argument("--image", default="magisk_patched.img", help="Rooted boot image (default: %(default)s)")
+    p_rescue = sub.add_parser("rescue", parents=[common], help="Run the fastboot rescue flash")
+    p_rescue.add_argument("serials", nargs="+")
+    p_batch = sub.add_parser("batch", parents=[common], help="Run the jobs in a JSON job file")
+    p_batch.add_argument("jobfile")
+    args = parser.parse_args(argv)
+
+    if not args.command:
         main_menu()
+        return 0
+
+    try:
+        if args.command == "batch":
+            jobs = batch_jobs.load_jobs(args.jobfile, args.timeout)
+        else:
+            jobs = [batch_jobs.Job(serial, args.command, image=getattr(args, "image", None), timeout=args.timeout,
+                                   confirm_wipe=getattr(args, "confirm_wipe", False))
+                    for serial in args.serials]
+            batch_jobs.check_jobs(jobs)
+    except batch_jobs.JobError as e:
+        print(f"{Colors.FAIL}{e}{Colors.ENDC}")
+        return 2
+    return run_batch(jobs, args.jobs)
+
+if __name__ == "__main__":
+    try:
+        sys.exit(main())
     except KeyboardInterrupt:
         print("\nAborted.")
         sys.exit(0)
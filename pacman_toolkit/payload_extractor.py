@@ -0,0 +1,367 @@
+#!/usr/bin/env python3
+"""
+Streaming extractor for Android OTA payload.bin files.
+
+Only the manifest and the data blobs of the requested partitions are read;
+every other partition is skipped without being decompressed. Operations are
+applied in parallel on a thread pool using positional reads/writes, so each
+worker seeks straight to its blob and writes straight to its destination
+extents.
+
+Supported operations are the ones found in full OTAs: REPLACE, REPLACE_BZ,
+REPLACE_XZ, ZERO and DISCARD. Delta payloads are rejected.
+"""
+import os
+import sys
+import bz2
+import lzma
+import struct
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
+
+PAYLOAD_MAGIC = b'CrAU'
+DEFAULT_BLOCK_SIZE = 4096
+
+# InstallOperation.Type
+OP_REPLACE = 0
+OP_REPLACE_BZ = 1
+OP_ZERO = 6
+OP_DISCARD = 7
+OP_REPLACE_XZ = 8
+
+OP_NAMES = {
+    OP_REPLACE: 'REPLACE',
+    OP_REPLACE_BZ: 'REPLACE_BZ',
+    OP_ZERO: 'ZERO',
+    OP_DISCARD: 'DISCARD',
+    OP_REPLACE_XZ: 'REPLACE_XZ',
+}
+
+# Payload partition name -> firmware filename used by the toolkit
+RESCUE_PARTITIONS = {
+    'boot': 'boot.img',
+    'vbmeta': 'vbmeta.img',
+    'lk': 'lk.img',
+    'preloader_raw': 'preloader.img',
+    'preloader': 'preloader.img',
+}
+
+class PayloadError(Exception):
+    """Raised for malformed or unsupported payloads."""
+
+# --- Minimal protobuf wire-format decoding ---
+
+def _read_varint(buf, pos):
+    result = 0
+    shift = 0
+    while True:
+        if pos >= len(buf):
+            raise PayloadError("Truncated varint in manifest")
+        b = buf[pos]
+        pos += 1
+        result |= (b & 0x7f) << shift
+        if not b & 0x80:
+            return result, pos
+        shift += 7
+        if shift > 63:
+            raise PayloadError("Varint too long in manifest")
+
+def _iter_fields(buf):
+    """Yields (field_number, value) for each field in a protobuf message."""
+    pos = 0
+    end = len(buf)
+    while pos < end:
+        key, pos = _read_varint(buf, pos)
+        field, wire_type = key >> 3, key & 7
+        if wire_type == 0:
+            value, pos = _read_varint(buf, pos)
+        elif wire_type == 1:
+            value = buf[pos:pos + 8]
+            pos += 8
+        elif wire_type == 2:
+            length, pos = _read_varint(buf, pos)
+            value = buf[pos:pos + length]
+            pos += length
+        elif wire_type == 5:
+            value = buf[pos:pos + 4]
+            pos += 4
+        else:
+            raise PayloadError(f"Unsupported wire type {wire_type} in manifest")
+        if pos > end:
+            raise PayloadError("Truncated field in manifest")
+        yield field, value
+
+class Extent:
+    __slots__ = ('start_block', 'num_blocks')
+
+    def __init__(self, buf):
+        self.start_block = 0
+        self.num_blocks = 0
+        for field, value in _iter_fields(buf):
+            if field == 1:
+                self.start_block = value
+            elif field == 2:
+                self.num_blocks = value
+
+class InstallOperation:
+    __slots__ = ('type', 'data_offset', 'data_length', 'dst_extents', 'data_sha256')
+
+    def __init__(self, buf):
+        self.type = OP_REPLACE
+        self.data_offset = 0
+        self.data_length = 0
+        self.dst_extents = []
+        self.data_sha256 = None
+        for field, value in _iter_fields(buf):
+            if field == 1:
+                self.type = value
+            elif field == 2:
+                self.data_offset = value
+            elif field == 3:
+                self.data_length = value
+            elif field == 6:
+                self.dst_extents.append(Extent(value))
+            elif field == 8:
+                self.data_sha256 = bytes(value)
+
+class PartitionUpdate:
+    __slots__ = ('name', 'size', 'sha256', 'operations')
+
+    def __init__(self, name, buf):
+        self.name = name
+        self.size = None
+        self.sha256 = None
+        self.operations = []
+        for field, value in _iter_fields(buf):
+            if field == 7:
+                # new_partition_info: size (1), hash (2)
+                for info_field, info_value in _iter_fields(value):
+                    if info_field == 1:
+                        self.size = info_value
+                    elif info_field == 2:
+                        self.sha256 = bytes(info_value)
+            elif field == 8:
+                self.operations.append(InstallOperation(value))
+
+def _partition_name(buf):
+    for field, value in _iter_fields(buf):
+        if field == 1:
+            return bytes(value).decode('utf-8', 'replace')
+    return None
+
+class Payload:
+    """
+    An opened payload.bin. `base_offset` allows reading a payload that is
+    stored (uncompressed) inside a larger file such as an OTA zip.
+    """
+
+    def __init__(self, path, base_offset=0):
+        self.path = path
+        self.base_offset = base_offset
+        self.fd = os.open(path, os.O_RDONLY)
+        try:
+            self._read_header()
+        except Exception:
+            os.close(self.fd)
+            raise
+
+    def _pread(self, length, offset):
+        data = os.pread(self.fd, length, self.base_offset + offset)
+        if len(data) != length:
+            raise PayloadError(f"Unexpected end of payload at offset {offset}")
+        return data
+
+    def _read_header(self):
+        head = self._pread(24, 0)
+        if head[:4] != PAYLOAD_MAGIC:
+            raise PayloadError("Not an OTA payload (bad magic)")
+        version, manifest_size = struct.unpack('>QQ', head[4:20])
+        if version == 1:
+            header_size = 20
+            signature_size = 0
+        elif version == 2:
+            header_size = 24
+            signature_size = struct.unpack('>I', head[20:24])[0]
+        else:
+            raise PayloadError(f"Unsupported payload version {version}")
+
+        self.version = version
+        self.manifest = memoryview(self._pread(manifest_size, header_size))
+        self.data_offset = header_size + manifest_size + signature_size
+
+        self.block_size = DEFAULT_BLOCK_SIZE
+        self._partition_bufs = {}
+        for field, value in _iter_fields(self.manifest):
+            if field == 3:
+                self.block_size = value
+            elif field == 13:
+                # Decode only the name now, operations are decoded on demand
+                name = _partition_name(value)
+                if name:
+                    self._partition_bufs[name] = value
+
+    def partition_names(self):
+        return list(self._partition_bufs)
+
+    def partition(self, name):
+        buf = self._partition_bufs.get(name)
+        if buf is None:
+            return None
+        return PartitionUpdate(name, buf)
+
+    def read_blob(self, op):
+        return self._pread(op.data_length, self.data_offset + op.data_offset)
+
+    def close(self):
+        if self.fd is not None:
+            os.close(self.fd)
+            self.fd = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def _apply_operation(payload, op, out_fd, verify):
+    if op.type in (OP_ZERO, OP_DISCARD):
+        # Output files are created sparse and zero-filled
+        return 0
+
+    if op.type not in (OP_REPLACE, OP_REPLACE_BZ, OP_REPLACE_XZ):
+        raise PayloadError(
+            f"Unsupported operation type {op.type} (delta payloads are not supported)")
+
+    blob = payload.read_blob(op)
+    if verify and op.data_sha256 and hashlib.sha256(blob).digest() != op.data_sha256:
+        raise PayloadError(f"Data hash mismatch for blob at offset {op.data_offset}")
+
+    if op.type == OP_REPLACE_BZ:
+        data = bz2.decompress(blob)
+    elif op.type == OP_REPLACE_XZ:
+        data = lzma.decompress(blob)
+    else:
+        data = blob
+
+    view = memoryview(data)
+    pos = 0
+    for extent in op.dst_extents:
+        length = extent.num_blocks * payload.block_size
+        chunk = view[pos:pos + length]
+        if chunk:
+            os.pwrite(out_fd, chunk, extent.start_block * payload.block_size)
+        pos += length
+    return len(data)
+
+def _partition_size(payload, part):
+    if part.size is not None:
+        return part.size
+    end = 0
+    for op in part.operations:
+        for extent in op.dst_extents:
+            end = max(end, (extent.start_block + extent.num_blocks) * payload.block_size)
+    return end
+
+def _file_sha256(path):
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        while True:
+            chunk = f.read(1024 * 1024)
+            if not chunk:
+                break
+            h.update(chunk)
+    return h.digest()
+
+def extract_partitions(payload_path, wanted, output_dir, workers=None, verify=True, base_offset=0):
+    """
+    Extracts the partitions in `wanted` (dict of partition name -> output
+    filename) from a payload into `output_dir`.
+    Partitions missing from the payload are skipped. If several partition
+    names map to the same filename, the first one present wins.
+    Returns a dict of output filename -> written path.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    results = {}
+
+    with Payload(payload_path, base_offset) as payload:
+        jobs = []
+        try:
+            for name, filename in wanted.items():
+                if filename in results:
+                    continue
+                part = payload.partition(name)
+                if part is None:
+                    continue
+                final_path = os.path.join(output_dir, filename)
+                tmp_path = os.path.join(output_dir, f".{filename}.part")
+                out_fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+                jobs.append([part, out_fd, tmp_path, final_path])
+                os.ftruncate(out_fd, _partition_size(payload, part))
+                results[filename] = final_path
+
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                futures = [pool.submit(_apply_operation, payload, op, out_fd, verify)
+                           for part, out_fd, _, _ in jobs
+                           for op in part.operations]
+                for future in futures:
+                    future.result()
+
+            for job in jobs:
+                os.close(job[1])
+                job[1] = None
+            # Every partition is checked before any is moved into place
+            for part, _, tmp_path, _ in jobs:
+                if verify and part.sha256 and _file_sha256(tmp_path) != part.sha256:
+                    raise PayloadError(f"Partition hash mismatch for {part.name}")
+            for _, _, tmp_path, final_path in jobs:
+                os.replace(tmp_path, final_path)
+        finally:
+            for _, out_fd, tmp_path, _ in jobs:
+                if out_fd is not None:
+                    os.close(out_fd)
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+
+    return results
+
+def list_partitions(payload_path, base_offset=0):
+    with Payload(payload_path, base_offset) as payload:
+        return payload.partition_names()
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Extract rescue partitions from an OTA payload.bin")
+    parser.add_argument("payload", help="Path to payload.bin")
+    parser.add_argument("partitions", nargs="*",
+                        help="Partitions to extract (default: boot vbmeta lk preloader)")
+    parser.add_argument("-o", "--output", default=os.path.join(
+        os.path.dirname(os.path.realpath(__file__)), "firmware"), help="Output directory")
+    parser.add_argument("-j", "--jobs", type=int, default=None, help="Worker threads")
+    parser.add_argument("-l", "--list", action="store_true", help="List partitions and exit")
+    args = parser.parse_args(argv)
+
+    try:
+        if args.list:
+            for name in list_partitions(args.payload):
+                print(name)
+            return 0
+
+        if args.partitions:
+            wanted = {name: RESCUE_PARTITIONS.get(name, f"{name}.img") for name in args.partitions}
+        else:
+            wanted = RESCUE_PARTITIONS
+        written = extract_partitions(args.payload, wanted, args.output, workers=args.jobs)
+    except (PayloadError, OSError) as e:
+        print(f"[PAYLOAD] Error: {e}")
+        return 1
+
+    for filename, path in written.items():
+        print(f"[PAYLOAD] Extracted {filename} -> {path}")
+    if not written:
+        print("[PAYLOAD] None of the requested partitions are in this payload.")
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
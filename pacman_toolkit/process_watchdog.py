@@ -0,0 +1,214 @@
+#!/usr/bin/env python3
+"""
+Runs flashing subprocesses (fastboot, mtkclient, flash_rescue.sh) under a
+watchdog, so a stuck transfer cannot hold a bench forever.
+
+Output (stdout and stderr merged) is read as it arrives and passed through
+to the terminal, and every chunk counts as progress. A step is killed when
+it goes quiet for longer than its allowance, or when it runs past its
+overall deadline. Both come from the work in flight: step_deadline() turns
+an image size into seconds at an expected throughput, and FastbootSteps
+reads fastboot's "Sending 'boot_a' (65536 KB)" announcements so a large
+transfer may stay silent for as long as it should take.
+
+    result = run(["fastboot", "flash", "boot_a", path], "flash boot_a",
+                 deadline=step_deadline(os.path.getsize(path)),
+                 allowance=FastbootSteps())
+    if not result.ok:
+        print(result.describe())
+
+The child runs in its own process group, so killing flash_rescue.sh also
+kills the fastboot or mtkclient process it started and the device is
+released for the next attempt.
+"""
+import os
+import re
+import sys
+import time
+import codecs
+import signal
+import selectors
+import subprocess
+from collections import deque
+
+FASTBOOT_THROUGHPUT = 10e6  # bytes/s, USB 2.0 fastboot including the eMMC write
+MTK_THROUGHPUT = 2e6  # bytes/s, mtkclient writes through the download agent
+BASE_SECONDS = 30.0  # fixed part of every step (handshake, erase, reboot)
+SAFETY_FACTOR = 3.0
+STALL_TIMEOUT = 60.0  # seconds without output when no step announced its size
+KILL_GRACE = 5.0  # seconds between SIGTERM and SIGKILL
+TAIL_LINES = 20
+# How often an idle loop checks whether the child exited without closing
+# its output (a grandchild may still hold the pipe)
+EXIT_CHECK_INTERVAL = 0.25
+
+def step_deadline(size=0, throughput=FASTBOOT_THROUGHPUT, base=BASE_SECONDS):
+    """Seconds a step that moves `size` bytes may take."""
+    return base + SAFETY_FACTOR * size / throughput
+
+class FastbootSteps:
+    """
+    Allowance for fastboot output. "Sending 'x' (N KB)" and the
+    "Writing 'x'" that follows may be quiet for step_deadline(N KB); any
+    other line gets the default stall timeout.
+    """
+
+    SENDING = re.compile(r"Sending(?: sparse)? '([^']+)'(?: \d+/\d+)? \((\d+) KB\)")
+    WRITING = re.compile(r"Writing '([^']+)'")
+
+    def __init__(self, throughput=FASTBOOT_THROUGHPUT, base=BASE_SECONDS):
+        self.throughput = throughput
+        self.base = base
+        self.sizes = {}
+
+    def __call__(self, line):
+        match = self.SENDING.search(line)
+        if match:
+            self.sizes[match.group(1)] = int(match.group(2)) * 1024
+            return step_deadline(self.sizes[match.group(1)], self.throughput, self.base)
+        match = self.WRITING.search(line)
+        if match and match.group(1) in self.sizes:
+            return step_deadline(self.sizes[match.group(1)], self.throughput, self.base)
+        return None
+
+class StepResult:
+    def __init__(self, name, status, returncode, seconds, output_bytes=0, tail=(), idle=0.0, limit=None):
+        self.name = name
+        # 'ok', 'failed', 'stalled' or 'timeout'
+        self.status = status
+        self.returncode = returncode
+        self.seconds = seconds
+        self.output_bytes = output_bytes
+        self.tail = list(tail)
+        # Seconds without output when it was killed, and the limit it ran into
+        self.idle = idle
+        self.limit = limit
+
+    @property
+    def ok(self):
+        return self.status == "ok"
+
+    @property
+    def step(self):
+        """The last line of output: what the process was doing."""
+        return self.tail[-1] if self.tail else ""
+
+    def describe(self):
+        during = f" during {self.step!r}" if self.step else ""
+        if self.status == "stalled":
+            return (f"{self.name}: no output for {self.idle:.1f}s (allowed {self.limit:.1f}s){during}; "
+                    f"killed after {self.seconds:.1f}s")
+        if self.status == "timeout":
+            return f"{self.name}: still running at its {self.limit:.1f}s deadline{during}; killed"
+        if self.status == "failed":
+            return f"{self.name}: exited with {self.returncode} after {self.seconds:.1f}s{during}"
+        return f"{self.name}: done in {self.seconds:.1f}s"
+
+    def __repr__(self):
+        return f"StepResult({self.name!r}, {self.status!r})"
+
+class StepFailed(subprocess.CalledProcessError):
+    """Raised by check(); a CalledProcessError so existing handlers catch it."""
+
+    def __init__(self, cmd, result):
+        super().__init__(result.returncode, cmd, "\n".join(result.tail))
+        self.result = result
+
+    def __str__(self):
+        return self.result.describe()
+
+def _kill(proc):
+    try:
+        os.killpg(proc.pid, signal.SIGTERM)
+    except ProcessLookupError:
+        pass
+    try:
+        proc.wait(KILL_GRACE)
+    except subprocess.TimeoutExpired:
+        try:
+            os.killpg(proc.pid, signal.SIGKILL)
+        except ProcessLookupError:
+            pass
+        proc.wait()
+
+def run(cmd, name=None, deadline=None, stall_timeout=STALL_TIMEOUT, allowance=None,
+        env=None, echo=None, clock=time.monotonic):
+    """
+    Runs `cmd` until it exits, goes quiet for too long or passes `deadline`
+    seconds. `allowance(line)` may return a longer quiet period for the step a
+    line starts. Output is copied to `echo` (a binary stream, default
+    stdout; False for none). Returns a StepResult; raises FileNotFoundError
+    like subprocess.call() if the program does not exist.
+    """
+    name = name or os.path.basename(cmd[0])
+    if echo is None:
+        echo = getattr(sys.stdout, "buffer", None)
+    proc = subprocess.Popen(cmd, stdin=subprocess.DEVNULL, stdout=subprocess.PIPE,
+                            stderr=subprocess.STDOUT, env=env, start_new_session=True)
+    start = last_output = clock()
+    limit = stall_timeout
+    tail = deque(maxlen=TAIL_LINES)
+    partial = ""
+    # Keeps UTF-8 sequences split across reads intact
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+    output_bytes = 0
+    status = None
+    fd = proc.stdout.fileno()
+    selector = selectors.DefaultSelector()
+    selector.register(fd, selectors.EVENT_READ)
+    try:
+        while True:
+            now = clock()
+            if deadline is not None and now - start >= deadline:
+                status, limit = "timeout", deadline
+                break
+            if now - last_output >= limit:
+                status = "stalled"
+                break
+            wait = min(limit - (now - last_output), EXIT_CHECK_INTERVAL)
+            if deadline is not None:
+                wait = min(wait, deadline - (now - start))
+            if not selector.select(max(wait, 0)):
+                if proc.poll() is not None:
+                    break
+                continue
+            chunk = os.read(fd, 65536)
+            if not chunk:
+                break
+            last_output = clock()
+            output_bytes += len(chunk)
+            if echo:
+                echo.write(chunk)
+                echo.flush()
+            # Progress bars redraw with \r; each redraw counts as a line
+            lines = (partial + decoder.decode(chunk)).replace("\r", "\n").split("\n")
+            partial = lines.pop()
+            limit = stall_timeout
+            for line in lines + [partial]:
+                extended = allowance(line) if allowance else None
+                if extended is not None:
+                    limit = max(stall_timeout, extended)
+            tail.extend(line for line in lines if line.strip())
+        idle = clock() - last_output
+        if status:
+            _kill(proc)
+    except BaseException:
+        # Ctrl+C or a failing echo stream: don't leave the step running
+        _kill(proc)
+        raise
+    finally:
+        selector.close()
+        proc.stdout.close()
+    if partial.strip():
+        tail.append(partial)
+    returncode = proc.wait()
+    if status is None:
+        status = "ok" if returncode == 0 else "failed"
+    return StepResult(name, status, returncode, clock() - start, output_bytes, tail, idle, limit)
+
+def check(cmd, name=None, **kwargs):
+    """run(), raising StepFailed unless the step succeeded."""
+    result = run(cmd, name, **kwargs)
+    if not result.ok:
+        raise StepFailed(cmd, result)
+    return result
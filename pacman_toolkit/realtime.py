@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+Opt-in real-time mode for the detection loop.
+
+On a loaded machine the polling thread can be descheduled right when the
+BROM window opens. RealtimeMode pins the calling thread to one CPU with
+sched_setaffinity and, when permitted (root or CAP_SYS_NICE), moves it to
+SCHED_FIFO/SCHED_RR. Every step is optional: whatever the platform or
+permissions refuse is reported and skipped, and restore() puts the thread
+back the way it was.
+
+The loop must keep sleeping between polls: a real-time thread that never
+sleeps can starve its CPU (the kernel's RT throttling only caps it at 95%).
+"""
+import os
+
+POLICIES = {
+    "fifo": "SCHED_FIFO",
+    "rr": "SCHED_RR",
+}
+DEFAULT_PRIORITY = 10
+
+class RealtimeMode:
+    """policy=None only pins; cpu=None picks a CPU from the allowed set."""
+
+    def __init__(self, cpu=None, policy="fifo", priority=DEFAULT_PRIORITY):
+        if policy is not None and policy not in POLICIES:
+            raise ValueError(f"Unknown scheduling policy '{policy}' (choose from {', '.join(POLICIES)})")
+        self.cpu = cpu
+        self.policy = policy
+        self.priority = priority
+        self.pinned_cpu = None
+        self.scheduler = None
+        self.messages = []
+        self._saved_affinity = None
+        self._saved_scheduler = None
+
+    def _pick_cpu(self, allowed):
+        # The highest allowed CPU is the least likely to be busy with interrupts
+        return max(allowed)
+
+    def _pin(self):
+        if not hasattr(os, "sched_setaffinity"):
+            self.messages.append("CPU pinning not supported on this platform")
+            return
+        try:
+            allowed = os.sched_getaffinity(0)
+            cpu = self.cpu if self.cpu is not None else self._pick_cpu(allowed)
+            if cpu not in allowed:
+                self.messages.append(f"CPU {cpu} not available (allowed: {sorted(allowed)})")
+                return
+            os.sched_setaffinity(0, {cpu})
+            self._saved_affinity = allowed
+            self.pinned_cpu = cpu
+        except OSError as e:
+            self.messages.append(f"CPU pinning failed: {e}")
+
+    def _raise_priority(self):
+        if self.policy is None:
+            return
+        name = POLICIES[self.policy]
+        if not hasattr(os, "sched_setscheduler") or not hasattr(os, name):
+            self.messages.append(f"{name} not supported on this platform")
+            return
+        try:
+            policy = getattr(os, name)
+            priority = min(max(self.priority, os.sched_get_priority_min(policy)),
+                           os.sched_get_priority_max(policy))
+            saved = (os.sched_getscheduler(0), os.sched_getparam(0))
+            os.sched_setscheduler(0, policy, os.sched_param(priority))
+            self._saved_scheduler = saved
+            self.scheduler = f"{name} priority {priority}"
+        except PermissionError:
+            self.messages.append(f"{name} needs root or CAP_SYS_NICE; staying on the normal scheduler")
+        except OSError as e:
+            self.messages.append(f"{name} failed: {e}")
+
+    def apply(self):
+        """Pins and raises the calling thread as far as allowed. Returns self."""
+        self._pin()
+        self._raise_priority()
+        return self
+
+    def restore(self):
+        """Undoes apply() so child processes (flash tools) run normally."""
+        if self._saved_scheduler is not None:
+            policy, param = self._saved_scheduler
+            try:
+                os.sched_setscheduler(0, policy, param)
+            except OSError:
+                pass
+            self._saved_scheduler = None
+            self.scheduler = None
+        if self._saved_affinity is not None:
+            try:
+                os.sched_setaffinity(0, self._saved_affinity)
+            except OSError:
+                pass
+            self._saved_affinity = None
+            self.pinned_cpu = None
+
+    @property
+    def active(self):
+        return self.pinned_cpu is not None or self.scheduler is not None
+
+    def describe(self):
+        parts = []
+        if self.pinned_cpu is not None:
+            parts.append(f"pinned to CPU {self.pinned_cpu}")
+        if self.scheduler:
+            parts.append(self.scheduler)
+        return ", ".join(parts) if parts else "normal scheduling"
+
+    def __enter__(self):
+        return self.apply()
+
+    def __exit__(self, *exc):
+        self.restore()
@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+"""
+Retry policies for catch attempts.
+
+A bootloop window is tens of milliseconds long and comes back every few
+seconds, so how long to wait after a failed catch decides how many windows
+are wasted. Each policy turns the retry state of one device into a delay:
+
+    exponential  INITIAL_BACKOFF * 2**n, capped (the original behaviour)
+    burst        retry on the next polls, then a short cooldown
+    jitter       short randomized backoff
+    window       retry just before the device's next predicted appearance,
+                 using the reappearance period observed so far
+
+RetryTracker follows devices across polls (a "window" is one continuous
+appearance) and counts, per policy, how many windows were seen and how many
+were spent on catch attempts.
+"""
+import abc
+import random
+
+class RetryState:
+    """What a policy knows about one device."""
+
+    def __init__(self):
+        self.failures = 0
+        self.window_failures = 0
+        self.window_start = None
+        self.window_starts = []
+        self.windows_used = 0
+        self.next_retry = 0.0
+        self._attempted_this_window = False
+
+    @property
+    def period(self):
+        """Median time between the last appearances, or None before two windows."""
+        if len(self.window_starts) < 2:
+            return None
+        # Imported here: statistics (fractions, decimal) is slow to import
+        # and not needed until a device has come back at least once
+        import statistics
+        starts = self.window_starts[-9:]
+        return statistics.median(b - a for a, b in zip(starts, starts[1:]))
+
+class RetryPolicy(abc.ABC):
+    name = "base"
+
+    def __init__(self):
+        self.windows_seen = 0
+        self.windows_used = 0
+        self.attempts = 0
+        self.failures = 0
+
+    @abc.abstractmethod
+    def delay(self, state, now):
+        """Seconds to wait after a failed attempt on the device in `state`."""
+
+    def describe(self):
+        return self.name
+
+    def summary(self):
+        return (f"{self.describe()}: {self.attempts} attempts, {self.failures} failed, "
+                f"used {self.windows_used} of {self.windows_seen} windows")
+
+class ExponentialBackoff(RetryPolicy):
+    name = "exponential"
+
+    def __init__(self, initial=2.0, maximum=30.0):
+        super().__init__()
+        self.initial = initial
+        self.maximum = maximum
+
+    def delay(self, state, now):
+        return min(self.initial * (2 ** state.failures), self.maximum)
+
+class ImmediateBurst(RetryPolicy):
+    """Up to `burst` attempts per window on consecutive polls, then `cooldown`."""
+    name = "burst"
+
+    def __init__(self, burst=3, cooldown=0.25):
+        super().__init__()
+        self.burst = burst
+        self.cooldown = cooldown
+
+    def delay(self, state, now):
+        return 0.0 if state.window_failures < self.burst else self.cooldown
+
+class JitteredBackoff(RetryPolicy):
+    name = "jitter"
+
+    def __init__(self, base=0.02, maximum=0.25, rng=None):
+        super().__init__()
+        self.base = base
+        self.maximum = maximum
+        self.rng = rng or random.Random()
+
+    def delay(self, state, now):
+        return self.rng.uniform(0, min(self.base * (2 ** state.failures), self.maximum))
+
+class WindowSynchronized(RetryPolicy):
+    """
+    Makes up to `burst` attempts inside the current window, then sleeps until `lead`
+    seconds before the next predicted appearance. Until a period has been
+    observed it behaves like `fallback`.
+    """
+    name = "window"
+
+    def __init__(self, burst=2, lead=0.02, fallback=None):
+        super().__init__()
+        self.burst = burst
+        self.lead = lead
+        self.fallback = fallback or JitteredBackoff()
+
+    def delay(self, state, now):
+        period = state.period
+        if period is None or state.window_start is None:
+            return self.fallback.delay(state, now)
+        if state.window_failures < self.burst:
+            return 0.0
+        next_start = state.window_start + period
+        while next_start - self.lead <= now:
+            next_start += period
+        return next_start - self.lead - now
+
+POLICIES = {
+    "exponential": ExponentialBackoff,
+    "burst": ImmediateBurst,
+    "jitter": JitteredBackoff,
+    "window": WindowSynchronized,
+}
+
+def make_policy(name, **kwargs):
+    try:
+        return POLICIES[name](**kwargs)
+    except KeyError:
+        raise ValueError(f"Unknown retry policy '{name}' (choose from {', '.join(POLICIES)})")
+
+def slot_key(dev):
+    """
+    Identifies a device across re-enumerations: the address changes every
+    time the bootloader reappears, the port path does not.
+    """
+    ports = getattr(dev, "port_numbers", None) or ()
+    try:
+        ports = tuple(ports)
+    except TypeError:
+        ports = ()
+    return (dev.idVendor, dev.idProduct, dev.bus, ports)
+
+class RetryTracker:
+    """Retry state per device, with the policy chosen by the device's profile."""
+
+    def __init__(self, policies):
+        # profile (e.g. "fastboot", "brom") -> RetryPolicy
+        self.policies = dict(policies)
+        self.states = {}
+        self._profiles = {}
+        self._present = set()
+
+    def policy_for(self, key):
+        return self.policies[self._profiles[key]]
+
+    def observe(self, devices, now):
+        """devices: iterable of (key, profile) seen by this poll."""
+        seen = set()
+        for key, profile in devices:
+            seen.add(key)
+            self._profiles[key] = profile
+            if key in self._present:
+                continue
+            state = self.states.setdefault(key, RetryState())
+            state.window_start = now
+            state.window_starts.append(now)
+            state.window_failures = 0
+            state._attempted_this_window = False
+            self.policies[profile].windows_seen += 1
+        self._present = seen
+
+    def ready(self, key, now):
+        state = self.states.get(key)
+        return state is None or now >= state.next_retry
+
+    def retries(self, key):
+        """Windows in which catch attempts on this device failed."""
+        state = self.states.get(key)
+        return state.windows_used if state and state.failures else 0
+
+    def attempt(self, key):
+        state = self.states.setdefault(key, RetryState())
+        policy = self.policy_for(key)
+        policy.attempts += 1
+        if not state._attempted_this_window:
+            state._attempted_this_window = True
+            state.windows_used += 1
+            policy.windows_used += 1
+
+    def failed(self, key, now):
+        """Records a failed attempt; returns the delay the policy chose."""
+        state = self.states.setdefault(key, RetryState())
+        policy = self.policy_for(key)
+        state.failures += 1
+        state.window_failures += 1
+        policy.failures += 1
+        delay = policy.delay(state, now)
+        state.next_retry = now + delay
+        return delay
+
+    def summary(self):
+        return [f"{profile}: {policy.summary()}" for profile, policy in self.policies.items()
+                if policy.windows_seen or policy.attempts]
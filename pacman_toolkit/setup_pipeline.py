@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+"""
+Dependency-graph runner for setup_and_verify.
+
+Each Stage names the stages it runs `after` (ordering only) and the ones it
+`needs` (skipped unless they succeeded). Stages whose dependencies are done
+start at once, each in its own thread, so a slow clone or pip install no
+longer holds up the firmware search. Interactive stages (those that prompt)
+share one console lock and never overlap each other.
+
+    pipeline = Pipeline([
+        Stage("clone", clone),
+        Stage("requirements", install, needs=["clone"]),
+        Stage("firmware", setup_firmware, interactive=True),
+    ])
+    print("\\n".join(pipeline.describe()))
+    results = pipeline.run()
+
+A stage fails if its function returns False or raises.
+"""
+import time
+import queue
+import threading
+
+class Stage:
+    def __init__(self, name, fn, after=(), needs=(), interactive=False):
+        self.name = name
+        self.fn = fn
+        self.after = list(after)
+        self.needs = list(needs)
+        self.interactive = interactive
+
+    @property
+    def deps(self):
+        return list(dict.fromkeys(self.after + self.needs))
+
+class StageResult:
+    def __init__(self, name, status, seconds=0.0, detail=""):
+        self.name = name
+        # 'ok', 'failed' or 'skipped'
+        self.status = status
+        self.seconds = seconds
+        self.detail = detail
+
+    @property
+    def ok(self):
+        return self.status == "ok"
+
+    def __repr__(self):
+        return f"StageResult({self.name!r}, {self.status!r})"
+
+class Pipeline:
+    def __init__(self, stages, log=print):
+        self.stages = list(stages)
+        self.log = log
+        self.console = threading.Lock()
+        self._validate()
+
+    def _validate(self):
+        names = [stage.name for stage in self.stages]
+        if len(set(names)) != len(names):
+            raise ValueError("Duplicate stage names")
+        for stage in self.stages:
+            unknown = [d for d in stage.deps if d not in names]
+            if unknown:
+                raise ValueError(f"Stage {stage.name} depends on unknown stage(s): {', '.join(unknown)}")
+        # Kahn's algorithm: anything left over is on a cycle
+        remaining = {stage.name: set(stage.deps) for stage in self.stages}
+        while True:
+            free = [name for name, deps in remaining.items() if not deps]
+            if not free:
+                break
+            for name in free:
+                del remaining[name]
+            for deps in remaining.values():
+                deps.difference_update(free)
+        if remaining:
+            raise ValueError(f"Dependency cycle between: {', '.join(sorted(remaining))}")
+
+    def describe(self):
+        """One line per stage with what it waits for."""
+        width = max(len(stage.name) for stage in self.stages) + 2
+        lines = []
+        for stage in self.stages:
+            waits = []
+            if stage.needs:
+                waits.append(f"needs {', '.join(stage.needs)}")
+            after = [d for d in stage.after if d not in stage.needs]
+            if after:
+                waits.append(f"after {', '.join(after)}")
+            text = "; ".join(waits) or "starts immediately"
+            if stage.interactive:
+                text += " [interactive]"
+            lines.append(f"{stage.name:<{width}}{text}")
+        return lines
+
+    def _execute(self, stage, done):
+        start = time.monotonic()
+        try:
+            if stage.interactive:
+                with self.console:
+                    ok = stage.fn()
+            else:
+                ok = stage.fn()
+            status, detail = ("failed", "") if ok is False else ("ok", "")
+        except Exception as e:
+            status, detail = "failed", f"{type(e).__name__}: {e}"
+        done.put(StageResult(stage.name, status, time.monotonic() - start, detail))
+
+    def run(self, serial=False):
+        """
+        Runs every stage once its dependencies are done. serial=True runs
+        them one at a time in declaration order. Returns {name: StageResult}.
+        """
+        results = {}
+        done = queue.SimpleQueue()
+        pending = list(self.stages)
+        running = 0
+        while pending or running:
+            progressed = False
+            for stage in list(pending):
+                if serial and running:
+                    break
+                if not all(d in results for d in stage.deps):
+                    if serial:
+                        break
+                    continue
+                pending.remove(stage)
+                progressed = True
+                failed = [d for d in stage.needs if not results[d].ok]
+                if failed:
+                    results[stage.name] = StageResult(stage.name, "skipped", detail=f"needs {', '.join(failed)}")
+                    self.log(f"[setup] {stage.name}: skipped ({', '.join(failed)} did not succeed)")
+                    continue
+                running += 1
+                threading.Thread(target=self._execute, args=(stage, done),
+                                 name=f"setup-{stage.name}", daemon=True).start()
+            if progressed and not (serial and running):
+                # A skip may have unblocked more stages
+                continue
+            if not running:
+                break
+            result = done.get()
+            running -= 1
+            results[result.name] = result
+            if not result.ok:
+                self.log(f"[setup] {result.name}: failed{f' ({result.detail})' if result.detail else ''}")
+        return {stage.name: results[stage.name] for stage in self.stages}
+
+def summary(results, elapsed):
+    """Summary lines: each stage's status and time, then wall time vs. summed stage time."""
+    lines = [f"  {r.name:<24}{r.status:<9}{r.seconds:>7.1f}s" for r in results.values()]
+    total = sum(r.seconds for r in results.values())
+    lines.append(f"  Finished in {elapsed:.1f}s ({total:.1f}s of stage time)")
+    return lines
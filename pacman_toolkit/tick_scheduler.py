@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+Deadline-based tick scheduler.
+
+`time.sleep(interval)` after a variable amount of work makes the real
+period interval + work time, and it drifts. TickScheduler keeps absolute
+deadlines on `time.monotonic_ns()` (immune to NTP/wall-clock jumps) and
+sleeps only for what is left of the current period, so the loop polls at
+the configured rate. Each wake-up's lateness against its deadline goes into
+a log-bucketed histogram, which gives p50/p99 jitter cheaply.
+
+    ticks = TickScheduler(0.05)
+    while True:
+        poll()
+        ticks.wait()
+"""
+import math
+import time
+
+# Histogram resolution: buckets per doubling of lateness (~9% wide)
+BUCKETS_PER_OCTAVE = 8
+
+class LatencyHistogram:
+    """Log-bucketed histogram of non-negative durations in nanoseconds."""
+
+    def __init__(self):
+        self.buckets = {}
+        self.count = 0
+        self.total = 0
+        self.max = 0
+
+    def add(self, ns):
+        ns = max(0, int(ns))
+        # Bucket 0 holds everything under 1 µs
+        index = 0 if ns < 1000 else 1 + int(math.log2(ns / 1000) * BUCKETS_PER_OCTAVE)
+        self.buckets[index] = self.buckets.get(index, 0) + 1
+        self.count += 1
+        self.total += ns
+        self.max = max(self.max, ns)
+
+    @staticmethod
+    def _upper_edge(index):
+        if index == 0:
+            return 1000
+        return int(1000 * 2 ** (index / BUCKETS_PER_OCTAVE))
+
+    def percentile(self, p):
+        """Upper edge of the bucket holding the p-th percentile, in ns."""
+        if not self.count:
+            return None
+        rank = math.ceil(self.count * p / 100.0)
+        seen = 0
+        for index in sorted(self.buckets):
+            seen += self.buckets[index]
+            if seen >= rank:
+                return min(self._upper_edge(index), self.max)
+        return self.max
+
+    @property
+    def mean(self):
+        return self.total / self.count if self.count else None
+
+class TickScheduler:
+    def __init__(self, interval, clock=time.monotonic_ns, sleep=time.sleep):
+        self.interval_ns = int(interval * 1e9)
+        self.clock = clock
+        self.sleep = sleep
+        self.lateness = LatencyHistogram()
+        self.ticks = 0
+        self.overruns = 0
+        self._start = clock()
+        self._deadline = self._start + self.interval_ns
+
+    def wait(self):
+        """Sleeps until the next deadline; returns how late it woke, in ns."""
+        remaining = self._deadline - self.clock()
+        # Always hand control to sleep(), even when already late
+        self.sleep(max(0, remaining) / 1e9)
+        now = self.clock()
+        late = now - self._deadline
+        self.lateness.add(late)
+        self.ticks += 1
+        self._deadline += self.interval_ns
+        if not self.interval_ns:
+            # Busy polling: every tick is due immediately
+            self._deadline = now
+        elif self._deadline <= now:
+            # Work overran whole periods: skip them rather than bursting to catch up
+            missed = (now - self._deadline) // self.interval_ns + 1
+            self.overruns += missed
+            self._deadline += missed * self.interval_ns
+        return late
+
+    @property
+    def mean_period(self):
+        """Average time per tick since the scheduler started, in seconds."""
+        if not self.ticks:
+            return None
+        return (self.clock() - self._start) / self.ticks / 1e9
+
+    def stats(self):
+        def ms(ns):
+            return None if ns is None else round(ns / 1e6, 3)
+        return {
+            "interval_ms": ms(self.interval_ns),
+            "ticks": self.ticks,
+            "overruns": self.overruns,
+            "mean_period_ms": None if self.mean_period is None else round(self.mean_period * 1000, 3),
+            "late_p50_ms": ms(self.lateness.percentile(50)),
+            "late_p99_ms": ms(self.lateness.percentile(99)),
+            "late_max_ms": ms(self.lateness.max if self.lateness.count else None),
+        }
+
+    def summary(self):
+        s = self.stats()
+        if not s["ticks"]:
+            return f"{s['interval_ms']} ms ticks: none completed"
+        return (f"{s['ticks']} ticks at {s['interval_ms']} ms (mean period {s['mean_period_ms']} ms), "
+                f"lateness p50 {s['late_p50_ms']} ms, p99 {s['late_p99_ms']} ms, "
+                f"max {s['late_max_ms']} ms, {s['overruns']} overruns")
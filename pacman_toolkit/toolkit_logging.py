@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+Asynchronous logging for the toolkit scripts.
+
+configure() replaces `logging.basicConfig`: the root logger gets a
+QueueHandler, and a QueueListener thread does the formatting and the writes.
+A log call on the detection path costs a queue put, however slow stderr or
+the disk is.
+
+Structured output: with `PACMAN_LOG_JSONL=FILE` in the environment (or
+enable_jsonl(FILE)) every record is also appended to FILE as one JSON object
+per line, with ANSI colors stripped. The file rotates at JSONL_MAX_BYTES and
+keeps JSONL_BACKUPS old files.
+"""
+import os
+import re
+import json
+import queue
+import atexit
+import logging
+import threading
+import logging.handlers
+
+FORMAT = '[%(levelname)s] %(message)s'
+JSONL_ENV = "PACMAN_LOG_JSONL"
+JSONL_MAX_BYTES = 5 * 1024 * 1024
+JSONL_BACKUPS = 3
+
+_ANSI = re.compile(r'\x1b\[[0-9;]*m')
+
+class JsonLinesFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            "ts": round(record.created, 6),
+            "level": record.levelname,
+            "logger": record.name,
+            "thread": record.threadName,
+            # QueueHandler has already folded any traceback into the message
+            "msg": _ANSI.sub("", record.getMessage()),
+        }
+        return json.dumps(entry, ensure_ascii=False)
+
+class _FlushMarker:
+    def __init__(self):
+        self.event = threading.Event()
+
+class _Listener(logging.handlers.QueueListener):
+    def handle(self, record):
+        if isinstance(record, _FlushMarker):
+            record.event.set()
+            return
+        super().handle(record)
+
+_queue = None
+_listener = None
+_queue_handler = None
+
+def configure(level=logging.INFO, jsonl_path=None, stream=None):
+    """
+    Starts the background writer. Like basicConfig() this does nothing and
+    returns None if the root logger already has handlers; otherwise returns
+    the listener. Safe to call again (only adds `jsonl_path`).
+    """
+    global _queue, _listener, _queue_handler
+    if _listener is not None:
+        if jsonl_path:
+            enable_jsonl(jsonl_path)
+        return _listener
+    root = logging.getLogger()
+    if root.handlers:
+        return None
+
+    console = logging.StreamHandler(stream)
+    console.setFormatter(logging.Formatter(FORMAT))
+    _queue = queue.SimpleQueue()
+    _listener = _Listener(_queue, console, respect_handler_level=True)
+    _queue_handler = logging.handlers.QueueHandler(_queue)
+    root.addHandler(_queue_handler)
+    root.setLevel(level)
+    _listener.start()
+    atexit.register(shutdown)
+
+    jsonl_path = jsonl_path or os.environ.get(JSONL_ENV)
+    if jsonl_path:
+        enable_jsonl(jsonl_path)
+    return _listener
+
+def enable_jsonl(path, max_bytes=JSONL_MAX_BYTES, backups=JSONL_BACKUPS):
+    """Adds a rotating JSON-lines file to the running writer; returns its handler."""
+    if _listener is None:
+        raise RuntimeError("toolkit logging is not configured")
+    handler = logging.handlers.RotatingFileHandler(path, maxBytes=max_bytes, backupCount=backups, encoding="utf-8")
+    handler.setFormatter(JsonLinesFormatter())
+    # The listener reads its handlers from its own thread: swap while it is stopped
+    _listener.stop()
+    _listener.handlers = _listener.handlers + (handler,)
+    _listener.start()
+    return handler
+
+def flush(timeout=1.0):
+    """Blocks until records logged so far are written. Returns False on timeout."""
+    if _listener is None:
+        return True
+    marker = _FlushMarker()
+    _queue.put(marker)
+    return marker.event.wait(timeout)
+
+def shutdown():
+    """Drains the queue and goes back to writing synchronously from the caller."""
+    global _listener, _queue_handler
+    if _listener is None:
+        return
+    _listener.stop()
+    root = logging.getLogger()
+    root.removeHandler(_queue_handler)
+    for handler in _listener.handlers:
+        root.addHandler(handler)
+    _listener = None
+    _queue_handler = None
@@ -0,0 +1,219 @@
+#!/usr/bin/env python3
+"""
+Double-buffered read-ahead pipeline between image reads and USB bulk writes.
+
+A reader thread refills a small ring of preallocated buffers with readinto()
+while the caller is writing the previous chunk to the device, so the bus is
+not left idle during disk reads. No memory is allocated per chunk.
+
+    with ReadAheadReader(f, size) as reader:
+        for chunk in reader:
+            ep_out.write(chunk)
+    print(reader.stats)
+
+A chunk (memoryview) is only valid until the next chunk is requested, at
+which point its buffer goes back to the reader thread.
+"""
+import time
+import queue
+import threading
+
+DEFAULT_CHUNK_SIZE = 1024 * 1024
+DEFAULT_BUFFERS = 2
+
+_STOP = object()
+
+class PipelineStats:
+    def __init__(self):
+        self.bytes = 0
+        self.chunks = 0
+        self.elapsed = 0.0
+        # Consumer waiting for the reader (buffer stall: the bus went idle)
+        self.read_stall = 0.0
+        # Reader waiting for a free buffer (the bus is the bottleneck)
+        self.write_backpressure = 0.0
+
+    @property
+    def mb_per_s(self):
+        return self.bytes / self.elapsed / 1e6 if self.elapsed else 0.0
+
+    def __str__(self):
+        return (f"{self.bytes / 1e6:.1f} MB in {self.elapsed:.3f}s ({self.mb_per_s:.1f} MB/s), "
+                f"{self.chunks} chunks, stall {self.read_stall * 1000:.1f} ms, "
+                f"backpressure {self.write_backpressure * 1000:.1f} ms")
+
+class ReadAheadReader:
+    """
+    Iterates over `size` bytes of a binary file (or all of it if size is
+    None) as memoryview chunks, reading ahead into `buffers` buffers.
+    `transform`, if given, is called in the reader thread with each filled
+    chunk and may return a different bytes-like object (e.g. sparse encoding).
+    """
+
+    def __init__(self, f, size=None, chunk_size=DEFAULT_CHUNK_SIZE, buffers=DEFAULT_BUFFERS,
+                 transform=None):
+        if buffers < 1:
+            raise ValueError("At least one buffer is required")
+        self.f = f
+        self.size = size
+        self.chunk_size = chunk_size
+        self.transform = transform
+        self.stats = PipelineStats()
+
+        self._buffers = [bytearray(chunk_size) for _ in range(buffers)]
+        self._free = queue.Queue()
+        self._full = queue.Queue()
+        for index in range(buffers):
+            self._free.put(index)
+        self._stop = threading.Event()
+        self._thread = None
+        self._held = None
+
+    def _reader(self):
+        remaining = self.size
+        try:
+            while not self._stop.is_set():
+                if remaining is not None and remaining <= 0:
+                    break
+
+                start = time.perf_counter()
+                index = None
+                while index is None:
+                    try:
+                        index = self._free.get(timeout=0.1)
+                    except queue.Empty:
+                        if self._stop.is_set():
+                            return
+                self.stats.write_backpressure += time.perf_counter() - start
+
+                view = memoryview(self._buffers[index])
+                if remaining is not None and remaining < self.chunk_size:
+                    view = view[:remaining]
+                n = self.f.readinto(view)
+                if not n:
+                    self._free.put(index)
+                    break
+                if remaining is not None:
+                    remaining -= n
+
+                chunk = view[:n]
+                if self.transform is not None:
+                    chunk = self.transform(chunk)
+                self._full.put((index, chunk))
+
+            if remaining is not None and remaining > 0:
+                raise EOFError(f"Source ended {remaining} bytes early")
+            self._full.put(_STOP)
+        except BaseException as e:
+            self._full.put(e)
+
+    def _recycle(self):
+        if self._held is not None:
+            self._free.put(self._held)
+            self._held = None
+
+    def __iter__(self):
+        self._thread = threading.Thread(target=self._reader, name="read-ahead", daemon=True)
+        start = time.perf_counter()
+        self._thread.start()
+        try:
+            while True:
+                self._recycle()
+                wait_start = time.perf_counter()
+                item = self._full.get()
+                self.stats.read_stall += time.perf_counter() - wait_start
+                if item is _STOP:
+                    return
+                if isinstance(item, BaseException):
+                    raise item
+                index, chunk = item
+                self._held = index
+                self.stats.bytes += len(chunk)
+                self.stats.chunks += 1
+                yield chunk
+        finally:
+            self.stats.elapsed = time.perf_counter() - start
+            self.close()
+
+    def close(self):
+        self._stop.set()
+        self._recycle()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def iter_view(view, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Chunks an in-memory image (e.g. an image_cache lease view) without copying."""
+    for offset in range(0, len(view), chunk_size):
+        yield view[offset:offset + chunk_size]
+
+def transfer(f, write, size=None, chunk_size=DEFAULT_CHUNK_SIZE, buffers=DEFAULT_BUFFERS,
+             transform=None):
+    """Streams a file into `write` through the read-ahead pipeline. Returns PipelineStats."""
+    reader = ReadAheadReader(f, size, chunk_size, buffers, transform)
+    for chunk in reader:
+        write(chunk)
+    return reader.stats
+
+def transfer_serial(f, write, size=None, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Read-then-write baseline with a single buffer, for comparison."""
+    stats = PipelineStats()
+    buf = bytearray(chunk_size)
+    remaining = size
+    start = time.perf_counter()
+    while remaining is None or remaining > 0:
+        view = memoryview(buf)
+        if remaining is not None and remaining < chunk_size:
+            view = view[:remaining]
+        read_start = time.perf_counter()
+        n = f.readinto(view)
+        stats.read_stall += time.perf_counter() - read_start
+        if not n:
+            break
+        if remaining is not None:
+            remaining -= n
+        write(view[:n])
+        stats.bytes += n
+        stats.chunks += 1
+    stats.elapsed = time.perf_counter() - start
+    return stats
+
+class EmulatedEndpoint:
+    """
+    A bulk OUT endpoint stand-in that takes `latency` seconds per transfer
+    plus len(data) / bandwidth seconds, like a USB bulk write would.
+    """
+
+    def __init__(self, bandwidth=40e6, latency=0.0002, sink=None):
+        self.bandwidth = bandwidth
+        self.latency = latency
+        self.sink = sink
+        self.bytes = 0
+        self.transfers = 0
+
+    def write(self, data, timeout=None):
+        time.sleep(self.latency + len(data) / self.bandwidth)
+        if self.sink is not None:
+            self.sink(data)
+        self.bytes += len(data)
+        self.transfers += 1
+        return len(data)
+
+class ThrottledReader:
+    """Wraps a binary file so readinto() behaves like a disk of a given speed."""
+
+    def __init__(self, f, bandwidth=100e6, latency=0.0005):
+        self.f = f
+        self.bandwidth = bandwidth
+        self.latency = latency
+
+    def readinto(self, view):
+        n = self.f.readinto(view)
+        if n:
+            time.sleep(self.latency + n / self.bandwidth)
+        return n
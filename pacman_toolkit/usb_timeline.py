@@ -0,0 +1,218 @@
+#!/usr/bin/env python3
+"""
+USB enumeration timeline recorder and offline replayer.
+
+The recorder diffs each poll of the bus and writes one small binary record
+per transition (device appeared / disappeared), so a field session of a
+bootlooping phone costs a few hundred bytes:
+
+    header:  8s magic, d wall-clock start time
+    record:  Q ns since start, B event, H vid, H pid, B bus, B address,
+             B port count, then one byte per port number
+
+`replay_bus()` turns a recording back into an EmulatedBus whose
+`usb.core.find` reports the same devices over the same windows, so catch
+logic can be regression-tested and benchmarked against real sessions.
+"""
+import sys
+import time
+import struct
+import argparse
+
+MAGIC = b"PUSBTL\x00\x01"
+HEADER = struct.Struct('<8sd')
+RECORD = struct.Struct('<QBHHBBB')
+
+EVENT_GONE = 0
+EVENT_APPEAR = 1
+EVENT_END = 2
+EVENT_NAMES = {EVENT_GONE: "gone", EVENT_APPEAR: "appear", EVENT_END: "end"}
+
+class TimelineError(Exception):
+    pass
+
+class TimelineEvent:
+    __slots__ = ("t", "event", "vid", "pid", "bus", "address", "ports")
+
+    def __init__(self, t, event, vid=0, pid=0, bus=0, address=0, ports=()):
+        self.t = t
+        self.event = event
+        self.vid = vid
+        self.pid = pid
+        self.bus = bus
+        self.address = address
+        self.ports = tuple(ports)
+
+    @property
+    def key(self):
+        return (self.vid, self.pid, self.bus, self.address, self.ports)
+
+    def __repr__(self):
+        return (f"TimelineEvent({self.t:.6f}, {EVENT_NAMES.get(self.event, self.event)}, "
+                f"{self.vid:04x}:{self.pid:04x}, bus={self.bus}, addr={self.address}, ports={self.ports})")
+
+class Appearance:
+    """One continuous enumeration of a device, in seconds since recording start."""
+
+    def __init__(self, vid, pid, bus, address, ports, start, end):
+        self.vid = vid
+        self.pid = pid
+        self.bus = bus
+        self.address = address
+        self.ports = ports
+        self.start = start
+        self.end = end
+
+    @property
+    def duration(self):
+        return self.end - self.start
+
+class Timeline:
+    def __init__(self, start_time, events):
+        self.start_time = start_time
+        self.events = events
+
+    @property
+    def duration(self):
+        return self.events[-1].t if self.events else 0.0
+
+    def appearances(self, vids=None):
+        """Pairs appear/gone events; devices still present end with the recording."""
+        open_ = {}
+        result = []
+        for ev in self.events:
+            if ev.event == EVENT_APPEAR:
+                open_[ev.key] = ev.t
+            elif ev.event == EVENT_GONE and ev.key in open_:
+                result.append(Appearance(*ev.key, open_.pop(ev.key), ev.t))
+        for key, start in open_.items():
+            result.append(Appearance(*key, start, self.duration))
+        if vids is not None:
+            result = [a for a in result if a.vid in vids]
+        result.sort(key=lambda a: a.start)
+        return result
+
+def device_key(dev):
+    ports = getattr(dev, "port_numbers", None) or ()
+    return (dev.idVendor, dev.idProduct, dev.bus or 0, dev.address or 0, tuple(ports))
+
+class TimelineRecorder:
+    """
+    Writes a transition record whenever the set of devices seen by a poll
+    changes. `vids` limits recording to the given vendor IDs.
+    """
+
+    def __init__(self, path, vids=None, clock=time.monotonic_ns):
+        self.path = path
+        self.vids = set(vids) if vids is not None else None
+        self.clock = clock
+        self.transitions = 0
+        self._present = set()
+        self._file = open(path, 'wb')
+        self._file.write(HEADER.pack(MAGIC, time.time()))
+        self._start = clock()
+
+    def _write(self, event, key, now):
+        vid, pid, bus, address, ports = key
+        ports = ports[:255]
+        self._file.write(RECORD.pack(now, event, vid, pid, bus & 0xff, address & 0xff, len(ports)))
+        self._file.write(bytes(p & 0xff for p in ports))
+        self.transitions += 1
+
+    def observe(self, devs):
+        now = self.clock() - self._start
+        seen = set()
+        for dev in devs:
+            if self.vids is not None and dev.idVendor not in self.vids:
+                continue
+            seen.add(device_key(dev))
+        if seen == self._present:
+            return
+        for key in sorted(seen - self._present):
+            self._write(EVENT_APPEAR, key, now)
+        for key in sorted(self._present - seen):
+            self._write(EVENT_GONE, key, now)
+        self._present = seen
+        # Transitions are rare; flush so a killed session keeps its data
+        self._file.flush()
+
+    def close(self):
+        if self._file.closed:
+            return
+        self._file.write(RECORD.pack(self.clock() - self._start, EVENT_END, 0, 0, 0, 0, 0))
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def read_timeline(path):
+    with open(path, 'rb') as f:
+        data = f.read()
+    if len(data) < HEADER.size:
+        raise TimelineError(f"{path}: too short for a timeline header")
+    magic, start_time = HEADER.unpack_from(data, 0)
+    if magic != MAGIC:
+        raise TimelineError(f"{path}: not a USB timeline recording")
+
+    events = []
+    pos = HEADER.size
+    while pos + RECORD.size <= len(data):
+        ns, event, vid, pid, bus, address, nports = RECORD.unpack_from(data, pos)
+        pos += RECORD.size
+        if pos + nports > len(data):
+            break
+        ports = tuple(data[pos:pos + nports])
+        pos += nports
+        events.append(TimelineEvent(ns / 1e9, event, vid, pid, bus, address, ports))
+    return Timeline(start_time, events)
+
+def replay_bus(timeline, clock=time.monotonic, vids=None, **device_kwargs):
+    """
+    Builds an EmulatedBus that replays the recording: each appearance becomes
+    an emulated bootloader enumerated over the recorded window. Extra keyword
+    arguments (bandwidth, latency, ...) go to every FastbootDevice.
+    """
+    # Imported here: the interceptor loads this module for recording only
+    try:
+        from . import fastboot_emulator
+    except ImportError:
+        import fastboot_emulator
+    devices = []
+    for a in timeline.appearances(vids):
+        devices.append(fastboot_emulator.FastbootDevice(
+            idVendor=a.vid, idProduct=a.pid, bus=a.bus, address=a.address,
+            port_numbers=a.ports, appear_at=a.start, window=a.duration, **device_kwargs))
+    return fastboot_emulator.EmulatedBus(devices, clock=clock)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Inspect a USB timeline recording")
+    parser.add_argument("path", help="Recording written by pacman_interceptor.py --record")
+    parser.add_argument("--events", action="store_true", help="List every transition")
+    args = parser.parse_args(argv)
+
+    try:
+        timeline = read_timeline(args.path)
+    except (OSError, TimelineError) as e:
+        print(f"[TIMELINE] {e}")
+        return 1
+
+    started = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(timeline.start_time))
+    print(f"[TIMELINE] Recorded {started}, {timeline.duration:.3f}s, {len(timeline.events)} events")
+    if args.events:
+        for ev in timeline.events:
+            if ev.event == EVENT_END:
+                print(f"  {ev.t * 1000:10.1f} ms  end")
+                continue
+            ports = ".".join(str(p) for p in ev.ports) or "-"
+            print(f"  {ev.t * 1000:10.1f} ms  {EVENT_NAMES.get(ev.event, ev.event):<6} "
+                  f"{ev.vid:04x}:{ev.pid:04x} bus {ev.bus} addr {ev.address} port {ports}")
+
+    for a in timeline.appearances():
+        print(f"  {a.vid:04x}:{a.pid:04x} at {a.start * 1000:10.1f} ms for {a.duration * 1000:8.1f} ms")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
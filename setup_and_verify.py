@@ -1,9 +1,14 @@
 #!/usr/bin/env python3
 import os
 import sys
+import time
 import shutil
+import argparse
 import subprocess
 
+from pacman_toolkit import (dependency_probe, file_search, firmware_store, image_source, lk_image,
+                            payload_extractor, setup_pipeline)
+
 # ANSI Colors
 class Colors:
     HEADER = '\033[95m'
@@ -19,6 +24,13 @@ class Colors:
 # Constants
 TOOLKIT_DIR = os.path.join(os.getcwd(), "pacman_toolkit")
 FIRMWARE_DIR = os.path.join(TOOLKIT_DIR, "firmware")
+# Shared with the interceptor and the manager (honours PACMAN_STORE_DIR)
+STORE_DIR = firmware_store.STORE_DIR
+
+MTKCLIENT_URL = "https://github.com/bkerler/mtkclient.git"
+# Offline sources, filled by --prepare-offline; used when present
+MTKCLIENT_MIRROR = os.environ.get("PACMAN_MTKCLIENT_MIRROR", os.path.join(TOOLKIT_DIR, "mirrors", "mtkclient.git"))
+WHEELHOUSE_DIR = os.environ.get("PACMAN_WHEELHOUSE", os.path.join(TOOLKIT_DIR, "wheelhouse"))
 
 REQUIRED_FILES = {
     'boot.img': 'Kernel Image',
@@ -30,6 +42,12 @@ OPTIONAL_MTK_FILES = {
     'lk.img': 'Little Kernel (Bootloader)'
 }
 
+# Packages whose Python module may also come from pip
+PYTHON_MODULES = {
+    'python-pyusb': 'usb',
+    'python-libusb1': 'usb1'
+}
+
 # Also accept raw names to rename them
 RAW_NAMES = {
     'preloader_raw.img': 'preloader.img',
@@ -66,15 +84,18 @@ def install_packages():
         "libusb", "android-tools", "python-pyusb", "python-libusb1"
     ]
 
-    missing = []
-    for pkg in packages:
-        # Check if installed
-        try:
-            if subprocess.call(["pacman", "-Qi", pkg], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL) != 0:
-                missing.append(pkg)
-        except FileNotFoundError:
-            print(f"{Colors.WARNING}Skipping dependency check (pacman not found).{Colors.ENDC}")
-            return False
+    # Reads the local pacman database once instead of running pacman -Qi per package
+    try:
+        result = dependency_probe.probe(packages, modules=PYTHON_MODULES)
+    except dependency_probe.ProbeError as e:
+        print(f"{Colors.WARNING}Skipping dependency check ({e}).{Colors.ENDC}")
+        return False
+    missing = result.missing
+
+    for pkg, module in PYTHON_MODULES.items():
+        if pkg in result.installed and not result.modules[module]:
+            print(f"{Colors.WARNING}{pkg} is installed, but {sys.executable} cannot find the '{module}' module "
+                  f"(virtualenv?).{Colors.ENDC}")
 
     if missing:
         print(f"{Colors.WARNING}Missing packages: {', '.join(missing)}{Colors.ENDC}")
@@ -101,34 +122,204 @@ def find_file(filename, search_paths):
             return candidate
     return None
 
-def setup_mtkclient():
+def lk_image_ok(path):
+    """Checks that a candidate lk image really is an MTK partition header chain."""
+    ok, result = lk_image.validate_lk_image(path)
+    if ok:
+        print(f"{Colors.GREEN}Valid LK image: {', '.join(result.names())}{Colors.ENDC}")
+    else:
+        print(f"{Colors.FAIL}Rejecting {path}: not a valid LK image ({result}){Colors.ENDC}")
+    return ok
+
+def run_quiet(cmd):
+    """Runs a command with its output captured. Returns (ok, last lines of output)."""
+    try:
+        proc = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True)
+    except FileNotFoundError:
+        return False, [f"{cmd[0]}: command not found"]
+    return proc.returncode == 0, proc.stdout.strip().splitlines()[-5:]
+
+def clone_mtkclient(mirror=None, offline=False):
+    """Clones mtkclient, from the local bare mirror when there is one."""
     print(f"\n{Colors.CYAN}[2.5/3] Checking mtkclient...{Colors.ENDC}")
     mtk_dir = os.path.join(TOOLKIT_DIR, "mtkclient")
+    mirror = mirror or MTKCLIENT_MIRROR
 
     if os.path.exists(mtk_dir):
         print(f"{Colors.GREEN}mtkclient already present.{Colors.ENDC}")
+        return True
+
+    sources = [mirror] if os.path.isdir(mirror) else []
+    if not offline:
+        sources.append(MTKCLIENT_URL)
+    for source in sources:
+        print(f"{Colors.WARNING}mtkclient not found. Cloning from {source}...{Colors.ENDC}")
+        ok, tail = run_quiet(["git", "clone", "--quiet", source, mtk_dir])
+        if ok:
+            if source != MTKCLIENT_URL:
+                # Later pulls go upstream, not to the mirror
+                run_quiet(["git", "-C", mtk_dir, "remote", "set-url", "origin", MTKCLIENT_URL])
+            print(f"{Colors.GREEN}mtkclient cloned successfully from {source}.{Colors.ENDC}")
+            return True
+        print("\n".join(tail))
+        shutil.rmtree(mtk_dir, ignore_errors=True)
+    print(f"{Colors.FAIL}Failed to clone mtkclient. Please check internet connection or clone manually.{Colors.ENDC}")
+    return False
+
+def install_mtkclient_requirements(wheelhouse=None, offline=False):
+    """Installs mtkclient's requirements, from the local wheelhouse when there is one."""
+    req_file = os.path.join(TOOLKIT_DIR, "mtkclient", "requirements.txt")
+    if not os.path.exists(req_file):
+        return True
+    wheelhouse = wheelhouse or WHEELHOUSE_DIR
+
+    # We use the current python executable to install requirements
+    pip = [sys.executable, "-m", "pip", "install", "--quiet", "-r", req_file]
+    attempts = []
+    if os.path.isdir(wheelhouse):
+        attempts.append((f"wheelhouse {wheelhouse}", pip + ["--no-index", "--find-links", wheelhouse]))
+    if not offline:
+        attempts.append(("PyPI", pip))
+    for label, cmd in attempts:
+        print(f"Installing mtkclient requirements from {label}...")
+        ok, tail = run_quiet(cmd)
+        if ok:
+            print(f"{Colors.GREEN}mtkclient requirements installed from {label}.{Colors.ENDC}")
+            return True
+        print("\n".join(tail))
+    print(f"{Colors.WARNING}Failed to install mtkclient requirements. You may need to run 'pip install -r {req_file}' manually.{Colors.ENDC}")
+    return False
+
+def setup_mtkclient(mirror=None, wheelhouse=None, offline=False):
+    return clone_mtkclient(mirror, offline) and install_mtkclient_requirements(wheelhouse, offline)
+
+def prepare_offline(mirror=None, wheelhouse=None):
+    """
+    Fills the local mtkclient mirror and wheelhouse, so that later setups
+    (on this machine or on benches that copy them) need no network.
+    """
+    mirror = mirror or MTKCLIENT_MIRROR
+    wheelhouse = wheelhouse or WHEELHOUSE_DIR
+    if os.path.isdir(mirror):
+        print(f"Updating mirror {mirror}...")
+        ok, tail = run_quiet(["git", "--git-dir", mirror, "remote", "update", "--prune"])
     else:
-        print(f"{Colors.WARNING}mtkclient not found. Cloning from GitHub...{Colors.ENDC}")
-        try:
-            subprocess.check_call(["git", "clone", "https://github.com/bkerler/mtkclient.git", mtk_dir])
-            print(f"{Colors.GREEN}mtkclient cloned successfully.{Colors.ENDC}")
-        except subprocess.CalledProcessError:
-            print(f"{Colors.FAIL}Failed to clone mtkclient. Please check internet connection or clone manually.{Colors.ENDC}")
-            return False
-
-    # Install requirements
-    req_file = os.path.join(mtk_dir, "requirements.txt")
-    if os.path.exists(req_file):
-        print("Installing mtkclient requirements...")
-        try:
-            # We use the current python executable to install requirements
-            subprocess.check_call([sys.executable, "-m", "pip", "install", "-r", req_file])
-            print(f"{Colors.GREEN}mtkclient requirements installed.{Colors.ENDC}")
-        except subprocess.CalledProcessError:
-            print(f"{Colors.WARNING}Failed to install mtkclient requirements. You may need to run 'pip install -r {req_file}' manually.{Colors.ENDC}")
+        print(f"Creating mirror {mirror}...")
+        os.makedirs(os.path.dirname(mirror), exist_ok=True)
+        ok, tail = run_quiet(["git", "clone", "--quiet", "--mirror", MTKCLIENT_URL, mirror])
+    if not ok:
+        print(f"{Colors.FAIL}Mirror update failed:{Colors.ENDC}\n" + "\n".join(tail))
+        return False
 
+    proc = subprocess.run(["git", "--git-dir", mirror, "show", "HEAD:requirements.txt"],
+                          stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+    if proc.returncode != 0:
+        print(f"{Colors.FAIL}No requirements.txt in the mirror.{Colors.ENDC}")
+        return False
+    os.makedirs(wheelhouse, exist_ok=True)
+    req_file = os.path.join(wheelhouse, "requirements.txt")
+    with open(req_file, "wb") as f:
+        f.write(proc.stdout)
+    print(f"Building wheels into {wheelhouse}...")
+    ok, tail = run_quiet([sys.executable, "-m", "pip", "wheel", "--quiet", "-r", req_file, "-w", wheelhouse])
+    if not ok:
+        print(f"{Colors.FAIL}Building the wheelhouse failed:{Colors.ENDC}\n" + "\n".join(tail))
+        return False
+    print(f"{Colors.GREEN}Offline mirror and wheelhouse ready.{Colors.ENDC}")
+    return True
+
+def install_image(src, target):
+    """
+    Adds an image to the content-addressed store (a no-op if an identical
+    image is already stored) and links it into the firmware directory.
+    Returns a description of how the image was staged and linked.
+    """
+    store = firmware_store.FirmwareStore(STORE_DIR)
+    digest, staged = store.ingest(src)
+    link = firmware_store.link_file(store.blob_path(digest), os.path.join(FIRMWARE_DIR, target))
+    stored = staged.describe() if staged else "already stored"
+    return f"{stored}; linked by {link}"
+
+def link_archive(target, search_paths):
+    """
+    Makes a factory zip containing `target` available to the toolkit by
+    symlinking it into the firmware directory instead of unpacking it.
+    The member is streamed once to verify its CRC and report its hash.
+    """
+    with image_source.FirmwareSource(FIRMWARE_DIR) as current:
+        if current.has(target):
+            print(f"{Colors.GREEN}Found {target} in {current.describe(target)}{Colors.ENDC}")
+            return True
+
+    ref = image_source.find_in_archives(target, search_paths)
+    if not ref:
+        return False
+
+    try:
+        print(f"{Colors.GREEN}Found {target} in {ref}{Colors.ENDC}")
+        if target == 'lk.img':
+            staged, path = image_source.stage_ref(ref)
+            with staged:
+                if not lk_image_ok(path):
+                    return False
+        digest = ref.source.sha256(target)
+    except Exception as e:
+        print(f"{Colors.FAIL}Archive member {ref} is unreadable: {e}{Colors.ENDC}")
+        return False
+    finally:
+        ref.source.close()
+
+    link_path = os.path.join(FIRMWARE_DIR, os.path.basename(ref.source.path))
+    if not os.path.lexists(link_path):
+        os.symlink(os.path.abspath(ref.source.path), link_path)
+        print(f"Linked {os.path.basename(link_path)} into {FIRMWARE_DIR} (no extraction)")
+    print(f"  sha256 {digest}")
     return True
 
+def extract_from_payload(targets, search_paths):
+    """Extracts missing targets from a payload.bin. Returns the number of files written."""
+    with image_source.FirmwareSource(FIRMWARE_DIR) as current:
+        missing = [t for t in targets if not current.has(t)]
+    if not missing:
+        return 0
+
+    payload_path = find_file("payload.bin", search_paths)
+    base_offset = 0
+    if not payload_path:
+        # OTA zips store payload.bin uncompressed, so it can be read in place
+        ref = image_source.find_in_archives("payload.bin", search_paths)
+        if not ref:
+            return 0
+        base_offset = ref.source.stored_offset("payload.bin")
+        payload_path = ref.source.path
+        ref.source.close()
+        if base_offset is None:
+            print(f"{Colors.WARNING}payload.bin in {payload_path} is compressed; extract it first.{Colors.ENDC}")
+            return 0
+
+    wanted = {part: filename for part, filename in payload_extractor.RESCUE_PARTITIONS.items()
+              if filename in missing}
+    print(f"{Colors.GREEN}Found OTA payload at {payload_path}{Colors.ENDC}")
+    confirm = input(f"Extract {', '.join(sorted(set(wanted.values())))} from payload.bin? (y/n): ").strip().lower()
+    if confirm != 'y':
+        return 0
+
+    try:
+        written = payload_extractor.extract_partitions(payload_path, wanted, FIRMWARE_DIR,
+                                                       base_offset=base_offset)
+    except (payload_extractor.PayloadError, OSError) as e:
+        print(f"{Colors.FAIL}Failed to extract from payload.bin: {e}{Colors.ENDC}")
+        return 0
+
+    lk_path = written.get('lk.img')
+    if lk_path and not lk_image_ok(lk_path):
+        os.remove(lk_path)
+        del written['lk.img']
+
+    for filename in written:
+        print(f"{Colors.GREEN}Extracted {filename} to {FIRMWARE_DIR}{Colors.ENDC}")
+    return len(written)
+
 def setup_firmware():
     print(f"\n{Colors.CYAN}[3/3] Setting up Firmware...{Colors.ENDC}")
 
@@ -150,17 +341,27 @@ def setup_firmware():
     # 1. Look for standard files
     all_targets = list(REQUIRED_FILES.keys()) + list(OPTIONAL_MTK_FILES.keys())
 
+    # One pass over the search paths for every name, raw names included; only
+    # files directly in each path, and all of them since lk.img may be rejected
+    hits = file_search.search(search_paths, file_search.Matcher(all_targets, aliases=RAW_NAMES),
+                              file_search.SearchRules(max_depth=0), stop_when_found=False)
+
     for target in all_targets:
         if os.path.exists(os.path.join(FIRMWARE_DIR, target)):
             print(f"{Colors.GREEN}Found {target} in firmware directory.{Colors.ENDC}")
             found_count += 1
             continue
 
-        found_path = find_file(target, search_paths)
+        found_path = hits.path_of(target)
+        if found_path and target == 'lk.img' and not lk_image_ok(found_path):
+            found_path = None
+
         if found_path:
             print(f"{Colors.GREEN}Found {target} at {found_path}{Colors.ENDC}")
-            shutil.copy2(found_path, os.path.join(FIRMWARE_DIR, target))
-            print(f"Copied to {FIRMWARE_DIR}")
+            strategy = install_image(found_path, target)
+            print(f"Stored and linked into {FIRMWARE_DIR} ({strategy})")
+            found_count += 1
+        elif link_archive(target, search_paths):
             found_count += 1
         else:
             print(f"{Colors.WARNING}Missing: {target}{Colors.ENDC}")
@@ -171,15 +372,21 @@ def setup_firmware():
         if os.path.exists(os.path.join(FIRMWARE_DIR, new_name)):
             continue
 
-        found_path = find_file(raw_name, search_paths)
+        found_path = hits.path_of(raw_name)
+        if found_path and new_name == 'lk.img' and not lk_image_ok(found_path):
+            continue
+
         if found_path:
             print(f"{Colors.GREEN}Found {raw_name} (will be renamed to {new_name}){Colors.ENDC}")
             confirm = input(f"Copy and rename '{raw_name}' to '{new_name}'? (y/n): ").strip().lower()
             if confirm == 'y':
-                shutil.copy2(found_path, os.path.join(FIRMWARE_DIR, new_name))
-                print(f"Copied and renamed to {FIRMWARE_DIR}/{new_name}")
+                strategy = install_image(found_path, new_name)
+                print(f"Stored and linked as {FIRMWARE_DIR}/{new_name} ({strategy})")
                 found_count += 1
 
+    # 3. Pull anything still missing straight out of an OTA payload.bin
+    found_count += extract_from_payload(all_targets, search_paths)
+
     if found_count == 0:
         print(f"\n{Colors.FAIL}No firmware files found.{Colors.ENDC}")
         print(f"Please download firmware from: https://github.com/spike0en/nothing_archive")
@@ -198,25 +405,54 @@ def finalize_setup():
         else:
             print(f"{Colors.WARNING}Warning: {script} not found.{Colors.ENDC}")
 
-if __name__ == "__main__":
-    print_header()
-
-    # System Check
-    if not check_system():
-        print(f"{Colors.WARNING}System check failed, but continuing for manual setup...{Colors.ENDC}")
-
-    # Dependencies
-    if not install_packages():
-        print(f"{Colors.WARNING}Dependency installation skipped or failed.{Colors.ENDC}")
-
-    # mtkclient
-    setup_mtkclient()
+def build_pipeline(args):
+    """The setup stages and what each one waits for."""
+    Stage = setup_pipeline.Stage
+    return setup_pipeline.Pipeline([
+        Stage("system", check_system),
+        # Prompts before installing, and pacman holds its own lock anyway
+        Stage("packages", install_packages, after=["system"], interactive=True),
+        # git and pip come from the packages stage, and pip must not write
+        # pyusb into site-packages while pacman installs python-pyusb
+        Stage("mtkclient", lambda: clone_mtkclient(args.mirror, args.offline), after=["packages"]),
+        Stage("mtkclient-requirements", lambda: install_mtkclient_requirements(args.wheelhouse, args.offline),
+              after=["packages"], needs=["mtkclient"]),
+        Stage("firmware", setup_firmware, interactive=True),
+        Stage("permissions", finalize_setup),
+    ])
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Set up and verify the Pacman repair toolkit")
+    parser.add_argument("--serial", action="store_true", help="Run the setup stages one at a time")
+    parser.add_argument("--plan", action="store_true", help="Print the stage graph and exit")
+    parser.add_argument("--offline", action="store_true", help="Never fall back to GitHub or PyPI")
+    parser.add_argument("--mirror", help=f"Bare mtkclient mirror to clone from (default: {MTKCLIENT_MIRROR})")
+    parser.add_argument("--wheelhouse", help=f"Wheel directory for mtkclient's requirements (default: {WHEELHOUSE_DIR})")
+    parser.add_argument("--prepare-offline", action="store_true",
+                        help="Create/update the mirror and wheelhouse, then exit")
+    args = parser.parse_args(argv)
+
+    if args.prepare_offline:
+        return 0 if prepare_offline(args.mirror, args.wheelhouse) else 1
+
+    pipeline = build_pipeline(args)
+    if args.plan:
+        print("\n".join(pipeline.describe()))
+        return 0
 
-    # Firmware
-    setup_firmware()
+    print_header()
+    print(f"{Colors.BOLD}Setup plan:{Colors.ENDC}")
+    for line in pipeline.describe():
+        print(f"  {line}")
 
-    # Finalize
-    finalize_setup()
+    start = time.monotonic()
+    results = pipeline.run(serial=args.serial)
 
+    print(f"\n{Colors.BOLD}Setup summary:{Colors.ENDC}")
+    print("\n".join(setup_pipeline.summary(results, time.monotonic() - start)))
     print(f"\n{Colors.BOLD}{Colors.GREEN}Setup Complete!{Colors.ENDC}")
     print(f"To run the repair tool: sudo python3 pacman_toolkit/pacman_interceptor.py")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,333 @@
+"""
+Catch-probability benchmark for the interceptor's detection loop.
+
+Drives a pacman_interceptor.Interceptor against thousands of synthetic bootloop
+timelines on the emulated USB bus. Each timeline runs on a virtual clock:
+a device appears at a random offset, stays enumerated for one window
+(with jitter) and is caught only if the loop enumerates it and has time to
+send its freeze command before the window closes. Sleeps overshoot by a
+random amount and each enumeration costs scan time, like on a busy host.
+
+With --cycles N each timeline is a bootloop of N windows, --period apart.
+Adding --catch-failure P (chance that an attempt inside the window fails
+anyway) also benchmarks the retry policies, and reports how many windows
+each needed.
+
+With --recording, the windows come from a field session captured with
+`pacman_interceptor.py --record` instead: each timeline replays a run of
+recorded appearances, with their recorded spacing, at a random phase.
+
+Idle CPU, the real poll period and its lateness (from the interceptor's
+tick scheduler) are measured separately in real time with an empty bus.
+
+    python3 tests/benchmark_catch_probability.py
+    python3 tests/benchmark_catch_probability.py --timelines 5000 --json results.json
+    python3 tests/benchmark_catch_probability.py --cycles 8 --catch-failure 0.5
+    python3 tests/benchmark_catch_probability.py --recording session.tl
+
+Results are deterministic for a given --seed, and the JSON output has
+sorted keys, so two releases can be compared with a plain diff.
+"""
+import os
+import sys
+import json
+import time
+import types
+import random
+import argparse
+import importlib
+from unittest.mock import patch
+
+# Add the repo root to sys.path so we can import pacman_toolkit
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from pacman_toolkit import fastboot_emulator as emu
+from pacman_toolkit import usb_timeline
+
+DEFAULT_WINDOWS_MS = [20, 40, 75, 150]
+DEFAULT_TIMELINES = 2000
+
+class _Caught(BaseException):
+    pass
+
+class _Timeout(BaseException):
+    pass
+
+class VirtualClock:
+    """Time source for the interceptor and the bus; sleep() only advances it."""
+
+    def __init__(self, rng, sleep_jitter, scan_cost):
+        self.rng = rng
+        self.sleep_jitter = sleep_jitter
+        self.scan_cost = scan_cost
+        self.now = 0.0
+        self.deadline = None
+
+    def sleep(self, duration):
+        self.now += duration + abs(self.rng.gauss(0, self.sleep_jitter))
+        if self.deadline is not None and self.now > self.deadline:
+            raise _Timeout()
+
+    def time(self):
+        return self.now
+
+    def time_module(self):
+        # Stands in for the `time` module inside pacman_interceptor only
+        return types.SimpleNamespace(sleep=self.sleep, time=self.time, monotonic=self.time,
+                                     monotonic_ns=lambda: int(self.now * 1e9), perf_counter=self.time)
+
+class PollingStrategy:
+    """An Interceptor with a given POLLING_INTERVAL (None = as shipped)."""
+
+    def __init__(self, name, interval=None):
+        self.name = name
+        self.interval = interval
+
+    def patches(self, interceptor):
+        if self.interval is None:
+            return []
+        return [patch.object(interceptor, 'POLLING_INTERVAL', self.interval)]
+
+    def session(self, interceptor):
+        return interceptor.Interceptor()
+
+class RetryStrategy(PollingStrategy):
+    """Shipped polling with one retry policy for every device profile."""
+
+    def __init__(self, name, policy):
+        super().__init__(name)
+        self.policy = policy
+
+    def patches(self, interceptor):
+        policies = {profile: self.policy for profile in interceptor.RETRY_POLICIES}
+        return [patch.object(interceptor, 'RETRY_POLICIES', policies)]
+
+STRATEGIES = [
+    PollingStrategy("poll-100ms", 0.1),
+    PollingStrategy("main (as shipped)"),
+    PollingStrategy("poll-20ms", 0.02),
+    PollingStrategy("poll-10ms", 0.01),
+    PollingStrategy("poll-busy", 0.0),
+]
+
+# Only differ from "main (as shipped)" when attempts can fail
+RETRY_STRATEGIES = [
+    RetryStrategy("retry-exponential", "exponential"),
+    RetryStrategy("retry-burst", "burst"),
+    RetryStrategy("retry-jitter", "jitter"),
+    RetryStrategy("retry-window", "window"),
+]
+
+def load_interceptor(bus):
+    with bus.installed():
+        import pacman_toolkit.pacman_interceptor as interceptor
+        interceptor = importlib.reload(interceptor)
+        # Binds the emulated bus; pyusb is imported on first use
+        interceptor.load_usb()
+        return interceptor
+
+def percentile(values, p):
+    if not values:
+        return None
+    values = sorted(values)
+    k = (len(values) - 1) * p / 100.0
+    lo = int(k)
+    hi = min(lo + 1, len(values) - 1)
+    return values[lo] + (values[hi] - values[lo]) * (k - lo)
+
+def synthetic_windows(window, args):
+    def make(rng):
+        devices = []
+        start = rng.uniform(0, args.max_offset)
+        for cycle in range(args.cycles):
+            actual = window * rng.uniform(1 - args.window_jitter, 1 + args.window_jitter)
+            # Each reappearance gets a new address, like a real re-enumeration
+            devices.append(emu.FastbootDevice(address=5 + cycle, appear_at=start, window=actual))
+            start += args.period * rng.uniform(1 - args.window_jitter, 1 + args.window_jitter)
+        return devices
+    return make
+
+def recorded_windows(appearances, args):
+    def make(rng):
+        first = rng.randrange(len(appearances))
+        run = appearances[first:first + args.cycles]
+        shift = rng.uniform(0, args.max_offset) - run[0].start
+        return [emu.FastbootDevice(idVendor=a.vid, idProduct=a.pid, bus=a.bus, address=a.address,
+                                   port_numbers=a.ports, appear_at=a.start + shift, window=a.duration)
+                for a in run]
+    return make
+
+def simulate(strategy, interceptor, bus, make_devices, args, rng):
+    """Runs `args.timelines` timelines from make_devices(rng); returns stats."""
+    clock = VirtualClock(rng, args.sleep_jitter / 1000.0, args.scan_cost / 1000.0)
+    bus.clock = clock.time
+    real_find = bus.find
+
+    def find(*a, **kw):
+        clock.now += clock.scan_cost
+        return real_find(*a, **kw)
+
+    def catch(dev):
+        if rng.random() < args.catch_failure:
+            raise emu.USBError("transient catch failure")
+        # The freeze command has to land while the bootloader still listens
+        if dev._state.present(clock.now + args.catch_cost / 1000.0):
+            raise _Caught(dev._state)
+        raise emu.USBError("window closed during catch")
+
+    caught = 0
+    latencies = []
+    cycles_used = []
+    patches = strategy.patches(interceptor) + [
+        patch.object(interceptor, 'time', clock.time_module()),
+        patch.object(interceptor.Interceptor, '_sleep', lambda session, seconds: clock.sleep(seconds)),
+        patch.object(interceptor, 'catch_device', lambda dev, mode, before_payload=None: catch(dev)),
+        patch.object(bus.core, 'find', find),
+    ]
+    for p in patches:
+        p.start()
+    try:
+        for _ in range(args.timelines):
+            devices = make_devices(rng)
+            bus.devices = devices
+            clock.now = 0.0
+            bus.start_time = 0.0
+            clock.deadline = devices[-1].appear_at + devices[-1].window + args.horizon
+            try:
+                # Ends in _Caught or _Timeout; a session that gives up missed the device
+                strategy.session(interceptor).run()
+            except _Caught as e:
+                caught += 1
+                latencies.append(clock.now - devices[0].appear_at)
+                cycles_used.append(devices.index(e.args[0]) + 1)
+            except _Timeout:
+                pass
+    finally:
+        for p in reversed(patches):
+            p.stop()
+
+    result = {
+        "catch_probability": round(caught / args.timelines, 4),
+        "caught": caught,
+    }
+    for p in (50, 90, 99):
+        value = percentile(latencies, p)
+        result[f"detect_p{p}_ms"] = None if value is None else round(value * 1000, 2)
+    if args.cycles > 1:
+        result["mean_windows_to_catch"] = round(sum(cycles_used) / len(cycles_used), 2) if cycles_used else None
+    return result
+
+def measure_idle_cpu(strategy, interceptor, bus, seconds):
+    """Real-time run with no devices attached; returns (CPU% of one core, poll stats)."""
+    bus.devices = []
+    bus.clock = time.monotonic
+    patches = strategy.patches(interceptor)
+    for p in patches:
+        p.start()
+    try:
+        session = strategy.session(interceptor)
+        start_wall = time.monotonic()
+        start_cpu = time.process_time()
+        session.run(timeout=seconds)
+        cpu = time.process_time() - start_cpu
+        wall = time.monotonic() - start_wall
+    finally:
+        for p in reversed(patches):
+            p.stop()
+    poll = session.scheduler.stats()
+    return round(100.0 * cpu / wall, 2), {k: poll[k] for k in ("mean_period_ms", "late_p50_ms", "late_p99_ms")}
+
+def run_benchmark(args):
+    bus = emu.EmulatedBus()
+    interceptor = load_interceptor(bus)
+    if args.recording:
+        appearances = usb_timeline.read_timeline(args.recording).appearances(interceptor.TARGET_VIDS)
+        if not appearances:
+            raise SystemExit(f"No target device appearances in {args.recording}")
+        sources = {"recorded": recorded_windows(appearances, args)}
+    else:
+        sources = {f"{w}ms": synthetic_windows(w / 1000.0, args) for w in args.windows}
+
+    strategies = STRATEGIES + (RETRY_STRATEGIES if args.catch_failure > 0 else [])
+    results = {}
+    for strategy in strategies:
+        rng = random.Random(args.seed)
+        windows = {}
+        for label, make_devices in sources.items():
+            windows[label] = simulate(strategy, interceptor, bus, make_devices, args, rng)
+        entry = {"windows": windows}
+        if args.idle_seconds > 0:
+            entry["idle_cpu_percent"], entry["poll"] = measure_idle_cpu(strategy, interceptor, bus, args.idle_seconds)
+        results[strategy.name] = entry
+    return {
+        "parameters": {
+            "timelines": args.timelines,
+            "windows": list(sources),
+            "recording": os.path.basename(args.recording) if args.recording else None,
+            "window_jitter": args.window_jitter,
+            "sleep_jitter_ms": args.sleep_jitter,
+            "scan_cost_ms": args.scan_cost,
+            "catch_cost_ms": args.catch_cost,
+            "catch_failure": args.catch_failure,
+            "cycles": args.cycles,
+            "period_s": args.period,
+            "seed": args.seed,
+        },
+        "strategies": results,
+    }
+
+def print_table(report):
+    windows = report["parameters"]["windows"]
+    print(f"{report['parameters']['timelines']} timelines per window, seed {report['parameters']['seed']}\n")
+    header = f"{'strategy':<20}" + "".join(f"{w + ' catch':>14}" for w in windows)
+    cycles = report["parameters"]["cycles"] > 1
+    header += f"{'p50 ms':>9}{'p99 ms':>9}" + (f"{'windows':>9}" if cycles else "")
+    header += f"{'idle CPU':>10}{'period ms':>11}{'late p99':>10}"
+    print(header)
+    for name, entry in report["strategies"].items():
+        row = f"{name:<20}"
+        for w in windows:
+            row += f"{entry['windows'][w]['catch_probability'] * 100:>13.1f}%"
+        # Latency columns use the longest window, where every strategy catches most devices
+        longest = entry["windows"][windows[-1]]
+        for key in ("detect_p50_ms", "detect_p99_ms"):
+            row += f"{longest[key]:>9.1f}" if longest[key] is not None else f"{'-':>9}"
+        if cycles:
+            used = longest["mean_windows_to_catch"]
+            row += f"{used:>9.2f}" if used is not None else f"{'-':>9}"
+        idle = entry.get("idle_cpu_percent")
+        row += f"{idle:>9.1f}%" if idle is not None else f"{'-':>10}"
+        if "poll" in entry:
+            row += f"{entry['poll']['mean_period_ms']:>11.2f}{entry['poll']['late_p99_ms']:>10.3f}"
+        print(row)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Catch probability per detection strategy and window length")
+    parser.add_argument("--timelines", type=int, default=DEFAULT_TIMELINES, help="Timelines per window length")
+    parser.add_argument("--windows", type=int, nargs="+", default=DEFAULT_WINDOWS_MS, help="Window lengths in ms")
+    parser.add_argument("--window-jitter", type=float, default=0.1, help="Relative jitter of each window (0.1 = +/-10%%)")
+    parser.add_argument("--sleep-jitter", type=float, default=1.0, help="Std dev of sleep overshoot in ms")
+    parser.add_argument("--scan-cost", type=float, default=0.5, help="Time one USB enumeration takes in ms")
+    parser.add_argument("--catch-cost", type=float, default=1.0, help="Time from enumeration to freeze command in ms")
+    parser.add_argument("--cycles", type=int, default=1, help="Bootloop windows per timeline")
+    parser.add_argument("--period", type=float, default=2.0, help="Seconds between bootloop windows")
+    parser.add_argument("--catch-failure", type=float, default=0.0, help="Chance a catch attempt fails inside the window")
+    parser.add_argument("--max-offset", type=float, default=0.5, help="Latest device appearance in seconds")
+    parser.add_argument("--horizon", type=float, default=0.5, help="Seconds to keep polling after the window closes")
+    parser.add_argument("--idle-seconds", type=float, default=1.0, help="Real seconds per idle CPU measurement (0 to skip)")
+    parser.add_argument("--recording", help="Take window lengths from a USB timeline recording")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--json", help="Write the report as JSON to this path")
+    args = parser.parse_args(argv)
+
+    report = run_benchmark(args)
+    print_table(report)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+            f.write("\n")
+        print(f"\nReport written to {args.json}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,109 @@
+import os
+import sys
+import time
+import tempfile
+import importlib
+from unittest.mock import patch
+
+# Add the repo root to sys.path so we can import pacman_toolkit
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from pacman_toolkit import fastboot_emulator as emu
+from pacman_toolkit import fastboot_client
+
+BOOT_SIZE = 32 * 1024 * 1024
+VBMETA_SIZE = 8192
+
+# label, device settings
+SCENARIOS = [
+    ("USB 2.0, 75ms window", dict(bandwidth=40e6, latency=0.0005, window=0.075)),
+    ("USB 3.0, 75ms window", dict(bandwidth=300e6, latency=0.0002, window=0.075)),
+    ("Slow hub, 40ms window", dict(bandwidth=25e6, latency=0.002, window=0.040)),
+    ("eMMC-bound flash", dict(bandwidth=40e6, latency=0.0005, window=0.075, flash_bandwidth=60e6)),
+    ("FAIL on boot_b", dict(bandwidth=40e6, latency=0.0005, window=0.075, fail={"flash:boot_b": "write error"})),
+    ("Disconnect mid-flash", dict(bandwidth=40e6, latency=0.0005, window=0.075, disconnect_after_bytes=BOOT_SIZE // 2)),
+]
+
+APPEAR_AT = 0.2
+TIMEOUT = 3.0
+
+def make_images(tmpdir):
+    images = {}
+    for name, size in (("boot.img", BOOT_SIZE), ("vbmeta.img", VBMETA_SIZE)):
+        path = os.path.join(tmpdir, name)
+        with open(path, 'wb') as f:
+            f.write(os.urandom(size))
+        images[name] = path
+    return images
+
+def run_scenario(settings, images):
+    state = emu.FastbootDevice(appear_at=APPEAR_AT, **settings)
+    bus = emu.EmulatedBus([state])
+    with bus.installed():
+        import pacman_toolkit.pacman_interceptor as interceptor
+        interceptor = importlib.reload(interceptor)
+        interceptor.load_usb()
+
+    result = {"caught": False, "flashed": False, "error": None, "steps": []}
+
+    def native_rescue(mode):
+        # Same sequence as flash_rescue.sh fastboot mode, over the emulated USB link
+        dev = bus.core.find(idVendor=state.idVendor, idProduct=state.idProduct)
+        result["caught"] = True
+        result["flash_start"] = time.monotonic()
+        try:
+            with fastboot_client.FastbootClient(dev, bus.util) as client:
+                result["steps"] = fastboot_client.flash_rescue(client, images)
+            result["flashed"] = True
+        except (fastboot_client.FastbootError, emu.USBError) as e:
+            result["error"] = str(e)
+        result["flash_end"] = time.monotonic()
+        return 0
+
+    start_wall = time.monotonic()
+    real_sleep = time.sleep
+
+    def stop_after_timeout(duration):
+        # time.sleep is module-global, so the emulator's pacing lands here too
+        if not result["caught"] and time.monotonic() - start_wall > TIMEOUT:
+            raise StopIteration("Timeout")
+        real_sleep(duration)
+
+    with patch.object(interceptor, 'run_rescue', native_rescue), \
+         patch.object(interceptor, 'check_prerequisites', lambda: None), \
+         patch.object(interceptor, 'print_instructions', lambda: None), \
+         patch.object(interceptor, 'log', lambda *a, **k: None), \
+         patch.object(interceptor, 'Renderer') as mock_spinner, \
+         patch.object(interceptor.time, 'sleep', stop_after_timeout):
+        mock_spinner.return_value.running = False
+        bus.restart_clock()
+        appear_time = bus.start_time + APPEAR_AT
+        try:
+            interceptor.main()
+        except (SystemExit, StopIteration):
+            pass
+
+    if state.first_command_at is not None:
+        result["detect_latency"] = state.first_command_at - appear_time
+    if "flash_end" in result:
+        result["total"] = result["flash_end"] - appear_time
+        result["flash_time"] = result["flash_end"] - result["flash_start"]
+        result["mb_per_s"] = state.bytes_received / result["flash_time"] / 1e6
+    return result
+
+def run_benchmark():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        images = make_images(tmpdir)
+        print(f"boot.img {BOOT_SIZE // (1024 * 1024)} MB, device appears at t={APPEAR_AT}s\n")
+        print(f"{'scenario':<24} {'caught':>6} {'detect ms':>10} {'flash s':>8} {'MB/s':>7} {'total s':>8}  result")
+        for label, settings in SCENARIOS:
+            r = run_scenario(settings, images)
+            detect = f"{r['detect_latency'] * 1000:.1f}" if "detect_latency" in r else "-"
+            flash = f"{r['flash_time']:.2f}" if "flash_time" in r else "-"
+            rate = f"{r['mb_per_s']:.1f}" if "mb_per_s" in r else "-"
+            total = f"{r['total']:.2f}" if "total" in r else "-"
+            outcome = "OK" if r["flashed"] else (r["error"] or "missed")
+            print(f"{label:<24} {str(r['caught']):>6} {detect:>10} {flash:>8} {rate:>7} {total:>8}  {outcome}")
+
+if __name__ == "__main__":
+    run_benchmark()
@@ -0,0 +1,129 @@
+"""
+Firmware discovery on a large synthetic tree: one os.walk per wanted file
+(the old manager search) vs. file_search's single pass, serial and
+threaded, with and without stopping once everything is found.
+
+Builds a tree of empty files (1,000,000 by default, 100 per directory) and
+hides the firmware images in it: boot.img and vbmeta.img in the middle,
+preloader_raw.img and lk.bin (RAW_NAMES aliases) three quarters of the way in.
+The tree is kept in --tree and reused on later runs.
+
+    python3 tests/benchmark_file_search.py
+    python3 tests/benchmark_file_search.py --files 200000 --tree /tmp/fw-tree
+    sudo python3 tests/benchmark_file_search.py --drop-caches   # cold cache per run
+"""
+import os
+import sys
+import time
+import argparse
+import tempfile
+
+# Add the repo root to sys.path so we can import pacman_toolkit
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from pacman_toolkit import file_search
+
+TARGETS = ["boot.img", "vbmeta.img", "preloader.img", "lk.img"]
+RAW_NAMES = {'preloader_raw.img': 'preloader.img', 'lk': 'lk.img', 'lk.bin': 'lk.img'}
+FILES_PER_DIR = 100
+FANOUT = 10
+
+def build_tree(root, files):
+    marker = os.path.join(root, f".tree-{files}")
+    if os.path.exists(marker):
+        return
+    dirs = max(1, files // FILES_PER_DIR)
+    placed = {dirs // 2: ["boot.img"], dirs // 2 + 1: ["vbmeta.img"],
+              dirs * 3 // 4: ["preloader_raw.img"], dirs * 3 // 4 + 1: ["lk.bin"]}
+    print(f"Building {files} files in {dirs} directories under {root} ...", flush=True)
+    for d in range(dirs):
+        # d -> a/b/c/... path with FANOUT-way branching
+        parts, n = [], d
+        while True:
+            parts.append(f"d{n % FANOUT}")
+            n //= FANOUT
+            if not n:
+                break
+        path = os.path.join(root, *reversed(parts), "leaf")
+        os.makedirs(path, exist_ok=True)
+        names = [f"file{i}.dat" for i in range(FILES_PER_DIR)]
+        names[:len(placed.get(d, []))] = placed.get(d, [])
+        for name in names:
+            open(os.path.join(path, name), "wb").close()
+    # Noise the search must skip
+    for pruned in (".git", "node_modules", ".cache"):
+        os.makedirs(os.path.join(root, pruned, "objects"), exist_ok=True)
+    open(marker, "w").close()
+
+def drop_caches():
+    os.sync()
+    with open("/proc/sys/vm/drop_caches", "w") as f:
+        f.write("3\n")
+
+def walk_per_file(root):
+    """What find_file_interactive used to do: one os.walk per file."""
+    found, dirs_listed = {}, 0
+    names = {target: [target] + [a for a, t in RAW_NAMES.items() if t == target] for target in TARGETS}
+    for target, wanted in names.items():
+        for dirpath, dirs, files in os.walk(root):
+            dirs_listed += 1
+            dirs[:] = [d for d in dirs if d not in ('.git', 'node_modules', '.cache')]
+            hit = next((name for name in wanted if name in files), None)
+            if hit:
+                found[target] = os.path.join(dirpath, hit)
+                break
+    return found, dirs_listed
+
+def run(label, fn, cold):
+    if cold:
+        drop_caches()
+    start = time.perf_counter()
+    found, dirs = fn()
+    return label, time.perf_counter() - start, dirs, len(found)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Firmware search on a synthetic tree")
+    parser.add_argument("--files", type=int, default=1_000_000)
+    parser.add_argument("--tree", help="Where to build/reuse the tree (default: a temp dir, removed afterwards)")
+    parser.add_argument("--workers", type=int, default=file_search.DEFAULT_WORKERS)
+    parser.add_argument("--drop-caches", action="store_true", help="Drop the page cache before each run (root)")
+    args = parser.parse_args(argv)
+
+    tmp = None
+    root = args.tree
+    if not root:
+        tmp = tempfile.TemporaryDirectory()
+        root = tmp.name
+    os.makedirs(root, exist_ok=True)
+    start = time.perf_counter()
+    build_tree(root, args.files)
+    print(f"Tree ready in {time.perf_counter() - start:.1f}s\n")
+
+    matcher = file_search.Matcher(TARGETS, aliases=RAW_NAMES)
+
+    def engine(workers, stop):
+        def go():
+            result = file_search.search([root], matcher, workers=workers, stop_when_found=stop)
+            return result.best, result.stats["dirs"]
+        return go
+
+    # Warm the cache once so the first row is not penalized
+    if not args.drop_caches:
+        engine(args.workers, False)()
+    runs = [
+        ("os.walk per file", lambda: walk_per_file(root)),
+        ("scandir, 1 thread", engine(1, False)),
+        (f"scandir, {args.workers} threads", engine(args.workers, False)),
+        (f"{args.workers} threads, early exit", engine(args.workers, True)),
+    ]
+    print(f"{'search':<28}{'seconds':>9}{'dirs listed':>13}{'found':>7}")
+    for label, fn in runs:
+        label, elapsed, dirs, found = run(label, fn, args.drop_caches)
+        print(f"{label:<28}{elapsed:>9.2f}{dirs:>13}{found:>5}/{len(TARGETS)}")
+    print(f"\n{args.files} files, {'cold' if args.drop_caches else 'warm'} page cache")
+    if tmp:
+        tmp.cleanup()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -29,6 +29,7 @@ module_patches = {
 
 with unittest.mock.patch.dict(sys.modules, module_patches):
     import pacman_interceptor
+    pacman_interceptor.load_usb()
 
 def run_benchmark():
     # Mock check_prerequisites
@@ -37,18 +38,16 @@ def run_benchmark():
     # Capture sleep calls
     sleep_calls = []
 
-    original_sleep = time.sleep
-
-    def mock_sleep(duration):
+    def mock_sleep(session, duration):
         sleep_calls.append(duration)
         if len(sleep_calls) >= 10:  # Run for limited calls
             raise StopIteration("Benchmark complete")
 
-    # Patch time.sleep in the module
-    pacman_interceptor.time.sleep = mock_sleep
+    # Patch the detection loop's sleep (main() runs an Interceptor)
+    pacman_interceptor.Interceptor._sleep = mock_sleep
 
     # Patch usb.core.find in the module (it might have been imported)
-    # Since pacman_interceptor does `import usb.core`, we need to patch the attribute on the module
+    # load_usb() bound the mock `usb` package on the module, so patch it there
     pacman_interceptor.usb.core.find.return_value = []
 
     print("Starting benchmark loop...")
@@ -0,0 +1,126 @@
+"""
+Latency that logging adds to the catch path: synchronous StreamHandler
+(the old basicConfig setup) vs. the toolkit_logging queue.
+
+Polls a mock device with an Interceptor shown by main()'s ConsoleView and
+measures the time from the poll to claim_interface(), the step that has to
+win the race against the bootloader. The view logs the detection on the way
+there. stderr is replaced by a stream whose writes block for
+--write-latency ms (slow ssh or serial console). The renderer is not
+running here, so log() goes straight to the logger.
+
+    python3 tests/benchmark_logging.py
+    python3 tests/benchmark_logging.py --write-latency 0 --runs 500
+"""
+import os
+import sys
+import time
+import logging
+import argparse
+import tempfile
+from unittest.mock import MagicMock, patch
+
+# Add the repo root to sys.path so we can import pacman_toolkit
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+for name in ('usb', 'usb.core', 'usb.util'):
+    sys.modules.setdefault(name, MagicMock())
+
+from pacman_toolkit import pacman_interceptor as interceptor
+from pacman_toolkit import toolkit_logging
+
+interceptor.load_usb()
+
+class SlowStream:
+    def __init__(self, latency):
+        self.latency = latency
+
+    def write(self, text):
+        if self.latency:
+            time.sleep(self.latency)
+        return len(text)
+
+    def flush(self):
+        pass
+
+class Claimed(BaseException):
+    # Not an Exception, so the poll doesn't count it as a failed attempt
+    pass
+
+def time_to_claim(runs):
+    dev = MagicMock()
+    dev.idVendor, dev.idProduct = interceptor.VID_GOOGLE, 0x4ee0
+    dev.is_kernel_driver_active.return_value = False
+    claimed = []
+
+    def claim(*args):
+        claimed.append(time.perf_counter())
+        # Stop here: the rest of the catch is not what is being measured
+        raise Claimed()
+
+    session = interceptor.Interceptor(find=lambda: [dev])
+    session.on_event = interceptor.ConsoleView(session, MagicMock()).show
+    samples = []
+    with patch.object(interceptor.usb.util, 'claim_interface', side_effect=claim), \
+         patch.object(interceptor, 'spinner', None):
+        for _ in range(runs):
+            # A fresh tracker, so every poll attempts the catch
+            session.tracker = interceptor.build_retry_tracker()
+            start = time.perf_counter()
+            try:
+                session.poll()
+            except Claimed:
+                pass
+            samples.append(claimed[-1] - start)
+    return samples
+
+def measure(mode, stream, runs, jsonl_dir):
+    root = logging.getLogger()
+    toolkit_logging.shutdown()
+    root.handlers = []
+    if mode == "sync":
+        handler = logging.StreamHandler(stream)
+        handler.setFormatter(logging.Formatter(toolkit_logging.FORMAT))
+        root.addHandler(handler)
+    else:
+        jsonl = os.path.join(jsonl_dir, "log.jsonl") if mode == "queue+jsonl" else None
+        toolkit_logging.configure(stream=stream, jsonl_path=jsonl)
+    try:
+        samples = time_to_claim(runs)
+        drain = time.perf_counter()
+        toolkit_logging.flush(timeout=None)
+        return samples, time.perf_counter() - drain
+    finally:
+        toolkit_logging.shutdown()
+        for handler in root.handlers:
+            handler.close()
+        root.handlers = []
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p / 100.0))]
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Catch-path logging latency, synchronous vs. queued")
+    parser.add_argument("--runs", type=int, default=100)
+    parser.add_argument("--write-latency", type=float, default=2.0, help="Blocking time per stderr write in ms")
+    args = parser.parse_args(argv)
+
+    stream = SlowStream(args.write_latency / 1000.0)
+    saved = logging.getLogger().handlers[:]
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for mode in ("sync", "queue", "queue+jsonl"):
+            results.append((mode,) + measure(mode, stream, args.runs, tmp))
+    logging.getLogger().handlers = saved
+
+    print(f"{args.runs} catch attempts, {args.write_latency:g} ms per stderr write\n")
+    print(f"{'logging':<13}{'p50 ms':>9}{'p99 ms':>9}{'max ms':>9}{'drain ms':>10}")
+    for mode, samples, drain in results:
+        print(f"{mode:<13}{percentile(samples, 50) * 1000:>9.3f}{percentile(samples, 99) * 1000:>9.3f}"
+              f"{max(samples) * 1000:>9.3f}{drain * 1000:>10.1f}")
+    print("\n(time from the poll to claim_interface(); drain = writer backlog left afterwards)")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
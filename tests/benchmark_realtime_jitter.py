@@ -0,0 +1,97 @@
+"""
+Poll jitter under CPU load: normal scheduling vs. the interceptor's
+real-time modes.
+
+Starts busy-looping load processes (2 per CPU by default), then runs a
+TickScheduler loop with a little per-tick work in each mode and reports
+wake-up lateness. SCHED_FIFO/RR need root or CAP_SYS_NICE; without them
+those rows show what the fallback does.
+
+    sudo python3 tests/benchmark_realtime_jitter.py
+    python3 tests/benchmark_realtime_jitter.py --duration 3 --interval 5 --load 8
+"""
+import os
+import sys
+import time
+import argparse
+import multiprocessing
+
+# Add the repo root to sys.path so we can import pacman_toolkit
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from pacman_toolkit import realtime
+from pacman_toolkit.tick_scheduler import TickScheduler
+
+# label, RealtimeMode arguments (None = normal scheduling)
+MODES = [
+    ("normal", None),
+    ("pinned", dict(policy=None)),
+    ("fifo", dict(policy="fifo")),
+    ("rr", dict(policy="rr")),
+]
+
+def burn(stop):
+    x = 0
+    while not stop.is_set():
+        for i in range(10000):
+            x += i * i
+
+def poll_work():
+    # Roughly what filtering one enumeration result costs
+    return sum(range(2000))
+
+def measure(mode_args, interval, duration, cpu):
+    rt = realtime.RealtimeMode(cpu=cpu, **mode_args) if mode_args is not None else None
+    if rt:
+        rt.apply()
+    try:
+        ticks = TickScheduler(interval)
+        end = time.monotonic() + duration
+        while time.monotonic() < end:
+            poll_work()
+            ticks.wait()
+        stats = ticks.stats()
+        stats["applied"] = rt.describe() if rt else "normal scheduling"
+        stats["messages"] = list(rt.messages) if rt else []
+        return stats
+    finally:
+        if rt:
+            rt.restore()
+
+def run_benchmark(args):
+    stop = multiprocessing.Event()
+    workers = [multiprocessing.Process(target=burn, args=(stop,), daemon=True) for _ in range(args.load)]
+    for w in workers:
+        w.start()
+    results = []
+    try:
+        # Let the load settle onto the CPUs
+        time.sleep(0.5)
+        for label, mode_args in MODES:
+            results.append((label, measure(mode_args, args.interval / 1000.0, args.duration, args.cpu)))
+    finally:
+        stop.set()
+        for w in workers:
+            w.join(timeout=2)
+    return results
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Poll jitter under load, normal vs. real-time")
+    parser.add_argument("--duration", type=float, default=5.0, help="Seconds per mode")
+    parser.add_argument("--interval", type=float, default=10.0, help="Tick interval in ms")
+    parser.add_argument("--load", type=int, default=2 * (os.cpu_count() or 1), help="Busy-loop load processes")
+    parser.add_argument("--cpu", type=int, help="CPU to pin to (default: highest allowed)")
+    args = parser.parse_args(argv)
+
+    print(f"{args.load} load processes on {os.cpu_count()} CPUs, {args.interval:g} ms ticks, {args.duration:g}s per mode\n")
+    results = run_benchmark(args)
+    print(f"{'mode':<8}{'ticks':>7}{'period ms':>11}{'p50 ms':>9}{'p99 ms':>9}{'max ms':>9}{'overruns':>10}  applied")
+    for label, s in results:
+        print(f"{label:<8}{s['ticks']:>7}{s['mean_period_ms']:>11.2f}{s['late_p50_ms']:>9.3f}"
+              f"{s['late_p99_ms']:>9.3f}{s['late_max_ms']:>9.3f}{s['overruns']:>10}  {s['applied']}")
+        for message in s["messages"]:
+            print(f"{'':<8}  {message}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,114 @@
+"""
+Poll-loop cost of terminal output on a slow terminal: the old inline
+Spinner (update() on every poll, log() stopping and restarting it) vs. the
+Renderer thread.
+
+stdout is replaced by a stream whose writes block for --write-latency ms,
+as over a congested ssh session or a serial console. The loop does what the
+poll loop does for the terminal and the time each iteration spends in that
+code is reported.
+
+    python3 tests/benchmark_renderer.py
+    python3 tests/benchmark_renderer.py --write-latency 20 --log-every 5
+"""
+import os
+import sys
+import time
+import logging
+import argparse
+from unittest.mock import MagicMock, patch
+
+# Add the repo root to sys.path so we can import pacman_toolkit
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+for name in ('usb', 'usb.core', 'usb.util'):
+    sys.modules.setdefault(name, MagicMock())
+
+from pacman_toolkit import pacman_interceptor as interceptor
+
+class SlowStream:
+    def __init__(self, latency):
+        self.latency = latency
+        self.writes = 0
+
+    def write(self, text):
+        self.writes += 1
+        time.sleep(self.latency)
+        return len(text)
+
+    def flush(self):
+        time.sleep(self.latency)
+
+    def isatty(self):
+        return True
+
+def inline_spinner(iterations, interval, log_every):
+    spinner = interceptor.Spinner("Waiting for device connection...")
+    interceptor.spinner = spinner
+    spinner.start()
+    costs = []
+    for i in range(iterations):
+        start = time.perf_counter()
+        spinner.update()
+        if log_every and i % log_every == 0:
+            # What log() used to do around every message
+            spinner.stop()
+            interceptor.logger.info(f"[PACMAN-INTERCEPTOR] message {i}")
+            spinner.start()
+        costs.append(time.perf_counter() - start)
+        time.sleep(interval)
+    spinner.stop()
+    return costs
+
+def renderer_thread(iterations, interval, log_every):
+    renderer = interceptor.Renderer("Waiting for device connection...")
+    interceptor.spinner = renderer
+    renderer.start()
+    costs = []
+    for i in range(iterations):
+        start = time.perf_counter()
+        renderer.update((("brom", i % 3),) if i % 10 == 0 else ())
+        if log_every and i % log_every == 0:
+            interceptor.log(f"message {i}")
+        costs.append(time.perf_counter() - start)
+        time.sleep(interval)
+    drain = time.perf_counter()
+    renderer.stop()
+    return costs, time.perf_counter() - drain
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p / 100.0))]
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Poll-loop terminal cost, inline spinner vs. renderer thread")
+    parser.add_argument("--iterations", type=int, default=200)
+    parser.add_argument("--interval", type=float, default=50.0, help="Poll interval in ms")
+    parser.add_argument("--write-latency", type=float, default=10.0, help="Blocking time per write/flush in ms")
+    parser.add_argument("--log-every", type=int, default=20, help="Log a message every N polls (0: never)")
+    args = parser.parse_args(argv)
+
+    stream = SlowStream(args.write_latency / 1000.0)
+    handler = logging.StreamHandler(stream)
+    interceptor.logger.addHandler(handler)
+    interceptor.logger.propagate = False
+    try:
+        with patch('sys.stdout', stream):
+            inline = inline_spinner(args.iterations, args.interval / 1000.0, args.log_every)
+            threaded, drain = renderer_thread(args.iterations, args.interval / 1000.0, args.log_every)
+    finally:
+        interceptor.logger.removeHandler(handler)
+        interceptor.logger.propagate = True
+        interceptor.spinner = None
+
+    print(f"{args.iterations} polls at {args.interval:g} ms, {args.write_latency:g} ms per terminal write, "
+          f"a log line every {args.log_every} polls\n")
+    print(f"{'mode':<10}{'p50 ms':>9}{'p99 ms':>9}{'max ms':>9}{'total ms':>10}")
+    for label, costs in (("inline", inline), ("renderer", threaded)):
+        print(f"{label:<10}{percentile(costs, 50) * 1000:>9.3f}{percentile(costs, 99) * 1000:>9.3f}"
+              f"{max(costs) * 1000:>9.3f}{sum(costs) * 1000:>10.1f}")
+    print(f"\nRenderer drained its queue in {drain * 1000:.1f} ms on stop()")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
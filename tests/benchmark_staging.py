@@ -0,0 +1,77 @@
+"""
+Firmware staging cost: the old store ingest (hash, then a buffered copy
+through userspace) vs. firmware_store.stage_file with each strategy forced.
+Strategies the filesystem does not support are reported as such.
+
+    python3 tests/benchmark_staging.py
+    python3 tests/benchmark_staging.py --size-mb 1024 --dir /mnt/btrfs   # reflinks need btrfs/xfs
+"""
+import os
+import sys
+import time
+import argparse
+import tempfile
+
+# Add the repo root to sys.path so we can import pacman_toolkit
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from pacman_toolkit import firmware_store
+
+def old_ingest(src, dst):
+    """What FirmwareStore.add_file used to do for a new image: hash, then re-read and copy."""
+    with open(src, 'rb') as f:
+        firmware_store._hash_stream(f)
+    with open(src, 'rb') as s, open(dst, 'wb') as d:
+        while True:
+            chunk = s.read(firmware_store.CHUNK_SIZE)
+            if not chunk:
+                break
+            d.write(chunk)
+
+def new_ingest(src, dst, strategies):
+    """Hash once for deduplication, then stage and verify."""
+    with open(src, 'rb') as f:
+        digest, _ = firmware_store._hash_stream(f)
+    return firmware_store.stage_file(src, dst, digest, strategies)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Firmware staging strategies")
+    parser.add_argument("--size-mb", type=int, default=256)
+    parser.add_argument("--dir", help="Directory to stage in (default: a temp dir)")
+    parser.add_argument("--runs", type=int, default=3)
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory(dir=args.dir) as tmp:
+        src = os.path.join(tmp, "boot.img")
+        block = os.urandom(firmware_store.CHUNK_SIZE)
+        with open(src, 'wb') as f:
+            for _ in range(args.size_mb):
+                f.write(block)
+        size = os.path.getsize(src)
+        dst = os.path.join(tmp, "staged.img")
+
+        cases = [("old ingest (hash + copy)", lambda: old_ingest(src, dst))]
+        for strategy in firmware_store.STAGE_STRATEGIES:
+            cases.append((f"ingest via {strategy}", lambda s=strategy: new_ingest(src, dst, (s,))))
+        cases.append(("stage_file, no verify", lambda: firmware_store.stage_file(src, dst)))
+
+        print(f"{args.size_mb} MB image in {tmp}, best of {args.runs}\n")
+        print(f"{'case':<28}{'seconds':>9}{'MB/s':>10}  strategy")
+        for label, fn in cases:
+            best, strategy = None, "-"
+            try:
+                for _ in range(args.runs):
+                    start = time.perf_counter()
+                    result = fn()
+                    elapsed = time.perf_counter() - start
+                    best = elapsed if best is None else min(best, elapsed)
+                    strategy = result.strategy if result else "copy"
+                    os.remove(dst)
+            except OSError as e:
+                print(f"{label:<28}{'unsupported':>19}  ({e.strerror or e})")
+                continue
+            print(f"{label:<28}{best:>9.3f}{size / best / 1e6:>10.0f}  {strategy}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
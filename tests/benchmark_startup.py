@@ -0,0 +1,158 @@
+"""
+Time from launching the interceptor to its first USB enumeration.
+
+Each run starts a fresh interpreter that imports pacman_interceptor and calls
+main(); the first usb.core.find() call records the time and ends the
+process. Timestamps are CLOCK_MONOTONIC, so parent and child agree:
+
+    interpreter  process start until the script runs
+    imports      importing pacman_interceptor and what it pulls in
+    first poll   main() until the bus is enumerated for the first time
+
+"sequential" is the old order, where check_prerequisites() and the banner
+ran before main() started polling. "concurrent" is main() as shipped: the
+checks and the banner run beside the poll loop. pyusb is replaced by a
+stand-in module unless --real-usb is given, so the figures exclude loading
+libusb.
+
+    python3 tests/benchmark_startup.py
+    python3 tests/benchmark_startup.py --runs 20 --archive-mb 64
+    python3 tests/benchmark_startup.py --importtime
+"""
+import os
+import sys
+import time
+
+TESTS_DIR = os.path.dirname(os.path.abspath(__file__))
+
+def child(out_path, firmware_dir, sequential, real_usb):
+    script = time.monotonic()
+    sys.path.append(os.path.abspath(os.path.join(TESTS_DIR, '..')))
+    if not real_usb:
+        import types
+        usb = types.ModuleType("usb")
+        usb.core = types.ModuleType("usb.core")
+        usb.util = types.ModuleType("usb.util")
+        usb.core.USBError = type("USBError", (IOError,), {})
+        usb.core.find = lambda **kwargs: iter(())
+        sys.modules.update({"usb": usb, "usb.core": usb.core, "usb.util": usb.util})
+
+    from pacman_toolkit import pacman_interceptor as interceptor
+    imported = time.monotonic()
+
+    def first_find(**kwargs):
+        first_poll = time.monotonic()
+        import json
+        with open(out_path, "w") as f:
+            json.dump({"script": script, "imported": imported, "first_poll": first_poll}, f)
+        sys.stdout.flush()
+        os._exit(0)
+
+    interceptor.load_usb().core.find = first_find
+    interceptor.FIRMWARE_DIR = firmware_dir
+    if sequential:
+        interceptor.check_prerequisites()
+        interceptor.print_instructions()
+        interceptor.check_prerequisites = interceptor.print_instructions = lambda: None
+    interceptor.main()
+
+def make_firmware(path, archive_mb):
+    """A firmware directory with boot.img loose, or only inside a factory zip of `archive_mb` MB."""
+    os.makedirs(path)
+    if not archive_mb:
+        with open(os.path.join(path, "boot.img"), "wb") as f:
+            f.write(b"\0" * 4096)
+        return
+    import zipfile
+    with zipfile.ZipFile(os.path.join(path, "factory.zip"), "w", zipfile.ZIP_STORED) as zf:
+        zf.writestr("boot.img", b"\0" * 4096)
+        chunk = b"\0" * (1 << 20)
+        for i in range(archive_mb):
+            zf.writestr(f"images/part{i:03d}.img", chunk)
+
+def run_child(mode, firmware_dir, out_path, real_usb, importtime=False):
+    import subprocess
+    cmd = [sys.executable]
+    if importtime:
+        cmd += ["-X", "importtime"]
+    cmd += [os.path.abspath(__file__), "--child", out_path, "--firmware", firmware_dir]
+    if mode == "sequential":
+        cmd.append("--sequential")
+    if real_usb:
+        cmd.append("--real-usb")
+    launched = time.monotonic()
+    proc = subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+    import json
+    try:
+        with open(out_path) as f:
+            marks = json.load(f)
+    except (OSError, ValueError):
+        raise SystemExit(f"{mode}: child did not reach the first poll:\n{proc.stderr}")
+    os.unlink(out_path)
+    marks["launched"] = launched
+    return marks, proc.stderr
+
+def import_costs(stderr, top):
+    """The `top` slowest imports (cumulative) from -X importtime output."""
+    costs = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        prefix, cumulative, name = line.split("|")
+        costs.append((int(cumulative), int(prefix.split(":")[1]), name.rstrip()))
+    return sorted(costs, reverse=True)[:top]
+
+def median(values):
+    values = sorted(values)
+    return values[len(values) // 2]
+
+def main(argv=None):
+    import argparse
+    import shutil
+    import tempfile
+    parser = argparse.ArgumentParser(description="Interceptor launch to first USB enumeration")
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--archive-mb", type=int, default=0,
+                        help="Put boot.img only inside a factory zip of this size (default: loose boot.img)")
+    parser.add_argument("--real-usb", action="store_true", help="Import the installed pyusb instead of a stand-in")
+    parser.add_argument("--importtime", action="store_true", help="Also list the slowest imports (python -X importtime)")
+    parser.add_argument("--child", metavar="OUT", help=argparse.SUPPRESS)
+    parser.add_argument("--firmware", help=argparse.SUPPRESS)
+    parser.add_argument("--sequential", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.child:
+        child(args.child, args.firmware, args.sequential, args.real_usb)
+        return 1
+
+    tmp = tempfile.mkdtemp()
+    try:
+        firmware_dir = os.path.join(tmp, "firmware")
+        make_firmware(firmware_dir, args.archive_mb)
+        out_path = os.path.join(tmp, "marks.json")
+        rows = {}
+        for mode in ("sequential", "concurrent"):
+            # Warm the page cache and .pyc files first
+            run_child(mode, firmware_dir, out_path, args.real_usb)
+            runs = [run_child(mode, firmware_dir, out_path, args.real_usb)[0] for _ in range(args.runs)]
+            rows[mode] = [median([(m[b] - m[a]) * 1000 for m in runs]) for a, b in
+                          (("launched", "script"), ("script", "imported"), ("imported", "first_poll"),
+                           ("launched", "first_poll"))]
+
+        source = f"boot.img inside a {args.archive_mb} MB zip" if args.archive_mb else "loose boot.img"
+        print(f"Median of {args.runs} launches, {source}, {'real pyusb' if args.real_usb else 'pyusb stand-in'}\n")
+        print(f"{'mode':<12}{'interpreter':>13}{'imports':>10}{'first poll':>12}{'total ms':>10}")
+        for mode, row in rows.items():
+            print(f"{mode:<12}" + "".join(f"{v:>{w}.1f}" for v, w in zip(row, (13, 10, 12, 10))))
+
+        if args.importtime:
+            _, stderr = run_child("concurrent", firmware_dir, out_path, args.real_usb, importtime=True)
+            print(f"\nSlowest imports (python -X importtime, one run):\n{'cumulative us':>14}{'self us':>10}  module")
+            for cumulative, self_us, name in import_costs(stderr, 15):
+                print(f"{cumulative:>14}{self_us:>10}  {name}")
+    finally:
+        shutil.rmtree(tmp)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
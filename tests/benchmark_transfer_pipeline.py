@@ -0,0 +1,49 @@
+import os
+import sys
+import tempfile
+
+# Add the repo root to sys.path so we can import pacman_toolkit
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from pacman_toolkit import transfer_pipeline as tp
+
+IMAGE_SIZE = 64 * 1024 * 1024
+CHUNK_SIZE = 1024 * 1024
+
+# (label, disk MB/s, USB MB/s)
+SCENARIOS = [
+    ("USB 2.0 bus, fast SSD", 500e6, 40e6),
+    ("USB 2.0 bus, slow HDD", 60e6, 40e6),
+    ("Balanced disk and bus", 40e6, 40e6),
+]
+
+def run_case(path, disk_bw, usb_bw, buffers):
+    endpoint = tp.EmulatedEndpoint(bandwidth=usb_bw)
+    with open(path, 'rb', buffering=0) as f:
+        reader = tp.ThrottledReader(f, bandwidth=disk_bw)
+        if buffers == 0:
+            return tp.transfer_serial(reader, endpoint.write, chunk_size=CHUNK_SIZE)
+        return tp.transfer(reader, endpoint.write, chunk_size=CHUNK_SIZE, buffers=buffers)
+
+def run_benchmark():
+    with tempfile.NamedTemporaryFile(delete=False) as tmp:
+        block = os.urandom(CHUNK_SIZE)
+        for _ in range(IMAGE_SIZE // CHUNK_SIZE):
+            tmp.write(block)
+        path = tmp.name
+
+    try:
+        print(f"Image: {IMAGE_SIZE // (1024 * 1024)} MB, chunk {CHUNK_SIZE // 1024} KB\n")
+        print(f"{'scenario':<26} {'mode':<10} {'MB/s':>8} {'time s':>8} {'stall ms':>10} {'backpr. ms':>11}")
+        for label, disk_bw, usb_bw in SCENARIOS:
+            for buffers in (0, 2, 3):
+                mode = "serial" if buffers == 0 else f"{buffers} bufs"
+                stats = run_case(path, disk_bw, usb_bw, buffers)
+                print(f"{label:<26} {mode:<10} {stats.mb_per_s:>8.1f} {stats.elapsed:>8.2f} "
+                      f"{stats.read_stall * 1000:>10.1f} {stats.write_backpressure * 1000:>11.1f}")
+            print("")
+    finally:
+        os.remove(path)
+
+if __name__ == "__main__":
+    run_benchmark()
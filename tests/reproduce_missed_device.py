@@ -42,6 +42,7 @@ module_patches = {
 
 with unittest.mock.patch.dict(sys.modules, module_patches):
     import pacman_interceptor
+    pacman_interceptor.load_usb()
 
 def run_test(polling_interval, window_duration=0.075):
     # Set POLLING_INTERVAL
@@ -50,15 +51,15 @@ def run_test(polling_interval, window_duration=0.075):
     # Mock check_prerequisites
     pacman_interceptor.check_prerequisites = lambda: None
 
-    # Mock catch_fastboot to stop the loop when called (simulating success)
+    # Mock catch_device to stop the loop when called (simulating success)
     caught = False
 
-    def mock_catch_fastboot(dev):
+    def mock_catch_device(dev, mode, before_payload=None):
         nonlocal caught
         caught = True
         raise SystemExit("Caught Device!")
 
-    pacman_interceptor.catch_fastboot = mock_catch_fastboot
+    pacman_interceptor.catch_device = mock_catch_device
 
     # Set device present window
     start_time = time.time() + 0.02 # Small delay before device appears
@@ -70,14 +71,14 @@ def run_test(polling_interval, window_duration=0.075):
     # Run main for a short duration
     start_run = time.time()
     try:
-        # Patch time.sleep to use real sleep but stop after duration
-        original_sleep = time.sleep
-        def controlled_sleep(duration):
+        # Patch the loop's sleep to use real sleep but stop after duration
+        original_sleep = pacman_interceptor.Interceptor._sleep
+        def controlled_sleep(session, duration):
             if time.time() - start_run > 0.5: # Run for max 0.5s
                 raise StopIteration("Timeout")
-            original_sleep(duration)
+            original_sleep(session, duration)
 
-        pacman_interceptor.time.sleep = controlled_sleep
+        pacman_interceptor.Interceptor._sleep = controlled_sleep
 
         # Suppress spinner output
         pacman_interceptor.spinner = None
@@ -99,7 +100,7 @@ def run_test(polling_interval, window_duration=0.075):
         return False
     finally:
         # Restore sleep
-        pacman_interceptor.time.sleep = original_sleep
+        pacman_interceptor.Interceptor._sleep = original_sleep
 
     return False
 
@@ -0,0 +1,148 @@
+import unittest
+from unittest.mock import patch
+import os
+import sys
+import json
+import shutil
+import tempfile
+import threading
+import importlib
+
+# Add the repo root to sys.path so we can import pacman_toolkit
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from pacman_toolkit import fastboot_emulator as emu
+from pacman_toolkit import batch_jobs
+from pacman_toolkit.batch_jobs import DeviceWatcher, Job, JobError
+
+FAST = dict(bandwidth=1e9, latency=0)
+
+def device(serial, address, **kwargs):
+    return emu.FastbootDevice(serial=serial, address=address, port_numbers=(address,), **{**FAST, **kwargs})
+
+class BatchTestCase(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.image = os.path.join(self.tmp, "magisk_patched.img")
+        with open(self.image, "wb") as f:
+            f.write(b"rooted")
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def install(self, *devices):
+        bus = emu.EmulatedBus(list(devices))
+        with bus.installed():
+            import pacman_toolkit.pacman_interceptor as interceptor
+            self.interceptor = importlib.reload(interceptor)
+            self.interceptor.load_usb()
+        return DeviceWatcher(interval=0.01, find=lambda: bus.core.find(find_all=True))
+
+class TestJobFile(BatchTestCase):
+    def write(self, jobs):
+        path = os.path.join(self.tmp, "jobs.json")
+        with open(path, "w") as f:
+            json.dump(jobs, f)
+        return path
+
+    def test_load(self):
+        jobs = batch_jobs.load_jobs(self.write({"jobs": [
+            {"serial": "A1", "op": "root", "image": "magisk_patched.img"},
+            {"serial": "B2", "op": "rescue", "timeout": 30},
+            {"serial": "C3", "op": "unlock", "confirm_wipe": True},
+        ]}), timeout=60)
+        self.assertEqual([(j.serial, j.op, j.timeout) for j in jobs],
+                         [("A1", "root", 60), ("B2", "rescue", 30), ("C3", "unlock", 60)])
+        # Relative to the job file, not the working directory
+        self.assertEqual(jobs[0].image, self.image)
+
+    def test_invalid_jobs(self):
+        for jobs in ([{"serial": "A1", "op": "unlock"}],
+                     [{"serial": "A1", "op": "format"}],
+                     [{"op": "rescue"}],
+                     [{"serial": "A1", "op": "root", "image": "missing.img"}],
+                     [{"serial": "A1", "op": "rescue", "retries": 3}],
+                     [{"serial": "A1", "op": "rescue"}, {"serial": "A1", "op": "rescue"}],
+                     {"serial": "A1"}):
+            with self.assertRaises(JobError, msg=jobs):
+                batch_jobs.load_jobs(self.write(jobs))
+
+class TestDeviceWatcher(BatchTestCase):
+    def test_waits_for_serial(self):
+        watcher = self.install(device("A1", 5, appear_at=0.1), device("B2", 6))
+        with watcher:
+            dev, mode = watcher.wait("A1", ("fastboot",), 5)
+            self.assertEqual((dev.serial_number, mode), ("A1", "fastboot"))
+            self.assertIsNone(watcher.wait("Z9", ("fastboot",), 0.1))
+            self.assertIsNone(watcher.wait("B2", ("brom",), 0.1))
+
+    def test_stop_wakes_waiters(self):
+        watcher = self.install().start()
+        threading.Timer(0.1, watcher.stop).start()
+        self.assertIsNone(watcher.wait("A1", ("fastboot",), 30))
+
+class TestRunJobs(BatchTestCase):
+    def test_jobs_run_concurrently_on_their_own_device(self):
+        watcher = self.install(device("A1", 5), device("B2", 6, appear_at=0.05))
+        both_flashing = threading.Barrier(2, timeout=5)
+        calls = []
+
+        def fastboot(serial, *args):
+            if args[:2] == ("flash", "boot_a"):
+                # Only passes if both jobs are flashing at the same time
+                both_flashing.wait()
+            calls.append((serial,) + args)
+
+        jobs = [Job("A1", "root", self.image), Job("B2", "root", self.image), Job("C3", "root", self.image, timeout=0.2)]
+        with patch.object(batch_jobs, "_fastboot", side_effect=fastboot):
+            results = batch_jobs.run_jobs(jobs, workers=3, watcher=watcher)
+
+        self.assertEqual([r.ok for r in results], [True, True, False])
+        self.assertIn("not seen", results[2].message)
+        for serial in ("A1", "B2"):
+            self.assertEqual([c[1:] for c in calls if c[0] == serial],
+                             [("flash", "boot_a", self.image), ("flash", "boot_b", self.image), ("reboot",)])
+
+    def test_rescue_freezes_and_pins_the_device(self):
+        state = device("A1", 5, window=5)
+        watcher = self.install(state)
+        with patch.object(self.interceptor, "run_rescue", return_value=0) as rescue, \
+             patch.object(self.interceptor, "log"):
+            results = batch_jobs.run_jobs([Job("A1", "rescue")], watcher=watcher)
+        self.assertTrue(results[0].ok)
+        self.assertEqual(state.commands, ["getvar:all"])
+        rescue.assert_called_once_with("fastboot", serial="A1")
+
+    def test_failed_command_fails_only_its_job(self):
+        watcher = self.install(device("A1", 5), device("B2", 6))
+
+        def fastboot(serial, *args):
+            if serial == "A1":
+                raise JobError("fastboot flashing unlock failed: FAILED (remote: 'locked')")
+
+        jobs = [Job("A1", "unlock", confirm_wipe=True), Job("B2", "unlock", confirm_wipe=True)]
+        with patch.object(batch_jobs, "_fastboot", side_effect=fastboot):
+            results = batch_jobs.run_jobs(jobs, watcher=watcher)
+        self.assertEqual([r.ok for r in results], [False, True])
+        self.assertIn("locked", results[0].message)
+
+class TestManagerCommands(BatchTestCase):
+    def test_unlock_requires_confirmation(self):
+        from pacman_toolkit import pacman_manager
+        with patch("sys.stderr"), self.assertRaises(SystemExit):
+            pacman_manager.main(["unlock", "A1"])
+        with patch("builtins.print"):
+            self.assertEqual(pacman_manager.main(["root", "A1", "--image", os.path.join(self.tmp, "nope.img")]), 2)
+
+    def test_commands_become_jobs(self):
+        from pacman_toolkit import pacman_manager
+        ok = batch_jobs.JobResult(None, True, "done", 1.0)
+        with patch.object(batch_jobs, "run_jobs") as run, patch("builtins.print"):
+            run.side_effect = lambda jobs, workers: [setattr(ok, "job", job) or ok for job in jobs]
+            self.assertEqual(pacman_manager.main(["root", "A1", "B2", "--image", self.image, "--jobs", "2"]), 0)
+        jobs, workers = run.call_args[0]
+        self.assertEqual([(j.serial, j.op, j.image) for j in jobs], [("A1", "root", self.image), ("B2", "root", self.image)])
+        self.assertEqual(workers, 2)
+
+if __name__ == '__main__':
+    unittest.main()
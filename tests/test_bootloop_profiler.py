@@ -0,0 +1,75 @@
+import unittest
+import os
+import sys
+import tempfile
+import importlib
+
+# Add the repo root to sys.path so we can import pacman_toolkit
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from pacman_toolkit import usb_timeline
+from pacman_toolkit import fastboot_emulator as emu
+
+def appearance_timeline(windows):
+    """windows: list of (vid, pid, start, end) in seconds."""
+    events = []
+    for vid, pid, start, end in windows:
+        events.append(usb_timeline.TimelineEvent(start, usb_timeline.EVENT_APPEAR, vid, pid, 1, 5))
+        events.append(usb_timeline.TimelineEvent(end, usb_timeline.EVENT_GONE, vid, pid, 1, 5))
+    events.sort(key=lambda ev: ev.t)
+    return usb_timeline.Timeline(0.0, events)
+
+class TestBootloopProfiler(unittest.TestCase):
+    def setUp(self):
+        self.bus = emu.EmulatedBus()
+        with self.bus.installed():
+            import pacman_toolkit.pacman_interceptor as interceptor
+            importlib.reload(interceptor)
+            interceptor.load_usb()
+            from pacman_toolkit import bootloop_profiler
+            self.profiler = importlib.reload(bootloop_profiler)
+        self.interceptor = interceptor
+
+    def test_device_mode(self):
+        mode = self.interceptor.device_mode
+        self.assertEqual(mode(0x0e8d, 0x0003), "brom")
+        self.assertEqual(mode(0x0e8d, 0x2000), "preloader")
+        self.assertEqual(mode(0x18d1, 0x4ee0), "fastboot")
+        self.assertIsNone(mode(0x0e8d, 0x1234))
+        self.assertIsNone(mode(0x046d, 0x4ee0))
+
+    def test_profile_and_suggest(self):
+        windows = []
+        t = 0.0
+        for _ in range(20):
+            windows.append((0x0e8d, 0x0003, t, t + 0.060))
+            windows.append((0x0e8d, 0x2000, t + 0.1, t + 0.4))
+            t += 2.0
+        modes = self.profiler.profile(appearance_timeline(windows))
+        self.assertEqual(set(modes), {"brom", "preloader"})
+        self.assertEqual(len(modes["brom"]["present"]), 20)
+        self.assertAlmostEqual(modes["brom"]["gaps"][0], 1.94)
+
+        settings = self.profiler.suggest(modes["brom"]["present"], modes["brom"]["gaps"])
+        self.assertEqual(settings["POLLING_INTERVAL"], 0.03)
+        self.assertAlmostEqual(settings["INITIAL_BACKOFF"], 0.485, delta=0.01)
+        self.assertEqual(settings["MAX_BACKOFF"], 1.9)
+
+    def test_histogram(self):
+        lines = self.profiler.histogram([0.003, 0.060, 0.070, 20.0])
+        self.assertEqual(len(lines), 3)
+        self.assertTrue(lines[1].endswith(" 2"))
+
+    def test_sample_live_bus(self):
+        self.bus.add(emu.FastbootDevice(appear_at=0.1, window=0.15))
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, "profile.tl")
+            self.bus.restart_clock()
+            stats = self.profiler.sample(0.4, 0.002, path)
+            modes = self.profiler.profile(usb_timeline.read_timeline(path))
+        self.assertGreater(stats.samples, 50)
+        (present,) = modes["fastboot"]["present"]
+        self.assertAlmostEqual(present, 0.15, delta=0.03)
+
+if __name__ == '__main__':
+    unittest.main()
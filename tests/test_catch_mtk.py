@@ -34,126 +34,69 @@ class TestCatchMtk(unittest.TestCase):
         self.mock_dev.idVendor = 0x0e8d
         self.mock_dev.idProduct = 0x2000 # Example
 
-        # Mock the global spinner to avoid actual output
-        self.interceptor.spinner = MagicMock()
-        self.interceptor.spinner.running = True
-
-    @patch('pacman_toolkit.pacman_interceptor.subprocess.call')
-    @patch('pacman_toolkit.pacman_interceptor.os.chmod')
-    @patch('pacman_toolkit.pacman_interceptor.sys.exit')
-    @patch('pacman_toolkit.pacman_interceptor.os.path.exists')
-    def test_catch_mtk_local_success(self, mock_exists, mock_exit, mock_chmod, mock_call):
-        """Test catch_mtk success path when local mtkclient exists."""
-        # Setup: Local mtk exists
-        # interceptor.MTK_PATH is defined at module level.
-        mtk_path = self.interceptor.MTK_PATH
-        local_mtk = os.path.join(mtk_path, "mtk")
-
-        # Mock os.path.exists to return True specifically for the local mtk path check
-        def side_effect(path):
-            if path == local_mtk:
-                return True
-            if path.endswith("mtk.py"):
-                return False
-            # For other checks (like RESCUE_SCRIPT), we can return True or rely on the actual file system
-            # But simpler to just mock it all as True for success path, or check if it matters.
-            # The catch_mtk function calls os.path.exists for local mtk.
-            return True
-
-        mock_exists.side_effect = side_effect
-        mock_call.return_value = 0 # Success for both calls (mtk payload and rescue script)
-
-        # Run
-        self.interceptor.catch_mtk(self.mock_dev)
-
-        # Verify
-        # First call: mtk payload using local python script
-        expected_cmd = ["python3", local_mtk, "payload"]
-        mock_call.assert_any_call(expected_cmd)
-
-        # Second call: rescue script
-        rescue_script = self.interceptor.RESCUE_SCRIPT
-        mock_call.assert_any_call([rescue_script, "mtk"])
-
-        # Verify spinner stopped
-        self.interceptor.spinner.stop.assert_called()
-
-        # Verify chmod
-        mock_chmod.assert_called_with(rescue_script, 0o755)
-
-        # Verify exit
-        mock_exit.assert_called_with(0)
-
-    @patch('pacman_toolkit.pacman_interceptor.subprocess.call')
-    @patch('pacman_toolkit.pacman_interceptor.os.chmod')
-    @patch('pacman_toolkit.pacman_interceptor.sys.exit')
-    @patch('pacman_toolkit.pacman_interceptor.os.path.exists')
-    def test_catch_mtk_system_success(self, mock_exists, mock_exit, mock_chmod, mock_call):
-        """Test catch_mtk success path when local mtkclient is missing (fallback to system)."""
-        # Setup: Local mtk DOES NOT exist
-        # We need to make sure the check for local mtk returns False
-        mtk_path = self.interceptor.MTK_PATH
-        local_mtk = os.path.join(mtk_path, "mtk")
-
-        def side_effect(path):
-            if path == local_mtk:
-                return False
-            if path.endswith("mtk.py"):
-                return False
-            return True # Allow other checks to pass if any
-
-        mock_exists.side_effect = side_effect
-        mock_call.return_value = 0 # Success
-
-        # Run
-        self.interceptor.catch_mtk(self.mock_dev)
-
-        # Verify
-        # First call: mtk payload (system command)
-        expected_cmd = ["mtk", "payload"]
-        mock_call.assert_any_call(expected_cmd)
-
-        # Verify exit
-        mock_exit.assert_called_with(0)
-
-    @patch('pacman_toolkit.pacman_interceptor.subprocess.call')
-    @patch('pacman_toolkit.pacman_interceptor.os.chmod')
-    @patch('pacman_toolkit.pacman_interceptor.sys.exit')
-    @patch('pacman_toolkit.pacman_interceptor.os.path.exists')
-    def test_catch_mtk_payload_fail(self, mock_exists, mock_exit, mock_chmod, mock_call):
-        """Test catch_mtk handling when payload command fails."""
-        # Setup: Payload fails
-        mock_call.return_value = 1
-        mock_exists.return_value = False # Default to system mtk, doesn't matter for failure check
-
-        # Run
-        self.interceptor.catch_mtk(self.mock_dev)
-
-        # Verify
-        mock_call.assert_called_once() # Only one call (payload)
-
-        # Should NOT exit or run rescue script
-        mock_exit.assert_not_called()
-        mock_chmod.assert_not_called()
-
-    @patch('pacman_toolkit.pacman_interceptor.subprocess.call')
-    @patch('pacman_toolkit.pacman_interceptor.sys.exit')
-    @patch('pacman_toolkit.pacman_interceptor.os.path.exists')
-    def test_catch_mtk_exception(self, mock_exists, mock_exit, mock_call):
-        """Test catch_mtk exception handling."""
-        # Setup: Exception raised during subprocess call
-        mock_call.side_effect = Exception("Test Exception")
-        mock_exists.return_value = False
-
-        # Run
-        # Should not crash, just log and return
-        try:
-            self.interceptor.catch_mtk(self.mock_dev)
-        except Exception:
-            self.fail("catch_mtk raised Exception unexpectedly!")
-
-        # Verify
-        mock_exit.assert_not_called()
+        self.preloader = os.path.join(self.interceptor.FIRMWARE_DIR, "preloader.img")
+
+    def exists(self, *present):
+        """os.path.exists side effect: only the preloader and `present` exist."""
+        return lambda path: path == self.preloader or path in present
+
+    def patches(self, exists):
+        # patch.object: the reloaded module is not in sys.modules once setUp is done
+        return (patch.object(self.interceptor.process_watchdog, 'run'),
+                patch.object(self.interceptor.os.path, 'exists', side_effect=exists))
+
+    def test_catch_device_local_mtk(self):
+        """Test catch_device sends the payload with the local mtkclient."""
+        local_mtk = os.path.join(self.interceptor.MTK_PATH, "mtk")
+        before_payload = MagicMock()
+        run_patch, exists_patch = self.patches(self.exists(local_mtk))
+        with run_patch as mock_run, exists_patch:
+            mock_run.return_value.ok = True
+            self.interceptor.catch_device(self.mock_dev, "preloader", before_payload=before_payload)
+
+        # Verify: the payload went through the local script, after the callback
+        mock_run.assert_called_once()
+        self.assertEqual(mock_run.call_args[0][0], ["python3", local_mtk, "payload", "--preloader", self.preloader])
+        before_payload.assert_called_once()
+
+    def test_catch_device_system_mtk(self):
+        """Test catch_device falls back to the system mtk when local mtkclient is missing."""
+        run_patch, exists_patch = self.patches(self.exists())
+        with run_patch as mock_run, exists_patch:
+            mock_run.return_value.ok = True
+            self.interceptor.catch_device(self.mock_dev, "brom")
+
+        self.assertEqual(mock_run.call_args[0][0], ["mtk", "payload", "--preloader", self.preloader])
+
+    def test_catch_device_payload_fail(self):
+        """Test catch_device raises when the payload command fails."""
+        run_patch, exists_patch = self.patches(self.exists())
+        with run_patch as mock_run, exists_patch, self.assertRaises(self.interceptor.CatchError) as failed:
+            mock_run.return_value.ok = False
+            mock_run.return_value.describe.return_value = "mtkclient payload: exited with 1"
+            self.interceptor.catch_device(self.mock_dev, "preloader")
+
+        mock_run.assert_called_once() # Only one call (payload)
+        self.assertIn("exited with 1", str(failed.exception))
+
+    def test_catch_device_exception(self):
+        """Test catch_device passes on an exception from running the payload."""
+        run_patch, exists_patch = self.patches(self.exists())
+        with run_patch as mock_run, exists_patch, self.assertRaisesRegex(Exception, "Test Exception"):
+            mock_run.side_effect = Exception("Test Exception")
+            self.interceptor.catch_device(self.mock_dev, "preloader")
+
+    def test_catch_device_without_preloader(self):
+        """Test catch_device does not run mtkclient without a preloader image."""
+        before_payload = MagicMock()
+        run_patch, exists_patch = self.patches(lambda path: False)
+        with run_patch as mock_run, exists_patch, \
+             patch.object(self.interceptor, 'lease_archive_images', return_value=[]), \
+             self.assertRaisesRegex(self.interceptor.CatchError, "Preloader image not found"):
+            self.interceptor.catch_device(self.mock_dev, "preloader", before_payload=before_payload)
+
+        mock_run.assert_not_called()
+        before_payload.assert_not_called()
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,100 @@
+import unittest
+from unittest.mock import patch
+import os
+import sys
+import shutil
+import tempfile
+
+# Add the repo root to sys.path so we can import pacman_toolkit
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from pacman_toolkit import dependency_probe
+from pacman_toolkit.dependency_probe import PackageDB, ProbeError, probe
+
+OLD = 1_600_000_000
+
+class TestDependencyProbe(unittest.TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.db = os.path.join(self.root, dependency_probe.DB_SUBDIR)
+        self.cache = os.path.join(self.root, "cache", "deps.json")
+        self.add("git", "2.44.0-1")
+        self.add("python-pip", "24.0-1")
+        self.add("android-tools", "35.0.1-3", groups=["tools"])
+        self.add("libusb-compat", "0.1.8-1", provides=["libusb=1.0.27", "libusb-legacy"])
+        self.age()
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def add(self, name, version, provides=(), groups=()):
+        path = os.path.join(self.db, f"{name}-{version}")
+        os.makedirs(path)
+        with open(os.path.join(path, "desc"), "w") as f:
+            f.write(f"%NAME%\n{name}\n\n%VERSION%\n{version}\n\n")
+            if provides:
+                f.write("%PROVIDES%\n" + "\n".join(provides) + "\n\n")
+            if groups:
+                f.write("%GROUPS%\n" + "\n".join(groups) + "\n\n")
+
+    def age(self, when=OLD):
+        # Keeps the cache from treating the database as just modified
+        os.utime(self.db, (when, when))
+
+    def test_names_resolve_from_the_directory_listing(self):
+        db = PackageDB(self.root).load()
+        self.assertEqual(db.packages["android-tools"], "35.0.1-3")
+        self.assertEqual(db.resolve("git"), "git")
+        self.assertIsNone(db.provides)
+        self.assertIsNone(db.resolve("base-devel"))
+
+    def test_provides_and_groups(self):
+        result = probe(["libusb", "libusb-legacy", "tools", "git", "base-devel"], root=self.root, cache_path=False)
+        self.assertEqual(result.installed, {"libusb": "libusb-compat", "libusb-legacy": "libusb-compat",
+                                            "tools": "android-tools", "git": "git"})
+        self.assertEqual(result.missing, ["base-devel"])
+        self.assertEqual(result.source, "database")
+
+    def test_partly_installed_group(self):
+        # Only one member of the group is installed
+        self.add("fastboot-extras", "1.0-1", groups=["mobile-tools"])
+        db = PackageDB(self.root).load()
+        self.assertEqual(db.resolve("mobile-tools"), "fastboot-extras")
+        self.add("adb-extras", "1.0-1", groups=["mobile-tools"])
+        self.assertEqual(PackageDB(self.root).load().resolve("mobile-tools"), "adb-extras fastboot-extras")
+
+    def test_cache_is_keyed_by_database_mtime(self):
+        self.assertEqual(probe(["git"], root=self.root, cache_path=self.cache).source, "database")
+        with patch.object(PackageDB, "load", side_effect=AssertionError("database re-read")):
+            result = probe(["git", "python-pip"], root=self.root, cache_path=self.cache)
+        self.assertEqual(result.source, "cache")
+        self.assertEqual(result.missing, [])
+
+        self.add("python-pyusb", "1.2.1-5")
+        self.age(OLD + 60)
+        result = probe(["python-pyusb"], root=self.root, cache_path=self.cache)
+        self.assertEqual(result.source, "database")
+        self.assertEqual(result.missing, [])
+
+    def test_fresh_database_is_not_cached(self):
+        os.utime(self.db)
+        probe(["git"], root=self.root, cache_path=self.cache)
+        self.assertFalse(os.path.exists(self.cache))
+
+    def test_python_modules(self):
+        modules = {"python-pyusb": "json", "python-libusb1": "no_such_module_for_probe"}
+        with patch.object(dependency_probe.importlib.util, "find_spec", wraps=dependency_probe.importlib.util.find_spec) as find_spec:
+            result = probe(["python-pyusb", "python-libusb1"], modules=modules, root=self.root, cache_path=False)
+        # A module found without the package (pip) satisfies it
+        self.assertEqual(result.installed, {"python-pyusb": "python module json"})
+        self.assertEqual(result.missing, ["python-libusb1"])
+        self.assertEqual(result.modules, {"json": True, "no_such_module_for_probe": False})
+        self.assertEqual(find_spec.call_count, 2)
+        self.assertNotIn("no_such_module_for_probe", sys.modules)
+
+    def test_missing_database(self):
+        with self.assertRaises(ProbeError):
+            probe(["git"], root=os.path.join(self.root, "nope"), cache_path=False)
+
+if __name__ == '__main__':
+    unittest.main()
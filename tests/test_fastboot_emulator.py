@@ -0,0 +1,131 @@
+import unittest
+from unittest.mock import patch
+import os
+import sys
+import hashlib
+import importlib
+
+# Add the repo root to sys.path so we can import pacman_toolkit
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from pacman_toolkit import fastboot_emulator as emu
+from pacman_toolkit import fastboot_client
+
+FAST = dict(bandwidth=1e9, latency=0)
+
+class TestFastbootEmulator(unittest.TestCase):
+    def connect(self, **kwargs):
+        state = emu.FastbootDevice(**{**FAST, **kwargs})
+        bus = emu.EmulatedBus([state])
+        dev = bus.core.find(idVendor=0x18d1)
+        return state, bus, fastboot_client.FastbootClient(dev, bus.util)
+
+    def test_getvar(self):
+        state, _, client = self.connect(max_download_size=0x1000)
+        self.assertEqual(client.getvar("product"), "Pacman")
+        self.assertEqual(client.max_download_size(), 0x1000)
+        with self.assertRaises(fastboot_client.FastbootError):
+            client.getvar("nope")
+
+    def test_getvar_all_reports_info(self):
+        _, _, client = self.connect()
+        client.getvar("all")
+        self.assertIn("product: Pacman", client.info)
+
+    def test_flash_records_image(self):
+        state, _, client = self.connect()
+        image = os.urandom(300000)
+        client.flash("boot_a", image)
+        self.assertEqual(state.flashed["boot_a"], (len(image), hashlib.sha256(image).hexdigest()))
+        self.assertEqual(client.last_transfer.bytes, len(image))
+
+    def test_download_too_large(self):
+        _, _, client = self.connect(max_download_size=1024)
+        with self.assertRaises(fastboot_client.FastbootError):
+            client.download(b'x' * 2048)
+
+    def test_injected_fail(self):
+        state, _, client = self.connect(fail={"flash:boot_b": "write error"})
+        client.flash("boot_a", b'a' * 100)
+        with self.assertRaisesRegex(fastboot_client.FastbootError, "write error"):
+            client.flash("boot_b", b'b' * 100)
+
+    def test_disconnect_mid_download(self):
+        state, bus, client = self.connect(disconnect_after_bytes=64 * 1024)
+        client.chunk_size = 16 * 1024
+        with self.assertRaises(emu.USBError):
+            client.download(b'x' * (256 * 1024))
+        self.assertIsNone(bus.core.find(idVendor=0x18d1))
+
+    def test_bandwidth_is_emulated(self):
+        _, _, client = self.connect(bandwidth=20e6)
+        stats = client.download(bytes(2 * 1000 * 1000))
+        self.assertGreater(stats.elapsed, 0.09)
+
+    def test_window_and_freeze(self):
+        clock = [0.0]
+        state = emu.FastbootDevice(appear_at=1.0, window=0.05, **FAST)
+        bus = emu.EmulatedBus([state], clock=lambda: clock[0])
+
+        self.assertIsNone(bus.core.find(idVendor=0x18d1))
+        clock[0] = 1.01
+        dev = bus.core.find(idVendor=0x18d1)
+        self.assertIsNotNone(dev)
+        clock[0] = 1.2
+        self.assertIsNone(bus.core.find(idVendor=0x18d1))
+
+        # Sending a command inside the window freezes the bootloader
+        clock[0] = 1.01
+        client = fastboot_client.FastbootClient(bus.core.find(idVendor=0x18d1), bus.util)
+        client.getvar("product")
+        clock[0] = 5.0
+        self.assertIsNotNone(bus.core.find(idVendor=0x18d1))
+
+    def test_rescue_sequence(self):
+        state, _, client = self.connect()
+        timings = fastboot_client.flash_rescue(client, {"boot.img": b'B' * 4096, "vbmeta.img": b'V' * 512})
+        self.assertEqual([p for p, _ in timings], ["boot_a", "boot_b", "vbmeta_a", "vbmeta_b"])
+        self.assertTrue(state.rebooted)
+
+class TestInterceptorAgainstEmulator(unittest.TestCase):
+    def load(self, bus):
+        with bus.installed():
+            import pacman_toolkit.pacman_interceptor as interceptor
+            interceptor = importlib.reload(interceptor)
+            interceptor.load_usb()
+            return interceptor
+
+    def test_catch_device_freezes_fastboot(self):
+        state = emu.FastbootDevice(window=0.05, **FAST)
+        bus = emu.EmulatedBus([state])
+        interceptor = self.load(bus)
+
+        dev = bus.core.find(idVendor=0x18d1)
+        with patch.object(interceptor, 'log'):
+            interceptor.catch_device(dev, "fastboot")
+
+        self.assertEqual(state.commands, ["getvar:all"])
+        self.assertTrue(state.frozen)
+
+    def main_exit_code(self, interceptor, rescue_returncode):
+        with patch.object(interceptor, 'run_rescue', return_value=rescue_returncode) as mock_rescue, \
+             patch.object(interceptor, 'check_prerequisites'), \
+             patch.object(interceptor, 'print_instructions'), \
+             patch.object(interceptor, 'log'), \
+             self.assertRaises(SystemExit) as exit:
+            interceptor.main()
+        mock_rescue.assert_called_once_with("fastboot")
+        return exit.exception.code
+
+    def test_main_exits_after_the_rescue(self):
+        state = emu.FastbootDevice(window=5, **FAST)
+        interceptor = self.load(emu.EmulatedBus([state]))
+        self.assertEqual(self.main_exit_code(interceptor, 0), 0)
+        self.assertTrue(state.frozen)
+
+    def test_failed_rescue_exits_nonzero(self):
+        interceptor = self.load(emu.EmulatedBus([emu.FastbootDevice(window=5, **FAST)]))
+        self.assertEqual(self.main_exit_code(interceptor, -9), 1)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,127 @@
+import unittest
+import os
+import sys
+import time
+import shutil
+import tempfile
+
+# Add the repo root to sys.path so we can import pacman_toolkit
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from pacman_toolkit.file_index import FileIndex, is_candidate
+
+OLD = 1_600_000_000  # well outside the racy window
+
+class TestFileIndex(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.root = os.path.join(self.tmp, "home")
+        self.index_path = os.path.join(self.tmp, "index.json")
+        for rel in ["Downloads/fw/boot.img", "Downloads/fw/vbmeta.img", "Downloads/notes.txt",
+                    "backup/2023/boot.img", "backup/2023/lk", ".git/objects/boot.img",
+                    "node_modules/x/vbmeta.img"]:
+            self.make(rel)
+        self.age()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def make(self, rel, data=b"x"):
+        path = os.path.join(self.root, rel)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb") as f:
+            f.write(data)
+        return path
+
+    def age(self, when=OLD):
+        for dirpath, dirs, files in os.walk(self.root):
+            for name in files:
+                os.utime(os.path.join(dirpath, name), (when, when))
+            os.utime(dirpath, (when, when))
+
+    def test_candidates(self):
+        self.assertTrue(is_candidate("boot.img"))
+        self.assertTrue(is_candidate("lk"))
+        self.assertTrue(is_candidate("Pacman_V2.5.zip"))
+        self.assertFalse(is_candidate("notes.txt"))
+
+    def test_initial_scan_and_lookup(self):
+        index = FileIndex(self.index_path)
+        index.refresh(self.root)
+        found = index.lookup_all(["boot.img", "vbmeta.img", "lk", "notes.txt", "missing.img"])
+        self.assertEqual(sorted(found["boot.img"]), [os.path.join(self.root, "Downloads/fw/boot.img"),
+                                                      os.path.join(self.root, "backup/2023/boot.img")])
+        # Pruned directories are not indexed
+        self.assertEqual(found["vbmeta.img"], [os.path.join(self.root, "Downloads/fw/vbmeta.img")])
+        self.assertEqual(found["lk"], [os.path.join(self.root, "backup/2023/lk")])
+        self.assertEqual(found["notes.txt"], [])
+        self.assertEqual(found["missing.img"], [])
+        self.assertEqual(index.entries(), 4)
+
+    def test_newest_first(self):
+        os.utime(os.path.join(self.root, "backup/2023/boot.img"), (OLD + 100, OLD + 100))
+        index = FileIndex(self.index_path)
+        index.refresh(self.root)
+        self.assertEqual(index.lookup("boot.img")[0], os.path.join(self.root, "backup/2023/boot.img"))
+
+    def test_unchanged_tree_is_not_listed_again(self):
+        index = FileIndex(self.index_path)
+        first = dict(index.refresh(self.root))
+        self.assertTrue(index.save())
+
+        reloaded = FileIndex(self.index_path)
+        stats = reloaded.refresh(self.root)
+        self.assertEqual(stats["scanned"], 0)
+        self.assertEqual(stats["reused"], first["scanned"])
+        self.assertEqual(len(reloaded.lookup("boot.img")), 2)
+
+    def test_incremental_update(self):
+        index = FileIndex(self.index_path)
+        index.refresh(self.root)
+        index.save()
+
+        os.remove(os.path.join(self.root, "Downloads/fw/boot.img"))
+        shutil.rmtree(os.path.join(self.root, "backup/2023"))
+        self.make("backup/2024/preloader_raw.img")
+        # Put every mtime back, then mark what the changes above touched
+        self.age()
+        for rel in ["Downloads/fw", "backup", "backup/2024"]:
+            os.utime(os.path.join(self.root, rel), (OLD + 10, OLD + 10))
+
+        index = FileIndex(self.index_path)
+        stats = index.refresh(self.root)
+        # Only the directories whose entries changed were listed
+        self.assertEqual(stats["scanned"], 3)  # Downloads/fw, backup, backup/2024
+        self.assertEqual(stats["dropped"], 1)  # backup/2023
+        self.assertEqual(index.lookup("boot.img"), [])
+        self.assertEqual(index.lookup("vbmeta.img"), [os.path.join(self.root, "Downloads/fw/vbmeta.img")])
+        self.assertEqual(index.lookup("preloader_raw.img"), [os.path.join(self.root, "backup/2024/preloader_raw.img")])
+
+    def test_recently_modified_directory_is_rescanned(self):
+        fw = os.path.join(self.root, "Downloads/fw")
+        now = time.time()
+        os.utime(fw, (now, now))
+        index = FileIndex(self.index_path)
+        index.refresh(self.root)
+        # A change within the same mtime tick leaves the directory mtime as it was
+        self.make("Downloads/fw/lk.img")
+        os.utime(fw, (now, now))
+        self.assertEqual(index.refresh(self.root)["scanned"], 1)
+        self.assertEqual(len(index.lookup("lk.img")), 1)
+
+    def test_vanished_file_filtered_without_refresh(self):
+        index = FileIndex(self.index_path)
+        index.refresh(self.root)
+        os.remove(os.path.join(self.root, "backup/2023/lk"))
+        self.assertEqual(index.lookup("lk"), [])
+
+    def test_corrupt_index_ignored(self):
+        with open(self.index_path, "w") as f:
+            f.write("{not json")
+        index = FileIndex(self.index_path)
+        self.assertEqual(index.dirs, {})
+        index.refresh(self.root)
+        self.assertEqual(len(index.lookup("boot.img")), 2)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,106 @@
+import unittest
+import os
+import sys
+import shutil
+import tempfile
+
+# Add the repo root to sys.path so we can import pacman_toolkit
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from pacman_toolkit.file_search import Matcher, SearchRules, search, DEFAULT_PRUNE_GLOBS
+
+RAW_NAMES = {'preloader_raw.img': 'preloader.img', 'lk': 'lk.img', 'lk.bin': 'lk.img'}
+
+class TestFileSearch(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def make(self, rel, size=1):
+        path = os.path.join(self.tmp, rel)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb") as f:
+            f.write(b"x" * size)
+        return path
+
+    def root(self, name):
+        path = os.path.join(self.tmp, name)
+        os.makedirs(path, exist_ok=True)
+        return path
+
+    def test_all_targets_and_aliases_in_one_pass(self):
+        boot = self.make("a/fw/boot.img")
+        raw = self.make("a/dump/preloader_raw.img")
+        lk = self.make("a/lk.bin")
+        result = search([self.root("a")], Matcher(["boot.img", "preloader.img", "lk.img", "vbmeta.img"], RAW_NAMES),
+                        stop_when_found=False)
+        self.assertEqual(result.path("boot.img"), boot)
+        self.assertEqual(result.path("preloader.img"), raw)
+        self.assertEqual(result.path("lk.img"), lk)
+        self.assertIsNone(result.path_of("preloader.img"))
+        self.assertEqual(result.path_of("preloader_raw.img"), raw)
+        self.assertEqual(result.missing, ["vbmeta.img"])
+
+    def test_root_priority_and_own_name_preferred(self):
+        self.make("b/boot.img")
+        deep = self.make("a/x/y/z/boot.img")
+        self.make("a/lk")
+        lk = self.make("a/deep/er/lk.img")
+        for workers in (1, 4):
+            result = search([self.root("a"), self.root("b")], Matcher(["boot.img"]), workers=workers)
+            # The deep hit in the first root beats the shallow one in the second
+            self.assertEqual(result.path("boot.img"), deep)
+            # The target's own name beats an alias in the same root
+            result = search([self.root("a")], Matcher(["lk.img"], RAW_NAMES), workers=workers, stop_when_found=False)
+            self.assertEqual(result.path("lk.img"), lk)
+
+    def test_stops_once_everything_is_found(self):
+        self.make("a/boot.img")
+        for i in range(50):
+            self.make(f"b/d{i}/e/f.txt")
+        result = search([self.root("a"), self.root("b")], Matcher(["boot.img"]), workers=1)
+        self.assertTrue(result.stats["cancelled"])
+        self.assertLess(result.stats["dirs"], 20)
+
+        full = search([self.root("a"), self.root("b")], Matcher(["boot.img"]), stop_when_found=False)
+        self.assertFalse(full.stats["cancelled"])
+        self.assertEqual(full.stats["dirs"], 1 + 1 + 50 * 2)
+
+    def test_pruning_rules(self):
+        self.make("a/.git/boot.img")
+        self.make("a/node_modules/x/boot.img")
+        self.make("a/.Trash-1000/files/boot.img")
+        self.make("a/build-out/boot.img")
+        self.make("a/.hidden/vbmeta.img")
+        self.make("a/one/two/lk.img")
+        self.make("a/small/preloader.img", size=10)
+        matcher = Matcher(["boot.img", "vbmeta.img", "lk.img", "preloader.img"])
+
+        result = search([self.root("a")], matcher, SearchRules(prune_globs=DEFAULT_PRUNE_GLOBS + ("build-*",)), stop_when_found=False)
+        self.assertIsNone(result.path("boot.img"))
+        self.assertIsNotNone(result.path("vbmeta.img"))
+
+        rules = SearchRules(skip_hidden=True, max_depth=1, min_size=100)
+        result = search([self.root("a")], matcher, rules, stop_when_found=False)
+        self.assertIsNone(result.path("vbmeta.img"))
+        self.assertIsNone(result.path("lk.img"))  # depth 2
+        self.assertIsNone(result.path("preloader.img"))  # too small
+        self.assertIsNotNone(search([self.root("a")], matcher, SearchRules(max_depth=2)).path("lk.img"))
+
+    def test_max_depth_zero_matches_top_level_only(self):
+        top = self.make("a/boot.img")
+        self.make("a/sub/vbmeta.img")
+        result = search([self.root("a")], Matcher(["boot.img", "vbmeta.img"]), SearchRules(max_depth=0))
+        self.assertEqual(result.path("boot.img"), top)
+        self.assertIsNone(result.path("vbmeta.img"))
+        self.assertEqual(result.stats["dirs"], 1)
+
+    def test_missing_roots(self):
+        result = search([os.path.join(self.tmp, "nope")], Matcher(["boot.img"]))
+        self.assertEqual(result.missing, ["boot.img"])
+        self.assertEqual(result.stats["dirs"], 0)
+
+if __name__ == '__main__':
+    unittest.main()
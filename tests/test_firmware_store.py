@@ -0,0 +1,188 @@
+import unittest
+from unittest.mock import patch
+import os
+import sys
+import errno
+import hashlib
+import tempfile
+import zipfile
+
+# Add the repo root to sys.path so we can import pacman_toolkit
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from pacman_toolkit import firmware_store, image_source
+
+PRELOADER = b'MMM\x01' + b'p' * 5000
+LK = b'\x88\x16\x88\x58' + b'l' * 5000
+
+class TestFirmwareStore(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.root = self.tmpdir.name
+        self.store = firmware_store.FirmwareStore(os.path.join(self.root, 'store'))
+        self.firmware = os.path.join(self.root, 'firmware')
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def make_build(self, name, boot):
+        path = os.path.join(self.root, name)
+        os.makedirs(path)
+        for filename, data in (('boot.img', boot), ('preloader.img', PRELOADER), ('lk.img', LK)):
+            with open(os.path.join(path, filename), 'wb') as f:
+                f.write(data)
+        return path
+
+    def import_dir(self, version, path):
+        with image_source.open_source(path) as source:
+            return self.store.import_version(version, source)
+
+    def test_deduplicates_across_versions(self):
+        self.import_dir('2.5.1', self.make_build('v1', b'boot-one' * 1000))
+        self.import_dir('2.5.2', self.make_build('v2', b'boot-two' * 1000))
+
+        # Two distinct boot images, shared preloader and lk
+        blobs = list(self.store._iter_blobs())
+        self.assertEqual(len(blobs), 4)
+        unique, logical = self.store.usage()
+        self.assertLess(unique, logical)
+        self.assertEqual(self.store.versions(), ['2.5.1', '2.5.2'])
+
+    def test_manifest_uses_sha256(self):
+        manifest = self.import_dir('2.5.1', self.make_build('v1', b'boot'))
+        self.assertEqual(manifest['images']['preloader.img'], hashlib.sha256(PRELOADER).hexdigest())
+
+    def test_activate_switches_by_relinking(self):
+        self.import_dir('2.5.1', self.make_build('v1', b'boot-one'))
+        self.import_dir('2.5.2', self.make_build('v2', b'boot-two'))
+
+        strategies = self.store.activate('2.5.1', self.firmware)
+        self.assertEqual(strategies['boot.img'], 'hardlink')
+        with open(os.path.join(self.firmware, 'boot.img'), 'rb') as f:
+            self.assertEqual(f.read(), b'boot-one')
+
+        self.store.activate('2.5.2', self.firmware)
+        with open(os.path.join(self.firmware, 'boot.img'), 'rb') as f:
+            self.assertEqual(f.read(), b'boot-two')
+        # The linked image shares the blob's inode, nothing was copied
+        blob = self.store.blob_path(hashlib.sha256(b'boot-two').hexdigest())
+        self.assertTrue(os.path.samefile(blob, os.path.join(self.firmware, 'boot.img')))
+        self.assertEqual(firmware_store.active_version(self.firmware)['version'], '2.5.2')
+
+    def test_activate_removes_images_of_previous_version(self):
+        build = self.make_build('v1', b'boot')
+        with open(os.path.join(build, 'vbmeta.img'), 'wb') as f:
+            f.write(b'AVB0')
+        self.import_dir('with-vbmeta', build)
+        self.import_dir('no-vbmeta', self.make_build('v2', b'boot'))
+
+        self.store.activate('with-vbmeta', self.firmware)
+        self.assertTrue(os.path.exists(os.path.join(self.firmware, 'vbmeta.img')))
+        self.store.activate('no-vbmeta', self.firmware)
+        self.assertFalse(os.path.exists(os.path.join(self.firmware, 'vbmeta.img')))
+
+    def test_import_from_zip(self):
+        archive = os.path.join(self.root, 'factory.zip')
+        with zipfile.ZipFile(archive, 'w', zipfile.ZIP_DEFLATED) as zf:
+            zf.writestr('images/boot.img', b'zipped boot')
+            zf.writestr('images/lk.img', LK)
+        with image_source.open_source(archive) as source:
+            manifest = self.store.import_version('zip-build', source)
+        self.assertEqual(sorted(manifest['images']), ['boot.img', 'lk.img'])
+
+    def test_gc_and_verify(self):
+        self.import_dir('2.5.1', self.make_build('v1', b'boot-one'))
+        self.import_dir('2.5.2', self.make_build('v2', b'boot-two'))
+        self.store.remove_version('2.5.1')
+
+        self.assertEqual(self.store.gc(), len(b'boot-one'))
+        self.assertEqual(self.store.verify(), [])
+
+    def test_rejects_bad_version_names(self):
+        with self.assertRaises(firmware_store.StoreError):
+            self.store.manifest('../etc')
+        with self.assertRaises(firmware_store.StoreError):
+            self.store.activate('missing', self.firmware)
+
+class TestStageFile(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.src = os.path.join(self.tmpdir.name, 'boot.img')
+        self.data = os.urandom(3 * firmware_store.CHUNK_SIZE + 17)
+        with open(self.src, 'wb') as f:
+            f.write(self.data)
+        self.digest = hashlib.sha256(self.data).hexdigest()
+        self.dst = os.path.join(self.tmpdir.name, 'staged.img')
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def read_dst(self):
+        with open(self.dst, 'rb') as f:
+            return f.read()
+
+    def test_each_strategy_places_a_verified_copy(self):
+        strategies = ['hardlink', 'copy', 'copy_file_range'] if hasattr(os, 'copy_file_range') else ['hardlink', 'copy']
+        for strategy in strategies:
+            result = firmware_store.stage_file(self.src, self.dst, self.digest, (strategy,))
+            self.assertEqual(result.strategy, strategy)
+            self.assertEqual(result.size, len(self.data))
+            self.assertGreater(result.rate, 0)
+            self.assertIn(strategy, result.describe())
+            self.assertEqual(self.read_dst(), self.data)
+            os.remove(self.dst)
+
+    def test_falls_back_in_order(self):
+        unsupported = OSError(errno.EOPNOTSUPP, "not supported")
+        with patch.object(firmware_store.os, 'link', side_effect=OSError(errno.EXDEV, "cross-device")), \
+             patch.object(firmware_store, '_reflink', side_effect=unsupported), \
+             patch.object(firmware_store.os, 'copy_file_range', side_effect=OSError(errno.EXDEV, "cross-device"),
+                          create=True):
+            result = firmware_store.stage_file(self.src, self.dst, self.digest)
+        self.assertEqual(result.strategy, 'copy')
+        self.assertEqual(self.read_dst(), self.data)
+
+    def test_short_copy_file_range_falls_back(self):
+        # A filesystem that claims success but copies nothing
+        with patch.object(firmware_store.os, 'copy_file_range', return_value=0, create=True):
+            result = firmware_store.stage_file(self.src, self.dst, self.digest, ('copy_file_range', 'copy'))
+        self.assertEqual(result.strategy, 'copy')
+        self.assertEqual(self.read_dst(), self.data)
+
+    def test_mismatch_is_rejected(self):
+        for strategy in ('copy', 'copy_file_range'):
+            with self.assertRaises(firmware_store.StoreError):
+                firmware_store.stage_file(self.src, self.dst, '0' * 64, (strategy, 'copy'))
+            self.assertFalse(os.path.exists(self.dst))
+
+    def test_existing_target_is_never_touched(self):
+        with open(self.dst, 'wb') as f:
+            f.write(b'user image')
+        with patch.object(firmware_store, '_reflink', side_effect=OSError(errno.EOPNOTSUPP, "not supported")), \
+             self.assertRaises(FileExistsError):
+            firmware_store.stage_file(self.src, self.dst, self.digest, ('reflink', 'copy'))
+        self.assertEqual(self.read_dst(), b'user image')
+
+    def test_failures_leave_no_temporary_files(self):
+        before = sorted(os.listdir(self.tmpdir.name))
+        with patch.object(firmware_store, '_reflink', side_effect=OSError(errno.EOPNOTSUPP, "not supported")), \
+             self.assertRaises(OSError):
+            firmware_store.stage_file(self.src, self.dst, self.digest, ('reflink',))
+        with self.assertRaises(firmware_store.StoreError):
+            firmware_store.stage_file(self.src, self.dst, '0' * 64, ('reflink', 'copy'))
+        self.assertEqual(sorted(os.listdir(self.tmpdir.name)), before)
+
+    def test_ingest_never_hardlinks_the_callers_file(self):
+        store = firmware_store.FirmwareStore(os.path.join(self.tmpdir.name, 'store'))
+        mode = os.stat(self.src).st_mode
+        digest, result = store.ingest(self.src)
+        self.assertEqual(digest, self.digest)
+        self.assertNotEqual(result.strategy, 'hardlink')
+        self.assertEqual(os.stat(self.src).st_nlink, 1)
+        self.assertEqual(os.stat(self.src).st_mode, mode)
+        self.assertEqual(store.verify(), [])
+        # Already stored: nothing is staged
+        self.assertEqual(store.ingest(self.src), (digest, None))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,179 @@
+import unittest
+import os
+import sys
+import json
+import hashlib
+import tempfile
+import zipfile
+import threading
+import subprocess
+
+# Add the repo root to sys.path so we can import pacman_toolkit
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from pacman_toolkit import image_cache
+from pacman_toolkit import image_source
+
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+# Child process used to measure peak RSS with N concurrent "devices".
+# Each device thread leases boot.img and reads the whole image through the view.
+RSS_SCRIPT = r'''
+import sys, json, hashlib, threading, resource
+sys.path.insert(0, sys.argv[1])
+from pacman_toolkit import image_cache
+
+firmware_dir, devices = sys.argv[2], int(sys.argv[3])
+cache = image_cache.FirmwareImageCache(firmware_dir)
+barrier = threading.Barrier(devices)
+digests = []
+
+def flash():
+    with cache.acquire("boot.img") as lease:
+        barrier.wait()
+        digests.append(hashlib.sha256(lease.view).hexdigest())
+        barrier.wait()
+
+threads = [threading.Thread(target=flash) for _ in range(devices)]
+for t in threads:
+    t.start()
+for t in threads:
+    t.join()
+print(json.dumps({"maxrss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+                  "loads": cache.loads, "digests": sorted(set(digests))}))
+'''
+
+class TestImageCache(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.firmware = self.tmpdir.name
+        self.boot = os.urandom(64 * 1024) * 512  # 32 MB
+        with open(os.path.join(self.firmware, 'boot.img'), 'wb') as f:
+            f.write(self.boot)
+        with open(os.path.join(self.firmware, 'vbmeta.img'), 'wb') as f:
+            f.write(b'AVB0' * 1024)
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_loads_once_for_concurrent_workers(self):
+        cache = image_cache.FirmwareImageCache(self.firmware)
+        leases = []
+        lock = threading.Lock()
+
+        def worker():
+            lease = cache.acquire('vbmeta.img')
+            with lock:
+                leases.append(lease)
+
+        threads = [threading.Thread(target=worker) for _ in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        self.assertEqual(cache.loads, 1)
+        self.assertEqual(cache.stats()['leases'], 8)
+        self.assertEqual(bytes(leases[0].view[:4]), b'AVB0')
+        self.assertTrue(leases[0].view.readonly)
+        with open(leases[0].path, 'rb') as f:
+            self.assertEqual(f.read(4), b'AVB0')
+
+        for lease in leases:
+            lease.release()
+        self.assertEqual(cache.stats()['leases'], 0)
+        cache.close()
+
+    def test_eviction_waits_for_last_lease(self):
+        cache = image_cache.FirmwareImageCache(self.firmware)
+        lease = cache.acquire('vbmeta.img')
+
+        # Swap the firmware set underneath the cache
+        with open(os.path.join(self.firmware, 'vbmeta.img'), 'wb') as f:
+            f.write(b'NEW!' * 1024)
+        self.assertTrue(cache.refresh())
+        self.assertEqual(cache.stats()['images'], 0)
+
+        # The old lease is still readable until released
+        self.assertEqual(bytes(lease.view[:4]), b'AVB0')
+        lease.release()
+
+        with cache.acquire('vbmeta.img') as fresh:
+            self.assertEqual(bytes(fresh.view[:4]), b'NEW!')
+        self.assertFalse(cache.refresh())
+        cache.close()
+
+    def test_refresh_closes_the_replaced_source(self):
+        with zipfile.ZipFile(os.path.join(self.firmware, 'factory.zip'), 'w') as zf:
+            zf.writestr('images/lk.img', b'LK' * 1024)
+        cache = image_cache.FirmwareImageCache(self.firmware)
+        old = cache._source
+        with cache.acquire('lk.img') as lease:
+            self.assertEqual(bytes(lease.view[:2]), b'LK')
+        with open(os.path.join(self.firmware, 'vbmeta.img'), 'wb') as f:
+            f.write(b'NEW!' * 1024)
+        self.assertTrue(cache.refresh())
+        self.assertIsNone(old.sources[-1]._zip.fp)
+        cache.close()
+        self.assertIsNone(cache._source.sources[-1]._zip.fp)
+
+    def test_source_replaced_during_a_load_is_closed_after_it(self):
+        loading, replaced = threading.Event(), threading.Event()
+
+        class SlowSource(image_source.DirectorySource):
+            closed = False
+
+            def open(self, name):
+                loading.set()
+                replaced.wait(5)
+                return super().open(name)
+
+            def close(self):
+                self.closed = True
+
+        slow = SlowSource(self.firmware)
+        cache = image_cache.ImageCache(slow)
+        worker = threading.Thread(target=lambda: cache.acquire('vbmeta.img').release())
+        worker.start()
+        loading.wait(5)
+        cache.set_source(image_source.DirectorySource(self.firmware))
+        self.assertFalse(slow.closed)
+        replaced.set()
+        worker.join()
+        self.assertTrue(slow.closed)
+        cache.close()
+
+    def test_put_patched_image(self):
+        cache = image_cache.ImageCache()
+        cache.put('boot.img', b'patched')
+        with cache.acquire('boot.img') as lease:
+            self.assertEqual(bytes(lease.view), b'patched')
+            self.assertEqual(lease.sha256, hashlib.sha256(b'patched').hexdigest())
+        self.assertEqual(cache.evict_unused(), len(b'patched'))
+
+    def test_missing_image(self):
+        cache = image_cache.FirmwareImageCache(self.firmware)
+        with self.assertRaises(KeyError):
+            cache.acquire('lk.img')
+        self.assertEqual(cache.archive_only(['boot.img', 'lk.img']), [])
+
+    def measure(self, devices):
+        out = subprocess.check_output([sys.executable, '-c', RSS_SCRIPT, REPO_ROOT,
+                                       self.firmware, str(devices)])
+        return json.loads(out)
+
+    def test_peak_rss_flat_as_devices_grow(self):
+        one = self.measure(1)
+        many = self.measure(16)
+
+        expected = hashlib.sha256(self.boot).hexdigest()
+        self.assertEqual(one['digests'], [expected])
+        self.assertEqual(many['digests'], [expected])
+        self.assertEqual(many['loads'], 1)
+
+        # 16 private copies would add ~480 MB; allow thread stacks and noise only
+        growth_mb = (many['maxrss_kb'] - one['maxrss_kb']) / 1024
+        self.assertLess(growth_mb, 16, f"peak RSS grew by {growth_mb:.1f} MB")
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,110 @@
+import unittest
+import os
+import sys
+import hashlib
+import tempfile
+import zipfile
+import subprocess
+
+# Add the repo root to sys.path so we can import pacman_toolkit
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from pacman_toolkit import image_source
+
+BOOT = b'ANDROID!' + os.urandom(300000)
+VBMETA = b'AVB0' + b'\0' * 4092
+
+class TestImageSource(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.root = self.tmpdir.name
+        self.firmware = os.path.join(self.root, 'firmware')
+        os.makedirs(self.firmware)
+
+        self.archive = os.path.join(self.root, 'Pacman-factory.zip')
+        with zipfile.ZipFile(self.archive, 'w', zipfile.ZIP_DEFLATED) as zf:
+            zf.writestr('images/boot.img', BOOT)
+            zf.writestr('images/vbmeta.img', VBMETA)
+            zf.writestr('payload.bin', b'CrAU' + b'\0' * 60, compress_type=zipfile.ZIP_STORED)
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_zip_lookup_by_basename(self):
+        with image_source.ZipSource(self.archive) as source:
+            self.assertTrue(source.has('boot.img'))
+            self.assertEqual(source.size('boot.img'), len(BOOT))
+            self.assertEqual(source.sha256('boot.img'), hashlib.sha256(BOOT).hexdigest())
+            with source.open('vbmeta.img') as f:
+                self.assertEqual(f.read(), VBMETA)
+
+    def test_stored_offset(self):
+        with image_source.ZipSource(self.archive) as source:
+            offset = source.stored_offset('payload.bin')
+            self.assertIsNone(source.stored_offset('boot.img'))
+        with open(self.archive, 'rb') as f:
+            f.seek(offset)
+            self.assertEqual(f.read(4), b'CrAU')
+
+    def test_firmware_source_prefers_loose_files(self):
+        loose = b'loose boot'
+        with open(os.path.join(self.firmware, 'boot.img'), 'wb') as f:
+            f.write(loose)
+        os.symlink(self.archive, os.path.join(self.firmware, 'factory.zip'))
+
+        with image_source.open_source(self.firmware) as source:
+            self.assertEqual(source.local_path('boot.img'), os.path.join(self.firmware, 'boot.img'))
+            self.assertIsNone(source.local_path('vbmeta.img'))
+            self.assertEqual(source.sha256('boot.img'), hashlib.sha256(loose).hexdigest())
+            self.assertIn('!images/vbmeta.img', source.describe('vbmeta.img'))
+
+    def test_stage_streams_members_into_memory(self):
+        os.symlink(self.archive, os.path.join(self.firmware, 'factory.zip'))
+        staged = image_source.stage_from_archives(self.firmware, ['boot.img', 'vbmeta.img'])
+        self.assertIsNotNone(staged)
+        with staged:
+            self.assertEqual(sorted(staged.in_memory()), ['boot.img', 'vbmeta.img'])
+            self.assertEqual(staged.sha256['boot.img'], hashlib.sha256(BOOT).hexdigest())
+            # Nothing was written next to the archive
+            self.assertEqual(os.listdir(self.firmware), ['factory.zip'])
+            # An external process can read the staged image by path
+            out = subprocess.check_output([sys.executable, '-c',
+                'import sys,hashlib; print(hashlib.sha256(open(sys.argv[1],"rb").read()).hexdigest())',
+                staged.paths['boot.img']])
+            self.assertEqual(out.decode().strip(), hashlib.sha256(BOOT).hexdigest())
+
+    def test_stage_from_archives_without_archives(self):
+        with open(os.path.join(self.firmware, 'boot.img'), 'wb') as f:
+            f.write(b'x')
+        self.assertIsNone(image_source.stage_from_archives(self.firmware, ['boot.img']))
+
+    def test_stage_loose_ref_uses_real_path(self):
+        path = os.path.join(self.root, 'magisk_patched.img')
+        with open(path, 'wb') as f:
+            f.write(b'patched')
+        staged, staged_path = image_source.stage_ref(path)
+        with staged:
+            self.assertEqual(staged_path, path)
+            self.assertEqual(staged.in_memory(), [])
+
+    def test_find_in_archives(self):
+        ref = image_source.find_in_archives('vbmeta.img', [os.path.join(self.root, 'missing'), self.root])
+        self.assertIsNotNone(ref)
+        self.assertEqual(ref.name, 'vbmeta.img')
+        ref.close()
+        self.assertIsNone(ref.source._zip.fp)
+        self.assertIsNone(image_source.find_in_archives('lk.img', [self.root]))
+
+    def test_image_source_is_abstract(self):
+        with self.assertRaises(TypeError):
+            image_source.ImageSource()
+
+        class NamesOnly(image_source.ImageSource):
+            def names(self):
+                return []
+
+        with self.assertRaises(TypeError):
+            NamesOnly()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,247 @@
+import unittest
+from unittest.mock import MagicMock, patch
+import os
+import sys
+import time
+import shutil
+import tempfile
+import threading
+import importlib
+
+# Add the repo root to sys.path so we can import pacman_toolkit
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from pacman_toolkit import fastboot_emulator as emu
+
+FAST = dict(bandwidth=1e9, latency=0)
+
+class InterceptorTestCase(unittest.TestCase):
+    def install(self, *devices):
+        bus = emu.EmulatedBus(list(devices))
+        with bus.installed():
+            import pacman_toolkit.pacman_interceptor as interceptor
+            self.interceptor = importlib.reload(interceptor)
+            # pyusb is imported on first use; bind the emulated bus now
+            self.interceptor.load_usb()
+        self.find = lambda: bus.core.find(find_all=True)
+        return bus
+
+    def make(self, **kwargs):
+        self.events = []
+        return self.interceptor.Interceptor(polling_interval=0.005, find=self.find,
+                                            on_event=self.events.append, **kwargs)
+
+    def kinds(self):
+        return [event.kind for event in self.events]
+
+class TestInterceptor(InterceptorTestCase):
+    def test_catches_and_rescues_without_exiting(self):
+        state = emu.FastbootDevice(appear_at=0.05, window=5, **FAST)
+        self.install(state)
+        with patch.object(self.interceptor, "run_rescue", return_value=0) as rescue, \
+             patch.object(self.interceptor, "log"):
+            result = self.make().run(timeout=5)
+        self.assertEqual((result.status, result.mode, result.attempts), ("rescued", "fastboot", 1))
+        self.assertEqual(self.kinds(), ["started", "appeared", "attempt", "caught", "rescued"])
+        self.assertEqual(state.commands, ["getvar:all"])
+        rescue.assert_called_once_with("fastboot")
+
+    def test_rescue_false_stops_at_the_catch(self):
+        self.install(emu.FastbootDevice(**FAST))
+        with patch.object(self.interceptor, "run_rescue") as rescue, patch.object(self.interceptor, "log"):
+            result = self.make(rescue=False).run(timeout=5)
+        self.assertEqual(result.status, "caught")
+        self.assertTrue(result.ok)
+        rescue.assert_not_called()
+
+    def test_gives_up_after_max_retries(self):
+        self.install(emu.FastbootDevice(**FAST))
+        interceptor = self.make(max_retries=1, retry_policies={"fastboot": "burst"})
+        with patch.object(self.interceptor, "freeze_fastboot", side_effect=emu.USBError("Access denied")):
+            result = interceptor.run(timeout=5)
+        self.assertEqual(result.status, "gave_up")
+        self.assertEqual(self.kinds(), ["started", "appeared", "attempt", "failed", "gave_up"])
+        self.assertIn("Access denied", self.events[3].detail)
+        # A second run starts with a fresh retry budget
+        with patch.object(self.interceptor, "freeze_fastboot"), patch.object(self.interceptor, "run_rescue", return_value=1):
+            self.assertEqual(interceptor.run(timeout=5).status, "rescue_failed")
+
+    def test_mtk_payload(self):
+        self.install(emu.FastbootDevice(idVendor=0x0e8d, idProduct=0x2000, **FAST))
+        firmware = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, firmware)
+        open(os.path.join(firmware, "preloader.img"), "wb").close()
+        with patch.object(self.interceptor, "FIRMWARE_DIR", firmware), \
+             patch.object(self.interceptor.process_watchdog, "run") as run, \
+             patch.object(self.interceptor, "run_rescue", return_value=0) as rescue:
+            run.return_value.ok = True
+            result = self.make().run(timeout=5)
+        self.assertEqual((result.status, result.mode), ("rescued", "preloader"))
+        self.assertEqual(run.call_args[0][0][-2:], ["--preloader", os.path.join(firmware, "preloader.img")])
+        rescue.assert_called_once_with("mtk")
+
+    def test_timeout_and_observe_only(self):
+        self.install(emu.FastbootDevice(window=0.05, **FAST))
+        with patch.object(self.interceptor, "freeze_fastboot") as freeze:
+            result = self.make(catch=False).run(timeout=0.2)
+        self.assertEqual(result.status, "timeout")
+        self.assertEqual(self.kinds(), ["started", "appeared", "left"])
+        freeze.assert_not_called()
+
+    def test_events_iterator_stops_when_left(self):
+        self.install(emu.FastbootDevice(appear_at=0.05, **FAST))
+        interceptor = self.make(catch=False)
+        for event in interceptor.events(timeout=30):
+            if event.kind != "started":
+                break
+        self.assertEqual(event.kind, "appeared")
+        self.assertEqual(interceptor.result.status, "stopped")
+        self.assertNotIn("interceptor", [t.name for t in threading.enumerate()])
+
+    def test_stop_from_another_thread(self):
+        self.install()
+        interceptor = self.make()
+        threading.Timer(0.05, interceptor.stop).start()
+        self.assertEqual(interceptor.run(timeout=30).status, "stopped")
+
+    def test_image_cache_is_created_once_by_concurrent_rescues(self):
+        from pacman_toolkit import image_cache
+        self.install()
+        created = []
+
+        def slow_cache(firmware_dir):
+            created.append(firmware_dir)
+            time.sleep(0.05)
+            return MagicMock()
+
+        with patch.object(image_cache, "FirmwareImageCache", slow_cache):
+            threads = [threading.Thread(target=self.interceptor.get_image_cache) for _ in range(4)]
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join()
+        self.assertEqual(len(created), 1)
+
+class FakeRealtime:
+    """Records apply()/restore() in `calls`, like realtime.RealtimeMode without touching the scheduler."""
+
+    active = True
+    scheduler = None
+
+    def __init__(self, calls):
+        self.calls = calls
+        self.messages = []
+
+    def describe(self):
+        return "fake"
+
+    def apply(self):
+        self.calls.append("apply")
+        return self
+
+    def restore(self):
+        self.calls.append("restore")
+
+class TestRealtime(InterceptorTestCase):
+    def setUp(self):
+        self.firmware = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.firmware)
+        open(os.path.join(self.firmware, "preloader.img"), "wb").close()
+        self.calls = []
+
+    def payload(self, ok):
+        def run(cmd, *args, **kwargs):
+            self.calls.append("payload")
+            return MagicMock(ok=ok, returncode=0 if ok else 1)
+        return run
+
+    def test_payload_runs_after_restore(self):
+        self.install(emu.FastbootDevice(idVendor=0x0e8d, idProduct=0x2000, window=5, **FAST))
+        with patch.object(self.interceptor, "FIRMWARE_DIR", self.firmware), \
+             patch.object(self.interceptor.process_watchdog, "run", side_effect=self.payload(False)), \
+             patch.object(self.interceptor, "log"):
+            result = self.make(rt=FakeRealtime(self.calls), max_retries=1,
+                               retry_policies={"preloader": "burst"}).run(timeout=5)
+        self.assertEqual(result.status, "gave_up")
+        # Polling goes back to real-time after the failed attempt
+        self.assertEqual(self.calls, ["apply", "restore", "payload", "apply", "restore"])
+
+    def test_main_restores_before_the_payload(self):
+        self.install(emu.FastbootDevice(idVendor=0x0e8d, idProduct=0x2000, window=5, **FAST))
+        with patch.object(self.interceptor, "FIRMWARE_DIR", self.firmware), \
+             patch.object(self.interceptor, "check_prerequisites"), \
+             patch.object(self.interceptor, "print_instructions"), \
+             patch.object(self.interceptor.process_watchdog, "run", side_effect=self.payload(True)), \
+             patch.object(self.interceptor, "run_rescue", side_effect=lambda mode: self.calls.append("rescue") or 0), \
+             patch.object(self.interceptor, "log"), self.assertRaises(SystemExit) as exit:
+            self.interceptor.main(rt=FakeRealtime(self.calls))
+        self.assertEqual(exit.exception.code, 0)
+        self.assertEqual(self.calls, ["apply", "restore", "payload", "rescue"])
+
+class TestStartup(InterceptorTestCase):
+    def run_main(self, check_prerequisites, find):
+        with patch.object(self.interceptor, "check_prerequisites", check_prerequisites), \
+             patch.object(self.interceptor, "print_instructions"), \
+             patch.object(self.interceptor.usb.core, "find", side_effect=find), \
+             patch.object(self.interceptor, "log"):
+            self.interceptor.main()
+
+    def test_polls_before_the_checks_finish(self):
+        self.install()
+        checked = threading.Event()
+        seen = []
+
+        def find(**kwargs):
+            if not seen:
+                seen.append(checked.is_set())
+                checked.set()
+                return []
+            raise KeyboardInterrupt
+
+        self.run_main(lambda: checked.wait(5), find)
+        self.assertEqual(seen, [False])
+
+    def test_failed_checks_stop_before_the_rescue(self):
+        state = emu.FastbootDevice(window=5, **FAST)
+        enumerate_bus = self.install(state).core.find
+        checking = threading.Event()
+
+        def check_prerequisites():
+            checking.wait(5)
+            sys.exit(1)
+
+        def find(**kwargs):
+            checking.set()
+            return enumerate_bus(find_all=True)
+
+        with patch.object(self.interceptor, "run_rescue") as rescue, self.assertRaises(SystemExit) as exit:
+            self.run_main(check_prerequisites, find)
+        self.assertEqual(exit.exception.code, 1)
+        # Frozen right away, but never flashed without the prerequisites
+        self.assertEqual(state.commands, ["getvar:all"])
+        rescue.assert_not_called()
+
+class TestManager(InterceptorTestCase):
+    def test_run_interceptor_in_process(self):
+        from pacman_toolkit import pacman_manager
+        self.install(emu.FastbootDevice(**FAST))
+        factory = self.interceptor.Interceptor
+        with patch.object(pacman_manager, "_interceptor", return_value=self.interceptor), \
+             patch.object(self.interceptor, "prerequisite_problems", return_value=[]), \
+             patch.object(self.interceptor, "Interceptor", lambda **kw: factory(find=self.find, polling_interval=0.005, **kw)), \
+             patch.object(self.interceptor, "run_rescue", return_value=0), \
+             patch.object(self.interceptor, "log"), patch("builtins.print") as printed:
+            result = pacman_manager.run_interceptor(timeout=5)
+        self.assertEqual(result.status, "rescued")
+        self.assertIn("caught: fastboot", " ".join(str(c[0][0]) for c in printed.call_args_list))
+
+    def test_missing_prerequisites(self):
+        from pacman_toolkit import pacman_manager
+        self.install()
+        with patch.object(pacman_manager, "_interceptor", return_value=self.interceptor), \
+             patch.object(self.interceptor, "RESCUE_SCRIPT", "/nonexistent/flash_rescue.sh"), \
+             patch("builtins.print"):
+            self.assertIsNone(pacman_manager.run_interceptor())
+
+if __name__ == '__main__':
+    unittest.main()
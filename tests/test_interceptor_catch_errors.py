@@ -53,6 +53,7 @@ class TestInterceptorCatchErrors(unittest.TestCase):
         self.mock_exit = self.exit_patcher.start()
 
         # Ensure interceptor uses OUR mock_usb_util
+        interceptor.load_usb()
         self.original_usb_util = interceptor.usb.util
         interceptor.usb.util = mock_usb_util
 
@@ -62,7 +63,7 @@ class TestInterceptorCatchErrors(unittest.TestCase):
         interceptor.usb.util = self.original_usb_util
 
     def test_catch_fastboot_claim_interface_error(self):
-        """Test that catch_fastboot handles exceptions (e.g. claim_interface failure) correctly."""
+        """Test that a fastboot catch error (e.g. claim_interface failure) fails only the attempt."""
 
         # Setup mock device
         mock_dev = MagicMock()
@@ -74,22 +75,21 @@ class TestInterceptorCatchErrors(unittest.TestCase):
         # raising an Exception here simulates a failure during interception
         mock_usb_util.claim_interface.side_effect = Exception("Simulated Fastboot Error")
 
-        # Call the function under test
-        interceptor.catch_fastboot(mock_dev)
+        # catch_device passes the error on
+        with self.assertRaisesRegex(Exception, "Simulated Fastboot Error"):
+            interceptor.catch_device(mock_dev, "fastboot")
+
+        # One poll of the detection loop turns it into a failed attempt
+        events = []
+        session = interceptor.Interceptor(find=lambda: [mock_dev], on_event=events.append)
+        self.assertIsNone(session.poll())
 
         # Verification
 
-        # 1. Verify log was called with the error message
-        # We expect a call like log(f"Fastboot Catch Error: {e}", Colors.FAIL)
-        # Check if any call args contain the expected substring
-        error_logged = False
-        for call in self.mock_log.call_args_list:
-            args, _ = call
-            if args and "Fastboot Catch Error" in str(args[0]) and "Simulated Fastboot Error" in str(args[0]):
-                error_logged = True
-                break
-
-        self.assertTrue(error_logged, "Expected error message not logged")
+        # 1. Verify the failed attempt carries the error message
+        failed = [event for event in events if event.kind == "failed"]
+        self.assertEqual(len(failed), 1)
+        self.assertIn("Simulated Fastboot Error", failed[0].detail)
 
         # 2. Verify that subprocess.call was NOT called (meaning we didn't proceed to rescue script)
         subprocess.call.assert_not_called()
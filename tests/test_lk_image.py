@@ -0,0 +1,92 @@
+import unittest
+import os
+import sys
+import struct
+import tempfile
+import time
+
+# Add the repo root to sys.path so we can import pacman_toolkit
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from pacman_toolkit import lk_image
+
+FIRMWARE_LK = os.path.join(os.path.dirname(__file__), '..', 'pacman_toolkit', 'firmware', 'lk.img')
+
+def make_header(name, dsize, last=False, align=16, hdr_size=512):
+    hdr = struct.pack('<II32sIIIIIIII',
+                      lk_image.LK_MAGIC, dsize, name.encode(), 0xffffffff, 0xffffffff,
+                      lk_image.LK_EXT_MAGIC, hdr_size, 1, 0, 1 if last else 0, align)
+    return hdr + b'\xff' * (hdr_size - len(hdr))
+
+def make_image(parts, padding=0):
+    data = b''
+    for i, (name, dsize) in enumerate(parts):
+        data += make_header(name, dsize, last=(i == len(parts) - 1))
+        data += b'\xaa' * dsize
+        data += b'\0' * ((-dsize) % 16)
+    return data + b'\0' * padding
+
+class TestLkImage(unittest.TestCase):
+    def setUp(self):
+        lk_image.clear_cache()
+        self.tmpdir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def write(self, data, name='lk.img'):
+        path = os.path.join(self.tmpdir.name, name)
+        with open(path, 'wb') as f:
+            f.write(data)
+        return path
+
+    def test_parse_chain(self):
+        path = self.write(make_image([('lk', 1000), ('cert1', 33), ('cert2', 16)], padding=4096))
+        image = lk_image.parse_lk_image(path)
+
+        self.assertEqual(image.names(), ['lk', 'cert1', 'cert2'])
+        lk = image.find('lk')
+        self.assertEqual(lk.header_offset, 0)
+        self.assertEqual(lk.data_offset, 512)
+        self.assertEqual(lk.size, 1000)
+        # 1000 rounded up to 16 is 1008
+        self.assertEqual(image.partitions[1].header_offset, 512 + 1008)
+        self.assertEqual(image.used_length, image.file_size - 4096)
+
+    def test_rejects_wrong_magic(self):
+        path = self.write(b'MMM\x01' + b'\0' * 1020)
+        with self.assertRaises(lk_image.LkImageError):
+            lk_image.parse_lk_image(path)
+        self.assertFalse(lk_image.has_lk_magic(path))
+
+    def test_rejects_truncated_data(self):
+        data = make_image([('lk', 4096)])
+        path = self.write(data[:2048])
+        with self.assertRaises(lk_image.LkImageError):
+            lk_image.parse_lk_image(path)
+
+    def test_rejects_garbage_after_chain(self):
+        path = self.write(make_image([('lk', 64)]) + b'\x12' * 32)
+        ok, msg = lk_image.validate_lk_image(path)
+        self.assertFalse(ok)
+        self.assertIn("after header chain", msg)
+
+    def test_cached_by_hash(self):
+        data = make_image([('lk', 64)])
+        first = lk_image.parse_lk_image(self.write(data, 'a.img'))
+        second = lk_image.parse_lk_image(self.write(data, 'b.img'))
+        self.assertIs(first, second)
+
+    @unittest.skipUnless(os.path.exists(FIRMWARE_LK), "firmware lk.img not present")
+    def test_shipped_firmware(self):
+        start = time.perf_counter()
+        image = lk_image.parse_lk_image(FIRMWARE_LK, use_cache=False)
+        elapsed = time.perf_counter() - start
+
+        self.assertEqual(image.partitions[0].name, 'lk')
+        self.assertIn('lk_main_dtb', image.names())
+        # Header walk plus hash of a ~3MB image should stay well under 50ms
+        self.assertLess(elapsed, 0.05)
+
+if __name__ == '__main__':
+    unittest.main()
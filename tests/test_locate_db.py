@@ -0,0 +1,137 @@
+import unittest
+from unittest.mock import patch
+import os
+import sys
+import shutil
+import tempfile
+
+# Add the repo root to sys.path so we can import pacman_toolkit
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from pacman_toolkit import file_index
+from pacman_toolkit import locate_db
+from pacman_toolkit import pacman_manager
+from pacman_toolkit.locate_db import LocateDB, LocateDBError, locate
+
+def write_mlocate_db(db_path, root, extra=()):
+    """Writes an mlocate database of the tree under `root`, plus fake (dir, [files]) records."""
+    config = b"prune_bind_mounts\0" + b"0\0\0"
+    out = locate_db.HEADER.pack(locate_db.MAGIC, len(config), 0, 0) + os.fsencode(root) + b"\0" + config
+    records = [(dirpath, dirs, files) for dirpath, dirs, files in os.walk(root)]
+    records += [(dirpath, [], files) for dirpath, files in extra]
+    for dirpath, dirs, files in records:
+        out += locate_db.DIRECTORY.pack(1700000000, 5) + os.fsencode(dirpath) + b"\0"
+        for name in sorted(dirs):
+            out += bytes([locate_db.ENTRY_DIR]) + os.fsencode(name) + b"\0"
+        for name in sorted(files):
+            out += bytes([locate_db.ENTRY_FILE]) + os.fsencode(name) + b"\0"
+        out += bytes([locate_db.ENTRY_END])
+    with open(db_path, "wb") as f:
+        f.write(out)
+    return out
+
+class TestLocateDB(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.tree = os.path.join(self.tmp, "tree")
+        self.db = os.path.join(self.tmp, "mlocate.db")
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def make(self, rel):
+        path = os.path.join(self.tree, rel)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        open(path, "wb").close()
+        return path
+
+    def test_finds_files_across_chunk_boundaries(self):
+        boot = self.make("fw/boot.img")
+        lk = self.make("a/b/c/lk.bin")
+        self.make("fw/other.img")
+        os.makedirs(os.path.join(self.tree, "boot.img.d"))
+        write_mlocate_db(self.db, self.tree)
+
+        db = LocateDB(self.db)
+        self.assertEqual(db.root, self.tree)
+        for chunk in (1 << 20, 7, 1):
+            with patch.object(locate_db, "CHUNK_SIZE", chunk):
+                hits = sorted(db.find(["boot.img", "lk.bin", "boot.img.d"]))
+            # Directory entries are never reported
+            self.assertEqual(hits, [("boot.img", boot), ("lk.bin", lk)])
+
+    def test_locate_drops_stale_hits(self):
+        boot = self.make("fw/boot.img")
+        write_mlocate_db(self.db, self.tree, extra=[("/nonexistent/dir", ["boot.img", "vbmeta.img"])])
+        found, messages = locate(["boot.img", "vbmeta.img"], dbs=[self.db])
+        self.assertEqual(found, {"boot.img": [boot], "vbmeta.img": []})
+        self.assertEqual(messages, [])
+
+    def test_unusable_databases_are_skipped(self):
+        plocate = os.path.join(self.tmp, "plocate.db")
+        with open(plocate, "wb") as f:
+            f.write(b"\0plocate" + b"\0" * 100)
+        garbage = os.path.join(self.tmp, "locatedb")
+        with open(garbage, "wb") as f:
+            f.write(b"\0LOCATE02\0")
+        found, messages = locate(["boot.img"], dbs=[plocate, garbage, os.path.join(self.tmp, "missing.db")])
+        self.assertEqual(found, {"boot.img": []})
+        self.assertEqual(len(messages), 3)
+        self.assertIn("plocate", messages[0])
+        self.assertIn("not an mlocate database", messages[1])
+
+    def test_truncated_database(self):
+        self.make("fw/boot.img")
+        data = write_mlocate_db(self.db, self.tree)
+        with open(self.db, "wb") as f:
+            f.write(data[:-3])
+        with self.assertRaises(LocateDBError):
+            list(LocateDB(self.db).find(["boot.img"]))
+        _, messages = locate(["boot.img"], dbs=[self.db])
+        self.assertIn("truncated", messages[0])
+
+    def test_databases_from_locate_path(self):
+        self.make("fw/boot.img")
+        write_mlocate_db(self.db, self.tree)
+        with patch.dict(os.environ, {"LOCATE_PATH": f"{self.db}:{self.tmp}/missing.db"}), \
+             patch.object(locate_db, "DEFAULT_DATABASES", [self.db, "/nonexistent/mlocate.db"]):
+            self.assertEqual(locate_db.databases(), [self.db])
+
+class TestManagerSearchHome(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.home = os.path.join(self.tmp, "home")
+        os.makedirs(self.home)
+        self.db = os.path.join(self.tmp, "mlocate.db")
+        self.patches = [patch.dict(os.environ, {"HOME": self.home}),
+                        patch.object(pacman_manager, "FILE_INDEX_PATH", os.path.join(self.tmp, "index.json"))]
+        for p in self.patches:
+            p.start()
+
+    def tearDown(self):
+        for p in reversed(self.patches):
+            p.stop()
+        shutil.rmtree(self.tmp)
+
+    def test_locate_hits_skip_the_disk_walk(self):
+        elsewhere = os.path.join(self.tmp, "other", "boot.img")
+        os.makedirs(os.path.dirname(elsewhere))
+        open(elsewhere, "wb").close()
+        mine = os.path.join(self.home, "fw", "boot.img")
+        os.makedirs(os.path.dirname(mine))
+        open(mine, "wb").close()
+        write_mlocate_db(self.db, self.tmp)
+        with patch.object(locate_db, "databases", return_value=[self.db]), \
+             patch.object(file_index, "FileIndex") as index:
+            self.assertEqual(pacman_manager.search_home(["boot.img"]), {"boot.img": mine})
+        index.assert_not_called()
+
+    def test_falls_back_without_a_database(self):
+        mine = os.path.join(self.home, ".stash", "boot.img")
+        os.makedirs(os.path.dirname(mine))
+        open(mine, "wb").close()
+        with patch.object(locate_db, "databases", return_value=[]):
+            self.assertEqual(pacman_manager.search_home(["boot.img"]), {"boot.img": mine})
+
+if __name__ == '__main__':
+    unittest.main()
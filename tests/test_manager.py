@@ -2,6 +2,7 @@ import unittest
 from unittest.mock import patch, MagicMock
 import os
 import sys
+import tempfile
 
 # Add the repo root to sys.path so we can import pacman_toolkit
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
@@ -28,24 +29,54 @@ class TestPacmanManager(unittest.TestCase):
         self.assertIsNotNone(result)
         self.assertTrue(result.endswith("boot.img"))
 
+    @patch('pacman_toolkit.pacman_manager.image_source.find_in_archives')
+    @patch('os.path.exists')
+    def test_find_file_interactive_archive(self, mock_exists, mock_find_in_archives):
+        # Case 1b: Not loose anywhere, but inside a factory zip in a common path
+        mock_exists.return_value = False
+        ref = MagicMock()
+        mock_find_in_archives.return_value = ref
+
+        with patch('builtins.print'):
+            result = pacman_manager.find_file_interactive("boot.img")
+
+        self.assertIs(result, ref)
+        args, _ = mock_find_in_archives.call_args
+        self.assertEqual(args[0], "boot.img")
+
     @patch('builtins.input', side_effect=['y'])
-    @patch('os.walk')
     @patch('os.path.exists')
-    def test_find_file_interactive_hidden(self, mock_exists, mock_walk, mock_input):
-        # Case 2: File not found in common, found in hidden
+    def test_find_file_interactive_hidden(self, mock_exists, mock_input):
+        # Case 2: File not found in common, found in hidden (through the file index)
         mock_exists.return_value = False # Not in common paths
 
-        # Mock os.walk to return a hit in a hidden folder
-        # root, dirs, files
-        mock_walk.return_value = [
-            ('/home/user/.hidden', [], ['secret.img'])
-        ]
-
-        with patch('builtins.print'):
-            result = pacman_manager.find_file_interactive("secret.img")
+        with tempfile.TemporaryDirectory() as home:
+            os.makedirs(os.path.join(home, '.hidden'))
+            open(os.path.join(home, '.hidden', 'secret.img'), 'wb').close()
+            index_path = os.path.join(home, 'index.json')
+            with patch.dict(os.environ, {'HOME': home}), \
+                 patch.object(pacman_manager, 'FILE_INDEX_PATH', index_path), \
+                 patch('builtins.print'):
+                result = pacman_manager.find_file_interactive("secret.img")
 
         self.assertIsNotNone(result)
-        self.assertEqual(result, '/home/user/.hidden/secret.img')
+        self.assertEqual(result, os.path.join(home, '.hidden', 'secret.img'))
+
+    @patch('builtins.input', side_effect=['y'])
+    @patch('os.path.exists')
+    def test_find_file_interactive_hidden_unindexed_name(self, mock_exists, mock_input):
+        # Names the index does not track are found by a direct search
+        mock_exists.return_value = False # Not in common paths
+
+        with tempfile.TemporaryDirectory() as home:
+            os.makedirs(os.path.join(home, '.hidden', 'deep'))
+            open(os.path.join(home, '.hidden', 'deep', 'secret_notes'), 'wb').close()
+            with patch.dict(os.environ, {'HOME': home}), \
+                 patch.object(pacman_manager, 'FILE_INDEX_PATH', os.path.join(home, 'index.json')), \
+                 patch('builtins.print'):
+                result = pacman_manager.find_file_interactive("secret_notes")
+
+        self.assertEqual(result, os.path.join(home, '.hidden', 'deep', 'secret_notes'))
 
     @patch('builtins.input', side_effect=['n', '/custom/path/custom.img'])
     @patch('os.path.isfile')
@@ -83,5 +114,34 @@ class TestPacmanManager(unittest.TestCase):
 
         self.assertIsNone(result)
 
+    def test_flash_root_closes_the_archive(self):
+        import zipfile
+        from pacman_toolkit import image_source
+        with tempfile.TemporaryDirectory() as tmp:
+            archive = os.path.join(tmp, 'factory.zip')
+            with zipfile.ZipFile(archive, 'w') as zf:
+                zf.writestr('images/magisk_patched.img', b'patched')
+            ref = image_source.ImageRef(image_source.ZipSource(archive), 'magisk_patched.img')
+            with patch.object(pacman_manager, 'find_file_interactive', return_value=ref), \
+                 patch.object(pacman_manager, 'print_header'), \
+                 patch.object(pacman_manager, 'flash_partition') as flash, \
+                 patch.object(pacman_manager.subprocess, 'check_call'), \
+                 patch.object(pacman_manager.subprocess, 'call'), \
+                 patch('builtins.input', return_value=''), patch('builtins.print'):
+                pacman_manager.flash_root()
+        self.assertEqual([c[0][0] for c in flash.call_args_list], ['boot_a', 'boot_b'])
+        self.assertIsNone(ref.source._zip.fp)
+
+    def test_import_defers_the_heavy_modules(self):
+        import subprocess
+        lazy = ['batch_jobs', 'file_index', 'file_search', 'locate_db', 'process_watchdog']
+        code = ("import sys; import pacman_toolkit.pacman_manager; "
+                f"print([m for m in {lazy!r} if 'pacman_toolkit.' + m in sys.modules]); "
+                # pyusb waits for the first poll
+                "import pacman_toolkit.pacman_interceptor; print('usb' in sys.modules)")
+        root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+        out = subprocess.check_output([sys.executable, '-c', code], cwd=root, text=True)
+        self.assertEqual(out.split(), ['[]', 'False'])
+
 if __name__ == '__main__':
     unittest.main()
@@ -28,6 +28,7 @@ class TestMtkPids(unittest.TestCase):
             import pacman_toolkit.pacman_interceptor
             importlib.reload(pacman_toolkit.pacman_interceptor)
             self.interceptor = pacman_toolkit.pacman_interceptor
+            self.interceptor.load_usb()
 
         # Reset spinner
         self.interceptor.spinner = None
@@ -35,10 +36,8 @@ class TestMtkPids(unittest.TestCase):
         # Mocks for usb.core to be used in test
         self.mock_usb_core = mock_usb_core
 
-    @patch('time.sleep')
-    @patch('pacman_toolkit.pacman_interceptor.catch_mtk')
-    def test_mtk_pid_check(self, mock_catch_mtk, mock_sleep):
-        """Verify that catch_mtk is only called for valid MTK PIDs."""
+    def test_mtk_pid_check(self):
+        """Verify that a catch is only attempted for valid MTK PIDs."""
 
         # Create mock devices
         # Device 1: Valid MTK BROM
@@ -63,7 +62,7 @@ class TestMtkPids(unittest.TestCase):
         dev_invalid.address = 3
 
         # Set up find return value on the Mock usb.core that interceptor uses
-        # Since interceptor.usb.core IS mock_usb_core (because we patched sys.modules during reload)
+        # Since interceptor.usb.core IS mock_usb_core (because load_usb() ran while we patched sys.modules)
         # BUT sys.modules['usb.core'] was restored after reload.
         # So interceptor.usb.core holds the Mock object created in setUp.
 
@@ -74,11 +73,14 @@ class TestMtkPids(unittest.TestCase):
         class LoopExit(Exception):
             pass
 
-        mock_sleep.side_effect = LoopExit("Exiting main loop")
-
         # Also need to patch check_prerequisites to avoid filesystem checks
+        # Every attempt fails, so both devices are tried in the first poll
         with patch.object(self.interceptor, 'check_prerequisites'), \
-             patch.object(self.interceptor, 'print_instructions'):
+             patch.object(self.interceptor, 'print_instructions'), \
+             patch.object(self.interceptor, 'log'), \
+             patch.object(self.interceptor, 'catch_device',
+                          side_effect=self.interceptor.CatchError("no payload")) as mock_catch, \
+             patch.object(self.interceptor.Interceptor, '_sleep', side_effect=LoopExit("Exiting main loop")):
 
             # Run main() and catch the exit exception
             try:
@@ -89,11 +91,10 @@ class TestMtkPids(unittest.TestCase):
                 self.fail(f"Unexpected exception: {e}")
 
         # Verify calls
-        # We verify mock_catch_mtk was called.
-        # mock_catch_mtk is passed via decorator.
-        # This patches interceptor.catch_mtk (on the reloaded module).
+        # We verify mock_catch was called.
+        # This patches interceptor.catch_device (on the reloaded module).
 
-        calls = mock_catch_mtk.call_args_list
+        calls = mock_catch.call_args_list
         called_devices = [c[0][0] for c in calls]
 
         # Assertions
@@ -101,7 +102,7 @@ class TestMtkPids(unittest.TestCase):
         self.assertIn(dev_preloader, called_devices, "Valid Preloader PID should be caught")
         self.assertNotIn(dev_invalid, called_devices, "Invalid PID should NOT be caught")
 
-        self.assertEqual(mock_catch_mtk.call_count, 2)
+        self.assertEqual(mock_catch.call_count, 2)
 
 if __name__ == '__main__':
     unittest.main()
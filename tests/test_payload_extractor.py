@@ -0,0 +1,169 @@
+import unittest
+import os
+import sys
+import bz2
+import lzma
+import struct
+import hashlib
+import tempfile
+
+# Add the repo root to sys.path so we can import pacman_toolkit
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from pacman_toolkit import payload_extractor as pe
+
+BLOCK = 4096
+
+# --- Tiny protobuf encoder, just enough to build test manifests ---
+
+def varint(n):
+    out = bytearray()
+    while True:
+        b = n & 0x7f
+        n >>= 7
+        if n:
+            out.append(b | 0x80)
+        else:
+            out.append(b)
+            return bytes(out)
+
+def field_varint(num, value):
+    return varint(num << 3) + varint(value)
+
+def field_bytes(num, value):
+    return varint((num << 3) | 2) + varint(len(value)) + value
+
+def build_payload(partitions):
+    """
+    partitions: list of (name, [(op_type, raw_data, start_block)])
+    Returns (payload bytes, {name: expected image bytes}).
+    """
+    blobs = b''
+    manifest = field_varint(3, BLOCK)
+    expected = {}
+
+    for name, ops in partitions:
+        num_blocks_total = max(start + max(1, -(-len(raw) // BLOCK)) for _, raw, start in ops)
+        image = bytearray(num_blocks_total * BLOCK)
+        part = field_bytes(1, name.encode())
+        op_msgs = b''
+        for op_type, raw, start in ops:
+            nblocks = max(1, -(-len(raw) // BLOCK))
+            if op_type == pe.OP_REPLACE_BZ:
+                blob = bz2.compress(raw)
+            elif op_type == pe.OP_REPLACE_XZ:
+                blob = lzma.compress(raw)
+            elif op_type == pe.OP_ZERO:
+                blob = b''
+            else:
+                blob = raw
+            if op_type != pe.OP_ZERO:
+                image[start * BLOCK:start * BLOCK + len(raw)] = raw
+            extent = field_varint(1, start) + field_varint(2, nblocks)
+            op = field_varint(1, op_type)
+            if blob:
+                op += field_varint(2, len(blobs)) + field_varint(3, len(blob))
+                op += field_bytes(8, hashlib.sha256(blob).digest())
+            op += field_bytes(6, extent)
+            op_msgs += field_bytes(8, op)
+            blobs += blob
+        info = field_varint(1, len(image)) + field_bytes(2, hashlib.sha256(image).digest())
+        part += field_bytes(7, info) + op_msgs
+        manifest += field_bytes(13, part)
+        expected[name] = bytes(image)
+
+    header = pe.PAYLOAD_MAGIC + struct.pack('>QQI', 2, len(manifest), 0)
+    return header + manifest + blobs, expected
+
+class TestPayloadExtractor(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.out_dir = os.path.join(self.tmpdir.name, 'firmware')
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def write_payload(self, data):
+        path = os.path.join(self.tmpdir.name, 'payload.bin')
+        with open(path, 'wb') as f:
+            f.write(data)
+        return path
+
+    def test_extracts_requested_partitions(self):
+        boot = os.urandom(BLOCK * 2)
+        data, expected = build_payload([
+            ('boot', [(pe.OP_REPLACE_XZ, boot, 0), (pe.OP_ZERO, b'\0' * BLOCK, 2),
+                      (pe.OP_REPLACE_BZ, b'tail' * 100, 3)]),
+            ('vbmeta', [(pe.OP_REPLACE, b'AVB0' + b'\1' * 100, 0)]),
+            ('system', [(pe.OP_REPLACE, b'S' * BLOCK, 0)]),
+        ])
+        path = self.write_payload(data)
+
+        written = pe.extract_partitions(path, {'boot': 'boot.img', 'vbmeta': 'vbmeta.img'},
+                                        self.out_dir, workers=4)
+
+        self.assertEqual(set(written), {'boot.img', 'vbmeta.img'})
+        with open(written['boot.img'], 'rb') as f:
+            self.assertEqual(f.read(), expected['boot'])
+        with open(written['vbmeta.img'], 'rb') as f:
+            self.assertEqual(f.read(), expected['vbmeta'])
+        self.assertFalse(os.path.exists(os.path.join(self.out_dir, 'system.img')))
+
+    def test_unrelated_partitions_are_not_decoded(self):
+        # A broken operation in an unrelated partition must not be touched
+        data, _ = build_payload([
+            ('boot', [(pe.OP_REPLACE, b'B' * BLOCK, 0)]),
+            ('super', [(pe.OP_REPLACE_XZ, b'x' * BLOCK, 0)]),
+        ])
+        data = data.replace(lzma.compress(b'x' * BLOCK), b'\0' * len(lzma.compress(b'x' * BLOCK)))
+        path = self.write_payload(data)
+
+        written = pe.extract_partitions(path, {'boot': 'boot.img'}, self.out_dir, verify=False)
+        self.assertIn('boot.img', written)
+
+    def test_preloader_raw_alias(self):
+        data, expected = build_payload([('preloader_raw', [(pe.OP_REPLACE, b'MMM\x01' * 64, 0)])])
+        path = self.write_payload(data)
+
+        written = pe.extract_partitions(path, pe.RESCUE_PARTITIONS, self.out_dir)
+        self.assertEqual(list(written), ['preloader.img'])
+
+    def test_hash_mismatch_leaves_no_output(self):
+        data, _ = build_payload([('boot', [(pe.OP_REPLACE, b'B' * BLOCK, 0)])])
+        data = data[:-1] + b'X'
+        path = self.write_payload(data)
+
+        with self.assertRaises(pe.PayloadError):
+            pe.extract_partitions(path, {'boot': 'boot.img'}, self.out_dir)
+        self.assertEqual(os.listdir(self.out_dir), [])
+
+    def test_corrupted_hash_cleans_up_every_partition(self):
+        # boot is padded to a block, so its partition and operation hashes differ
+        boot = b'B' * 100
+        partition_hash = hashlib.sha256(boot + b'\0' * (BLOCK - len(boot))).digest()
+        operation_hash = hashlib.sha256(boot).digest()
+        for corrupted in (partition_hash, operation_hash):
+            with self.subTest(corrupted=corrupted.hex()[:8]):
+                data, _ = build_payload([('boot', [(pe.OP_REPLACE, boot, 0)]),
+                                         ('vbmeta', [(pe.OP_REPLACE, b'AVB0' * 100, 0)])])
+                path = self.write_payload(data.replace(corrupted, b'\0' * 32))
+                open_fds = len(os.listdir('/proc/self/fd'))
+
+                with self.assertRaises(pe.PayloadError):
+                    pe.extract_partitions(path, {'boot': 'boot.img', 'vbmeta': 'vbmeta.img'}, self.out_dir)
+                self.assertEqual(os.listdir(self.out_dir), [])
+                self.assertEqual(len(os.listdir('/proc/self/fd')), open_fds)
+
+    def test_rejects_bad_magic(self):
+        path = self.write_payload(b'PK\x03\x04' + b'\0' * 60)
+        with self.assertRaises(pe.PayloadError):
+            pe.list_partitions(path)
+
+    def test_rejects_delta_operations(self):
+        data, _ = build_payload([('boot', [(4, b'B' * BLOCK, 0)])])  # SOURCE_COPY
+        path = self.write_payload(data)
+        with self.assertRaises(pe.PayloadError):
+            pe.extract_partitions(path, {'boot': 'boot.img'}, self.out_dir)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,152 @@
+import unittest
+from unittest.mock import patch
+import io
+import os
+import sys
+import time
+import shutil
+import tempfile
+
+# Add the repo root to sys.path so we can import pacman_toolkit
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from pacman_toolkit import process_watchdog as watchdog
+from pacman_toolkit.process_watchdog import FastbootSteps, StepFailed
+
+def python(code):
+    return [sys.executable, "-c", code]
+
+def alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    return True
+
+class TestRun(unittest.TestCase):
+    def test_ok_streams_output(self):
+        echo = io.BytesIO()
+        result = watchdog.run(python("print('Sending boot_a'); import sys; sys.stderr.write('OKAY\\n')"),
+                              "flash", echo=echo)
+        self.assertTrue(result.ok)
+        self.assertEqual(result.returncode, 0)
+        self.assertEqual(result.tail, ["Sending boot_a", "OKAY"])
+        self.assertEqual(echo.getvalue().splitlines(), [b"Sending boot_a", b"OKAY"])
+
+    def test_failed(self):
+        result = watchdog.run(python("print(\"FAILED (remote: 'locked')\"); raise SystemExit(3)"), "unlock", echo=False)
+        self.assertEqual((result.status, result.returncode), ("failed", 3))
+        self.assertIn("locked", result.describe())
+        with self.assertRaises(StepFailed) as failed:
+            watchdog.check(python("raise SystemExit(3)"), "unlock", echo=False)
+        self.assertEqual(failed.exception.returncode, 3)
+
+    def test_missing_program(self):
+        with self.assertRaises(FileNotFoundError):
+            watchdog.run(["/nonexistent/fastboot"], echo=False)
+
+    def test_stall_kills_the_process_group(self):
+        pid_file = os.path.join(tempfile.mkdtemp(), "pid")
+        self.addCleanup(shutil.rmtree, os.path.dirname(pid_file))
+        # The child starts a grandchild (like flash_rescue.sh starting fastboot) and both go quiet
+        code = ("import subprocess, sys, time; p = subprocess.Popen([sys.executable, '-c', 'import time; time.sleep(30)']);"
+                f"open({pid_file!r}, 'w').write(str(p.pid)); print('Sending boot_a', flush=True); time.sleep(30)")
+        start = time.monotonic()
+        result = watchdog.run(python(code), "rescue", stall_timeout=0.5, echo=False)
+        self.assertLess(time.monotonic() - start, 5)
+        self.assertEqual(result.status, "stalled")
+        self.assertLess(result.returncode, 0)
+        self.assertEqual(result.step, "Sending boot_a")
+        self.assertIn("no output for", result.describe())
+        with open(pid_file) as f:
+            grandchild = int(f.read())
+        for _ in range(50):
+            if not alive(grandchild):
+                break
+            time.sleep(0.05)
+        self.assertFalse(alive(grandchild))
+
+    def test_ignored_sigterm_gets_sigkill(self):
+        code = "import signal, time; signal.signal(signal.SIGTERM, signal.SIG_IGN); print('ready', flush=True); time.sleep(30)"
+        with patch.object(watchdog, "KILL_GRACE", 0.2):
+            result = watchdog.run(python(code), stall_timeout=0.5, echo=False)
+        self.assertEqual((result.status, result.returncode), ("stalled", -9))
+
+    def test_allowance_extends_the_quiet_period(self):
+        code = "import time; print(\"Sending 'boot_a' (1024 KB)\", flush=True); time.sleep(0.6); print('OKAY')"
+        steps = FastbootSteps(throughput=1e6, base=0.5)
+        result = watchdog.run(python(code), stall_timeout=0.3, allowance=steps, echo=False)
+        self.assertTrue(result.ok, result.describe())
+        # Any other line falls back to the stall timeout
+        code = "import time; print('waiting', flush=True); time.sleep(0.6); print('OKAY')"
+        self.assertEqual(watchdog.run(python(code), stall_timeout=0.3, allowance=steps, echo=False).status, "stalled")
+
+    def test_deadline_despite_output(self):
+        code = "import time\nwhile True:\n    print('.', flush=True)\n    time.sleep(0.05)"
+        result = watchdog.run(python(code), "flash", deadline=0.5, stall_timeout=5, echo=False)
+        self.assertEqual((result.status, result.limit), ("timeout", 0.5))
+        self.assertIn("0.5s deadline", result.describe())
+
+    def test_background_grandchild_holding_the_pipe(self):
+        # The child exits, but a process it left behind keeps stdout open
+        code = "import subprocess, sys; subprocess.Popen([sys.executable, '-c', 'import time; time.sleep(3)']); print('done')"
+        start = time.monotonic()
+        result = watchdog.run(python(code), stall_timeout=10, echo=False)
+        self.assertTrue(result.ok)
+        self.assertLess(time.monotonic() - start, 2)
+
+class TestDeadlines(unittest.TestCase):
+    def test_step_deadline(self):
+        self.assertEqual(watchdog.step_deadline(0), watchdog.BASE_SECONDS)
+        self.assertEqual(watchdog.step_deadline(10e6, throughput=10e6, base=0), watchdog.SAFETY_FACTOR)
+
+    def test_fastboot_steps(self):
+        steps = FastbootSteps(throughput=1024, base=0)
+        self.assertEqual(steps("Sending 'boot_a' (65536 KB)"), 65536 * watchdog.SAFETY_FACTOR)
+        self.assertEqual(steps("Sending sparse 'super' 1/4 (262140 KB)"), 262140 * watchdog.SAFETY_FACTOR)
+        self.assertEqual(steps("Writing 'boot_a'"), 65536 * watchdog.SAFETY_FACTOR)
+        self.assertIsNone(steps("Writing 'vbmeta'"))
+        self.assertIsNone(steps("OKAY [  0.002s]"))
+
+class TestCallers(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp)
+
+    def script(self, name, body):
+        path = os.path.join(self.tmp, name)
+        with open(path, "w") as f:
+            f.write("#!/bin/sh\n" + body)
+        os.chmod(path, 0o755)
+        return path
+
+    def test_batch_fastboot_stall_fails_the_job(self):
+        from pacman_toolkit import batch_jobs
+        self.script("fastboot", "echo '< waiting for any device >'\nsleep 30\n")
+        image = os.path.join(self.tmp, "boot.img")
+        with open(image, "wb") as f:
+            f.write(b"\0" * 4096)
+        with patch.dict(os.environ, {"PATH": self.tmp + os.pathsep + os.environ["PATH"]}), \
+             patch.object(watchdog, "STALL_TIMEOUT", 0.3), \
+             self.assertRaises(batch_jobs.JobError) as failed:
+            batch_jobs._fastboot("A1", "flash", "boot_a", image)
+        self.assertIn("no output for", str(failed.exception))
+        self.assertIn("waiting for any device", str(failed.exception))
+
+    def test_rescue_script_is_killed_when_it_stalls(self):
+        from pacman_toolkit import fastboot_emulator as emu
+        import importlib
+        with emu.EmulatedBus([]).installed():
+            import pacman_toolkit.pacman_interceptor as interceptor
+            interceptor = importlib.reload(interceptor)
+        script = self.script("flash_rescue.sh", "echo \"Flashing $1\"\nsleep 30\n")
+        with patch.object(interceptor, "RESCUE_SCRIPT", script), \
+             patch.object(interceptor, "FIRMWARE_DIR", self.tmp), \
+             patch.object(interceptor, "STALL_TIMEOUT", 0.3), \
+             patch.object(interceptor, "log") as log, \
+             patch.object(sys, "stdout", io.StringIO()):
+            self.assertLess(interceptor.run_rescue("fastboot"), 0)
+        self.assertIn("'Flashing fastboot'", log.call_args_list[-1][0][0])
+
+if __name__ == '__main__':
+    unittest.main()
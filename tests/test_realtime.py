@@ -0,0 +1,65 @@
+import unittest
+from unittest.mock import patch
+import os
+import sys
+
+# Add the repo root to sys.path so we can import pacman_toolkit
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from pacman_toolkit import realtime
+
+@unittest.skipUnless(hasattr(os, "sched_setaffinity"), "Linux scheduling API required")
+class TestRealtimeMode(unittest.TestCase):
+    def setUp(self):
+        self.affinity = os.sched_getaffinity(0)
+        self.policy = os.sched_getscheduler(0)
+
+    def tearDown(self):
+        os.sched_setaffinity(0, self.affinity)
+
+    def test_pin_and_restore(self):
+        rt = realtime.RealtimeMode(policy=None).apply()
+        self.assertEqual(rt.pinned_cpu, max(self.affinity))
+        self.assertEqual(os.sched_getaffinity(0), {max(self.affinity)})
+        self.assertEqual(rt.describe(), f"pinned to CPU {max(self.affinity)}")
+        rt.restore()
+        self.assertEqual(os.sched_getaffinity(0), self.affinity)
+        self.assertFalse(rt.active)
+
+    def test_unavailable_cpu(self):
+        rt = realtime.RealtimeMode(cpu=100000, policy=None).apply()
+        self.assertIsNone(rt.pinned_cpu)
+        self.assertIn("not available", rt.messages[0])
+
+    def test_scheduler_permission_fallback(self):
+        with patch.object(realtime.os, 'sched_setscheduler', side_effect=PermissionError):
+            with realtime.RealtimeMode(policy="fifo") as rt:
+                self.assertIsNone(rt.scheduler)
+                self.assertIn("CAP_SYS_NICE", rt.messages[0])
+                # Pinning still applies without the priority
+                self.assertIsNotNone(rt.pinned_cpu)
+        self.assertEqual(os.sched_getaffinity(0), self.affinity)
+
+    def test_fifo_sets_and_restores(self):
+        calls = []
+        with patch.object(realtime.os, 'sched_setscheduler', side_effect=lambda *a: calls.append(a)):
+            with realtime.RealtimeMode(policy="fifo", priority=1000) as rt:
+                max_prio = os.sched_get_priority_max(os.SCHED_FIFO)
+                self.assertEqual(rt.scheduler, f"SCHED_FIFO priority {max_prio}")
+        self.assertEqual(calls[0][1], os.SCHED_FIFO)
+        self.assertEqual(calls[1][1], self.policy)
+
+    def test_unsupported_platform(self):
+        with patch.object(realtime, 'os') as fake_os:
+            del fake_os.sched_setaffinity
+            del fake_os.sched_setscheduler
+            rt = realtime.RealtimeMode().apply()
+        self.assertFalse(rt.active)
+        self.assertEqual(len(rt.messages), 2)
+
+    def test_unknown_policy(self):
+        with self.assertRaises(ValueError):
+            realtime.RealtimeMode(policy="deadline")
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,141 @@
+import unittest
+from unittest.mock import patch, MagicMock
+import os
+import sys
+import types
+import random
+import importlib
+
+# Add the repo root to sys.path so we can import pacman_toolkit
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from pacman_toolkit import retry_policy as rp
+from pacman_toolkit import fastboot_emulator as emu
+
+KEY = (0x18d1, 0x4ee0, 1, (1,))
+
+def tracker_with(policy, profile="fastboot"):
+    return rp.RetryTracker({profile: policy})
+
+class TestPolicies(unittest.TestCase):
+    def test_exponential_matches_original_backoff(self):
+        tracker = tracker_with(rp.ExponentialBackoff(initial=2.0, maximum=30.0))
+        tracker.observe([(KEY, "fastboot")], 0.0)
+        delays = [tracker.failed(KEY, 0.0) for _ in range(5)]
+        self.assertEqual(delays, [4.0, 8.0, 16.0, 30.0, 30.0])
+
+    def test_burst_then_cooldown(self):
+        tracker = tracker_with(rp.ImmediateBurst(burst=3, cooldown=0.25))
+        tracker.observe([(KEY, "fastboot")], 0.0)
+        delays = [tracker.failed(KEY, 0.0) for _ in range(4)]
+        # Three attempts per window, then cool down
+        self.assertEqual(delays, [0.0, 0.0, 0.25, 0.25])
+        # A new window starts a new burst
+        tracker.observe([], 0.5)
+        tracker.observe([(KEY, "fastboot")], 2.0)
+        self.assertEqual(tracker.failed(KEY, 2.0), 0.0)
+
+    def test_jitter_is_bounded(self):
+        policy = rp.JitteredBackoff(base=0.02, maximum=0.1, rng=random.Random(3))
+        tracker = tracker_with(policy)
+        tracker.observe([(KEY, "fastboot")], 0.0)
+        for _ in range(20):
+            self.assertTrue(0.0 <= tracker.failed(KEY, 0.0) <= 0.1)
+
+    def test_window_synchronized_uses_period(self):
+        tracker = tracker_with(rp.WindowSynchronized(burst=2, lead=0.02,
+                                                     fallback=rp.ImmediateBurst(burst=0, cooldown=0.5)))
+        tracker.observe([(KEY, "fastboot")], 0.0)
+        # No period yet: fallback
+        self.assertEqual(tracker.failed(KEY, 0.01), 0.5)
+        tracker.observe([], 0.05)
+        tracker.observe([(KEY, "fastboot")], 2.0)
+        self.assertEqual(tracker.states[KEY].period, 2.0)
+        # Second attempt in the window goes at once, then it waits for the next one
+        self.assertEqual(tracker.failed(KEY, 2.01), 0.0)
+        self.assertAlmostEqual(tracker.failed(KEY, 2.03), 1.95)
+
+    def test_window_counters(self):
+        policy = rp.ImmediateBurst()
+        tracker = tracker_with(policy)
+        for start in (0.0, 2.0, 4.0):
+            tracker.observe([(KEY, "fastboot")], start)
+            if start < 4.0:
+                tracker.attempt(KEY)
+                tracker.attempt(KEY)
+                tracker.failed(KEY, start)
+            tracker.observe([], start + 0.05)
+        self.assertEqual((policy.windows_seen, policy.windows_used, policy.attempts), (3, 2, 4))
+        self.assertEqual(tracker.retries(KEY), 2)
+        self.assertIn("used 2 of 3 windows", tracker.summary()[0])
+
+    def test_policy_needs_a_delay(self):
+        class NoDelay(rp.RetryPolicy):
+            name = "none"
+
+        with self.assertRaises(TypeError):
+            NoDelay()
+
+    def test_unknown_policy(self):
+        with self.assertRaises(ValueError):
+            rp.make_policy("nope")
+
+    def test_slot_key_ignores_address(self):
+        a = MagicMock(idVendor=0x18d1, idProduct=0x4ee0, bus=1, address=5, port_numbers=[1, 2])
+        b = MagicMock(idVendor=0x18d1, idProduct=0x4ee0, bus=1, address=9, port_numbers=[1, 2])
+        self.assertEqual(rp.slot_key(a), rp.slot_key(b))
+
+class TestInterceptorRetries(unittest.TestCase):
+    def run_bootloop(self, policy):
+        """Six 50 ms windows 1 s apart; every catch attempt fails."""
+        clock = [0.0]
+        devices = [emu.FastbootDevice(address=5 + i, appear_at=0.2 + i, window=0.05) for i in range(6)]
+        bus = emu.EmulatedBus(devices, clock=lambda: clock[0])
+        with bus.installed():
+            import pacman_toolkit.pacman_interceptor as interceptor
+            interceptor = importlib.reload(interceptor)
+            interceptor.load_usb()
+
+        class Done(BaseException):
+            pass
+
+        def sleep(seconds):
+            clock[0] += seconds
+            if clock[0] > 6.0:
+                raise Done()
+
+        fake_time = types.SimpleNamespace(sleep=sleep, time=lambda: clock[0], monotonic=lambda: clock[0],
+                                          monotonic_ns=lambda: int(clock[0] * 1e9))
+        trackers = []
+        build = interceptor.build_retry_tracker
+
+        def build_tracker(overrides):
+            trackers.append(build(overrides))
+            return trackers[-1]
+
+        with patch.object(interceptor, 'check_prerequisites'), \
+             patch.object(interceptor, 'print_instructions'), \
+             patch.object(interceptor, 'log'), \
+             patch.object(interceptor, 'Spinner'), \
+             patch.object(interceptor, 'time', fake_time), \
+             patch.object(interceptor.Interceptor, '_sleep', lambda self, seconds: sleep(seconds)), \
+             patch.object(interceptor, 'catch_device', side_effect=emu.USBError("busy")), \
+             patch.object(interceptor, 'build_retry_tracker', build_tracker):
+            try:
+                interceptor.main(retry_policies={"fastboot": policy})
+            except Done:
+                pass
+        # The one run() started with
+        return trackers[-1].policies["fastboot"]
+
+    def test_exponential_skips_windows(self):
+        policy = self.run_bootloop("exponential")
+        self.assertEqual(policy.windows_seen, 6)
+        self.assertLess(policy.windows_used, 4)
+
+    def test_burst_uses_every_window(self):
+        policy = self.run_bootloop("burst")
+        self.assertEqual(policy.windows_used, 6)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,144 @@
+import unittest
+from unittest.mock import patch
+import os
+import sys
+import shutil
+import tempfile
+import argparse
+import threading
+import subprocess
+
+# Add the repo root to sys.path so we can import pacman_toolkit
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from pacman_toolkit.setup_pipeline import Pipeline, Stage
+import setup_and_verify
+
+def quiet_pipeline(stages):
+    return Pipeline(stages, log=lambda line: None)
+
+class TestPipeline(unittest.TestCase):
+    def test_independent_stages_overlap(self):
+        started = threading.Event()
+
+        def slow():
+            # Only finishes if the other stage runs at the same time
+            return started.wait(5)
+
+        results = quiet_pipeline([Stage("slow", slow), Stage("fast", started.set)]).run()
+        self.assertTrue(all(r.ok for r in results.values()))
+
+    def test_dependencies_order_and_skip(self):
+        order = []
+        results = quiet_pipeline([
+            Stage("a", lambda: order.append("a")),
+            Stage("b", lambda: order.append("b") or False, after=["a"]),
+            Stage("c", lambda: order.append("c"), needs=["b"]),
+            Stage("d", lambda: order.append("d"), needs=["c"]),
+            Stage("e", lambda: order.append("e"), after=["b"]),
+        ]).run()
+        self.assertEqual(order[:2], ["a", "b"])
+        self.assertEqual(sorted(order), ["a", "b", "e"])
+        self.assertEqual([r.status for r in results.values()], ["ok", "failed", "skipped", "skipped", "ok"])
+
+    def test_exceptions_fail_the_stage(self):
+        def boom():
+            raise RuntimeError("no network")
+        results = quiet_pipeline([Stage("clone", boom), Stage("pip", lambda: True, needs=["clone"])]).run()
+        self.assertEqual(results["clone"].detail, "RuntimeError: no network")
+        self.assertEqual(results["pip"].status, "skipped")
+
+    def test_interactive_stages_never_overlap(self):
+        active, overlaps = [], []
+
+        def prompt():
+            active.append(1)
+            if len(active) > 1:
+                overlaps.append(1)
+            threading.Event().wait(0.05)
+            active.pop()
+
+        quiet_pipeline([Stage(f"p{i}", prompt, interactive=True) for i in range(3)]).run()
+        self.assertEqual(overlaps, [])
+
+    def test_serial_runs_in_declaration_order(self):
+        order = []
+        stages = [Stage(name, lambda name=name: order.append(name)) for name in "xyz"]
+        stages.insert(1, Stage("skip", lambda: True, needs=["x"]))
+        stages[0].fn = lambda: False
+        quiet_pipeline(stages).run(serial=True)
+        self.assertEqual(order, ["y", "z"])
+
+    def test_invalid_graphs(self):
+        with self.assertRaises(ValueError):
+            Pipeline([Stage("a", None, after=["missing"])])
+        with self.assertRaises(ValueError):
+            Pipeline([Stage("a", None, after=["b"]), Stage("b", None, needs=["a"])])
+
+    def test_describe(self):
+        lines = Pipeline([Stage("clone", None), Stage("pip", None, needs=["clone"], interactive=True)]).describe()
+        self.assertEqual(lines, ["clone  starts immediately", "pip    needs clone [interactive]"])
+
+    def test_mtkclient_waits_for_packages(self):
+        args = argparse.Namespace(mirror=None, wheelhouse=None, offline=False)
+        stages = {stage.name: stage for stage in setup_and_verify.build_pipeline(args).stages}
+        for name in ("mtkclient", "mtkclient-requirements"):
+            self.assertIn("packages", stages[name].after)
+
+class TestOfflineSources(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.patch = patch.object(setup_and_verify, "TOOLKIT_DIR", self.tmp)
+        self.patch.start()
+
+    def tearDown(self):
+        self.patch.stop()
+        shutil.rmtree(self.tmp)
+
+    @unittest.skipUnless(shutil.which("git"), "git not installed")
+    def test_clone_from_local_mirror(self):
+        upstream = os.path.join(self.tmp, "upstream")
+        git = ["git", "-c", "user.name=t", "-c", "user.email=t@t"]
+        subprocess.run(git + ["init", "-q", upstream], check=True)
+        with open(os.path.join(upstream, "requirements.txt"), "w") as f:
+            f.write("pyusb\n")
+        subprocess.run(git + ["-C", upstream, "add", "."], check=True)
+        subprocess.run(git + ["-C", upstream, "commit", "-qm", "init"], check=True)
+        mirror = os.path.join(self.tmp, "mtkclient.git")
+        subprocess.run(["git", "clone", "-q", "--mirror", upstream, mirror], check=True)
+
+        with patch("builtins.print"):
+            self.assertTrue(setup_and_verify.clone_mtkclient(mirror, offline=True))
+        mtk_dir = os.path.join(self.tmp, "mtkclient")
+        self.assertTrue(os.path.exists(os.path.join(mtk_dir, "requirements.txt")))
+        origin = subprocess.run(["git", "-C", mtk_dir, "remote", "get-url", "origin"],
+                                stdout=subprocess.PIPE, text=True).stdout.strip()
+        self.assertEqual(origin, setup_and_verify.MTKCLIENT_URL)
+
+    def test_offline_without_mirror_fails(self):
+        with patch("builtins.print"), patch.object(setup_and_verify, "run_quiet") as run:
+            self.assertFalse(setup_and_verify.clone_mtkclient(os.path.join(self.tmp, "none.git"), offline=True))
+        run.assert_not_called()
+
+    def test_requirements_prefer_the_wheelhouse(self):
+        os.makedirs(os.path.join(self.tmp, "mtkclient"))
+        open(os.path.join(self.tmp, "mtkclient", "requirements.txt"), "w").close()
+        wheelhouse = os.path.join(self.tmp, "wheelhouse")
+        os.makedirs(wheelhouse)
+
+        with patch("builtins.print"), patch.object(setup_and_verify, "run_quiet", return_value=(True, [])) as run:
+            self.assertTrue(setup_and_verify.install_mtkclient_requirements(wheelhouse))
+        self.assertEqual(run.call_count, 1)
+        self.assertIn("--no-index", run.call_args[0][0])
+        self.assertEqual(run.call_args[0][0][-1], wheelhouse)
+
+        # An incomplete wheelhouse falls back to PyPI unless offline
+        with patch("builtins.print"), patch.object(setup_and_verify, "run_quiet", side_effect=[(False, []), (True, [])]) as run:
+            self.assertTrue(setup_and_verify.install_mtkclient_requirements(wheelhouse))
+        self.assertNotIn("--no-index", run.call_args[0][0])
+        with patch("builtins.print"), patch.object(setup_and_verify, "run_quiet", return_value=(False, [])) as run:
+            self.assertFalse(setup_and_verify.install_mtkclient_requirements(wheelhouse, offline=True))
+        self.assertEqual(run.call_count, 1)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -2,7 +2,10 @@ import unittest
 from unittest.mock import MagicMock, patch
 import sys
 import os
+import io
 import time
+import logging
+import threading
 
 # Mock usb module before it's imported by pacman_interceptor
 sys.modules['usb'] = MagicMock()
@@ -12,7 +15,8 @@ sys.modules['usb.util'] = MagicMock()
 # Add the parent directory to sys.path to import pacman_toolkit
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
-from pacman_toolkit.pacman_interceptor import Spinner
+import pacman_toolkit.pacman_interceptor as interceptor
+from pacman_toolkit.pacman_interceptor import Spinner, Renderer
 
 class TestSpinner(unittest.TestCase):
     def test_init(self):
@@ -96,3 +100,55 @@ class TestSpinner(unittest.TestCase):
         expected_clear = "\r" + " " * (len("Testing") + 2) + "\r"
         mock_stdout.write.assert_called_with(expected_clear)
         mock_stdout.flush.assert_called()
+
+class TestRenderer(unittest.TestCase):
+    def test_update_does_no_terminal_io(self):
+        r = Renderer("Testing")
+        with patch('sys.stdout') as mock_stdout:
+            r.start()
+            mock_stdout.reset_mock()
+            r.update((("brom", 0),))
+            mock_stdout.write.assert_not_called()
+            r.stop()
+        self.assertEqual(r.status, (("brom", 0),))
+
+    def test_log_lines_written_by_renderer_thread(self):
+        records = []
+        r = Renderer("Testing")
+        with patch('sys.stdout', new_callable=io.StringIO), \
+             patch.object(interceptor, 'logger') as mock_logger:
+            mock_logger.log.side_effect = lambda level, text: records.append((text, threading.current_thread().name))
+            r.start()
+            r.log(logging.INFO, "one")
+            r.log(logging.INFO, "two")
+            r.stop()
+        self.assertEqual(records, [("one", "interceptor-renderer"), ("two", "interceptor-renderer")])
+        self.assertFalse(r.running)
+        # The spinner line is cleared on exit
+        self.assertFalse(r.spinner.running)
+
+    def test_status_shown_in_spinner_line(self):
+        r = Renderer("Testing", fps=200)
+        with patch('sys.stdout', new_callable=io.StringIO) as out:
+            r.start()
+            r.update((("fastboot", 0), ("brom", 2)))
+            deadline = time.monotonic() + 2
+            while "brom (retry 2)" not in out.getvalue() and time.monotonic() < deadline:
+                time.sleep(0.01)
+            r.stop()
+        self.assertIn("Testing", out.getvalue())
+        self.assertIn("[fastboot, brom (retry 2)]", out.getvalue())
+
+    def test_log_queues_while_rendering(self):
+        r = Renderer("Testing")
+        with patch('sys.stdout', new_callable=io.StringIO), \
+             patch.object(interceptor, 'logger') as mock_logger, \
+             patch.object(interceptor, 'spinner', r):
+            r.start()
+            with patch.object(r, '_queue') as mock_queue:
+                interceptor.log("Queued")
+                mock_queue.put.assert_called_once_with((logging.INFO, "[PACMAN-INTERCEPTOR] Queued"))
+            mock_logger.info.assert_not_called()
+            r.stop()
+            interceptor.log("Direct")
+            mock_logger.info.assert_called_once_with("[PACMAN-INTERCEPTOR] Direct")
@@ -0,0 +1,96 @@
+import unittest
+import os
+import sys
+import time
+
+# Add the repo root to sys.path so we can import pacman_toolkit
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from pacman_toolkit.tick_scheduler import TickScheduler, LatencyHistogram
+
+MS = 1_000_000
+
+class FakeClock:
+    """monotonic_ns stand-in; sleep() advances it by the request plus `oversleep`."""
+
+    def __init__(self, oversleep=0):
+        self.now = 0
+        self.oversleep = oversleep
+        self.sleeps = []
+
+    def clock(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += int(seconds * 1e9) + self.oversleep
+
+class TestTickScheduler(unittest.TestCase):
+    def test_compensates_for_work_time(self):
+        fake = FakeClock()
+        ticks = TickScheduler(0.05, clock=fake.clock, sleep=fake.sleep)
+        for _ in range(10):
+            fake.now += 20 * MS  # work
+            ticks.wait()
+        self.assertEqual(fake.now, 500 * MS)
+        self.assertAlmostEqual(fake.sleeps[0], 0.03)
+        self.assertEqual(ticks.overruns, 0)
+
+    def test_oversleep_does_not_accumulate(self):
+        fake = FakeClock(oversleep=2 * MS)
+        ticks = TickScheduler(0.05, clock=fake.clock, sleep=fake.sleep)
+        for _ in range(100):
+            ticks.wait()
+        # Each wake is 2 ms late, but the deadlines stay on the 50 ms grid
+        self.assertEqual(fake.now, 100 * 50 * MS + 2 * MS)
+        stats = ticks.stats()
+        self.assertAlmostEqual(stats["late_p50_ms"], 2.0, delta=0.2)
+        self.assertAlmostEqual(stats["late_max_ms"], 2.0)
+
+    def test_overrun_skips_missed_ticks(self):
+        fake = FakeClock()
+        ticks = TickScheduler(0.05, clock=fake.clock, sleep=fake.sleep)
+        fake.now += 180 * MS
+        late = ticks.wait()
+        self.assertEqual(late, 130 * MS)
+        self.assertEqual(fake.sleeps, [0.0])
+        # The 100 ms and 150 ms deadlines are skipped
+        self.assertEqual(ticks.overruns, 2)
+        ticks.wait()
+        self.assertEqual(fake.now, 200 * MS)
+
+    def test_busy_polling(self):
+        fake = FakeClock()
+        ticks = TickScheduler(0, clock=fake.clock, sleep=fake.sleep)
+        fake.now += MS
+        ticks.wait()
+        ticks.wait()
+        self.assertEqual(fake.sleeps, [0.0, 0.0])
+        self.assertEqual(ticks.overruns, 0)
+
+    def test_real_clock_rate(self):
+        ticks = TickScheduler(0.005)
+        start = time.monotonic()
+        for _ in range(40):
+            ticks.wait()
+        self.assertAlmostEqual(time.monotonic() - start, 0.2, delta=0.05)
+        self.assertIn("40 ticks", ticks.summary())
+
+class TestLatencyHistogram(unittest.TestCase):
+    def test_percentiles(self):
+        hist = LatencyHistogram()
+        for _ in range(99):
+            hist.add(100_000)  # 0.1 ms
+        hist.add(10 * MS)
+        self.assertAlmostEqual(hist.percentile(50), 100_000, delta=10_000)
+        self.assertAlmostEqual(hist.percentile(99), 100_000, delta=10_000)
+        self.assertEqual(hist.percentile(100), 10 * MS)
+
+    def test_empty_and_negative(self):
+        hist = LatencyHistogram()
+        self.assertIsNone(hist.percentile(50))
+        hist.add(-5)
+        self.assertEqual(hist.percentile(50), 0)
+
+if __name__ == '__main__':
+    unittest.main()
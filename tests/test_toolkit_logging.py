@@ -0,0 +1,109 @@
+import unittest
+from unittest.mock import patch
+import io
+import os
+import sys
+import json
+import logging
+import tempfile
+import threading
+
+# Add the repo root to sys.path so we can import pacman_toolkit
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from pacman_toolkit import toolkit_logging
+
+class BlockingStream(io.StringIO):
+    """A terminal that hangs until released."""
+
+    def __init__(self):
+        super().__init__()
+        self.release = threading.Event()
+
+    def write(self, text):
+        self.release.wait(5)
+        return super().write(text)
+
+class TestToolkitLogging(unittest.TestCase):
+    def setUp(self):
+        self.root = logging.getLogger()
+        self.saved = (self.root.handlers[:], self.root.level)
+        self.root.handlers = []
+        self.logger = logging.getLogger("pacman_toolkit.test")
+        self.tmp = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        toolkit_logging.shutdown()
+        for handler in self.root.handlers:
+            handler.close()
+        self.root.handlers, level = self.saved
+        self.root.setLevel(level)
+        self.tmp.cleanup()
+
+    def test_records_written_in_background(self):
+        stream = io.StringIO()
+        self.assertIsNotNone(toolkit_logging.configure(stream=stream))
+        self.logger.info("first")
+        self.logger.warning("second %d", 2)
+        self.assertTrue(toolkit_logging.flush())
+        self.assertEqual(stream.getvalue(), "[INFO] first\n[WARNING] second 2\n")
+
+    def test_slow_stream_does_not_block_caller(self):
+        stream = BlockingStream()
+        toolkit_logging.configure(stream=stream)
+        self.logger.info("stuck")
+        self.logger.info("behind")
+        # Both calls returned while the writer is still blocked on the first
+        self.assertFalse(toolkit_logging.flush(timeout=0.05))
+        stream.release.set()
+        self.assertTrue(toolkit_logging.flush())
+        self.assertIn("behind", stream.getvalue())
+
+    def test_jsonl_output(self):
+        path = os.path.join(self.tmp.name, "log.jsonl")
+        toolkit_logging.configure(stream=io.StringIO(), jsonl_path=path)
+        self.logger.info("\033[92m[PACMAN-INTERCEPTOR] Device frozen\033[0m")
+        try:
+            raise ValueError("boom")
+        except ValueError:
+            self.logger.exception("failed")
+        toolkit_logging.flush()
+        with open(path) as f:
+            entries = [json.loads(line) for line in f]
+        self.assertEqual(entries[0]["msg"], "[PACMAN-INTERCEPTOR] Device frozen")
+        self.assertEqual(entries[0]["level"], "INFO")
+        self.assertEqual(entries[0]["logger"], "pacman_toolkit.test")
+        self.assertIn("ValueError: boom", entries[1]["msg"])
+
+    def test_jsonl_from_environment_and_rotation(self):
+        path = os.path.join(self.tmp.name, "log.jsonl")
+        with patch.dict(os.environ, {toolkit_logging.JSONL_ENV: path}):
+            toolkit_logging.configure(stream=io.StringIO())
+        toolkit_logging.enable_jsonl(os.path.join(self.tmp.name, "small.jsonl"), max_bytes=200, backups=2)
+        for i in range(20):
+            self.logger.info("line %d", i)
+        toolkit_logging.flush()
+        with open(path) as f:
+            self.assertEqual(len(f.readlines()), 20)
+        self.assertTrue(os.path.exists(os.path.join(self.tmp.name, "small.jsonl.2")))
+        self.assertFalse(os.path.exists(os.path.join(self.tmp.name, "small.jsonl.3")))
+
+    def test_existing_handlers_left_alone(self):
+        handler = logging.NullHandler()
+        self.root.addHandler(handler)
+        self.assertIsNone(toolkit_logging.configure())
+        self.assertEqual(self.root.handlers, [handler])
+        with self.assertRaises(RuntimeError):
+            toolkit_logging.enable_jsonl(os.path.join(self.tmp.name, "log.jsonl"))
+
+    def test_shutdown_drains_and_goes_synchronous(self):
+        stream = io.StringIO()
+        toolkit_logging.configure(stream=stream)
+        self.logger.info("queued")
+        toolkit_logging.shutdown()
+        self.assertEqual(stream.getvalue(), "[INFO] queued\n")
+        self.logger.info("direct")
+        self.assertEqual(stream.getvalue(), "[INFO] queued\n[INFO] direct\n")
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,68 @@
+import unittest
+import io
+import os
+import sys
+import hashlib
+
+# Add the repo root to sys.path so we can import pacman_toolkit
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from pacman_toolkit import transfer_pipeline as tp
+
+class TestReadAheadReader(unittest.TestCase):
+    def setUp(self):
+        self.data = os.urandom(1000003)
+
+    def test_streams_all_bytes_in_order(self):
+        h = hashlib.sha256()
+        stats = tp.transfer(io.BytesIO(self.data), h.update, chunk_size=65536, buffers=3)
+        self.assertEqual(h.digest(), hashlib.sha256(self.data).digest())
+        self.assertEqual(stats.bytes, len(self.data))
+        self.assertEqual(stats.chunks, -(-len(self.data) // 65536))
+
+    def test_size_limit(self):
+        out = bytearray()
+        tp.transfer(io.BytesIO(self.data), out.extend, size=100000, chunk_size=4096)
+        self.assertEqual(bytes(out), self.data[:100000])
+
+    def test_short_source_raises(self):
+        with self.assertRaises(EOFError):
+            tp.transfer(io.BytesIO(b'abc'), lambda chunk: None, size=10)
+
+    def test_buffers_are_reused(self):
+        seen = set()
+        reader = tp.ReadAheadReader(io.BytesIO(self.data), chunk_size=8192, buffers=2)
+        for chunk in reader:
+            seen.add(id(chunk.obj))
+        self.assertEqual(len(seen), 2)
+
+    def test_transform_runs_in_reader(self):
+        out = bytearray()
+        tp.transfer(io.BytesIO(b'ab' * 10), out.extend, chunk_size=4,
+                    transform=lambda chunk: bytes(chunk).upper())
+        self.assertEqual(bytes(out), b'AB' * 10)
+
+    def test_early_exit_stops_reader(self):
+        reader = tp.ReadAheadReader(io.BytesIO(self.data), chunk_size=1024, buffers=2)
+        for _ in reader:
+            break
+        self.assertFalse(reader._thread.is_alive())
+
+    def test_overlaps_reads_and_writes(self):
+        # 4 MB at 80 MB/s disk and 80 MB/s bus: serial ~0.1s, pipelined ~0.05s
+        size = 4 * 1024 * 1024
+        serial = tp.transfer_serial(tp.ThrottledReader(io.BytesIO(bytes(size)), 80e6, 0),
+                                    tp.EmulatedEndpoint(80e6, 0).write, chunk_size=262144)
+        piped = tp.transfer(tp.ThrottledReader(io.BytesIO(bytes(size)), 80e6, 0),
+                            tp.EmulatedEndpoint(80e6, 0).write, chunk_size=262144, buffers=2)
+        self.assertEqual(piped.bytes, size)
+        self.assertLess(piped.elapsed, serial.elapsed * 0.85)
+
+    def test_iter_view(self):
+        view = memoryview(self.data)
+        chunks = list(tp.iter_view(view, 300000))
+        self.assertEqual(b''.join(chunks), self.data)
+        self.assertIs(chunks[0].obj, self.data)
+
+if __name__ == '__main__':
+    unittest.main()
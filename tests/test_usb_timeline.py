@@ -0,0 +1,133 @@
+import unittest
+from unittest.mock import patch, MagicMock
+import os
+import sys
+import time
+import tempfile
+import importlib
+
+# Add the repo root to sys.path so we can import pacman_toolkit
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from pacman_toolkit import usb_timeline
+from pacman_toolkit import fastboot_emulator as emu
+
+def fake_dev(vid, pid, bus=1, address=5, ports=(1, 2)):
+    dev = MagicMock()
+    dev.idVendor, dev.idProduct, dev.bus, dev.address, dev.port_numbers = vid, pid, bus, address, ports
+    return dev
+
+class TestTimelineRecorder(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmpdir.name, "session.tl")
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_round_trip(self):
+        now = [0]
+        fastboot = fake_dev(0x18d1, 0x4ee0)
+        with usb_timeline.TimelineRecorder(self.path, clock=lambda: now[0]) as rec:
+            rec.observe([])
+            now[0] = 100_000_000
+            rec.observe([fastboot])
+            now[0] = 140_000_000
+            rec.observe([fastboot])
+            now[0] = 175_000_000
+            rec.observe([])
+            now[0] = 200_000_000
+        self.assertEqual(rec.transitions, 2)
+
+        timeline = usb_timeline.read_timeline(self.path)
+        kinds = [ev.event for ev in timeline.events]
+        self.assertEqual(kinds, [usb_timeline.EVENT_APPEAR, usb_timeline.EVENT_GONE, usb_timeline.EVENT_END])
+        self.assertEqual(timeline.events[0].key, (0x18d1, 0x4ee0, 1, 5, (1, 2)))
+        self.assertAlmostEqual(timeline.duration, 0.2)
+
+        (a,) = timeline.appearances()
+        self.assertAlmostEqual(a.start, 0.1)
+        self.assertAlmostEqual(a.duration, 0.075)
+
+    def test_vid_filter_and_open_appearance(self):
+        now = [0]
+        with usb_timeline.TimelineRecorder(self.path, vids={0x0e8d}, clock=lambda: now[0]) as rec:
+            rec.observe([fake_dev(0x046d, 0xc52b), fake_dev(0x0e8d, 0x0003, ports=())])
+            now[0] = 50_000_000
+        (a,) = usb_timeline.read_timeline(self.path).appearances()
+        self.assertEqual((a.vid, a.pid, a.ports), (0x0e8d, 0x0003, ()))
+        self.assertAlmostEqual(a.end, 0.05)
+
+    def test_rejects_other_files(self):
+        with open(self.path, 'wb') as f:
+            f.write(b'\0' * 64)
+        with self.assertRaises(usb_timeline.TimelineError):
+            usb_timeline.read_timeline(self.path)
+
+    def test_replay_bus(self):
+        now = [0]
+        with usb_timeline.TimelineRecorder(self.path, clock=lambda: now[0]) as rec:
+            now[0] = 1_000_000_000
+            rec.observe([fake_dev(0x18d1, 0x4ee0, address=7)])
+            now[0] = 1_050_000_000
+            rec.observe([])
+
+        clock = [0.0]
+        bus = usb_timeline.replay_bus(usb_timeline.read_timeline(self.path), clock=lambda: clock[0])
+        self.assertIsNone(bus.core.find(idVendor=0x18d1))
+        clock[0] = 1.02
+        dev = bus.core.find(idVendor=0x18d1)
+        self.assertEqual((dev.address, dev.port_numbers), (7, (1, 2)))
+        clock[0] = 1.06
+        self.assertEqual(list(bus.core.find(find_all=True)), [])
+
+class TestInterceptorRecording(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmpdir.name, "session.tl")
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def run_main(self, bus, duration, **kwargs):
+        with bus.installed():
+            import pacman_toolkit.pacman_interceptor as interceptor
+            interceptor = importlib.reload(interceptor)
+            interceptor.load_usb()
+
+        start = time.monotonic()
+        real_sleep = interceptor.Interceptor._sleep
+
+        def sleep(session, seconds):
+            if time.monotonic() - start > duration:
+                session.stop()
+            real_sleep(session, seconds)
+
+        # Every catch fails, so the session polls until it is stopped
+        with patch.object(interceptor, 'check_prerequisites'), \
+             patch.object(interceptor, 'print_instructions'), \
+             patch.object(interceptor, 'log'), \
+             patch.object(interceptor, 'Spinner'), \
+             patch.object(interceptor, 'catch_device', side_effect=interceptor.CatchError("busy")) as mock_catch, \
+             patch.object(interceptor.Interceptor, '_sleep', sleep):
+            bus.restart_clock()
+            interceptor.main(**kwargs)
+        return mock_catch
+
+    def test_record_then_replay(self):
+        field = emu.EmulatedBus([emu.FastbootDevice(appear_at=0.1, window=0.2)])
+        mock_catch = self.run_main(field, 0.5, record_path=self.path, catch=False)
+        mock_catch.assert_not_called()
+
+        (a,) = usb_timeline.read_timeline(self.path).appearances()
+        self.assertAlmostEqual(a.start, 0.1, delta=0.06)
+        self.assertAlmostEqual(a.duration, 0.2, delta=0.1)
+
+        # The recorded session, replayed, is caught by the normal loop
+        replay = usb_timeline.replay_bus(usb_timeline.read_timeline(self.path))
+        mock_catch = self.run_main(replay, 0.5)
+        mock_catch.assert_called()
+        self.assertEqual(mock_catch.call_args[0][0].idProduct, 0x4ee0)
+
+if __name__ == '__main__':
+    unittest.main()